@@ -0,0 +1,263 @@
+# Micro-benchmarks of hplx's own code: parsing HPL output, writing results, choosing the theoretical best inputs and
+# enumerating process grids. None of these run HPL. The output files are synthetic, written in the same format as
+# HPL's with varied N, NB, P, Q, times and residuals, at sizes of 1 thousand (small), 100 thousand (medium) and 10
+# million (large) results. The large file is several GB and its results take several GB of memory so it is only
+# run when asked for. Each benchmark is repeated and its timings are reported as JSON so that a run of one version
+# can be compared against a run of another with --baseline. Run from the repository root with:
+#   PYTHONPATH=src python benchmarks/bench_hplx.py --output-file bench.json
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from importlib import metadata
+from pathlib import Path
+from typing import Callable
+
+from hmxlabs.hplx.hpl_input import HplInputFileGenerator
+from hmxlabs.hplx.hpl_model import HplPerformanceModel
+from hmxlabs.hplx.hpl_results import HplResult, HplResultsFile
+from hmxlabs.hplx.hpl_results_writer import HplResultsWriter
+
+SIZES = {"small": 1000, "medium": 100000, "large": 10000000}
+DEFAULT_SIZES = ["small", "medium"]
+DEFAULT_REPEATS = 5
+# Results are written in batches of this many, as hplx does when writing a whole result set
+WRITE_BATCH_SIZE = 10000
+# A run this much slower than the baseline is reported as a regression
+DEFAULT_REGRESSION_THRESHOLD = 1.1
+
+# Memory in bytes and core counts from a small workstation to a large node
+MEMORY_SIZES = [16 * 1024 ** 3, 256 * 1024 ** 3, 4 * 1024 ** 4]
+CORE_COUNTS = [8, 128, 1024]
+# Rank counts of large multi-node runs, including highly composite ones with many process grids
+RANK_COUNTS = [4096, 65536, 720720, 2 ** 20 * 3]
+# About the DGEMM rate of a modern core
+GFLOPS_PER_PROCESS = 40.0
+
+OUTPUT_HEADER = """================================================================================
+HPLinpack 2.3  --  High-Performance Linpack benchmark  --   December 2, 2018
+Written by A. Petitet and R. Clint Whaley,  Innovative Computing Laboratory, UTK
+Modified by Piotr Luszczek, Innovative Computing Laboratory, UTK
+Modified by Julien Langou, University of Colorado Denver
+================================================================================
+
+- The matrix A is randomly generated for each test.
+- The relative machine precision (eps) is taken to be               1.110223e-16
+- Computational tests pass if scaled residuals are less than                16.0
+
+"""
+
+RESULT_BLOCK = """================================================================================
+T/V                N    NB     P     Q               Time                 Gflops
+--------------------------------------------------------------------------------
+{variant:<12}{n:>8}{nb:>6}{p:>6}{q:>6}{time:>19.2f}{gflops:>23.4e}
+HPL_pdgesv() start time {start}
+
+HPL_pdgesv() end time   {end}
+
+--------------------------------------------------------------------------------
+||Ax-b||_oo/(eps*(||A||_oo*||x||_oo+||b||_oo)*N)=   {residual:.8e} ...... {check}
+"""
+
+OUTPUT_FOOTER = """================================================================================
+
+Finished {count:>6} tests with the following results:
+         {passed:>6} tests completed and passed residual checks,
+         {failed:>6} tests completed and failed residual checks,
+              0 tests skipped because of illegal input values.
+--------------------------------------------------------------------------------
+
+End of Tests.
+================================================================================
+"""
+
+
+def write_synthetic_output(file_path: str, count: int, seed: int = 0) -> None:
+    """
+        Writes an HPL output file of count results. Roughly 1 in 100 fails its residual check
+    """
+    rng = random.Random(seed)
+    grids = [(1, 8), (2, 4), (4, 4), (4, 8), (8, 8), (8, 16)]
+    variants = ["WR11C2R4", "WR00L2L2", "WR12R2C4", "WC10R2R4"]
+    start = datetime(2024, 12, 9, 11, 54, 52)
+    failed = 0
+    with open(file_path, "w") as file:
+        file.write(OUTPUT_HEADER)
+        blocks = []
+        for index in range(count):
+            p, q = grids[index % len(grids)]
+            n = rng.randrange(1000, 200000, 1000)
+            nb = rng.choice([32, 64, 96, 128, 192, 256])
+            seconds = max(0.01, 2 * n ** 3 / 3 / (p * q * 1e10) * rng.uniform(0.8, 1.2))
+            residual = rng.uniform(1e-4, 1e-2) if rng.random() > 0.01 else rng.uniform(20, 100)
+            failed += residual >= 16
+            end = start + timedelta(seconds=seconds)
+            blocks.append(RESULT_BLOCK.format(variant=variants[index % len(variants)], n=n, nb=nb, p=p, q=q,
+                                              time=seconds, gflops=2 * n ** 3 / 3 / seconds / 1e9,
+                                              start=start.strftime(HplResult.HPL_TIME_FORMAT),
+                                              end=end.strftime(HplResult.HPL_TIME_FORMAT), residual=residual,
+                                              check="PASSED" if residual < 16 else "FAILED"))
+            start = end
+            if len(blocks) >= WRITE_BATCH_SIZE:
+                file.write("".join(blocks))
+                blocks = []
+        file.write("".join(blocks))
+        file.write(OUTPUT_FOOTER.format(count=count, passed=count - failed, failed=failed))
+
+
+def measure(name: str, params: dict, func: Callable[[], object], repeats: int, items: int = None,
+            setup: Callable[[], None] = None) -> dict:
+    """
+        Times func repeats times, after a warm up run, calling setup before each untimed. Throughput is items per
+        second of the median time, if items is given
+    """
+    timings = []
+    for _ in range(repeats + 1):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    timings = timings[1:]
+
+    median = statistics.median(timings)
+    benchmark = {"name": name, "params": params, "repeats": repeats, "unit": "s", "min": min(timings),
+                 "median": median, "mean": statistics.fmean(timings), "max": max(timings)}
+    if items is not None:
+        benchmark["items"] = items
+        benchmark["throughput"] = items / median if median > 0 else None
+    return benchmark
+
+
+def bench_results_files(sizes: list[str], repeats: int, work_dir: Path) -> list[dict]:
+    benchmarks = []
+    for size in sizes:
+        count = SIZES[size]
+        output_file = str(work_dir / f"HPL-{size}.out")
+        write_synthetic_output(output_file, count)
+        # The large files are read and written fewer times, they take minutes each
+        size_repeats = repeats if count <= SIZES["medium"] else 1
+        params = {"size": size, "results": count}
+        benchmarks.append(measure("read_result_file", params,
+                                  lambda: HplResultsFile.read_result_file(output_file), size_repeats, count))
+
+        results = HplResultsFile.read_result_file(output_file)
+        if len(results) != count:
+            raise ValueError(f"Expected {count} results in {output_file} but read {len(results)}")
+        Path(output_file).unlink()
+
+        for output_format in [HplResultsWriter.FORMAT_CSV, HplResultsWriter.FORMAT_JSON]:
+            results_file = str(work_dir / f"results-{size}{HplResultsWriter.FILE_EXTENSIONS[output_format]}")
+
+            def write_results() -> None:
+                with HplResultsWriter.open(results_file, output_format, append=False,
+                                           batch_size=WRITE_BATCH_SIZE) as results_writer:
+                    results_writer.write_all(results)
+
+            benchmarks.append(measure(f"write_results_{output_format}", params, write_results, size_repeats,
+                                      count))
+            Path(results_file).unlink()
+    return benchmarks
+
+
+def bench_theoretical_best(repeats: int) -> list[dict]:
+    benchmarks = []
+    model = HplPerformanceModel.from_peak(GFLOPS_PER_PROCESS)
+    for memory in MEMORY_SIZES:
+        for cores in CORE_COUNTS:
+            params = {"available_memory": memory, "cpu_count": cores}
+            benchmarks.append(measure("generate_theoretical_best_inputs", params,
+                                      lambda: HplInputFileGenerator.generate_theoretical_best_inputs(cores, memory),
+                                      repeats))
+            benchmarks.append(measure("generate_theoretical_best_inputs_model", params,
+                                      lambda: HplInputFileGenerator.generate_theoretical_best_inputs(
+                                          cores, memory, performance_model=model), repeats))
+    return benchmarks
+
+
+def bench_process_grids(repeats: int) -> list[dict]:
+    benchmarks = []
+    for ranks in RANK_COUNTS:
+        grids = HplInputFileGenerator.generate_possible_process_grids(ranks)
+        benchmarks.append(measure("generate_possible_process_grids", {"cpu_count": ranks},
+                                  lambda: HplInputFileGenerator.generate_possible_process_grids(ranks), repeats,
+                                  len(grids[0])))
+    return benchmarks
+
+
+def compare(benchmarks: list[dict], baseline_file: str, threshold: float) -> list[dict]:
+    """
+        Adds each benchmark's baseline median and its ratio to it. Returns the benchmarks slower than the threshold
+    """
+    with open(baseline_file, "r") as file:
+        baseline = {(benchmark["name"], json.dumps(benchmark["params"], sort_keys=True)): benchmark
+                    for benchmark in json.load(file)["benchmarks"]}
+
+    regressions = []
+    for benchmark in benchmarks:
+        previous = baseline.get((benchmark["name"], json.dumps(benchmark["params"], sort_keys=True)))
+        if previous is None or previous["median"] <= 0:
+            continue
+        benchmark["baseline_median"] = previous["median"]
+        benchmark["ratio"] = benchmark["median"] / previous["median"]
+        if benchmark["ratio"] > threshold:
+            regressions.append(benchmark)
+    return regressions
+
+
+def hplx_version() -> str:
+    try:
+        return metadata.version("hmxlabs.hplx")
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def main() -> None:
+    argparser = argparse.ArgumentParser(description="Benchmarks hplx's parsing, writing and input generation")
+    argparser.add_argument("--sizes", dest="sizes", nargs="+", choices=list(SIZES), default=DEFAULT_SIZES,
+                           help=f"The synthetic HPL output files to read and write, of {', '.join(f'{name}={count}' for name, count in SIZES.items())} results. Default is {' '.join(DEFAULT_SIZES)}")
+    argparser.add_argument("--repeats", dest="repeats", type=int, default=DEFAULT_REPEATS,
+                           help=f"The number of timed runs of each benchmark, after a warm up run. Default is {DEFAULT_REPEATS}")
+    argparser.add_argument("--output-file", dest="output_file", type=str, default=None,
+                           help="The file to write the timings to as JSON. Default is stdout")
+    argparser.add_argument("--baseline", dest="baseline", type=str, default=None,
+                           help="The timings of an earlier run to compare against. Exits with 1 if any benchmark regressed")
+    argparser.add_argument("--threshold", dest="threshold", type=float, default=DEFAULT_REGRESSION_THRESHOLD,
+                           help=f"With --baseline, the ratio of the median times beyond which a benchmark has regressed. Default is {DEFAULT_REGRESSION_THRESHOLD}")
+    argparser.add_argument("--work-dir", dest="work_dir", type=str, default=None,
+                           help="The directory to write the synthetic files to. Default is a temporary directory")
+    args = argparser.parse_args()
+
+    if args.repeats < 1:
+        raise ValueError("repeats must be at least 1")
+
+    with tempfile.TemporaryDirectory(dir=args.work_dir) as work_dir:
+        benchmarks = bench_results_files(args.sizes, args.repeats, Path(work_dir))
+    benchmarks += bench_theoretical_best(args.repeats)
+    benchmarks += bench_process_grids(args.repeats)
+
+    regressions = compare(benchmarks, args.baseline, args.threshold) if args.baseline else []
+    report = {"hplx_version": hplx_version(), "python": platform.python_version(), "machine": platform.machine(),
+              "processor": platform.processor(), "timestamp": datetime.now().isoformat(timespec="seconds"),
+              "benchmarks": benchmarks}
+    if args.output_file:
+        with open(args.output_file, "w") as file:
+            json.dump(report, file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    for regression in regressions:
+        print(f"Regression: {regression['name']} {regression['params']} took {regression['ratio']:.2f}x the "
+              f"baseline median", file=sys.stderr)
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
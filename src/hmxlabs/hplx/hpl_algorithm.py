@@ -0,0 +1,246 @@
+# The algorithmic parameters of HPL, lines 13-36 of HPL.dat.
+# See https://www.netlib.org/benchmark/hpl/tuning.html for what each does.
+# HPL accepts a list of values for the panel factorisation (PFACT), recursive stopping criterion (NBMIN), panels in
+# recursion (NDIV), recursive factorisation (RFACT), broadcast (BCAST) and lookahead depth (DEPTH) and runs every
+# combination of them, each of which it reports with a T/V code such as WR11C2R4. The remaining parameters,
+# including the SWAP algorithm and its threshold, take a single value per HPL.dat.
+import itertools
+
+
+class HplAlgorithmParameters:
+
+    # Panel factorisations, used for both PFACT and RFACT, and the letter HPL uses for each in its T/V code
+    FACT_LEFT = 0
+    FACT_CROUT = 1
+    FACT_RIGHT = 2
+    FACT_CODES = "LCR"
+
+    BCAST_1RING = 0
+    BCAST_1RING_MODIFIED = 1
+    BCAST_2RING = 2
+    BCAST_2RING_MODIFIED = 3
+    BCAST_LONG = 4
+    BCAST_LONG_MODIFIED = 5
+
+    SWAP_BINARY_EXCHANGE = 0
+    SWAP_LONG = 1
+    SWAP_MIX = 2
+
+    # The process mapping, line 9 of HPL.dat, is not one of lines 13-36 but is part of the T/V code
+    PMAP_CODES = {True: "R", False: "C"}
+
+    # The values swept by default. These are the combinations most likely to matter on current hardware
+    SWEEP_PFACTS = (FACT_CROUT, FACT_RIGHT)
+    SWEEP_NBMINS = (4,)
+    SWEEP_NDIVS = (2,)
+    SWEEP_RFACTS = (FACT_CROUT, FACT_RIGHT)
+    SWEEP_BCASTS = (BCAST_1RING, BCAST_1RING_MODIFIED, BCAST_2RING, BCAST_2RING_MODIFIED, BCAST_LONG,
+                    BCAST_LONG_MODIFIED)
+    SWEEP_DEPTHS = (0, 1, 2)
+
+    # The PTRANS section at the end of the file is not used by HPL itself and is always the same
+    PTRANS_LINES = """##### This line (no. 32) is ignored (it serves as a separator). ######
+0                               Number of additional problem sizes for PTRANS
+1200 10000 30000                values of N
+0                               number of additional blocking sizes for PTRANS
+40 9 8 13 13 20 16 32 64        values of NB
+"""
+
+    # The width of the value column before the comment on each line
+    VALUE_WIDTH = 13
+
+    def __init__(self, threshold: float = 16.0, pfacts: [int] = (FACT_RIGHT,), nbmins: [int] = (4,),
+                 ndivs: [int] = (2,), rfacts: [int] = (FACT_CROUT,), bcasts: [int] = (BCAST_1RING_MODIFIED,),
+                 depths: [int] = (1,), swap: int = SWAP_MIX, swapping_threshold: int = 64, l1_transposed: bool = True,
+                 u_transposed: bool = True, equilibration: bool = True, memory_alignment: int = 8) -> None:
+        """
+            The defaults are those HPLx has always used
+        """
+        HplAlgorithmParameters._check_values("pfacts", pfacts, 0, 2)
+        HplAlgorithmParameters._check_values("nbmins", nbmins, 1)
+        HplAlgorithmParameters._check_values("ndivs", ndivs, 2)
+        HplAlgorithmParameters._check_values("rfacts", rfacts, 0, 2)
+        HplAlgorithmParameters._check_values("bcasts", bcasts, 0, 5)
+        HplAlgorithmParameters._check_values("depths", depths, 0)
+        HplAlgorithmParameters._check_values("swap", [swap], 0, 2)
+        HplAlgorithmParameters._check_values("swapping_threshold", [swapping_threshold], 0)
+        HplAlgorithmParameters._check_values("memory_alignment", [memory_alignment], 1)
+
+        self._threshold = float(threshold)
+        self._pfacts = list(pfacts)
+        self._nbmins = list(nbmins)
+        self._ndivs = list(ndivs)
+        self._rfacts = list(rfacts)
+        self._bcasts = list(bcasts)
+        self._depths = list(depths)
+        self._swap = swap
+        self._swapping_threshold = swapping_threshold
+        self._l1_transposed = l1_transposed
+        self._u_transposed = u_transposed
+        self._equilibration = equilibration
+        self._memory_alignment = memory_alignment
+
+    @staticmethod
+    def sweep(pfacts: [int] = SWEEP_PFACTS, nbmins: [int] = SWEEP_NBMINS, ndivs: [int] = SWEEP_NDIVS,
+              rfacts: [int] = SWEEP_RFACTS, bcasts: [int] = SWEEP_BCASTS, depths: [int] = SWEEP_DEPTHS,
+              swap: int = SWAP_MIX, swapping_threshold: int = 64) -> "HplAlgorithmParameters":
+        return HplAlgorithmParameters(pfacts=pfacts, nbmins=nbmins, ndivs=ndivs, rfacts=rfacts, bcasts=bcasts,
+                                      depths=depths, swap=swap, swapping_threshold=swapping_threshold)
+
+    @property
+    def threshold(self) -> float:
+        return self._threshold
+
+    @property
+    def pfacts(self) -> [int]:
+        return self._pfacts
+
+    @property
+    def nbmins(self) -> [int]:
+        return self._nbmins
+
+    @property
+    def ndivs(self) -> [int]:
+        return self._ndivs
+
+    @property
+    def rfacts(self) -> [int]:
+        return self._rfacts
+
+    @property
+    def bcasts(self) -> [int]:
+        return self._bcasts
+
+    @property
+    def depths(self) -> [int]:
+        return self._depths
+
+    @property
+    def swap(self) -> int:
+        return self._swap
+
+    @property
+    def swapping_threshold(self) -> int:
+        return self._swapping_threshold
+
+    @property
+    def l1_transposed(self) -> bool:
+        return self._l1_transposed
+
+    @property
+    def u_transposed(self) -> bool:
+        return self._u_transposed
+
+    @property
+    def equilibration(self) -> bool:
+        return self._equilibration
+
+    @property
+    def memory_alignment(self) -> int:
+        return self._memory_alignment
+
+    @property
+    def num_variants(self) -> int:
+        # HPL runs every combination of the multi-valued parameters for each N, NB and process grid
+        return len(self._pfacts) * len(self._nbmins) * len(self._ndivs) * len(self._rfacts) * len(self._bcasts) * \
+            len(self._depths)
+
+    def variant_codes(self, row_major: bool = True) -> list[str]:
+        """
+            The T/V code HPL reports for each combination of the parameters
+        """
+        return [HplAlgorithmParameters.variant_code(row_major, depth, bcast, rfact, ndiv, pfact, nbmin)
+                for depth, bcast, rfact, ndiv, pfact, nbmin in
+                itertools.product(self._depths, self._bcasts, self._rfacts, self._ndivs, self._pfacts, self._nbmins)]
+
+    @staticmethod
+    def variant_code(row_major: bool, depth: int, bcast: int, rfact: int, ndiv: int, pfact: int, nbmin: int) -> str:
+        # As HPL writes it: W, the process mapping, DEPTH, BCAST, RFACT, NDIV, PFACT and NBMIN
+        return f"W{HplAlgorithmParameters.PMAP_CODES[row_major]}{depth}{bcast}" \
+               f"{HplAlgorithmParameters.FACT_CODES[rfact]}{ndiv}{HplAlgorithmParameters.FACT_CODES[pfact]}{nbmin}"
+
+    @staticmethod
+    def parse_variant_code(code: str) -> dict:
+        """
+            Splits a T/V code such as WR11C2R4 into its parameters. Raises ValueError if it is not a valid code
+        """
+        if not code or len(code) < 8 or "W" != code[0] or code[1] not in "RC" or code[4] not in "LCR" or \
+                code[6] not in "LCR" or not (code[2] + code[3] + code[5] + code[7:]).isdigit():
+            raise ValueError(f"{code} is not a valid HPL T/V code")
+
+        return {
+            "row_major": "R" == code[1],
+            "depth": int(code[2]),
+            "bcast": int(code[3]),
+            "rfact": HplAlgorithmParameters.FACT_CODES.index(code[4]),
+            "ndiv": int(code[5]),
+            "pfact": HplAlgorithmParameters.FACT_CODES.index(code[6]),
+            "nbmin": int(code[7:]),
+        }
+
+    def lines_13_36(self) -> str:
+        lines = [
+            self._line(self._threshold, "threshold"),
+            self._line(len(self._pfacts), "# of panel fact"),
+            self._line(self._pfacts, "PFACTs (0=left, 1=Crout, 2=Right)"),
+            self._line(len(self._nbmins), "# of recursive stopping criterium"),
+            self._line(self._nbmins, "NBMINs (>= 1)"),
+            self._line(len(self._ndivs), "# of panels in recursion"),
+            self._line(self._ndivs, "NDIVs"),
+            self._line(len(self._rfacts), "# of recursive panel fact."),
+            self._line(self._rfacts, "RFACTs (0=left, 1=Crout, 2=Right)"),
+            self._line(len(self._bcasts), "# of broadcast"),
+            self._line(self._bcasts, "BCASTs (0=1rg,1=1rM,2=2rg,3=2rM,4=Lng,5=LnM)"),
+            self._line(len(self._depths), "# of lookahead depth"),
+            self._line(self._depths, "DEPTHs (>=0)"),
+            self._line(self._swap, "SWAP (0=bin-exch,1=long,2=mix)"),
+            self._line(self._swapping_threshold, "swapping threshold"),
+            self._line(0 if self._l1_transposed else 1, "L1 in (0=transposed,1=no-transposed) form"),
+            self._line(0 if self._u_transposed else 1, "U  in (0=transposed,1=no-transposed) form"),
+            self._line(1 if self._equilibration else 0, "Equilibration (0=no,1=yes)"),
+            self._line(self._memory_alignment, "memory alignment in double (> 0)"),
+        ]
+        return "\n".join(lines) + "\n" + HplAlgorithmParameters.PTRANS_LINES
+
+    @staticmethod
+    def parse_lines_13_36(lines: list[str]) -> "HplAlgorithmParameters":
+        """
+            Reads the parameters back from lines 13-36 of an HPL.dat, as HPL does: the leading values of each line,
+            the lists cut to the count on the line before. Raises ValueError if the lines are incomplete or invalid
+        """
+        if len(lines) < 19:
+            raise ValueError(f"Expected at least 19 lines of algorithmic parameters but got {len(lines)}")
+
+        try:
+            values = [line.split() for line in lines[:19]]
+            counts = {index: int(values[index - 1][0]) for index in (2, 4, 6, 8, 10, 12)}
+            lists = {index: [int(value) for value in values[index][:count]] for index, count in counts.items()}
+            if any(len(lists[index]) != counts[index] for index in counts):
+                raise ValueError("A list of parameters is shorter than its count")
+
+            return HplAlgorithmParameters(threshold=float(values[0][0]), pfacts=lists[2], nbmins=lists[4],
+                                          ndivs=lists[6], rfacts=lists[8], bcasts=lists[10], depths=lists[12],
+                                          swap=int(values[13][0]), swapping_threshold=int(values[14][0]),
+                                          l1_transposed=0 == int(values[15][0]),
+                                          u_transposed=0 == int(values[16][0]),
+                                          equilibration=1 == int(values[17][0]),
+                                          memory_alignment=int(values[18][0]))
+        except IndexError:
+            raise ValueError("The algorithmic parameters are incomplete")
+
+    @staticmethod
+    def _line(value, comment: str) -> str:
+        if isinstance(value, list):
+            value = " ".join(str(item) for item in value)
+        # Long lists push the comment along rather than running into it
+        return str(value).ljust(HplAlgorithmParameters.VALUE_WIDTH - 1) + " " + comment
+
+    @staticmethod
+    def _check_values(name: str, values: [int], minimum: int, maximum: int = None) -> None:
+        if not values:
+            raise ValueError(f"{name} cannot be empty")
+
+        for value in values:
+            if value < minimum or (maximum is not None and value > maximum):
+                limit = f"between {minimum} and {maximum}" if maximum is not None else f"at least {minimum}"
+                raise ValueError(f"{name} must be {limit}. Got {value}")
@@ -0,0 +1,131 @@
+# Groups HPL configurations into batches, each written to a single HPL.dat and run by a single HPL invocation.
+# Launching HPL (mpirun starting every rank, often across nodes) can take tens of seconds, so running every
+# configuration separately wastes that time over and over, while a single invocation for everything cannot be
+# stopped or timed out with any granularity. HPL runs the cross product of the problem sizes, block sizes and process
+# grids in its input, so a batch is always a full N x NB x grid product of configurations that were asked for and
+# never adds combinations that were not. The configurations are first split into as few such products as possible,
+# then any product predicted to take longer than the maximum batch time, launch included, is split again, along the
+# problem sizes first as they dominate the runtime.
+import math
+from typing import Callable
+
+
+class HplBatch:
+
+    def __init__(self, n: list[int], nb: list[int], grids: list[tuple[int, int]]) -> None:
+        if not n or not nb or not grids:
+            raise ValueError("A batch must have at least one problem size, block size and process grid")
+
+        self._n = list(n)
+        self._nb = list(nb)
+        self._grids = list(grids)
+
+    @property
+    def n(self) -> list[int]:
+        return self._n
+
+    @property
+    def nb(self) -> list[int]:
+        return self._nb
+
+    @property
+    def grids(self) -> list[tuple[int, int]]:
+        return self._grids
+
+    @property
+    def configs(self) -> list[tuple[int, int, int, int]]:
+        # In the order HPL runs them
+        return [(n, nb, p, q) for n in self._n for nb in self._nb for p, q in self._grids]
+
+    def __len__(self) -> int:
+        return len(self._n) * len(self._nb) * len(self._grids)
+
+    def __str__(self) -> str:
+        return f"N={self._n}, NB={self._nb}, grids={self._grids}"
+
+
+class HplBatchPlanner:
+
+    # The dimensions a batch is split along, in order of preference
+    SPLIT_ORDER = ("n", "grids", "nb")
+
+    def __init__(self, predict_runtime: Callable[[tuple[int, int, int, int]], float], launch_overhead: float = 0.0,
+                 max_batch_time: float = math.inf) -> None:
+        """
+            predict_runtime gives the predicted runtime in seconds of an (N, NB, P, Q) configuration. Each batch
+            costs launch_overhead seconds on top of the runtime of its configurations, which together are kept to no
+            more than max_batch_time seconds where possible. A single configuration that alone takes longer is a
+            batch of its own
+        """
+        if launch_overhead < 0:
+            raise ValueError("launch_overhead cannot be negative")
+
+        if max_batch_time <= 0:
+            raise ValueError("max_batch_time must be positive")
+
+        self._predict_runtime = predict_runtime
+        self._launch_overhead = launch_overhead
+        self._max_batch_time = max_batch_time
+
+    def predict(self, batch: HplBatch) -> float:
+        # In seconds, launch included
+        return self._launch_overhead + sum(self._predict_runtime(config) for config in batch.configs)
+
+    def plan(self, configs: list[tuple[int, int, int, int]]) -> list[HplBatch]:
+        """
+            The batches to run the configurations in, shortest first
+        """
+        batches = [split for batch in HplBatchPlanner.products(configs) for split in self._split(batch)]
+        return sorted(batches, key=lambda batch: (min(batch.n), self.predict(batch)))
+
+    @staticmethod
+    def products(configs: list[tuple[int, int, int, int]]) -> list[HplBatch]:
+        """
+            Covers the (N, NB, P, Q) configurations with N x NB x grid products, each of which holds only
+            configurations that were given. A full cross product is a single batch
+        """
+        # Problem sizes with the same (NB, grid) pairs can share a batch, as can grids with the same block sizes
+        pairs_by_n: dict[int, set[tuple[int, tuple[int, int]]]] = {}
+        for n, nb, p, q in dict.fromkeys(configs):
+            pairs_by_n.setdefault(n, set()).add((nb, (p, q)))
+
+        ns_by_pairs: dict[frozenset, list[int]] = {}
+        for n in sorted(pairs_by_n):
+            ns_by_pairs.setdefault(frozenset(pairs_by_n[n]), []).append(n)
+
+        products: dict[tuple[tuple[int, ...], tuple[tuple[int, int], ...]], list[int]] = {}
+        for pairs, ns in ns_by_pairs.items():
+            nbs_by_grid: dict[tuple[int, int], set[int]] = {}
+            for nb, grid in pairs:
+                nbs_by_grid.setdefault(grid, set()).add(nb)
+            grids_by_nbs: dict[tuple[int, ...], list[tuple[int, int]]] = {}
+            for grid in sorted(nbs_by_grid):
+                grids_by_nbs.setdefault(tuple(sorted(nbs_by_grid[grid])), []).append(grid)
+            for nbs, grids in grids_by_nbs.items():
+                # Problem sizes that ended up in different groups can still share the same block sizes and grids
+                products.setdefault((nbs, tuple(grids)), []).extend(ns)
+
+        return [HplBatch(sorted(ns), list(nbs), list(grids)) for (nbs, grids), ns in products.items()]
+
+    def _split(self, batch: HplBatch) -> list[HplBatch]:
+        if len(batch) <= 1 or self.predict(batch) <= self._max_batch_time:
+            return [batch]
+
+        # Pack the values of the first dimension with more than one into as few batches as fit, splitting any
+        # value that alone does not fit along the next dimension
+        dimension = next(dimension for dimension in HplBatchPlanner.SPLIT_ORDER if len(getattr(batch, dimension)) > 1)
+        chunks = [[]]
+        for value in getattr(batch, dimension):
+            candidate = chunks[-1] + [value]
+            if chunks[-1] and self.predict(HplBatchPlanner._with(batch, dimension, candidate)) > self._max_batch_time:
+                chunks.append([value])
+            else:
+                chunks[-1] = candidate
+
+        return [split for chunk in chunks for split in self._split(HplBatchPlanner._with(batch, dimension, chunk))]
+
+    @staticmethod
+    def _with(batch: HplBatch, dimension: str, values: list) -> HplBatch:
+        parts = {"n": batch.n, "nb": batch.nb, "grids": batch.grids}
+        parts[dimension] = values
+        return HplBatch(parts["n"], parts["nb"], parts["grids"])
@@ -0,0 +1,134 @@
+# A local cache of HPL results so that configurations already measured on identical hardware need not be run again.
+# Results are held in SQLite keyed by a fingerprint of the hardware, the CPUs HPL was run on and how they were split
+# into ranks and threads, and the fixed part of HPL.dat (lines 13-36), and within that by the (N, NB, P, Q)
+# configuration. Entries older than a configurable age are ignored and may be
+# evicted, as may the oldest entries once the cache grows beyond a configurable size.
+import hashlib
+import json
+import sqlite3
+import time
+from pathlib import Path
+
+import cpuinfo
+import psutil
+
+from hmxlabs.hplx.hpl_results import HplResult
+
+
+class HplResultsCache:
+
+    DEFAULT_CACHE_FILE = str(Path.home() / ".hplx" / "results-cache.sqlite")
+    DEFAULT_MAX_AGE = 7 * 24 * 60 * 60
+    DEFAULT_MAX_ENTRIES = 100000
+
+    def __init__(self, cache_file: str = DEFAULT_CACHE_FILE) -> None:
+        if not cache_file:
+            raise ValueError("cache_file cannot be None or empty")
+
+        Path(cache_file).parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(cache_file)
+        self._connection.execute("""CREATE TABLE IF NOT EXISTS results (
+                                        fingerprint TEXT NOT NULL,
+                                        n INTEGER NOT NULL,
+                                        nb INTEGER NOT NULL,
+                                        p INTEGER NOT NULL,
+                                        q INTEGER NOT NULL,
+                                        measured_at REAL NOT NULL,
+                                        gflops REAL,
+                                        result TEXT NOT NULL,
+                                        PRIMARY KEY (fingerprint, n, nb, p, q))""")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS results_measured_at ON results (measured_at)")
+        self._connection.commit()
+
+    @staticmethod
+    def hardware_fingerprint(available_memory: int, lines_13_36: str, cpu_model: str = None,
+                             cpu_count: int = None, threads: int = 1) -> str:
+        """
+            Identifies the hardware (CPU model, physical and logical core counts and memory size), the number of
+            CPUs HPL is run on, the threads each rank runs and the algorithmic parameters in lines 13-36 of HPL.dat.
+            Results are only reused where all of these match. The same process grid on a different number of CPUs,
+            e.g. a partition's, or with a different number of threads per rank is not the same measurement
+        """
+        if cpu_model is None:
+            cpu_model = cpuinfo.get_cpu_info().get("brand_raw", "unknown")
+
+        fingerprint = {
+            "cpu_model": cpu_model,
+            "physical_cores": psutil.cpu_count(logical=False),
+            "logical_cores": psutil.cpu_count(logical=True),
+            "memory": available_memory,
+            "cpu_count": cpu_count,
+            "threads": threads,
+            "hpl_dat_13_36": hashlib.sha256(lines_13_36.encode()).hexdigest(),
+        }
+        return hashlib.sha256(json.dumps(fingerprint, sort_keys=True).encode()).hexdigest()
+
+    def put(self, fingerprint: str, result: HplResult, measured_at: float = None) -> None:
+        # A run that failed its residual check is not a valid measurement so is never cached
+        if result.failed:
+            return
+
+        if measured_at is None:
+            measured_at = time.time()
+
+        self._connection.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                 (fingerprint, int(result.n), int(result.nb), int(result.p), int(result.q),
+                                  measured_at, result.gflops, result.to_json()))
+        self._connection.commit()
+
+    def get(self, fingerprint: str, n: int, nb: int, p: int, q: int,
+            max_age: float = DEFAULT_MAX_AGE) -> HplResult | None:
+        row = self._connection.execute("SELECT result FROM results WHERE fingerprint = ? AND n = ? AND nb = ? "
+                                       "AND p = ? AND q = ? AND measured_at >= ?",
+                                       (fingerprint, n, nb, p, q, time.time() - max_age)).fetchone()
+        if row is None:
+            return None
+
+        return HplResultsCache._to_result(row[0])
+
+    def get_many(self, fingerprint: str, configs: list[tuple[int, int, int, int]],
+                 max_age: float = DEFAULT_MAX_AGE) -> dict[tuple[int, int, int, int], HplResult]:
+        """
+            Returns the cached result for each (N, NB, P, Q) in configs that has one no older than max_age
+        """
+        wanted = set(configs)
+        cached: dict[tuple[int, int, int, int], HplResult] = {}
+        rows = self._connection.execute("SELECT n, nb, p, q, result FROM results WHERE fingerprint = ? "
+                                        "AND measured_at >= ?", (fingerprint, time.time() - max_age))
+        for n, nb, p, q, result in rows:
+            if (n, nb, p, q) in wanted:
+                cached[(n, nb, p, q)] = HplResultsCache._to_result(result)
+
+        return cached
+
+    def evict(self, max_age: float = DEFAULT_MAX_AGE, max_entries: int = DEFAULT_MAX_ENTRIES) -> int:
+        """
+            Removes entries older than max_age and then the oldest entries beyond max_entries. Returns the number of
+            entries removed
+        """
+        removed = self._connection.execute("DELETE FROM results WHERE measured_at < ?",
+                                           (time.time() - max_age,)).rowcount
+        if max_entries > 0:
+            removed += self._connection.execute("DELETE FROM results WHERE rowid NOT IN "
+                                                "(SELECT rowid FROM results ORDER BY measured_at DESC LIMIT ?)",
+                                                (max_entries,)).rowcount
+        self._connection.commit()
+        return removed
+
+    def __len__(self) -> int:
+        return self._connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def __enter__(self) -> "HplResultsCache":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    @staticmethod
+    def _to_result(result_json: str) -> HplResult:
+        result = HplResult()
+        result.update(json.loads(result_json))
+        return result
@@ -0,0 +1,215 @@
+# Compares the results of a candidate run against those of a baseline, e.g. before and after a firmware, BIOS or
+# kernel change, so that a node that has got slower is caught before it goes back into production. Results are
+# matched by configuration: N, NB, P, Q, the CPU count and the variant of the algorithmic parameters. Results written
+# before the variant was recorded were run with the default algorithmic parameters and are matched as such. The runs of
+# each configuration are aggregated into a mean as for repetition (see hpl_repetition) and the change in the mean is
+# given with a confidence interval from the relative spread of runs, pooled across every configuration run more than
+# once on either side. A configuration has regressed if its throughput dropped by more than the threshold and the drop
+# is significant, i.e. the whole interval is below zero. If no configuration was run more than once there is no
+# measure of the noise, only the prior, so significance cannot be assessed and a drop of more than the threshold is a
+# regression. The best configuration of each side is compared too, as the best of two sweeps need not be the same
+# configuration.
+import math
+
+from hmxlabs.hplx.hpl_algorithm import HplAlgorithmParameters
+from hmxlabs.hplx.hpl_repetition import HplConfigStats, HplRepetition
+from hmxlabs.hplx.hpl_results import HplResult
+from hmxlabs.hplx.hpl_result_set import HplResultSet
+
+
+class HplComparison:
+
+    def __init__(self, baseline: HplConfigStats, candidate: HplConfigStats, relative_noise: float, df: float,
+                 confidence: float, threshold: float, assessed: bool = True) -> None:
+        """
+            The change from the baseline's mean GFLOPS to the candidate's, as a fraction of the baseline's.
+            relative_noise is the relative standard deviation of a single run, estimated with df degrees of freedom.
+            If not assessed the noise is only the prior and a drop of more than the threshold is a regression
+        """
+        if baseline.mean <= 0:
+            raise ValueError("The baseline's mean GFLOPS must be positive")
+
+        self._baseline = baseline
+        self._candidate = candidate
+        self._threshold = threshold
+        self._assessed = assessed
+        ratio = candidate.mean / baseline.mean
+        self._change = ratio - 1.0
+        self._half_width = HplRepetition.t_quantile(0.5 + confidence / 2, df) * ratio * relative_noise * \
+            math.sqrt(1 / baseline.count + 1 / candidate.count)
+
+    @property
+    def baseline(self) -> HplConfigStats:
+        return self._baseline
+
+    @property
+    def candidate(self) -> HplConfigStats:
+        return self._candidate
+
+    @property
+    def change(self) -> float:
+        return self._change
+
+    @property
+    def half_width(self) -> float:
+        return self._half_width
+
+    @property
+    def lower(self) -> float:
+        return self._change - self._half_width
+
+    @property
+    def upper(self) -> float:
+        return self._change + self._half_width
+
+    @property
+    def assessed(self) -> bool:
+        # Whether the noise was measured from repeated runs, rather than only assumed
+        return self._assessed
+
+    @property
+    def significant(self) -> bool:
+        # The change is more than the noise could explain
+        return self.lower > 0 or self.upper < 0
+
+    @property
+    def regressed(self) -> bool:
+        return self._change < -self._threshold and (self.upper < 0 or not self._assessed)
+
+    def __str__(self) -> str:
+        baseline = HplComparison._describe(self._baseline.representative)
+        candidate = HplComparison._describe(self._candidate.representative)
+        configs = baseline if baseline == candidate else f"{baseline} -> {candidate}"
+        verdict = "REGRESSED" if self.regressed else "significant" if self.significant else "within noise"
+        if not self._assessed:
+            verdict += ", significance not assessed"
+        return f"{configs}: {self._baseline.mean:.2f} -> {self._candidate.mean:.2f} GFLOPS over " \
+               f"{self._baseline.count} -> {self._candidate.count} runs, {self._change * 100:+.2f}% " \
+               f"+/- {self._half_width * 100:.2f}%, {verdict}"
+
+    @staticmethod
+    def _describe(result: HplResult) -> str:
+        return f"n={result.n}, nb={result.nb}, p={result.p}, q={result.q}, cpu_count={result.cpu_count}, " \
+               f"variant={result.variant}"
+
+
+class HplComparisonReport:
+
+    def __init__(self, comparisons: list[HplComparison], best: HplComparison | None,
+                 baseline_only: list[tuple], candidate_only: list[tuple], assessed: bool = True) -> None:
+        self._comparisons = comparisons
+        self._best = best
+        self._baseline_only = baseline_only
+        self._candidate_only = candidate_only
+        self._assessed = assessed
+
+    @property
+    def comparisons(self) -> list[HplComparison]:
+        # Those of the configurations in both, the largest drop first
+        return self._comparisons
+
+    @property
+    def best(self) -> HplComparison | None:
+        # The candidate's best configuration against the baseline's, None if either has no usable results
+        return self._best
+
+    @property
+    def baseline_only(self) -> list[tuple]:
+        return self._baseline_only
+
+    @property
+    def candidate_only(self) -> list[tuple]:
+        return self._candidate_only
+
+    @property
+    def assessed(self) -> bool:
+        # False if no configuration was run more than once, so regressions are judged on the threshold alone
+        return self._assessed
+
+    @property
+    def regressions(self) -> list[HplComparison]:
+        regressions = [comparison for comparison in self._comparisons if comparison.regressed]
+        if self._best is not None and self._best.regressed:
+            regressions.append(self._best)
+        return regressions
+
+    @property
+    def regressed(self) -> bool:
+        return len(self.regressions) > 0
+
+
+class HplComparer:
+
+    # A drop in throughput of more than this fraction is a regression, if it is significant
+    DEFAULT_THRESHOLD = 0.05
+    # The variant HPLx runs with unless the algorithmic parameters are swept
+    DEFAULT_VARIANT = HplAlgorithmParameters().variant_codes()[0]
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, confidence: float = HplRepetition.DEFAULT_CONFIDENCE,
+                 prior_noise: float = HplRepetition.DEFAULT_PRIOR_NOISE, exclude_failed: bool = True) -> None:
+        if threshold < 0:
+            raise ValueError("threshold cannot be negative")
+
+        if confidence <= 0 or confidence >= 1:
+            raise ValueError("confidence must be between 0 and 1")
+
+        if prior_noise < 0:
+            raise ValueError("prior_noise cannot be negative")
+
+        self._threshold = threshold
+        self._confidence = confidence
+        self._prior_noise = prior_noise
+        self._exclude_failed = exclude_failed
+
+    @staticmethod
+    def config_key(result: HplResult) -> tuple:
+        # Results read from HPL's own output have no CPU count and results written before the variant was recorded
+        # have none either
+        cpu_count = None if result.cpu_count is None or math.isnan(result.cpu_count) else int(result.cpu_count)
+        variant = result.variant or HplComparer.DEFAULT_VARIANT
+        return int(result.n), int(result.nb), int(result.p), int(result.q), cpu_count, variant
+
+    def compare(self, baseline: list[HplResult] | HplResultSet,
+                candidate: list[HplResult] | HplResultSet) -> HplComparisonReport:
+        baseline_groups = self._group(baseline)
+        candidate_groups = self._group(candidate)
+        relative_noise, df = HplRepetition.pooled_noise(list(baseline_groups.values()) +
+                                                        list(candidate_groups.values()), self._prior_noise)
+        # Without a configuration run more than once the noise is only the prior
+        assessed = df > HplRepetition.PRIOR_DF
+
+        comparisons = [self._comparison(baseline_groups[key], candidate_groups[key], relative_noise, df, assessed)
+                       for key in baseline_groups if key in candidate_groups]
+        comparisons.sort(key=lambda comparison: comparison.change)
+
+        # As when choosing the best configuration, it is the one with the highest lower confidence bound
+        best = None
+        if baseline_groups and candidate_groups:
+            best = self._comparison(self._best(baseline_groups, relative_noise, df).results,
+                                    self._best(candidate_groups, relative_noise, df).results, relative_noise, df,
+                                    assessed)
+
+        return HplComparisonReport(comparisons, best,
+                                   [key for key in baseline_groups if key not in candidate_groups],
+                                   [key for key in candidate_groups if key not in baseline_groups], assessed)
+
+    def _comparison(self, baseline: list[HplResult], candidate: list[HplResult], relative_noise: float,
+                    df: float, assessed: bool) -> HplComparison:
+        return HplComparison(HplConfigStats(baseline, relative_noise, df, self._confidence),
+                             HplConfigStats(candidate, relative_noise, df, self._confidence),
+                             relative_noise, df, self._confidence, self._threshold, assessed)
+
+    def _best(self, groups: dict[tuple, list[HplResult]], relative_noise: float, df: float) -> HplConfigStats:
+        stats = [HplConfigStats(group, relative_noise, df, self._confidence) for group in groups.values()]
+        return max(stats, key=lambda stat: (stat.lower, stat.mean))
+
+    def _group(self, results: list[HplResult] | HplResultSet) -> dict[tuple, list[HplResult]]:
+        if isinstance(results, HplResultSet):
+            results = results.to_results()
+
+        groups: dict[tuple, list[HplResult]] = {}
+        for result in results:
+            if math.isnan(result.gflops) or result.gflops <= 0 or (self._exclude_failed and result.failed):
+                continue
+            groups.setdefault(HplComparer.config_key(result), []).append(result)
+        return groups
@@ -3,8 +3,18 @@
 # Details on this may be found at https://www.netlib.org/benchmark/hpl/tuning.html
 # See also https://www.netlib.org/benchmark/hpl/faqs.html#grid
 # This will generate only the first 12 lines of the input file.
-# The rest of the file has a defaulted value. This can be overridden by the user
+# The rest of the file has a defaulted value. This can be overridden by the user, or generated from a set of
+# HplAlgorithmParameters
+# Problem sizes are chosen with an HplMemoryModel, which can likewise be overridden. Given an HplPerformanceModel the
+# theoretical best inputs are those it predicts to be fastest rather than those of the rules of thumb
 import math
+import warnings
+
+import numpy as np
+
+from hmxlabs.hplx.hpl_algorithm import HplAlgorithmParameters
+from hmxlabs.hplx.hpl_memory import HplMemoryModel
+from hmxlabs.hplx.hpl_model import HplPerformanceModel
 
 
 class HplInputFileGenerator:
@@ -12,6 +22,14 @@ class HplInputFileGenerator:
     MIN_N = 1000
     MAX_N = 1000000
     STEP_N = 1000
+    MIN_NB = 32
+    MAX_NB = 256
+    # The block sizes a performance model chooses between are multiples of this
+    NB_STEP = 8
+
+    # The problem and block size used when determining the best process grid
+    PROC_GRID_N = 1000
+    PROC_GRID_NB = 64
 
     LINE_1_HEADER = "HPLinpack benchmark input file. Generated by hmxlabs.hplx"
     LINE_2_HEADER = "See https://github.com/hmc-labs/hplx for more information"
@@ -53,75 +71,100 @@ class HplInputFileGenerator:
 
     output_lines_13_36 = LINES_13_36
 
+    memory_model = HplMemoryModel()
+
     @staticmethod
     def generate_theoretical_best_inputs(  cpu_count: int,
                                            available_memory: int,
                                            min_n: int = MIN_N,
                                            max_n:int = 0,
-                                           step_n:int = STEP_N,
-                                           prob_size_cap = 0) -> (int, int, int, int):
+                                           step_n:int = None,
+                                           prob_size_cap = 0,
+                                           performance_model: HplPerformanceModel = None) -> (int, int, int, int):
+        """
+            The largest problem size the memory model allows on the most square process grid (P <= Q), with NB
+            around sqrt(N). N is a multiple of NB x lcm(P, Q). Returns None if no N of at least min_n fits.
+            If a performance_model is given the grid and NB are instead those it predicts the most GFLOPS for.
+            step_n is deprecated and ignored, N no longer steps through a range
+        """
+        if step_n is not None:
+            warnings.warn("step_n is deprecated and ignored. N is the largest the memory model allows",
+                          DeprecationWarning, stacklevel=2)
 
-        # Assuming HPL will need 8 bytes per double precision element
-        available_memory_gb = available_memory / (1024**3)
-        double_precision_size = 8  # bytes per double
-        memory_per_core_gb = available_memory_gb / cpu_count
-        if 0 == max_n:
-            max_n = HplInputFileGenerator.calculate_max_problem_size(available_memory, prob_size_cap)
+        cap = min([limit for limit in [max_n, prob_size_cap] if limit > 0], default=0)
+        if performance_model is not None:
+            return HplInputFileGenerator._model_best_inputs(performance_model, cpu_count, available_memory, min_n, cap)
 
         best_params = None
-        best_performance = 0
-
         proc_grids = HplInputFileGenerator.generate_possible_process_grids(cpu_count)
-        p_vals = proc_grids[0]
-        q_vals = proc_grids[1]
-
-        for N in range(min_n, max_n + 1, step_n):
-            # Calculate the optimal NB based on memory per core (rule of thumb)
-            # Generally, NB is around sqrt(N) for optimal performance
-            NB = int(math.sqrt(N))
-            # NB is generally in the range 32..256 though so if its outside that range fit to it
-            if 32 > NB:
-                NB = 32
-
-            if 256 < NB:
-                NB = 256
-
-            required_memory = (N * double_precision_size) / (1024 ** 3)  # in GB
-            if required_memory <= memory_per_core_gb:
-
-                # Try to balance P and Q. The number of processes (P * Q) should be close to the number of cores
-                for idx in range(0, len(p_vals)):
-                    P = p_vals[idx]
-                    Q = q_vals[idx]
-                    performance_metric = required_memory / (P+Q)
-                    if performance_metric > best_performance:
-                        best_performance = performance_metric
-                        best_params = (N, NB, P, Q)
+        # HPL performs best with a grid as close to square as possible and P no greater than Q
+        ordered_grids = sorted(zip(proc_grids[0], proc_grids[1]), key=lambda grid: (grid[0] + grid[1], grid[0]))
+
+        for P, Q in ordered_grids:
+            # NB is generally best around sqrt(N) in the range 32..256. N depends on NB (through the workspace and
+            # the rounding to whole blocks) so start from the largest and refine once
+            NB = HplInputFileGenerator.MAX_NB
+            for _ in range(2):
+                N = HplInputFileGenerator.memory_model.max_problem_size(available_memory, NB, P, Q)
+                NB = min(HplInputFileGenerator.MAX_NB, max(HplInputFileGenerator.MIN_NB, int(math.sqrt(N))))
+            N = HplInputFileGenerator.memory_model.max_problem_size(available_memory, NB, P, Q)
+
+            if 0 != cap and N > cap:
+                # A smaller N suits a smaller NB, which needs less workspace so the capped N still fits
+                NB = min(HplInputFileGenerator.MAX_NB, max(HplInputFileGenerator.MIN_NB, int(math.sqrt(cap))))
+                step = NB * math.lcm(P, Q)
+                N = cap // step * step
+
+            if N >= min_n:
+                best_params = (N, NB, P, Q)
+                break
 
         return best_params
 
 
+    @staticmethod
+    def _model_best_inputs(performance_model: HplPerformanceModel, cpu_count: int, available_memory: int,
+                           min_n: int, cap: int) -> (int, int, int, int):
+        # Every grid and NB, each with the largest N that fits (within the cap), ranked by the predicted GFLOPS. The
+        # candidates are scored as arrays, rather than one by one, so that even large core counts are quick
+        proc_grids = HplInputFileGenerator.generate_possible_process_grids(cpu_count)
+        block_sizes = np.arange(HplInputFileGenerator.MIN_NB, HplInputFileGenerator.MAX_NB + 1,
+                                HplInputFileGenerator.NB_STEP)
+        p = np.repeat(proc_grids[0], len(block_sizes))
+        q = np.repeat(proc_grids[1], len(block_sizes))
+        nb = np.tile(block_sizes, len(proc_grids[0]))
+        n = HplInputFileGenerator.memory_model.max_problem_sizes(available_memory, nb, p, q)
+        if 0 != cap:
+            step = nb * np.lcm(p, q)
+            n = np.where(n > cap, cap // step * step, n)
+
+        viable = n >= min_n
+        if not np.any(viable):
+            return None
+
+        gflops = np.where(viable, performance_model.predict_gflops(np.maximum(n, 1), nb, p, q), -np.inf)
+        best = int(np.argmax(gflops))
+        return int(n[best]), int(nb[best]), int(p[best]), int(q[best])
+
+
     @staticmethod
     def generate_possible_process_grids(cpu_count: int) -> ([int], [int]):
         """
             This function generates all possible combinations of P and Q that can be used to solve the HPL problem
-            given a number of cpus
+            given a number of cpus, in order of increasing P
         """
-        process_grids: ([int], [int]) = ([], [])
-        for P in range(1, int(cpu_count/2) + 1):
-            for Q in range(1, cpu_count + 1):
-                if P * Q == cpu_count:
-                    process_grids[0].append(P)
-                    process_grids[1].append(Q)
-        return process_grids
+        divisors = [P for P in range(1, math.isqrt(cpu_count) + 1) if 0 == cpu_count % P]
+        divisors += [cpu_count // P for P in reversed(divisors) if P * P != cpu_count]
+        return divisors, [cpu_count // P for P in divisors]
 
 
     @staticmethod
-    def calculate_max_problem_size(available_memory: int, prob_size_cap:int = 0) -> int:
-        # Apply a conservative estimate of 80% of memory can actually be used
-        # without starving the system. Assume a double precision matrix and a double is 8 bytes
-        num_doubles = available_memory*0.8 / 8
-        max_prob_size = int(math.sqrt(num_doubles))
+    def calculate_max_problem_size(available_memory: int, prob_size_cap:int = 0, cpu_count: int = 1) -> int:
+        # The largest N the memory model allows with one rank per CPU, before the block size and process grid are
+        # known. The workspace is sized for the largest block size considered
+        max_prob_size = HplInputFileGenerator.memory_model.max_problem_size(available_memory,
+                                                                            HplInputFileGenerator.MAX_NB, 1,
+                                                                            cpu_count, whole_blocks=False)
         if 0 != prob_size_cap and max_prob_size > prob_size_cap:
             max_prob_size = prob_size_cap
 
@@ -133,12 +176,15 @@ class HplInputFileGenerator:
         process_grid = HplInputFileGenerator.generate_possible_process_grids(cpu_count)
         # Use a very small problem size to calculate the best process grid to minimise compute time
         # as the variation due to block size and problem size is minimal in determining the best grid
-        return HplInputFileGenerator.generate_input_file([1000], [64], process_grid[0], process_grid[1], write_file, output_file, row_major)
+        return HplInputFileGenerator.generate_input_file([HplInputFileGenerator.PROC_GRID_N],
+                                                         [HplInputFileGenerator.PROC_GRID_NB],
+                                                         process_grid[0], process_grid[1], write_file, output_file, row_major)
 
 
     @staticmethod
-    def generate_possible_problem_sizes(available_memory: int, num_sizes: int = 10, prob_size_cap: int = 0) -> [int]:
-        max_problem_size = HplInputFileGenerator.calculate_max_problem_size(available_memory, prob_size_cap)
+    def generate_possible_problem_sizes(available_memory: int, num_sizes: int = 10, prob_size_cap: int = 0,
+                                        cpu_count: int = 1) -> [int]:
+        max_problem_size = HplInputFileGenerator.calculate_max_problem_size(available_memory, prob_size_cap, cpu_count)
         # Bit of a random guess here but use 1/8th of the max problem size as the minimum to try and guess a range
         min_problem_size = int(max_problem_size / num_sizes)
         if 1000 > min_problem_size:
@@ -188,14 +234,16 @@ class HplInputFileGenerator:
                                                    output_file: str,
                                                    num_prob_sizes: int = 10, num_block_sizes: int = 10,
                                                    prob_size_cap = 0, row_major: bool = True) -> str:
-        problem_sizes = HplInputFileGenerator.generate_possible_problem_sizes(available_memory, num_prob_sizes, prob_size_cap)
+        problem_sizes = HplInputFileGenerator.generate_possible_problem_sizes(available_memory, num_prob_sizes,
+                                                                              prob_size_cap, p[0] * q[0] if p else 1)
         max_problem_size = problem_sizes[-1]
         block_sizes = HplInputFileGenerator.generate_possible_block_sizes(max_problem_size, num_block_sizes)
 
         return HplInputFileGenerator.generate_input_file(problem_sizes, block_sizes, p, q, write_file, output_file, row_major)
 
     @staticmethod
-    def generate_input_file(n: [int], nb: [int], p: [int], q: [int], write_file: bool, output_file: str, row_major: bool = True) -> str:
+    def generate_input_file(n: [int], nb: [int], p: [int], q: [int], write_file: bool, output_file: str, row_major: bool = True,
+                            algorithm: HplAlgorithmParameters = None) -> str:
 
         if len(p) != len(q):
             raise ValueError("The number of elements in p and q must be the same")
@@ -269,6 +317,45 @@ class HplInputFileGenerator:
             q_str += f"{q_val} "
         output += q_str + HplInputFileGenerator.LINE_12_COMMENT + "\n"
 
-        # The rest of the file is a default value. This can be overridden by the user
-        output += HplInputFileGenerator.output_lines_13_36
+        # The rest of the file is a default value. This can be overridden by the user or by the algorithmic
+        # parameters to run
+        if algorithm is not None:
+            output += algorithm.lines_13_36()
+        else:
+            output += HplInputFileGenerator.output_lines_13_36
         return output
+
+    @staticmethod
+    def parse_input_file(hpl_dat: str) -> dict:
+        """
+            Reads an HPL.dat back as HPL does, taking the leading values of each line. Returns a dict of the output
+            file, whether output is written to it (rather than stdout), the problem sizes (n), block sizes (nb),
+            whether the process mapping is row-major, the process grids (p and q) and the algorithmic parameters.
+            Raises ValueError if the file is incomplete or invalid
+        """
+        lines = hpl_dat.splitlines()
+        if len(lines) < 31:
+            raise ValueError(f"Expected at least 31 lines in HPL.dat but got {len(lines)}")
+
+        def values(index: int, count_index: int) -> [int]:
+            count = int(lines[count_index].split()[0])
+            parsed = [int(value) for value in lines[index].split()[:count]]
+            if len(parsed) != count:
+                raise ValueError(f"Line {index + 1} of HPL.dat has fewer than the {count} values expected")
+            return parsed
+
+        try:
+            p = values(10, 9)
+            return {
+                "output_file": lines[2].split()[0],
+                # 6 and 7 are stdout and stderr, anything else a file
+                "write_file": int(lines[3].split()[0]) not in (6, 7),
+                "n": values(5, 4),
+                "nb": values(7, 6),
+                "row_major": 0 == int(lines[8].split()[0]),
+                "p": p,
+                "q": values(11, 9),
+                "algorithm": HplAlgorithmParameters.parse_lines_13_36(lines[12:]),
+            }
+        except IndexError:
+            raise ValueError("HPL.dat is incomplete")
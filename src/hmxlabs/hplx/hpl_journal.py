@@ -0,0 +1,147 @@
+# A journal of a sweep's progress so that a long calc-optimal or run-all interrupted part way through (a node
+# reboot, a job hitting its wall time) can carry on where it stopped rather than start again. Each phase of the
+# sweep (the process grid probe, the problem sizes, each round of repeats and so on) is named by the HPL output file
+# it writes, so a configuration run again in a later round of repeats does not replace its earlier runs. The journal
+# records the configurations each phase plans to run, every result as it is produced and the choices made between
+# phases, such as the best process grid. It is a JSON lines file, appended to and synced to disk record by record,
+# so at worst the last record is torn by a crash and that record alone is ignored when the journal is read back.
+import json
+import os
+from pathlib import Path
+
+from hmxlabs.hplx.hpl_results import HplResult
+
+
+class HplJournal:
+
+    DEFAULT_JOURNAL_FILE = "./hplx-journal.jsonl"
+
+    JSON_KEY_EVENT = "event"
+    JSON_KEY_PHASE = "phase"
+    JSON_KEY_CONFIGS = "configs"
+    JSON_KEY_RESULT = "result"
+    JSON_KEY_NAME = "name"
+    JSON_KEY_VALUE = "value"
+
+    EVENT_PLAN = "plan"
+    EVENT_RESULT = "result"
+    EVENT_CHOICE = "choice"
+
+    def __init__(self, journal_file: str = DEFAULT_JOURNAL_FILE, resume: bool = False) -> None:
+        """
+            Opens the journal. Unless resuming, any existing journal is replaced and the sweep starts afresh
+        """
+        if not journal_file:
+            raise ValueError("journal_file cannot be None or empty")
+
+        self._journal_file = journal_file
+        self._plans: dict[str, list[tuple[int, int, int, int]]] = {}
+        self._results: dict[str, dict[tuple[int, int, int, int, str], HplResult]] = {}
+        self._choices: dict[str, dict] = {}
+        self._resumed = False
+        if resume and Path(journal_file).is_file():
+            self._load()
+            self._resumed = True
+
+        Path(journal_file).parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(journal_file, "a" if self._resumed else "w")
+
+    @property
+    def journal_file(self) -> str:
+        return self._journal_file
+
+    @property
+    def resumed(self) -> bool:
+        # Whether an earlier journal was read back
+        return self._resumed
+
+    def plan(self, phase: str, configs: list[tuple[int, int, int, int]]) -> None:
+        # Replanning a phase with the same configurations, as a resumed sweep does, is not recorded again
+        configs = [tuple(int(value) for value in config) for config in configs]
+        if self._plans.get(phase) == configs:
+            return
+
+        self._plans[phase] = configs
+        self._append({HplJournal.JSON_KEY_EVENT: HplJournal.EVENT_PLAN, HplJournal.JSON_KEY_PHASE: phase,
+                      HplJournal.JSON_KEY_CONFIGS: [list(config) for config in configs]})
+
+    def planned(self, phase: str) -> list[tuple[int, int, int, int]]:
+        return self._plans.get(phase, [])
+
+    def record(self, phase: str, result: HplResult) -> None:
+        self._results.setdefault(phase, {})[HplJournal._result_key(result)] = result
+        self._append({HplJournal.JSON_KEY_EVENT: HplJournal.EVENT_RESULT, HplJournal.JSON_KEY_PHASE: phase,
+                      HplJournal.JSON_KEY_RESULT: result.to_dict()})
+
+    def results(self, phase: str) -> list[HplResult]:
+        return list(self._results.get(phase, {}).values())
+
+    def completed(self, phase: str, configs: list[tuple[int, int, int, int]],
+                  variants: int = 1) -> dict[tuple[int, int, int, int], list[HplResult]]:
+        """
+            The results of each of the (N, NB, P, Q) configs the phase has finished. A configuration is only finished
+            once it has a result for every one of the variants of the algorithmic parameters it is run with
+        """
+        by_config: dict[tuple[int, int, int, int], list[HplResult]] = {}
+        for key, result in self._results.get(phase, {}).items():
+            by_config.setdefault(key[:4], []).append(result)
+
+        return {config: by_config[config] for config in configs
+                if len(by_config.get(config, [])) >= variants}
+
+    def choose(self, name: str, value: dict) -> None:
+        self._choices[name] = value
+        self._append({HplJournal.JSON_KEY_EVENT: HplJournal.EVENT_CHOICE, HplJournal.JSON_KEY_NAME: name,
+                      HplJournal.JSON_KEY_VALUE: value})
+
+    def choice(self, name: str) -> dict | None:
+        return self._choices.get(name)
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self) -> "HplJournal":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def _append(self, record: dict) -> None:
+        self._file.write(json.dumps(record))
+        self._file.write("\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _load(self) -> None:
+        with open(self._journal_file, "r") as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Torn by a crash part way through writing it
+                    continue
+
+                event = record.get(HplJournal.JSON_KEY_EVENT)
+                if HplJournal.EVENT_PLAN == event:
+                    self._plans[record[HplJournal.JSON_KEY_PHASE]] = [tuple(config) for config in
+                                                                      record[HplJournal.JSON_KEY_CONFIGS]]
+                elif HplJournal.EVENT_RESULT == event:
+                    result = HplResult()
+                    result.update(record[HplJournal.JSON_KEY_RESULT])
+                    self._results.setdefault(record[HplJournal.JSON_KEY_PHASE], {})[
+                        HplJournal._result_key(result)] = result
+                elif HplJournal.EVENT_CHOICE == event:
+                    self._choices[record[HplJournal.JSON_KEY_NAME]] = record[HplJournal.JSON_KEY_VALUE]
+
+        # A torn last line would otherwise have the next record appended to it
+        with open(self._journal_file, "rb+") as file:
+            file.seek(0, os.SEEK_END)
+            if file.tell() > 0:
+                file.seek(-1, os.SEEK_END)
+                if b"\n" != file.read(1):
+                    file.write(b"\n")
+
+    @staticmethod
+    def _result_key(result: HplResult) -> tuple[int, int, int, int, str]:
+        # A configuration run again replaces its earlier result, one per variant of the algorithmic parameters
+        return int(result.n), int(result.nb), int(result.p), int(result.q), str(result.variant)
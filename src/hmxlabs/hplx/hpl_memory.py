@@ -0,0 +1,138 @@
+# A model of the memory HPL needs, used to choose the largest problem size (N) a node can safely hold.
+# HPL distributes the N x N matrix of doubles over the P x Q process grid in NB x NB blocks, so each rank holds
+# roughly N/P x N/Q of it (plus a column for the right hand side) along with panel workspace for each panel in
+# flight (DEPTH + 1 of them). Every rank also carries a fixed overhead for MPI buffers, the HPL and BLAS libraries
+# and so on, and the OS needs memory of its own. N is rounded down to a multiple of NB x lcm(P, Q) so that every
+# rank holds the same number of whole blocks: a ragged last block leaves some ranks with more work than others.
+# Where huge pages are used the matrix and workspace must fit in the free huge pages, allocated in whole pages.
+import math
+from pathlib import Path
+
+import numpy as np
+
+
+class HplMemoryModel:
+
+    DOUBLE_SIZE = 8
+    DEFAULT_MEMORY_FRACTION = 0.8
+    DEFAULT_OS_RESERVE = 1024 ** 3
+    DEFAULT_RANK_OVERHEAD = 128 * 1024 ** 2
+    DEFAULT_DEPTH = 1
+    MEMINFO_FILE = "/proc/meminfo"
+
+    def __init__(self, memory_fraction: float = DEFAULT_MEMORY_FRACTION, os_reserve: int = DEFAULT_OS_RESERVE,
+                 rank_overhead: int = DEFAULT_RANK_OVERHEAD, huge_page_memory: int = 0, huge_page_size: int = 0,
+                 depth: int = DEFAULT_DEPTH) -> None:
+        """
+            At most memory_fraction of the available memory is used and at least os_reserve bytes are always left
+            for the OS. rank_overhead is the memory in bytes each rank needs besides the matrix and workspace.
+            If huge_page_memory is non-zero the matrix and workspace are placed in that many bytes of huge pages of
+            huge_page_size bytes each
+        """
+        if memory_fraction <= 0 or memory_fraction > 1:
+            raise ValueError("memory_fraction must be greater than 0 and no more than 1")
+
+        if os_reserve < 0 or rank_overhead < 0 or huge_page_memory < 0 or huge_page_size < 0:
+            raise ValueError("Memory sizes cannot be negative")
+
+        if depth < 0:
+            raise ValueError("depth cannot be negative")
+
+        self._memory_fraction = memory_fraction
+        self._os_reserve = os_reserve
+        self._rank_overhead = rank_overhead
+        self._huge_page_memory = huge_page_memory
+        self._huge_page_size = huge_page_size
+        self._depth = depth
+
+    @property
+    def memory_fraction(self) -> float:
+        return self._memory_fraction
+
+    @property
+    def uses_huge_pages(self) -> bool:
+        return self._huge_page_memory > 0
+
+    @staticmethod
+    def huge_pages(meminfo_file: str = MEMINFO_FILE) -> (int, int):
+        """
+            The free huge page memory and the huge page size, both in bytes, from /proc/meminfo. Both are 0 if
+            huge pages are not available
+        """
+        meminfo_path = Path(meminfo_file)
+        if not meminfo_path.is_file():
+            return 0, 0
+
+        values = {}
+        with open(meminfo_path, "r") as file:
+            for line in file:
+                name, _, value = line.partition(":")
+                parts = value.split()
+                if parts and parts[0].isdigit():
+                    values[name.strip()] = int(parts[0])
+
+        page_size = values.get("Hugepagesize", 0) * 1024
+        return values.get("HugePages_Free", 0) * page_size, page_size
+
+    @staticmethod
+    def local_size(n, nb, procs):
+        # The most rows (or columns) of an N x N matrix any one process holds when NB x NB blocks are dealt out
+        # cyclically over procs processes. Accepts scalars or NumPy arrays of integers
+        blocks = -(-n // nb)
+        return np.minimum(n, -(-blocks // procs) * nb)
+
+    def rank_memory(self, n, nb, p, q):
+        """
+            The memory in bytes the matrix and workspace of the largest rank take. Accepts scalars or NumPy arrays
+            of integers
+        """
+        mp = HplMemoryModel.local_size(n, nb, p)
+        nq = HplMemoryModel.local_size(n, nb, q)
+        # The local matrix has an extra column for the right hand side
+        matrix = mp * (nq + 1)
+        # Each panel holds an NB wide column and row of the trailing matrix
+        panels = (self._depth + 1) * nb * (mp + nq + 2 * nb + 1)
+        rank_memory = (matrix + panels) * HplMemoryModel.DOUBLE_SIZE
+        if self.uses_huge_pages and self._huge_page_size > 0:
+            rank_memory = -(-rank_memory // self._huge_page_size) * self._huge_page_size
+        return rank_memory
+
+    def usable_memory(self, available_memory: int) -> int:
+        """
+            The ordinary memory in bytes HPL can use: no more than the target fraction of the available memory and
+            never the OS reserve
+        """
+        return int(max(0, min(available_memory * self._memory_fraction, available_memory - self._os_reserve)))
+
+    def fits(self, available_memory: int, n, nb, p, q):
+        ranks = p * q
+        # The per rank overhead always comes from ordinary memory
+        overhead = ranks * self._rank_overhead
+        matrices = ranks * self.rank_memory(n, nb, p, q)
+        if self.uses_huge_pages:
+            return (overhead <= self.usable_memory(available_memory)) & (matrices <= self._huge_page_memory)
+
+        return matrices + overhead <= self.usable_memory(available_memory)
+
+    def max_problem_size(self, available_memory: int, nb: int, p: int, q: int, whole_blocks: bool = True) -> int:
+        """
+            The largest N that fits. With whole_blocks it is a multiple of NB x lcm(P, Q). Returns 0 if nothing fits
+        """
+        return int(self.max_problem_sizes(available_memory, nb, p, q, whole_blocks))
+
+    def max_problem_sizes(self, available_memory: int, nb, p, q, whole_blocks: bool = True) -> np.ndarray:
+        """
+            max_problem_size for every combination of NB, P and Q in the (broadcast) arrays given, all at once
+        """
+        nb, p, q = np.broadcast_arrays(*(np.asarray(value, dtype=np.int64) for value in (nb, p, q)))
+        step = nb * np.lcm(p, q) if whole_blocks else np.ones_like(nb)
+        # Between them the ranks hold at least the N^2 doubles of the matrix so this is an upper bound to search below
+        memory = self._huge_page_memory if self.uses_huge_pages else self.usable_memory(available_memory)
+        upper = int(math.sqrt(memory / HplMemoryModel.DOUBLE_SIZE))
+        low, high = np.zeros_like(step), upper // step
+        while np.any(low < high):
+            mid = (low + high + 1) // 2
+            fits = self.fits(available_memory, mid * step, nb, p, q)
+            low = np.where(fits, mid, low)
+            high = np.where(fits, high, mid - 1)
+        return low * step
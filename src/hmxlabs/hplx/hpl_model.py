@@ -0,0 +1,137 @@
+# An analytical model of HPL's runtime, used to rank candidate (N, NB, P, Q) configurations without running them.
+# It extends the model in the HPL documentation (https://www.netlib.org/benchmark/hpl/scalability.html):
+#   T = gamma3 * 2N^3 / (3PQ)                  the trailing matrix updates, at the DGEMM rate
+#     + delta * 2N^3 / (3PQ NB)                DGEMM slows as NB shrinks and its blocks get thinner
+#     + gamma2 * N^2 NB / (2P)                 panel factorisation, down a column of P processes
+#     + beta * N^2 (3P + Q) / (2PQ)            the volume of the panel broadcasts and row swaps
+#     + alpha * N ((NB + 1) log2(P) + P) / NB  their latency, mostly the pivot search down each column
+# The coefficients are the time per flop (gamma3, gamma2), per double sent (beta) and per message (alpha). They
+# default to values typical of a single node but are better calibrated by least squares from measured results,
+# after which the model captures how this machine trades the terms off against one another.
+import math
+
+import numpy as np
+
+from hmxlabs.hplx.hpl_results import HplResult
+
+
+class HplPerformanceModel:
+
+    COEFFICIENTS = ("gamma3", "delta", "gamma2", "beta", "alpha")
+    # Panel factorisation runs well below the DGEMM rate but lookahead hides most of it behind the updates, leaving
+    # about as much exposed as the same flops would take at the DGEMM rate
+    DEFAULT_PANEL_SLOWDOWN = 1.0
+    # The block size at which DGEMM reaches half its peak rate, roughly
+    DEFAULT_DGEMM_HALF_NB = 16.0
+    # Seconds per double (about 5 GB/s between processes) and per message
+    DEFAULT_BETA = 1.6e-9
+    DEFAULT_ALPHA = 2e-6
+    # Calibration needs at least this many results
+    MIN_CALIBRATION_RESULTS = 3
+
+    def __init__(self, gamma3: float, delta: float, gamma2: float, beta: float, alpha: float) -> None:
+        for name, value in zip(HplPerformanceModel.COEFFICIENTS, [gamma3, delta, gamma2, beta, alpha]):
+            if value < 0 or math.isnan(value):
+                raise ValueError(f"{name} cannot be negative. Got {value}")
+
+        if gamma3 <= 0:
+            raise ValueError("gamma3 must be positive")
+
+        self._coefficients = np.array([gamma3, delta, gamma2, beta, alpha], dtype=np.float64)
+
+    @staticmethod
+    def from_peak(gflops_per_process: float) -> "HplPerformanceModel":
+        """
+            An uncalibrated model for processes each capable of gflops_per_process at their DGEMM peak
+        """
+        if gflops_per_process <= 0:
+            raise ValueError("gflops_per_process must be positive")
+
+        gamma3 = 1.0 / (gflops_per_process * 1e9)
+        return HplPerformanceModel(gamma3, gamma3 * HplPerformanceModel.DEFAULT_DGEMM_HALF_NB,
+                                   gamma3 * HplPerformanceModel.DEFAULT_PANEL_SLOWDOWN,
+                                   HplPerformanceModel.DEFAULT_BETA, HplPerformanceModel.DEFAULT_ALPHA)
+
+    @property
+    def coefficients(self) -> dict[str, float]:
+        return dict(zip(HplPerformanceModel.COEFFICIENTS, self._coefficients.tolist()))
+
+    @staticmethod
+    def features(n, nb, p, q) -> np.ndarray:
+        """
+            The terms of the model for each configuration, before they are weighted by the coefficients. Accepts
+            scalars or arrays and returns an array with a column per coefficient
+        """
+        n, nb, p, q = (np.asarray(value, dtype=np.float64) for value in (n, nb, p, q))
+        update = 2.0 * n ** 3 / (3.0 * p * q)
+        return np.stack([update,
+                         update / nb,
+                         n ** 2 * nb / (2.0 * p),
+                         n ** 2 * (3.0 * p + q) / (2.0 * p * q),
+                         n * ((nb + 1.0) * np.log2(p) + p) / nb], axis=-1)
+
+    def predict_time(self, n, nb, p, q) -> np.ndarray | float:
+        # In seconds
+        time = HplPerformanceModel.features(n, nb, p, q) @ self._coefficients
+        return float(time) if np.ndim(time) == 0 else time
+
+    def predict_gflops(self, n, nb, p, q) -> np.ndarray | float:
+        # As HPL reports it, from 2/3 N^3 + 2 N^2 floating point operations
+        n_float = np.asarray(n, dtype=np.float64)
+        gflops = ((2.0 / 3.0) * n_float ** 3 + 2.0 * n_float ** 2) / (self.predict_time(n, nb, p, q) * 1e9)
+        return float(gflops) if np.ndim(gflops) == 0 else gflops
+
+    @staticmethod
+    def calibrate(results: list[HplResult], prior: "HplPerformanceModel" = None) -> "HplPerformanceModel":
+        """
+            Fits the coefficients to the runtimes of the results by non-negative least squares on the relative
+            error, so that small runs count as much as large ones. Failed and incomplete results are ignored.
+            Coefficients the results cannot determine (for example beta and alpha if every result used the same
+            grid) are taken from prior where it is given. Raises ValueError if there are too few results
+        """
+        usable = [result for result in results
+                  if not result.failed and not any(math.isnan(value) for value in
+                                                   [result.n, result.nb, result.p, result.q, result.time])
+                  and result.time > 0]
+        if len(usable) < HplPerformanceModel.MIN_CALIBRATION_RESULTS:
+            raise ValueError(f"At least {HplPerformanceModel.MIN_CALIBRATION_RESULTS} results are needed to "
+                             f"calibrate the model. Got {len(usable)}")
+
+        times = np.array([result.time for result in usable], dtype=np.float64)
+        features = HplPerformanceModel.features([result.n for result in usable], [result.nb for result in usable],
+                                                [result.p for result in usable], [result.q for result in usable])
+        # Relative error, with each column scaled to unit size so the solve is well conditioned
+        weighted = features / times[:, np.newaxis]
+        scale = np.linalg.norm(weighted, axis=0)
+        scale[scale == 0] = 1.0
+        coefficients = HplPerformanceModel._non_negative_least_squares(weighted / scale, np.ones(len(times))) / scale
+
+        if prior is not None:
+            # A term the results do not vary cannot be separated from the others so keep the prior's value for it
+            rank_deficient = np.linalg.matrix_rank(weighted / scale) < len(HplPerformanceModel.COEFFICIENTS)
+            if rank_deficient:
+                for idx in range(len(coefficients)):
+                    if 0 == coefficients[idx]:
+                        coefficients[idx] = prior._coefficients[idx]
+
+        if coefficients[0] <= 0:
+            raise ValueError("The results do not determine the DGEMM rate so the model cannot be calibrated")
+
+        return HplPerformanceModel(*coefficients.tolist())
+
+    @staticmethod
+    def _non_negative_least_squares(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        # Least squares, repeatedly dropping the most negative coefficient until none are negative. Runtimes are
+        # a sum of costs so a negative coefficient only ever compensates for noise in another term
+        active = list(range(a.shape[1]))
+        solution = np.zeros(a.shape[1])
+        while active:
+            fitted, _, _, _ = np.linalg.lstsq(a[:, active], b, rcond=None)
+            if np.all(fitted >= 0):
+                solution[active] = fitted
+                break
+            del active[int(np.argmin(fitted))]
+        return solution
+
+    def __str__(self) -> str:
+        return ", ".join(f"{name}={value:.3e}" for name, value in self.coefficients.items())
@@ -0,0 +1,174 @@
+# Runs several small HPL configurations at the same time, each on its own disjoint set of cores.
+# Small problem sizes (such as those used to probe process grids) cannot make use of a whole large machine, so
+# the cores are split into partitions and each partition runs a configuration of its own. Every partition has its
+# own working directory so that the HPL.dat and output files of concurrent runs do not collide, and HPL is pinned
+# to the partition's cores through the $CPU_LIST$ placeholder in HPL_EXEC (e.g. taskset -c $CPU_LIST$ ...).
+import math
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable
+
+import psutil
+
+from hmxlabs.hplx.hpl_results import HplResult
+
+
+class HplPartition:
+
+    def __init__(self, index: int, cpus: list[int], work_dir: str) -> None:
+        if not cpus:
+            raise ValueError("A partition must have at least one CPU")
+
+        self._index = index
+        self._cpus = sorted(cpus)
+        self._work_dir = work_dir
+
+    @property
+    def index(self) -> int:
+        return self._index
+
+    @property
+    def cpus(self) -> list[int]:
+        return self._cpus
+
+    @property
+    def cpu_count(self) -> int:
+        return len(self._cpus)
+
+    @property
+    def work_dir(self) -> str:
+        return self._work_dir
+
+    @property
+    def cpu_list(self) -> str:
+        """
+            The CPUs in the form taken by taskset -c and numactl --physcpubind, e.g. 0-3,8-11
+        """
+        ranges = []
+        start = previous = self._cpus[0]
+        for cpu in self._cpus[1:]:
+            if cpu != previous + 1:
+                ranges.append(str(start) if start == previous else f"{start}-{previous}")
+                start = cpu
+            previous = cpu
+        ranges.append(str(start) if start == previous else f"{start}-{previous}")
+        return ",".join(ranges)
+
+    def __str__(self) -> str:
+        return f"partition {self._index} (CPUs {self.cpu_list})"
+
+
+class HplParallelRunner:
+
+    WORK_DIR_PREFIX = "hplx-partition-"
+
+    def __init__(self, partitions: list[HplPartition],
+                 run_config: Callable[[HplPartition, tuple[int, int, int, int], Callable[[HplResult], None]],
+                                      list[HplResult]]) -> None:
+        """
+            run_config is called to run a single (N, NB, P, Q) configuration on a partition, reporting each result
+            to the callback it is given as well as returning them. It is called from a thread per partition
+        """
+        if not partitions:
+            raise ValueError("There must be at least one partition")
+
+        self._partitions = partitions
+        self._run_config = run_config
+
+    @property
+    def partitions(self) -> list[HplPartition]:
+        return self._partitions
+
+    @staticmethod
+    def create_partitions(cpu_count: int, num_partitions: int, work_dir: str = ".",
+                          cpus: list[int] = None) -> list[HplPartition]:
+        """
+            Splits the first cpu_count of the CPUs this process may run on into num_partitions equal, contiguous
+            partitions. Any CPUs left over are not used. Each partition's working directory is created under work_dir
+        """
+        if num_partitions < 1:
+            raise ValueError("num_partitions must be at least 1")
+
+        if cpus is None:
+            cpus = HplParallelRunner.available_cpus()
+
+        cpus = sorted(cpus)[:cpu_count]
+        cpus_per_partition = len(cpus) // num_partitions
+        if cpus_per_partition < 1:
+            raise ValueError(f"Unable to split {len(cpus)} CPUs into {num_partitions} partitions")
+
+        partitions = []
+        for index in range(num_partitions):
+            partition_dir = Path(work_dir) / f"{HplParallelRunner.WORK_DIR_PREFIX}{index}"
+            partition_dir.mkdir(parents=True, exist_ok=True)
+            partition_cpus = cpus[index * cpus_per_partition:(index + 1) * cpus_per_partition]
+            partitions.append(HplPartition(index, partition_cpus, str(partition_dir)))
+
+        return partitions
+
+    @staticmethod
+    def available_cpus() -> list[int]:
+        # cpu_affinity is not available on every platform (e.g. macOS), in which case assume all CPUs may be used
+        try:
+            return sorted(psutil.Process().cpu_affinity())
+        except AttributeError:
+            return list(range(psutil.cpu_count(logical=True)))
+
+    @staticmethod
+    def closest_grid(p: int, q: int, grid_p: [int], grid_q: [int]) -> tuple[int, int]:
+        """
+            The grid (grid_p[idx], grid_q[idx]) whose shape is closest to that of the P x Q grid. This maps the best
+            grid found on a partition to the grid to use across all the cores
+        """
+        if len(grid_p) != len(grid_q):
+            raise ValueError("The number of elements in p and q must be the same")
+
+        if not grid_p:
+            raise ValueError("There must be at least one grid to choose from")
+
+        aspect = math.log(p / q)
+        closest = min(range(len(grid_p)), key=lambda idx: abs(math.log(grid_p[idx] / grid_q[idx]) - aspect))
+        return grid_p[closest], grid_q[closest]
+
+    def run(self, configs: list[tuple[int, int, int, int]],
+            on_result: Callable[[HplResult], None] = None) -> list[HplResult]:
+        """
+            Runs every configuration, each partition taking the next one as soon as it is free. on_result is called
+            for each result on the calling thread, so it need not be thread safe
+        """
+        pending: queue.Queue[tuple[int, int, int, int]] = queue.Queue()
+        for config in configs:
+            pending.put(config)
+
+        produced: queue.Queue[HplResult] = queue.Queue()
+
+        def run_partition(partition: HplPartition) -> None:
+            while True:
+                try:
+                    config = pending.get_nowait()
+                except queue.Empty:
+                    return
+                self._run_config(partition, config, produced.put)
+
+        results = []
+        with ThreadPoolExecutor(max_workers=len(self._partitions)) as executor:
+            futures = [executor.submit(run_partition, partition) for partition in self._partitions]
+            while True:
+                done = all(future.done() for future in futures)
+                try:
+                    while True:
+                        result = produced.get(timeout=0 if done else 0.1)
+                        results.append(result)
+                        if on_result is not None:
+                            on_result(result)
+                except queue.Empty:
+                    pass
+                if done:
+                    break
+
+            # Raise any error a partition hit
+            for future in futures:
+                future.result()
+
+        return results
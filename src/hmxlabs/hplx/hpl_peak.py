@@ -0,0 +1,179 @@
+# Estimates the theoretical peak double precision performance (Rpeak) of the machine so that HPL results can be
+# reported as a percentage of it. A healthy node typically achieves a consistent fraction of Rpeak, which GFLOPS
+# alone does not show.
+# Rpeak = cores x frequency x double precision FLOPs per cycle per core. FLOPs per cycle follow from the widest
+# vector instructions the CPU supports (as reported by py-cpuinfo) and the number of FMA units per core, which cannot
+# be detected and defaults to two. The hardware threads of a core share its FMA units so with SMT Rpeak is that of the
+# physical cores, not of every logical CPU. The frequency is the base frequency, from the CPU's brand string or sysfs
+# cpufreq, else the maximum the OS reports, which is usually the maximum turbo frequency. Under sustained vector load
+# many CPUs run below (or above) the base frequency so every part of the estimate can be overridden, as can Rpeak.
+import math
+from pathlib import Path
+
+import cpuinfo
+import psutil
+
+
+class HplPeakPerformance:
+
+    # Double precision values per vector register
+    AVX512_LANES = 8
+    AVX_LANES = 4
+    SSE_LANES = 2
+    NEON_LANES = 2
+    DEFAULT_FMA_UNITS = 2
+    # AMD CPUs before Zen 5 (family 0x1A) execute AVX-512 on 256 bit units
+    AMD_FULL_WIDTH_AVX512_FAMILY = 26
+    DEFAULT_SYSFS_ROOT = "/sys"
+
+    def __init__(self, cpu_count: int, frequency_ghz: float, flops_per_cycle: float, rpeak: float = None,
+                 threads_per_core: int = 1) -> None:
+        """
+            cpu_count is the number of CPUs Rpeak applies to, threads_per_core of them to each physical core with
+            SMT. flops_per_cycle is per core. If rpeak (in GFLOPS) is given it is used as is rather than calculated
+            from the frequency and FLOPs per cycle
+        """
+        if cpu_count < 1:
+            raise ValueError("cpu_count must be at least 1")
+
+        if threads_per_core < 1:
+            raise ValueError("threads_per_core must be at least 1")
+
+        if rpeak is None and (not frequency_ghz or frequency_ghz <= 0 or not flops_per_cycle or flops_per_cycle <= 0):
+            raise ValueError("A positive frequency and FLOPs per cycle are required to calculate Rpeak")
+
+        if rpeak is not None and rpeak <= 0:
+            raise ValueError("rpeak must be positive")
+
+        self._cpu_count = cpu_count
+        self._cores = cpu_count / threads_per_core
+        self._frequency_ghz = frequency_ghz
+        self._flops_per_cycle = flops_per_cycle
+        self._rpeak = rpeak if rpeak is not None else self._cores * frequency_ghz * flops_per_cycle
+
+    @property
+    def cpu_count(self) -> int:
+        return self._cpu_count
+
+    @property
+    def cores(self) -> float:
+        # The physical cores the CPUs are on
+        return self._cores
+
+    @property
+    def frequency_ghz(self) -> float:
+        return self._frequency_ghz
+
+    @property
+    def flops_per_cycle(self) -> float:
+        return self._flops_per_cycle
+
+    @property
+    def rpeak(self) -> float:
+        # In GFLOPS
+        return self._rpeak
+
+    def efficiency(self, gflops: float, cpu_count: int = None) -> float:
+        """
+            gflops as a percentage of Rpeak. If cpu_count is given, e.g. for a run on a partition of the cores,
+            Rpeak is scaled to that many cores
+        """
+        if gflops is None or math.isnan(gflops):
+            return math.nan
+
+        rpeak = self._rpeak
+        if cpu_count is not None and not math.isnan(cpu_count) and cpu_count > 0:
+            rpeak = self._rpeak * cpu_count / self._cpu_count
+        return 100.0 * gflops / rpeak
+
+    @staticmethod
+    def detect(cpu_count: int, frequency_ghz: float = None, flops_per_cycle: float = None, fma_units: int = None,
+               rpeak: float = None, cpu_info: dict = None, threads_per_core: int = 1,
+               sysfs_root: str = DEFAULT_SYSFS_ROOT) -> "HplPeakPerformance":
+        """
+            Estimates Rpeak for cpu_count CPUs of this machine, threads_per_core of them to each core with SMT.
+            Anything given is used in place of what is detected. Raises ValueError if the frequency is neither given
+            nor detectable
+        """
+        if rpeak is not None:
+            return HplPeakPerformance(cpu_count, frequency_ghz, flops_per_cycle, rpeak, threads_per_core)
+
+        if cpu_info is None:
+            cpu_info = cpuinfo.get_cpu_info()
+
+        if flops_per_cycle is None:
+            flops_per_cycle = HplPeakPerformance.flops_per_cycle_from_cpu_info(cpu_info, fma_units)
+
+        if frequency_ghz is None:
+            frequency_ghz = HplPeakPerformance.frequency_from_cpu_info(cpu_info, sysfs_root)
+            if frequency_ghz is None:
+                raise ValueError("Unable to detect the CPU frequency. Specify it to calculate Rpeak")
+
+        return HplPeakPerformance(cpu_count, frequency_ghz, flops_per_cycle, threads_per_core=threads_per_core)
+
+    @staticmethod
+    def flops_per_cycle_from_cpu_info(cpu_info: dict, fma_units: int = None) -> int:
+        """
+            Double precision FLOPs per cycle per core for the widest vector instructions in the CPU's flags. An FMA
+            is two FLOPs on every lane and each FMA unit can issue one per cycle. Without FMA a vector add and a
+            vector multiply can issue together
+        """
+        flags = set(cpu_info.get("flags", []))
+        if fma_units is None:
+            fma_units = HplPeakPerformance.DEFAULT_FMA_UNITS
+
+        if "avx512f" in flags:
+            lanes = HplPeakPerformance.AVX512_LANES
+            if "AuthenticAMD" == cpu_info.get("vendor_id_raw") and \
+                    cpu_info.get("family", 0) < HplPeakPerformance.AMD_FULL_WIDTH_AVX512_FAMILY:
+                lanes = HplPeakPerformance.AVX_LANES
+            return lanes * 2 * fma_units
+        if "avx2" in flags and "fma" in flags:
+            return HplPeakPerformance.AVX_LANES * 2 * fma_units
+        if "avx" in flags:
+            return HplPeakPerformance.AVX_LANES * 2
+        # Arm reports Advanced SIMD as asimd. SVE vector lengths vary so are treated as Advanced SIMD
+        if "asimd" in flags:
+            return HplPeakPerformance.NEON_LANES * 2 * fma_units
+        if "sse2" in flags:
+            return HplPeakPerformance.SSE_LANES * 2
+        # Scalar, one add and one multiply per cycle
+        return 2
+
+    @staticmethod
+    def frequency_from_cpu_info(cpu_info: dict, sysfs_root: str = DEFAULT_SYSFS_ROOT) -> float | None:
+        """
+            The base frequency in GHz. The advertised frequency (from the CPU's brand string) is preferred, then the
+            base frequency from sysfs cpufreq. Failing those it is the maximum frequency reported by the OS, which is
+            usually the maximum turbo frequency and so understates efficiency, and finally the current frequency
+        """
+        advertised = cpu_info.get("hz_advertised")
+        if advertised and advertised[0] > 0:
+            return advertised[0] / 1e9
+
+        base_file = Path(sysfs_root) / "devices" / "system" / "cpu" / "cpu0" / "cpufreq" / "base_frequency"
+        try:
+            base_khz = float(base_file.read_text().strip())
+            if base_khz > 0:
+                return base_khz / 1e6
+        except (OSError, ValueError):
+            pass
+
+        frequency = psutil.cpu_freq()
+        if frequency is not None and frequency.max > 0:
+            return frequency.max / 1000.0
+
+        actual = cpu_info.get("hz_actual")
+        if actual and actual[0] > 0:
+            return actual[0] / 1e9
+
+        if frequency is not None and frequency.current > 0:
+            return frequency.current / 1000.0
+
+        return None
+
+    def __str__(self) -> str:
+        if self._frequency_ghz and self._flops_per_cycle:
+            return f"Rpeak={self._rpeak:.1f} GFLOPS ({self._cores:g} cores x {self._frequency_ghz:.2f} GHz x " \
+                   f"{self._flops_per_cycle:g} FLOPs/cycle)"
+        return f"Rpeak={self._rpeak:.1f} GFLOPS ({self._cpu_count} cores)"
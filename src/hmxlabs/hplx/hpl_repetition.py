@@ -0,0 +1,203 @@
+# Repeated runs of the same HPL configuration and how to choose between configurations whose runs are noisy. Picking
+# the single highest GFLOPS rewards noise: the "best" configuration is often just a lucky run. Instead the runs of
+# each (N, NB, P, Q, variant) are aggregated into a mean with a Student t confidence interval, and the best
+# configuration is the one with the highest lower confidence bound. Runs on one machine share much the same relative
+# spread, so it is pooled across every repeated configuration (starting from a prior) rather than estimated from each
+# configuration's own few runs. A configuration run once still has an interval and each repeat narrows it.
+# Repetition is adaptive: only contenders, configurations whose upper bound reaches the leader's lower bound, are run
+# again, and only until their interval is as tight as wanted or they reach the maximum number of runs.
+import math
+from statistics import NormalDist
+
+import numpy as np
+
+from hmxlabs.hplx.hpl_results import HplResult
+from hmxlabs.hplx.hpl_result_set import HplResultSet
+
+
+class HplConfigStats:
+
+    def __init__(self, results: list[HplResult], relative_noise: float, df: float, confidence: float) -> None:
+        """
+            The runs of a single configuration. relative_noise is the standard deviation of a single run's GFLOPS
+            as a fraction of the mean, estimated with df degrees of freedom, from which the interval at the given
+            confidence follows
+        """
+        if not results:
+            raise ValueError("At least one result is required")
+
+        self._results = results
+        gflops = np.array([result.gflops for result in results], dtype=np.float64)
+        self._mean = float(np.mean(gflops))
+        self._stddev = float(np.std(gflops, ddof=1)) if len(results) > 1 else math.nan
+        self._half_width = HplRepetition.t_quantile(0.5 + confidence / 2, df) * relative_noise * abs(self._mean) / \
+            math.sqrt(len(results))
+        # The run that best represents the configuration is the one closest to its mean
+        self._representative = results[int(np.argmin(np.abs(gflops - self._mean)))]
+
+    @property
+    def key(self) -> tuple[int, int, int, int, str]:
+        return HplRepetition.config_key(self._representative)
+
+    @property
+    def results(self) -> list[HplResult]:
+        return self._results
+
+    @property
+    def count(self) -> int:
+        return len(self._results)
+
+    @property
+    def mean(self) -> float:
+        return self._mean
+
+    @property
+    def stddev(self) -> float:
+        # Of its own runs, NaN if it was run only once
+        return self._stddev
+
+    @property
+    def half_width(self) -> float:
+        return self._half_width
+
+    @property
+    def lower(self) -> float:
+        return self._mean - self._half_width
+
+    @property
+    def upper(self) -> float:
+        return self._mean + self._half_width
+
+    @property
+    def relative_half_width(self) -> float:
+        return self._half_width / self._mean if self._mean > 0 else math.inf
+
+    @property
+    def representative(self) -> HplResult:
+        return self._representative
+
+    def __str__(self) -> str:
+        n, nb, p, q, variant = self.key
+        return f"n={n}, nb={nb}, p={p}, q={q}, variant={variant}: {self._mean:.2f} +/- {self._half_width:.2f} " \
+               f"GFLOPS over {self.count} runs"
+
+
+class HplRepetition:
+
+    DEFAULT_CONFIDENCE = 0.95
+    DEFAULT_MAX_REPEATS = 1
+    # The interval is tight enough once its half width is within this fraction of the mean
+    DEFAULT_RELATIVE_WIDTH = 0.02
+    # The relative standard deviation of a single run assumed until runs have been repeated, typical of a quiet node
+    DEFAULT_PRIOR_NOISE = 0.02
+    PRIOR_DF = 4
+    GROUP_KEYS = ("n", "nb", "p", "q", "variant")
+
+    def __init__(self, confidence: float = DEFAULT_CONFIDENCE, max_repeats: int = DEFAULT_MAX_REPEATS,
+                 relative_width: float = DEFAULT_RELATIVE_WIDTH, prior_noise: float = DEFAULT_PRIOR_NOISE,
+                 exclude_failed: bool = True) -> None:
+        if confidence <= 0 or confidence >= 1:
+            raise ValueError("confidence must be between 0 and 1")
+
+        if max_repeats < 1:
+            raise ValueError("max_repeats must be at least 1")
+
+        if relative_width <= 0:
+            raise ValueError("relative_width must be positive")
+
+        if prior_noise < 0:
+            raise ValueError("prior_noise cannot be negative")
+
+        self._confidence = confidence
+        self._max_repeats = max_repeats
+        self._relative_width = relative_width
+        self._prior_noise = prior_noise
+        self._exclude_failed = exclude_failed
+
+    @property
+    def max_repeats(self) -> int:
+        return self._max_repeats
+
+    @staticmethod
+    def config_key(result: HplResult) -> tuple[int, int, int, int, str]:
+        return int(result.n), int(result.nb), int(result.p), int(result.q), str(result.variant)
+
+    def stats(self, results: list[HplResult] | HplResultSet) -> list[HplConfigStats]:
+        """
+            The statistics of each configuration in the results, best (highest lower bound) first
+        """
+        result_set = HplResultSet.from_results(results) if not isinstance(results, HplResultSet) else results
+        if self._exclude_failed:
+            result_set = result_set.exclude_failed()
+        groups = [group.to_results() for group in result_set.group_by(HplRepetition.GROUP_KEYS).values()]
+        groups = [[result for result in group if not math.isnan(result.gflops)] for group in groups]
+        groups = [group for group in groups if group]
+
+        relative_noise, df = HplRepetition.pooled_noise(groups, self._prior_noise)
+        stats = [HplConfigStats(group, relative_noise, df, self._confidence) for group in groups]
+        return sorted(stats, key=lambda stat: (-stat.lower, -stat.mean))
+
+    @staticmethod
+    def pooled_noise(groups: list[list[HplResult]], prior_noise: float = DEFAULT_PRIOR_NOISE) -> tuple[float, int]:
+        """
+            The relative standard deviation of a single run's GFLOPS and its degrees of freedom, from the runs of
+            each configuration run more than once along with the prior
+        """
+        # Runs on the same machine are taken to share the same relative spread, so it is pooled across every
+        # repeated configuration, and the more often a configuration is run the tighter its interval. The prior
+        # counts as PRIOR_DF degrees of freedom so that a couple of repeats cannot swamp it
+        sum_squares = HplRepetition.PRIOR_DF * prior_noise ** 2
+        df = HplRepetition.PRIOR_DF
+        for group in groups:
+            gflops = np.array([result.gflops for result in group], dtype=np.float64)
+            if len(group) > 1 and np.mean(gflops) > 0:
+                sum_squares += float(np.sum((gflops / np.mean(gflops) - 1.0) ** 2))
+                df += len(group) - 1
+        return math.sqrt(sum_squares / df), df
+
+    def best(self, results: list[HplResult] | HplResultSet) -> HplConfigStats | None:
+        """
+            The configuration with the highest lower confidence bound, or None if there are no usable results
+        """
+        stats = self.stats(results)
+        return stats[0] if stats else None
+
+    def contenders(self, results: list[HplResult] | HplResultSet) -> list[HplConfigStats]:
+        """
+            The configurations worth running again: those that the leader does not clearly beat, whose interval is
+            still wider than wanted and that have not yet been run the maximum number of times. A leader that
+            nothing else comes close to is not run again, there is nothing left to choose between
+        """
+        stats = self.stats(results)
+        if not stats:
+            return []
+
+        leader = stats[0]
+        in_contention = [stat for stat in stats if stat.upper >= leader.lower]
+        if len(in_contention) < 2:
+            return []
+
+        return [stat for stat in in_contention if stat.relative_half_width > self._relative_width and
+                stat.count < self._max_repeats]
+
+    @staticmethod
+    def t_quantile(p: float, df: float) -> float:
+        """
+            The p quantile of Student's t distribution with df degrees of freedom. Exact for 1 and 2 degrees of
+            freedom, otherwise the Cornish-Fisher expansion about the normal, which is within 1% from 3 upwards
+        """
+        if df <= 0:
+            raise ValueError("df must be positive")
+
+        if math.isinf(df):
+            return NormalDist().inv_cdf(p)
+
+        if 1 == df:
+            return math.tan(math.pi * (p - 0.5))
+
+        if 2 == df:
+            return (2 * p - 1) / math.sqrt(2 * p * (1 - p))
+
+        z = NormalDist().inv_cdf(p)
+        return z + (z ** 3 + z) / (4 * df) + (5 * z ** 5 + 16 * z ** 3 + 3 * z) / (96 * df ** 2) + \
+            (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / (384 * df ** 3)
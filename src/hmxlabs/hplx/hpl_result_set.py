@@ -0,0 +1,390 @@
+# A columnar container for large numbers of HPL results.
+# Rather than one HplResult object per result, each field is held in a typed NumPy array so that
+# millions of results take a few tens of bytes each and queries (top-k, filter, sort, group-by) are
+# vectorised rather than Python loops. Sets convert to and from lists of HplResult and iterate as
+# HplResult so they may be handed straight to anything that expects a list of results.
+import json
+import math
+import struct
+import warnings
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, Iterator
+
+import numpy as np
+
+from hmxlabs.hplx.hpl_results import HplResult
+
+
+class HplResultSet:
+
+    INT_COLUMNS = ("n", "nb", "p", "q", "cpu_count", "threads", "swapped")
+    FLOAT_COLUMNS = ("time", "gflops", "residual", "efficiency", "mean_frequency", "min_frequency", "max_temperature")
+    TIME_COLUMNS = ("start_time", "end_time")
+    CATEGORY_COLUMNS = ("type", "source", "variant")
+    # Flags are held as an int8. -1 where unknown (e.g. the residual check was not seen), else 0 for False and 1
+    # for True
+    PASSED_COLUMN = "passed"
+    FLAG_COLUMNS = (PASSED_COLUMN, "throttled")
+    COLUMNS = INT_COLUMNS + FLOAT_COLUMNS + FLAG_COLUMNS + TIME_COLUMNS + CATEGORY_COLUMNS
+
+    GROUP_KEYS = ("n", "nb", "p", "q")
+
+    # Integer columns cannot hold NaN so unset values (NaN on HplResult) are held as -1
+    UNSET_INT = -1
+    UNSET_CATEGORY = -1
+
+    # The binary results file is a small header followed by fixed size records, one per result.
+    # The header holds the record layout so that files remain readable as columns are added.
+    BINARY_MAGIC = b"HPLXREC1"
+    BINARY_CATEGORY_LENGTHS = {"type": 32, "source": 128, "variant": 16}
+
+    def __init__(self, columns: dict[str, np.ndarray] = None, categories: dict[str, list] = None) -> None:
+        """
+            Creates a result set from already built columns. Category columns (type and source) are held as integer
+            codes into the matching list in categories. Most callers will want from_results instead
+        """
+        columns = columns or {}
+        categories = categories or {}
+        size = len(next(iter(columns.values()))) if columns else 0
+
+        self._columns: dict[str, np.ndarray] = {}
+        for name in HplResultSet.INT_COLUMNS:
+            self._columns[name] = np.asarray(columns.get(name, np.full(size, HplResultSet.UNSET_INT)), dtype=np.int64)
+        for name in HplResultSet.FLOAT_COLUMNS:
+            self._columns[name] = np.asarray(columns.get(name, np.full(size, np.nan)), dtype=np.float64)
+        for name in HplResultSet.FLAG_COLUMNS:
+            self._columns[name] = np.asarray(columns.get(name, np.full(size, -1)), dtype=np.int8)
+        for name in HplResultSet.TIME_COLUMNS:
+            self._columns[name] = np.asarray(columns.get(name, np.full(size, np.datetime64("NaT"))),
+                                             dtype="datetime64[s]")
+        for name in HplResultSet.CATEGORY_COLUMNS:
+            self._columns[name] = np.asarray(columns.get(name, np.full(size, HplResultSet.UNSET_CATEGORY)),
+                                             dtype=np.int32)
+
+        self._categories: dict[str, list] = {name: list(categories.get(name, []))
+                                             for name in HplResultSet.CATEGORY_COLUMNS}
+
+        for name, column in self._columns.items():
+            if len(column) != size:
+                raise ValueError(f"Column {name} has {len(column)} values but {size} were expected")
+
+    @staticmethod
+    def from_results(results: Iterable[HplResult]) -> "HplResultSet":
+        if isinstance(results, HplResultSet):
+            return results
+
+        results = list(results)
+        size = len(results)
+        columns: dict[str, np.ndarray] = {}
+
+        for name in HplResultSet.INT_COLUMNS:
+            values = [getattr(result, name) for result in results]
+            columns[name] = np.fromiter((HplResultSet.UNSET_INT if HplResultSet._is_unset(value) else value
+                                         for value in values), dtype=np.int64, count=size)
+        for name in HplResultSet.FLOAT_COLUMNS:
+            columns[name] = np.fromiter((getattr(result, name) for result in results), dtype=np.float64, count=size)
+
+        for name in HplResultSet.FLAG_COLUMNS:
+            columns[name] = np.fromiter((-1 if getattr(result, name) is None else int(getattr(result, name))
+                                         for result in results), dtype=np.int8, count=size)
+
+        for name in HplResultSet.TIME_COLUMNS:
+            columns[name] = np.array([np.datetime64(getattr(result, name), "s") if getattr(result, name)
+                                      else np.datetime64("NaT") for result in results], dtype="datetime64[s]")
+
+        categories: dict[str, list] = {}
+        for name in HplResultSet.CATEGORY_COLUMNS:
+            codes, categories[name] = HplResultSet._encode([getattr(result, name) for result in results])
+            columns[name] = codes
+
+        return HplResultSet(columns, categories)
+
+    @staticmethod
+    def concat(result_sets: list["HplResultSet"]) -> "HplResultSet":
+        if not result_sets:
+            return HplResultSet()
+
+        columns: dict[str, np.ndarray] = {}
+        for name in HplResultSet.INT_COLUMNS + HplResultSet.FLOAT_COLUMNS + HplResultSet.FLAG_COLUMNS + \
+                HplResultSet.TIME_COLUMNS:
+            columns[name] = np.concatenate([result_set._columns[name] for result_set in result_sets])
+
+        categories: dict[str, list] = {}
+        for name in HplResultSet.CATEGORY_COLUMNS:
+            # Remap each set's codes onto the merged list of categories
+            merged: list = []
+            lookup: dict = {}
+            remapped_codes = []
+            for result_set in result_sets:
+                remap = np.empty(len(result_set._categories[name]) + 1, dtype=np.int32)
+                remap[-1] = HplResultSet.UNSET_CATEGORY
+                for code, value in enumerate(result_set._categories[name]):
+                    if value not in lookup:
+                        lookup[value] = len(merged)
+                        merged.append(value)
+                    remap[code] = lookup[value]
+                remapped_codes.append(remap[result_set._columns[name]])
+            columns[name] = np.concatenate(remapped_codes)
+            categories[name] = merged
+
+        return HplResultSet(columns, categories)
+
+    def to_results(self) -> list[HplResult]:
+        return list(self)
+
+    @staticmethod
+    def record_dtype() -> np.dtype:
+        fields = [(name, "<i8") for name in HplResultSet.INT_COLUMNS]
+        fields += [(name, "<f8") for name in HplResultSet.FLOAT_COLUMNS]
+        fields += [(name, "i1") for name in HplResultSet.FLAG_COLUMNS]
+        fields += [(name, "<M8[s]") for name in HplResultSet.TIME_COLUMNS]
+        fields += [(name, f"S{HplResultSet.BINARY_CATEGORY_LENGTHS[name]}") for name in HplResultSet.CATEGORY_COLUMNS]
+        return np.dtype(fields)
+
+    def to_records(self) -> np.ndarray:
+        """
+            Returns the results as a structured array with one fixed size record per result. Category values are
+            UTF-8 encoded and truncated to fit their field, with a warning, on a character boundary
+        """
+        records = np.empty(len(self), dtype=HplResultSet.record_dtype())
+        for name in HplResultSet.INT_COLUMNS + HplResultSet.FLOAT_COLUMNS + HplResultSet.FLAG_COLUMNS + \
+                HplResultSet.TIME_COLUMNS:
+            records[name] = self._columns[name]
+        for name in HplResultSet.CATEGORY_COLUMNS:
+            length = HplResultSet.BINARY_CATEGORY_LENGTHS[name]
+            encoded = np.array([HplResultSet._encode_category(name, value, length)
+                                for value in self._categories[name]] + [b""], dtype=f"S{length}")
+            records[name] = encoded[self._columns[name]]
+        return records
+
+    @staticmethod
+    def _encode_category(name: str, value: str, length: int) -> bytes:
+        encoded = value.encode()
+        if len(encoded) <= length:
+            return encoded
+
+        warnings.warn(f"The {name} {value} is longer than the {length} bytes a binary record holds and is truncated",
+                      stacklevel=3)
+        # Cut on a character boundary so that the value can still be decoded
+        return encoded[:length].decode(errors="ignore").encode()
+
+    @staticmethod
+    def from_records(records: np.ndarray) -> "HplResultSet":
+        columns: dict[str, np.ndarray] = {}
+        categories: dict[str, list] = {}
+        for name in records.dtype.names:
+            if name in HplResultSet.CATEGORY_COLUMNS:
+                values, codes = np.unique(records[name], return_inverse=True)
+                decoded = [value.decode() for value in values]
+                # An empty value was an unset category so is dropped from the categories
+                kept = [value for value in decoded if value]
+                lookup = {value: idx for idx, value in enumerate(kept)}
+                remap = np.array([lookup.get(value, HplResultSet.UNSET_CATEGORY) for value in decoded], dtype=np.int32)
+                columns[name] = remap[codes.reshape(-1)] if len(remap) else np.empty(0, dtype=np.int32)
+                categories[name] = kept
+            elif name in HplResultSet.COLUMNS:
+                columns[name] = records[name]
+
+        return HplResultSet(columns, categories)
+
+    @staticmethod
+    def binary_header() -> bytes:
+        layout = json.dumps({"descr": HplResultSet.record_dtype().descr}).encode()
+        return HplResultSet.BINARY_MAGIC + struct.pack("<I", len(layout)) + layout
+
+    @staticmethod
+    def read_binary_file(file_path: str) -> "HplResultSet":
+        """
+            Loads a binary results file written by HplBinaryResultsWriter directly into columns. Any partially written
+            record at the end of the file, for example from a crash mid write, is ignored
+        """
+        if not file_path:
+            raise ValueError("file_path cannot be None or empty")
+
+        input_file = Path(file_path)
+        if not input_file.exists():
+            raise FileNotFoundError(f"File {file_path} does not exist")
+
+        with open(input_file, "rb") as file:
+            magic = file.read(len(HplResultSet.BINARY_MAGIC))
+            if magic != HplResultSet.BINARY_MAGIC:
+                raise ValueError(f"{file_path} is not a HPLx binary results file")
+            layout_length = struct.unpack("<I", file.read(4))[0]
+            layout = json.loads(file.read(layout_length))
+
+        dtype = np.dtype([tuple(field) for field in layout["descr"]])
+        offset = len(HplResultSet.BINARY_MAGIC) + 4 + layout_length
+        count = int((input_file.stat().st_size - offset) / dtype.itemsize)
+        records = np.fromfile(input_file, dtype=dtype, count=count, offset=offset)
+        return HplResultSet.from_records(records)
+
+    def __len__(self) -> int:
+        return len(self._columns["n"])
+
+    def __iter__(self) -> Iterator[HplResult]:
+        for index in range(len(self)):
+            yield self._result_at(index)
+
+    def __getitem__(self, item) -> "HplResultSet | HplResult":
+        """
+            An integer index returns a HplResult. A slice, boolean mask or array of indices returns a new set
+        """
+        if isinstance(item, (int, np.integer)):
+            return self._result_at(int(item))
+
+        return self._take(item)
+
+    def column(self, name: str) -> np.ndarray:
+        """
+            Returns the named column. Category columns are decoded to an array of their values
+        """
+        if name not in HplResultSet.COLUMNS:
+            raise ValueError(f"{name} is not a column of a HplResultSet")
+
+        if name in HplResultSet.CATEGORY_COLUMNS:
+            values = np.array(self._categories[name] + [None], dtype=object)
+            return values[self._columns[name]]
+
+        return self._columns[name]
+
+    def filter(self, mask: np.ndarray = None, **equals) -> "HplResultSet":
+        """
+            Returns the results matching the boolean mask, if given, and where each named column equals the value
+            given. For example filter(p=2, q=4)
+        """
+        selected = np.ones(len(self), dtype=bool) if mask is None else np.array(mask, dtype=bool)
+        for name, value in equals.items():
+            selected &= self.column(name) == value
+
+        return self._take(selected)
+
+    def exclude_failed(self) -> "HplResultSet":
+        return self._take(self._columns[HplResultSet.PASSED_COLUMN] != 0)
+
+    def sort(self, by: str = "gflops", descending: bool = True) -> "HplResultSet":
+        values = self._sort_values(by, descending)
+        return self._take(np.argsort(values, kind="stable"))
+
+    def top_k(self, k: int, by: str = "gflops") -> "HplResultSet":
+        """
+            Returns the k results with the highest value of the given column, highest first
+        """
+        if k <= 0:
+            return self._take(np.arange(0))
+
+        values = self._sort_values(by, True)
+        if k < len(self):
+            # Only the k largest need a full sort
+            candidates = np.argpartition(values, k - 1)[:k]
+        else:
+            candidates = np.arange(len(self))
+
+        order = candidates[np.argsort(values[candidates], kind="stable")]
+        return self._take(order)
+
+    def highest_gflops(self, exclude_failed: bool = True) -> HplResult | None:
+        candidates = self.exclude_failed() if exclude_failed else self
+        best = candidates.top_k(1)
+        if 0 == len(best):
+            return None
+
+        return best[0]
+
+    def group_by(self, keys: tuple[str, ...] = GROUP_KEYS) -> dict[tuple, "HplResultSet"]:
+        """
+            Splits the results into one set per distinct combination of the key columns. By default (n, nb, p, q)
+        """
+        if 0 == len(self):
+            return {}
+
+        unique_keys, inverse = np.unique(self._key_matrix(keys), axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        order = np.argsort(inverse, kind="stable")
+        boundaries = np.cumsum(np.bincount(inverse))[:-1]
+        groups: dict[tuple, HplResultSet] = {}
+        for key, indices in zip(unique_keys, np.split(order, boundaries)):
+            groups[tuple(int(value) for value in key)] = self._take(indices)
+
+        return groups
+
+    def group_max(self, by: str = "gflops", keys: tuple[str, ...] = GROUP_KEYS) -> "HplResultSet":
+        """
+            Returns the result with the highest value of the given column for each distinct combination of the key
+            columns, ordered by the keys
+        """
+        if 0 == len(self):
+            return self
+
+        key_matrix = self._key_matrix(keys)
+        # np.lexsort uses the last key as the primary so the keys go in reverse with the value sorted within them.
+        # The highest value is then the last of each group
+        sort_keys = [-self._sort_values(by, True)] + [key_matrix[:, idx] for idx in reversed(range(len(keys)))]
+        order = np.lexsort(sort_keys)
+        sorted_keys = key_matrix[order]
+        last_of_group = np.append(np.any(sorted_keys[1:] != sorted_keys[:-1], axis=1), True)
+        return self._take(order[last_of_group])
+
+    def _key_matrix(self, keys: tuple[str, ...]) -> np.ndarray:
+        for key in keys:
+            if key not in HplResultSet.INT_COLUMNS + HplResultSet.CATEGORY_COLUMNS:
+                raise ValueError(f"{key} cannot be used to group results")
+
+        return np.stack([self._columns[key] for key in keys], axis=1)
+
+    def _sort_values(self, by: str, descending: bool) -> np.ndarray:
+        if by not in HplResultSet.INT_COLUMNS + HplResultSet.FLOAT_COLUMNS:
+            raise ValueError(f"Cannot sort results by {by}")
+
+        # Sorting is always ascending so descending order negates the values. NaN goes to the end either way
+        values = self._columns[by].astype(np.float64)
+        if descending:
+            return -np.where(np.isnan(values), -np.inf, values)
+
+        return np.where(np.isnan(values), np.inf, values)
+
+    def _take(self, indices) -> "HplResultSet":
+        columns = {name: column[indices] for name, column in self._columns.items()}
+        return HplResultSet(columns, self._categories)
+
+    def _result_at(self, index: int) -> HplResult:
+        result = HplResult()
+        for name in HplResultSet.INT_COLUMNS:
+            value = int(self._columns[name][index])
+            setattr(result, name, math.nan if HplResultSet.UNSET_INT == value else value)
+        for name in HplResultSet.FLOAT_COLUMNS:
+            setattr(result, name, float(self._columns[name][index]))
+
+        for name in HplResultSet.FLAG_COLUMNS:
+            flag = int(self._columns[name][index])
+            setattr(result, name, None if -1 == flag else bool(flag))
+
+        for name in HplResultSet.TIME_COLUMNS:
+            value = self._columns[name][index]
+            setattr(result, name, None if np.isnat(value) else value.astype(datetime))
+
+        for name in HplResultSet.CATEGORY_COLUMNS:
+            code = int(self._columns[name][index])
+            setattr(result, name, None if HplResultSet.UNSET_CATEGORY == code else self._categories[name][code])
+
+        return result
+
+    @staticmethod
+    def _encode(values: list) -> (np.ndarray, list):
+        lookup: dict = {}
+        categories: list = []
+        codes = np.empty(len(values), dtype=np.int32)
+        for idx, value in enumerate(values):
+            if value is None:
+                codes[idx] = HplResultSet.UNSET_CATEGORY
+                continue
+            if value not in lookup:
+                lookup[value] = len(categories)
+                categories.append(value)
+            codes[idx] = lookup[value]
+
+        return codes, categories
+
+    @staticmethod
+    def _is_unset(value) -> bool:
+        return value is None or (isinstance(value, float) and math.isnan(value))
@@ -1,6 +1,12 @@
 import math
 import json
+import mmap
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
 from pathlib import Path
+from typing import Callable, Iterable, Iterator
 
 
 class HplResult:
@@ -12,7 +18,22 @@ class HplResult:
     JSON_KEY_GFLOPS = "gflops"
     JSON_KEY_CPUS = "cpu_count"
     JSON_KEY_TYPE = "type"
-
+    JSON_KEY_SOURCE = "source"
+    JSON_KEY_RESIDUAL = "residual"
+    JSON_KEY_PASSED = "passed"
+    JSON_KEY_START_TIME = "start_time"
+    JSON_KEY_END_TIME = "end_time"
+    JSON_KEY_VARIANT = "variant"
+    JSON_KEY_EFFICIENCY = "efficiency"
+    JSON_KEY_THREADS = "threads"
+    JSON_KEY_MEAN_FREQUENCY = "mean_frequency"
+    JSON_KEY_MIN_FREQUENCY = "min_frequency"
+    JSON_KEY_MAX_TEMPERATURE = "max_temperature"
+    JSON_KEY_SWAPPED = "swapped"
+    JSON_KEY_THROTTLED = "throttled"
+
+    # The format of the HPL_pdgesv() start and end times, as written by ctime()
+    HPL_TIME_FORMAT = "%a %b %d %H:%M:%S %Y"
 
     def __init__(self) -> None:
         self._n = math.nan
@@ -23,6 +44,19 @@ class HplResult:
         self._gflops = math.nan
         self._cpu_count = math.nan
         self._type = None
+        self._source = None
+        self._residual = math.nan
+        self._passed = None
+        self._start_time = None
+        self._end_time = None
+        self._variant = None
+        self._efficiency = math.nan
+        self._threads = math.nan
+        self._mean_frequency = math.nan
+        self._min_frequency = math.nan
+        self._max_temperature = math.nan
+        self._swapped = math.nan
+        self._throttled = None
 
     @property
     def n(self):
@@ -88,8 +122,125 @@ class HplResult:
     def type(self, type):
         self._type = type
 
+    @property
+    def source(self):
+        return self._source
+
+    @source.setter
+    def source(self, source):
+        self._source = source
+
+    @property
+    def residual(self):
+        return self._residual
+
+    @residual.setter
+    def residual(self, residual):
+        self._residual = residual
+
+    @property
+    def passed(self):
+        # None where the residual check was not seen, otherwise whether HPL reported PASSED
+        return self._passed
+
+    @passed.setter
+    def passed(self, passed):
+        self._passed = passed
+
+    @property
+    def failed(self) -> bool:
+        return self._passed is False
+
+    @property
+    def start_time(self):
+        return self._start_time
+
+    @start_time.setter
+    def start_time(self, start_time):
+        self._start_time = start_time
+
+    @property
+    def end_time(self):
+        return self._end_time
+
+    @end_time.setter
+    def end_time(self, end_time):
+        self._end_time = end_time
+
+    @property
+    def variant(self):
+        # The T/V code HPL reports for the algorithmic parameters used, e.g. WR11C2R4
+        return self._variant
+
+    @variant.setter
+    def variant(self, variant):
+        self._variant = variant
+
+    @property
+    def efficiency(self):
+        # GFLOPS as a percentage of the theoretical peak (Rpeak) of the CPUs used
+        return self._efficiency
+
+    @efficiency.setter
+    def efficiency(self, efficiency):
+        self._efficiency = efficiency
+
+    @property
+    def threads(self):
+        # The threads each MPI rank ran, so there were cpu_count / threads ranks
+        return self._threads
+
+    @threads.setter
+    def threads(self, threads):
+        self._threads = threads
+
+    @property
+    def mean_frequency(self):
+        # The CPU frequency in MHz over the run, averaged over the CPUs used
+        return self._mean_frequency
+
+    @mean_frequency.setter
+    def mean_frequency(self, mean_frequency):
+        self._mean_frequency = mean_frequency
+
+    @property
+    def min_frequency(self):
+        # The lowest frequency in MHz any CPU used was seen at during the run
+        return self._min_frequency
+
+    @min_frequency.setter
+    def min_frequency(self, min_frequency):
+        self._min_frequency = min_frequency
+
+    @property
+    def max_temperature(self):
+        # The hottest thermal zone in degrees Celsius during the run
+        return self._max_temperature
+
+    @max_temperature.setter
+    def max_temperature(self, max_temperature):
+        self._max_temperature = max_temperature
+
+    @property
+    def swapped(self):
+        # The bytes swapped in and out during the run
+        return self._swapped
+
+    @swapped.setter
+    def swapped(self, swapped):
+        self._swapped = swapped
+
+    @property
+    def throttled(self):
+        # None where no telemetry was recorded, otherwise whether the CPUs were throttled during the run
+        return self._throttled
+
+    @throttled.setter
+    def throttled(self, throttled):
+        self._throttled = throttled
+
     def __str__(self) -> str:
-        return f"n={self.n}, nb={self.nb}, p={self.p}, q={self.q}, time={self.time}, gflops={self.gflops}, cpu_count={self.cpu_count}, type={self.type}"
+        return f"n={self.n}, nb={self.nb}, p={self.p}, q={self.q}, time={self.time}, gflops={self.gflops}, cpu_count={self.cpu_count}, threads={self.threads}, type={self.type}, variant={self.variant}, efficiency={self.efficiency:.1f}%, passed={self.passed}"
 
     def to_dict(self):
         ret_dict = {
@@ -107,14 +258,50 @@ class HplResult:
         if self.type:
             ret_dict[HplResult.JSON_KEY_TYPE] = self.type
 
+        if self.source:
+            ret_dict[HplResult.JSON_KEY_SOURCE] = self.source
+
+        if not math.isnan(self.residual):
+            ret_dict[HplResult.JSON_KEY_RESIDUAL] = self.residual
+
+        if self.passed is not None:
+            ret_dict[HplResult.JSON_KEY_PASSED] = self.passed
+
+        if self.start_time:
+            ret_dict[HplResult.JSON_KEY_START_TIME] = self.start_time.isoformat()
+
+        if self.end_time:
+            ret_dict[HplResult.JSON_KEY_END_TIME] = self.end_time.isoformat()
+
+        if self.variant:
+            ret_dict[HplResult.JSON_KEY_VARIANT] = self.variant
+
+        if not math.isnan(self.efficiency):
+            ret_dict[HplResult.JSON_KEY_EFFICIENCY] = self.efficiency
+
+        if not math.isnan(self.threads):
+            ret_dict[HplResult.JSON_KEY_THREADS] = self.threads
+
+        for key, value in [(HplResult.JSON_KEY_MEAN_FREQUENCY, self.mean_frequency),
+                           (HplResult.JSON_KEY_MIN_FREQUENCY, self.min_frequency),
+                           (HplResult.JSON_KEY_MAX_TEMPERATURE, self.max_temperature),
+                           (HplResult.JSON_KEY_SWAPPED, self.swapped)]:
+            if not math.isnan(value):
+                ret_dict[key] = value
+
+        if self.throttled is not None:
+            ret_dict[HplResult.JSON_KEY_THROTTLED] = self.throttled
+
         return ret_dict
 
     def to_csv(self):
-        return f"{self.n},{self.nb},{self.p},{self.q},{self.time},{self.gflops},{self.cpu_count},{self.type}"
+        start_time = self.start_time.isoformat() if self.start_time else None
+        end_time = self.end_time.isoformat() if self.end_time else None
+        return f"{self.n},{self.nb},{self.p},{self.q},{self.time},{self.gflops},{self.cpu_count},{self.type},{self.source},{self.residual},{self.passed},{start_time},{end_time},{self.variant},{self.efficiency},{self.threads},{self.mean_frequency},{self.min_frequency},{self.max_temperature},{self.swapped},{self.throttled}"
 
     @staticmethod
     def csv_header():
-        return f"{HplResult.JSON_KEY_N},{HplResult.JSON_KEY_NB},{HplResult.JSON_KEY_P},{HplResult.JSON_KEY_Q},{HplResult.JSON_KEY_TIME},{HplResult.JSON_KEY_GFLOPS}, {HplResult.JSON_KEY_CPUS}, {HplResult.JSON_KEY_TYPE}"
+        return f"{HplResult.JSON_KEY_N},{HplResult.JSON_KEY_NB},{HplResult.JSON_KEY_P},{HplResult.JSON_KEY_Q},{HplResult.JSON_KEY_TIME},{HplResult.JSON_KEY_GFLOPS}, {HplResult.JSON_KEY_CPUS}, {HplResult.JSON_KEY_TYPE}, {HplResult.JSON_KEY_SOURCE}, {HplResult.JSON_KEY_RESIDUAL}, {HplResult.JSON_KEY_PASSED}, {HplResult.JSON_KEY_START_TIME}, {HplResult.JSON_KEY_END_TIME}, {HplResult.JSON_KEY_VARIANT}, {HplResult.JSON_KEY_EFFICIENCY}, {HplResult.JSON_KEY_THREADS}, {HplResult.JSON_KEY_MEAN_FREQUENCY}, {HplResult.JSON_KEY_MIN_FREQUENCY}, {HplResult.JSON_KEY_MAX_TEMPERATURE}, {HplResult.JSON_KEY_SWAPPED}, {HplResult.JSON_KEY_THROTTLED}"
 
     def update(self, data: dict):
         self.n = data[HplResult.JSON_KEY_N]
@@ -123,9 +310,27 @@ class HplResult:
         self.q = data[HplResult.JSON_KEY_Q]
         self.time = data[HplResult.JSON_KEY_TIME]
         self.gflops = data[HplResult.JSON_KEY_GFLOPS]
+        self.cpu_count = data.get(HplResult.JSON_KEY_CPUS, self.cpu_count)
+        self.type = data.get(HplResult.JSON_KEY_TYPE, self.type)
+        self.source = data.get(HplResult.JSON_KEY_SOURCE, self.source)
+        self.residual = data.get(HplResult.JSON_KEY_RESIDUAL, self.residual)
+        self.passed = data.get(HplResult.JSON_KEY_PASSED, self.passed)
+        self.variant = data.get(HplResult.JSON_KEY_VARIANT, self.variant)
+        self.efficiency = data.get(HplResult.JSON_KEY_EFFICIENCY, self.efficiency)
+        self.threads = data.get(HplResult.JSON_KEY_THREADS, self.threads)
+        self.mean_frequency = data.get(HplResult.JSON_KEY_MEAN_FREQUENCY, self.mean_frequency)
+        self.min_frequency = data.get(HplResult.JSON_KEY_MIN_FREQUENCY, self.min_frequency)
+        self.max_temperature = data.get(HplResult.JSON_KEY_MAX_TEMPERATURE, self.max_temperature)
+        self.swapped = data.get(HplResult.JSON_KEY_SWAPPED, self.swapped)
+        self.throttled = data.get(HplResult.JSON_KEY_THROTTLED, self.throttled)
+        if data.get(HplResult.JSON_KEY_START_TIME):
+            self.start_time = datetime.fromisoformat(data[HplResult.JSON_KEY_START_TIME])
+        if data.get(HplResult.JSON_KEY_END_TIME):
+            self.end_time = datetime.fromisoformat(data[HplResult.JSON_KEY_END_TIME])
 
     def from_hpl_output(self, line: str):
         parts = line.split()
+        self.variant = parts[0]
         self.n = int(parts[1])
         self.nb = int(parts[2])
         self.p = int(parts[3])
@@ -133,22 +338,69 @@ class HplResult:
         self.time = float(parts[5])
         self.gflops = float(parts[6])
 
+    def residual_from_hpl_output(self, line: str):
+        # ||Ax-b||_oo/(eps*(||A||_oo*||x||_oo+||b||_oo)*N)=   3.71130207e-03 ...... PASSED
+        parts = line.split("=")[-1].split()
+        self.residual = float(parts[0])
+        self.passed = "PASSED" == parts[-1]
+
+    @staticmethod
+    def time_from_hpl_output(line: str) -> datetime | None:
+        # HPL_pdgesv() start time Mon Dec  9 11:54:52 2024
+        timestamp = " ".join(line.split()[-5:])
+        try:
+            return datetime.strptime(timestamp, HplResult.HPL_TIME_FORMAT)
+        except ValueError:
+            return None
+
     def to_json(self):
         return json.dumps(self.to_dict())
 
     @staticmethod
-    def highest_gflops(results: list["HplResult"]) -> "HplResult":
+    def highest_gflops(results: list["HplResult"], exclude_failed: bool = True) -> "HplResult":
+        """
+            Returns the result with the highest gflops. Unless told otherwise results that failed the residual check
+            are ignored as their performance numbers cannot be trusted
+        """
         highest = None
         for result in results:
+            if exclude_failed and result.failed:
+                continue
             if highest is None or result.gflops > highest.gflops:
                 highest = result
 
         return highest
 
+    @staticmethod
+    def exclude_failed(results: list["HplResult"]) -> list["HplResult"]:
+        return [result for result in results if not result.failed]
+
+
+class HplRunSummary:
+    """
+        The summary HPL writes at the end of its output:
+        Finished     40 tests with the following results:
+                     40 tests completed and passed residual checks,
+                      0 tests completed and failed residual checks,
+                      0 tests skipped because of illegal input values.
+    """
+    def __init__(self) -> None:
+        self.tests = 0
+        self.passed = 0
+        self.failed = 0
+        self.skipped = 0
+
+    def __str__(self) -> str:
+        return f"tests={self.tests}, passed={self.passed}, failed={self.failed}, skipped={self.skipped}"
+
 
 class HplResultsFile:
+    # Files at least this large are scanned through mmap rather than read line by line
+    MMAP_THRESHOLD = 8 * (1024 ** 2)
+
     @staticmethod
-    def write_results_to_csv(file_path: str, results: list[HplResult]):
+    def write_results_to_csv(file_path: str, results: Iterable[HplResult]):
+        # results may be a list of HplResult or a HplResultSet
         if not file_path:
             raise ValueError("file_path cannot be None or empty")
 
@@ -164,7 +416,8 @@ class HplResultsFile:
                 file.write("\n")
 
     @staticmethod
-    def write_results_to_json(file_path: str, results: list[HplResult]):
+    def write_results_to_json(file_path: str, results: Iterable[HplResult]):
+        # results may be a list of HplResult or a HplResultSet
         if not file_path:
             raise ValueError("file_path cannot be None or empty")
 
@@ -177,9 +430,105 @@ class HplResultsFile:
                 file.write(result.to_json())
                 file.write("\n")
 
+    @staticmethod
+    def read_results_csv(file_path: str) -> list[HplResult]:
+        """
+            Reads back a results file written by write_results_to_csv or the CSV results writer
+        """
+        results = []
+        with open(file_path, "r") as file:
+            header = [name.strip() for name in file.readline().split(",")]
+            for line in file:
+                if not line.strip():
+                    continue
+                values = dict(zip(header, [value.strip() for value in line.rstrip("\n").split(",")]))
+                data = {}
+                for name, value in values.items():
+                    if "None" == value or "" == value:
+                        continue
+                    if name in [HplResult.JSON_KEY_N, HplResult.JSON_KEY_NB, HplResult.JSON_KEY_P,
+                                HplResult.JSON_KEY_Q]:
+                        data[name] = int(value)
+                    elif name in [HplResult.JSON_KEY_TIME, HplResult.JSON_KEY_GFLOPS, HplResult.JSON_KEY_RESIDUAL,
+                                  HplResult.JSON_KEY_EFFICIENCY, HplResult.JSON_KEY_CPUS, HplResult.JSON_KEY_THREADS,
+                                  HplResult.JSON_KEY_MEAN_FREQUENCY, HplResult.JSON_KEY_MIN_FREQUENCY,
+                                  HplResult.JSON_KEY_MAX_TEMPERATURE, HplResult.JSON_KEY_SWAPPED]:
+                        data[name] = float(value)
+                        if name in [HplResult.JSON_KEY_CPUS, HplResult.JSON_KEY_THREADS, HplResult.JSON_KEY_SWAPPED] \
+                                and not math.isnan(data[name]):
+                            data[name] = int(data[name])
+                    elif HplResult.JSON_KEY_PASSED == name:
+                        data[name] = "True" == value
+                    elif HplResult.JSON_KEY_THROTTLED == name:
+                        # None where no telemetry was recorded
+                        data[name] = None if "None" == value else "True" == value
+                    else:
+                        data[name] = value
+                result = HplResult()
+                result.update(data)
+                results.append(result)
+        return results
+
+    @staticmethod
+    def read_results_json(file_path: str) -> list[HplResult]:
+        """
+            Reads back a JSON lines results file written by write_results_to_json or the JSON lines results writer
+        """
+        results = []
+        with open(file_path, "r") as file:
+            for line in file:
+                if not line.strip():
+                    continue
+                result = HplResult()
+                result.update(json.loads(line))
+                results.append(result)
+        return results
 
     @staticmethod
     def read_result_file(file_path: str) -> list[HplResult]:
+        if Path(file_path).is_file() and Path(file_path).stat().st_size >= HplResultsFile.MMAP_THRESHOLD:
+            return list(HplResultsFile.iter_results_mmap(file_path))
+
+        return list(HplResultsFile.iter_results(file_path))
+
+    @staticmethod
+    def read_result_summary(file_path: str) -> HplRunSummary | None:
+        parser = HplOutputParser()
+        for _ in HplResultsFile.iter_results(file_path, parser=parser):
+            pass
+        return parser.summary
+
+    @staticmethod
+    def read_result_files(file_paths: list[str], max_workers: int = None) -> list[HplResult]:
+        """
+            Reads many HPL output files across a pool of processes. Each result is tagged with the file it was read
+            from and the results are returned in the order of the files given
+        """
+        if not file_paths:
+            raise ValueError("file_paths cannot be None or empty")
+
+        if 1 == len(file_paths) or 1 == max_workers:
+            file_results = map(_read_result_file_with_source, file_paths)
+            return [result for results in file_results for result in results]
+
+        if max_workers is None:
+            max_workers = min(len(file_paths), os.cpu_count() or 1)
+
+        # Hand out files in chunks so that thousands of small files don't each pay for a round trip to the pool
+        chunk_size = max(1, int(len(file_paths) / (max_workers * 4)))
+        results: list[HplResult] = []
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            for file_results in executor.map(_read_result_file_with_source, file_paths, chunksize=chunk_size):
+                results.extend(file_results)
+
+        return results
+
+    @staticmethod
+    def iter_results_mmap(file_path: str) -> Iterator[HplResult]:
+        """
+            Yields each result in the HPL output file by memory mapping the file and jumping straight to each
+            T/V header rather than testing every line. Only the lines between one header and the next are parsed
+        """
         if not file_path:
             raise ValueError("file_path cannot be None or empty")
 
@@ -190,28 +539,198 @@ class HplResultsFile:
         if not input_file.is_file():
             raise ValueError(f"{file_path} is not a file")
 
-        results:list[HplResult] = []
-        hit_header = False
-        hit_seperator = False
+        # An empty file cannot be memory mapped, and has no results anyway
+        if 0 == input_file.stat().st_size:
+            return
+
+        parser = HplOutputParser()
+        header = HplOutputParser.RESULT_HEADER.encode()
+        with open(file_path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            pos = mapped.find(header)
+            while -1 != pos:
+                next_pos = mapped.find(header, pos + len(header))
+                end = len(mapped) if -1 == next_pos else next_pos
+                for line in mapped[pos:end].decode().splitlines(keepends=True):
+                    result = parser.parse_line(line)
+                    if result is not None:
+                        yield result
+                pos = next_pos
+
+        result = parser.flush()
+        if result is not None:
+            yield result
+
+    @staticmethod
+    def iter_results(file_path: str, follow: bool = False, poll_interval: float = 0.5,
+                     stop: Callable[[], bool] = None, parser: "HplOutputParser" = None) -> Iterator[HplResult]:
+        """
+            Yields each result in the HPL output file as soon as it has been read. If follow is set the file is
+            tailed as it is written (and waited for if it does not yet exist) until HPL reports the end of the tests
+            or the stop callable returns True. Once stop returns True any remaining output is drained before returning.
+            A parser may be passed in to inspect the run summary once iteration is complete
+        """
+        if not file_path:
+            raise ValueError("file_path cannot be None or empty")
+
+        input_file = Path(file_path)
+        if not follow:
+            if not input_file.exists():
+                raise FileNotFoundError(f"File {file_path} does not exist")
+
+            if not input_file.is_file():
+                raise ValueError(f"{file_path} is not a file")
+
+        if parser is None:
+            parser = HplOutputParser()
+        while follow and not input_file.exists():
+            if stop is not None and stop():
+                return
+            time.sleep(poll_interval)
+
+        if not input_file.is_file():
+            raise ValueError(f"{file_path} is not a file")
+
         with open(file_path, "r") as file:
-            # Frankly we don't care about most of the lines in hpl.out
-            # Ww're looking for a pair of line as follows:
-            # T/V                N    NB     P     Q               Time                 Gflops
-            # --------------------------------------------------------------------------------
-            # The next line is the actual result
-            for line in file:
-                if line.startswith("T/V                N    NB     P     Q               Time                 Gflops"):
-                    hit_header = True
+            if not follow:
+                for line in file:
+                    result = parser.parse_line(line)
+                    if result is not None:
+                        yield result
+                result = parser.flush()
+                if result is not None:
+                    yield result
+                return
+
+            pending = ""
+            stopping = False
+            while True:
+                line = file.readline()
+                if line:
+                    # The writer may be part way through a line so hold on to it until the newline arrives
+                    pending += line
+                    if not pending.endswith("\n"):
+                        continue
+                    result = parser.parse_line(pending)
+                    pending = ""
+                    if result is not None:
+                        yield result
+                    if parser.finished:
+                        return
                     continue
-                if line.startswith("--------------------------"):
-                    hit_seperator = True
+
+                if stopping:
+                    if pending:
+                        result = parser.parse_line(pending)
+                        if result is not None:
+                            yield result
+                    result = parser.flush()
+                    if result is not None:
+                        yield result
+                    return
+
+                if stop is not None and stop():
+                    # Go round once more to pick up anything written before the writer exited
+                    stopping = True
                     continue
 
-                if hit_header and hit_seperator:
-                    result = HplResult()
-                    result.from_hpl_output(line)
-                    results.append(result)
-                    hit_header = False
-                    hit_seperator = False
+                time.sleep(poll_interval)
+
+
+class HplOutputParser:
+    """
+        Incremental parser for the output of HPL. Lines are fed in one at a time and a HplResult is returned once
+        its block of output is complete, so the same state machine serves both complete files and output that is
+        still being written. A block is complete when its residual check is seen, or when the next result or the
+        end of the tests starts without one. Call flush() once the output ends to collect any result still pending
+    """
+    RESULT_HEADER = "T/V                N    NB     P     Q               Time                 Gflops"
+    SEPARATOR = "--------------------------"
+    START_TIME = "HPL_pdgesv() start time"
+    END_TIME = "HPL_pdgesv() end time"
+    RESIDUAL = "||Ax-b||"
+    FINISHED = "Finished"
+    END_OF_TESTS = "End of Tests."
 
-        return results
\ No newline at end of file
+    def __init__(self) -> None:
+        self._hit_header = False
+        self._hit_seperator = False
+        self._finished = False
+        self._pending: HplResult | None = None
+        self._summary: HplRunSummary | None = None
+
+    @property
+    def finished(self) -> bool:
+        return self._finished
+
+    @property
+    def summary(self) -> HplRunSummary | None:
+        return self._summary
+
+    def flush(self) -> HplResult | None:
+        pending = self._pending
+        self._pending = None
+        return pending
+
+    def parse_line(self, line: str) -> HplResult | None:
+        # Frankly we don't care about most of the lines in hpl.out
+        # Ww're looking for a pair of line as follows:
+        # T/V                N    NB     P     Q               Time                 Gflops
+        # --------------------------------------------------------------------------------
+        # The next line is the actual result. It is followed by the start and end times and the residual check
+        if line.startswith(HplOutputParser.RESULT_HEADER):
+            self._hit_header = True
+            return self.flush()
+        if line.startswith(HplOutputParser.SEPARATOR):
+            self._hit_seperator = True
+            return None
+        if line.startswith(HplOutputParser.END_OF_TESTS):
+            self._finished = True
+            return self.flush()
+
+        if self._hit_header and self._hit_seperator:
+            self._hit_header = False
+            self._hit_seperator = False
+            self._pending = HplResult()
+            self._pending.from_hpl_output(line)
+            return None
+
+        if line.startswith(HplOutputParser.FINISHED):
+            self._summary = HplRunSummary()
+            self._summary.tests = int(line.split()[1])
+            return self.flush()
+
+        if self._summary is not None:
+            self._parse_summary_line(line)
+            return None
+
+        if self._pending is None:
+            return None
+
+        if line.startswith(HplOutputParser.START_TIME):
+            self._pending.start_time = HplResult.time_from_hpl_output(line)
+        elif line.startswith(HplOutputParser.END_TIME):
+            self._pending.end_time = HplResult.time_from_hpl_output(line)
+        elif line.startswith(HplOutputParser.RESIDUAL):
+            self._pending.residual_from_hpl_output(line)
+            return self.flush()
+
+        return None
+
+    def _parse_summary_line(self, line: str) -> None:
+        parts = line.split()
+        if not parts or not parts[0].isdigit():
+            return
+        if "passed" in parts:
+            self._summary.passed = int(parts[0])
+        elif "failed" in parts:
+            self._summary.failed = int(parts[0])
+        elif "skipped" in parts:
+            self._summary.skipped = int(parts[0])
+
+
+def _read_result_file_with_source(file_path: str) -> list[HplResult]:
+    # Module level so that it can be pickled and handed to worker processes
+    results = HplResultsFile.read_result_file(file_path)
+    for result in results:
+        result.source = str(file_path)
+    return results
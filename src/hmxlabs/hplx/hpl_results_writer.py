@@ -0,0 +1,168 @@
+# Writers that persist HPL results as they are produced rather than all at once at the end of a run.
+# Results are appended to the file, the header (if the format has one) is written only when the file
+# is new and writes are batched. A batch is written out and flushed to disk once it reaches the batch
+# size, or on flush/close, so with a batch size of 1 every result is on disk as soon as it is written.
+import os
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Iterable
+
+from hmxlabs.hplx.hpl_results import HplResult
+from hmxlabs.hplx.hpl_result_set import HplResultSet
+
+
+class HplResultsWriter(ABC):
+
+    FORMAT_CSV = "csv"
+    FORMAT_JSON = "json"
+    FORMAT_BINARY = "binary"
+
+    FILE_EXTENSIONS = {
+        FORMAT_CSV: ".csv",
+        FORMAT_JSON: ".json",
+        FORMAT_BINARY: ".bin",
+    }
+
+    def __init__(self, file_path: str, append: bool = True, batch_size: int = 1,
+                 flush_interval: float = 0, exclude_failed: bool = False) -> None:
+        """
+            Opens the file for writing. If append is False any existing file is replaced. The pending batch is also
+            written out when flush_interval seconds have passed since the last write out, if that is non-zero.
+            Results that failed the residual check are skipped if exclude_failed is set
+        """
+        if not file_path:
+            raise ValueError("file_path cannot be None or empty")
+
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+
+        self._file_path = file_path
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._exclude_failed = exclude_failed
+        self._pending: list[HplResult] = []
+        self._last_flush = time.monotonic()
+        self._count = 0
+
+        self._file = open(Path(file_path), "ab" if append else "wb")
+        if 0 == self._file.tell():
+            header = self._header()
+            if header:
+                self._file.write(header)
+                self._sync()
+        else:
+            self._check_existing()
+
+    @staticmethod
+    def open(file_path: str, output_format: str, append: bool = True, batch_size: int = 1,
+             flush_interval: float = 0, exclude_failed: bool = False) -> "HplResultsWriter":
+        writers = {
+            HplResultsWriter.FORMAT_CSV: HplCsvResultsWriter,
+            HplResultsWriter.FORMAT_JSON: HplJsonResultsWriter,
+            HplResultsWriter.FORMAT_BINARY: HplBinaryResultsWriter,
+        }
+        if output_format not in writers:
+            raise ValueError(f"Unknown results format {output_format}")
+
+        return writers[output_format](file_path, append, batch_size, flush_interval, exclude_failed)
+
+    @property
+    def file_path(self) -> str:
+        return self._file_path
+
+    @property
+    def count(self) -> int:
+        # The number of results written (or pending) so far
+        return self._count
+
+    def write(self, result: HplResult) -> None:
+        if self._exclude_failed and result.failed:
+            return
+
+        self._pending.append(result)
+        self._count += 1
+        if len(self._pending) >= self._batch_size or self._flush_due():
+            self.flush()
+
+    def write_all(self, results: Iterable[HplResult]) -> None:
+        for result in results:
+            self.write(result)
+
+    def flush(self) -> None:
+        if self._pending:
+            self._file.write(self._format(self._pending))
+            self._pending = []
+        self._sync()
+
+    def close(self) -> None:
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+
+    def __enter__(self) -> "HplResultsWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def _flush_due(self) -> bool:
+        return 0 < self._flush_interval <= time.monotonic() - self._last_flush
+
+    def _sync(self) -> None:
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._last_flush = time.monotonic()
+
+    def _check_existing(self) -> None:
+        # Appending to a file that already has content. Formats with a header check it matches
+        pass
+
+    def _header(self) -> bytes | None:
+        return None
+
+    @abstractmethod
+    def _format(self, results: list[HplResult]) -> bytes:
+        pass
+
+
+class HplCsvResultsWriter(HplResultsWriter):
+
+    def _header(self) -> bytes | None:
+        return (HplResult.csv_header() + "\n").encode()
+
+    def _format(self, results: list[HplResult]) -> bytes:
+        return "".join(result.to_csv() + "\n" for result in results).encode()
+
+
+class HplJsonResultsWriter(HplResultsWriter):
+
+    def _format(self, results: list[HplResult]) -> bytes:
+        return "".join(result.to_json() + "\n" for result in results).encode()
+
+
+class HplBinaryResultsWriter(HplResultsWriter):
+    """
+        Writes fixed size records that may be read back directly into columns with HplResultSet.read_binary_file
+    """
+
+    def _header(self) -> bytes | None:
+        return HplResultSet.binary_header()
+
+    def _check_existing(self) -> None:
+        header = HplResultSet.binary_header()
+        with open(self.file_path, "rb") as file:
+            existing_header = file.read(len(header))
+        if existing_header != header:
+            self._file.close()
+            raise ValueError(f"{self.file_path} is not a HPLx binary results file with the current record layout")
+
+        # Drop any partial record left by a crash mid write so that new records stay aligned
+        size = self._file.tell()
+        partial = (size - len(header)) % HplResultSet.record_dtype().itemsize
+        if 0 != partial:
+            self._file.truncate(size - partial)
+
+    def _format(self, results: list[HplResult]) -> bytes:
+        return HplResultSet.from_results(results).to_records().tobytes()
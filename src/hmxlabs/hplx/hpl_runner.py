@@ -0,0 +1,237 @@
+# Runs HPL as an asyncio subprocess and parses its results as they are produced.
+# HPL may write its results to a file (line 4 of HPL.dat set to 1), which is followed as it grows, or to stdout
+# (line 4 set to 6), which is read directly and can be saved to a file as it is read. Either way HPL is watched:
+# if it runs beyond its timeout, or produces no output at all for longer than the inactivity timeout (as happens
+# when an MPI job hangs), the whole of its process group is killed. Failures are raised as HplRunError
+# subclasses, each carrying any results produced before the failure and the last lines HPL wrote to stdout.
+# Being asyncio based several runners can be supervised at once, see run_many.
+import asyncio
+import collections
+import os
+import signal
+import time
+from pathlib import Path
+from typing import Callable
+
+from hmxlabs.hplx.hpl_results import HplResult, HplOutputParser, HplRunSummary
+
+
+class HplRunError(Exception):
+
+    def __init__(self, message: str, command: str, results: list[HplResult] = None, returncode: int = None,
+                 output: list[str] = None) -> None:
+        super().__init__(message)
+        self.command = command
+        self.results = results if results is not None else []
+        self.returncode = returncode
+        self.output = output if output is not None else []
+
+
+class HplTimeoutError(HplRunError):
+    # HPL ran for longer than its timeout and was killed
+    pass
+
+
+class HplHangError(HplRunError):
+    # HPL produced no output for longer than the inactivity timeout and was killed
+    pass
+
+
+class HplExitError(HplRunError):
+    # HPL exited with a non-zero exit code
+    pass
+
+
+class HplNoResultsError(HplRunError):
+    # HPL exited normally but the expected output file was not written or contained no results
+    pass
+
+
+class HplRunner:
+
+    DEFAULT_POLL_INTERVAL = 0.5
+    # The number of lines of stdout kept to report with an error
+    OUTPUT_TAIL_LINES = 20
+
+    def __init__(self, command: str, output_file: str = None, capture_file: str = None, cwd: str = None,
+                 timeout: float = None, inactivity_timeout: float = None,
+                 on_result: Callable[[HplResult], None] = None,
+                 poll_interval: float = DEFAULT_POLL_INTERVAL, env: dict[str, str] = None) -> None:
+        """
+            If output_file is given HPL is expected to write its results there, otherwise they are read from stdout.
+            If capture_file is given stdout is also written to it. Timeouts are in seconds and None means no limit.
+            Any env variables are set for HPL on top of this process's environment
+        """
+        if not command:
+            raise ValueError("command cannot be None or empty")
+
+        self._command = command
+        self._output_file = output_file
+        self._capture_file = capture_file
+        self._cwd = cwd
+        self._timeout = timeout
+        self._inactivity_timeout = inactivity_timeout
+        self._on_result = on_result
+        self._poll_interval = poll_interval
+        self._env = env
+        self._parser = HplOutputParser()
+        self._results: list[HplResult] = []
+        self._output_tail: collections.deque[str] = collections.deque(maxlen=HplRunner.OUTPUT_TAIL_LINES)
+        self._last_activity = 0.0
+
+    @property
+    def command(self) -> str:
+        return self._command
+
+    @property
+    def results(self) -> list[HplResult]:
+        return self._results
+
+    @property
+    def summary(self) -> HplRunSummary | None:
+        return self._parser.summary
+
+    @staticmethod
+    def run_many(runners: list["HplRunner"]) -> list[list[HplResult] | HplRunError]:
+        """
+            Runs all the runners at once, returning for each either its results or the error it failed with
+        """
+        async def run_all():
+            return await asyncio.gather(*(runner.run() for runner in runners), return_exceptions=True)
+
+        outcomes = asyncio.run(run_all())
+        for outcome in outcomes:
+            # Anything other than a failure of HPL itself is a bug so is not hidden
+            if isinstance(outcome, BaseException) and not isinstance(outcome, HplRunError):
+                raise outcome
+        return outcomes
+
+    def run_sync(self) -> list[HplResult]:
+        return asyncio.run(self.run())
+
+    async def run(self) -> list[HplResult]:
+        self._parser = HplOutputParser()
+        self._results = []
+        self._output_tail.clear()
+        self._last_activity = time.monotonic()
+        start = self._last_activity
+
+        # HPL runs in its own process group so that all of it (e.g. mpirun and its ranks) can be killed
+        process = await asyncio.create_subprocess_shell(self._command, stdout=asyncio.subprocess.PIPE,
+                                                        stderr=asyncio.subprocess.STDOUT, cwd=self._cwd,
+                                                        start_new_session=True,
+                                                        env=None if self._env is None else {**os.environ, **self._env})
+        exited = asyncio.Event()
+        readers = [asyncio.create_task(self._read_stdout(process))]
+        if self._output_file is not None:
+            readers.append(asyncio.create_task(self._follow_output_file(exited)))
+
+        error_type = None
+        try:
+            error_type = await self._watch(process, start)
+        finally:
+            if process.returncode is None:
+                self._kill(process)
+                await process.wait()
+            exited.set()
+            # Whatever HPL wrote before it exited, or was killed, is still read
+            await asyncio.gather(*readers, return_exceptions=True)
+            self._add_result(self._parser.flush())
+
+        if error_type is HplTimeoutError:
+            raise self._error(HplTimeoutError, f"HPL ran for more than its timeout of {self._timeout} seconds",
+                              process.returncode)
+        if error_type is HplHangError:
+            raise self._error(HplHangError, f"HPL produced no output for more than {self._inactivity_timeout} "
+                                            f"seconds and is assumed to have hung", process.returncode)
+        if 0 != process.returncode:
+            raise self._error(HplExitError, f"HPL exited with exit code {process.returncode}", process.returncode)
+        if self._output_file is not None and not Path(self._output_file).is_file():
+            raise self._error(HplNoResultsError, f"The expected output file {self._output_file} was not written",
+                              process.returncode)
+        if not self._results:
+            raise self._error(HplNoResultsError, "HPL produced no results", process.returncode)
+
+        return self._results
+
+    async def _watch(self, process: asyncio.subprocess.Process, start: float) -> type[HplRunError] | None:
+        # Returns once HPL exits or, having killed it, with the type of error to raise
+        while True:
+            try:
+                await asyncio.wait_for(process.wait(), self._poll_interval)
+                return None
+            except asyncio.TimeoutError:
+                pass
+
+            now = time.monotonic()
+            if self._timeout is not None and now - start > self._timeout:
+                self._kill(process)
+                return HplTimeoutError
+            if self._inactivity_timeout is not None and now - self._last_activity > self._inactivity_timeout:
+                self._kill(process)
+                return HplHangError
+
+    async def _read_stdout(self, process: asyncio.subprocess.Process) -> None:
+        capture = open(self._capture_file, "w") if self._capture_file is not None else None
+        try:
+            while True:
+                line_bytes = await process.stdout.readline()
+                if not line_bytes:
+                    return
+                self._last_activity = time.monotonic()
+                line = line_bytes.decode(errors="replace")
+                self._output_tail.append(line.rstrip("\n"))
+                if capture is not None:
+                    capture.write(line)
+                    capture.flush()
+                if self._output_file is None:
+                    self._add_result(self._parser.parse_line(line))
+        finally:
+            if capture is not None:
+                capture.close()
+
+    async def _follow_output_file(self, exited: asyncio.Event) -> None:
+        output_path = Path(self._output_file)
+        position = 0
+        partial = ""
+        while True:
+            # Once HPL has exited this is the final read, which picks up anything written since the last one
+            done = exited.is_set()
+            if output_path.is_file():
+                with open(output_path, "r") as file:
+                    file.seek(position)
+                    data = file.read()
+                    position = file.tell()
+                if data:
+                    self._last_activity = time.monotonic()
+                    lines = (partial + data).split("\n")
+                    partial = lines.pop()
+                    for line in lines:
+                        self._add_result(self._parser.parse_line(line + "\n"))
+
+            if done:
+                if partial:
+                    self._add_result(self._parser.parse_line(partial))
+                return
+            try:
+                await asyncio.wait_for(exited.wait(), self._poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def _add_result(self, result: HplResult | None) -> None:
+        if result is None:
+            return
+
+        self._results.append(result)
+        if self._on_result is not None:
+            self._on_result(result)
+
+    def _kill(self, process: asyncio.subprocess.Process) -> None:
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            # Already gone
+            pass
+
+    def _error(self, error_type: type[HplRunError], message: str, returncode: int | None) -> HplRunError:
+        return error_type(message, self._command, self._results, returncode, list(self._output_tail))
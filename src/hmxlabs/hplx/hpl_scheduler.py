@@ -0,0 +1,127 @@
+# Predicts how long each HPL configuration will take so that configurations can be run cheapest first and any
+# run that goes far beyond its prediction can be stopped.
+# HPL performs roughly 2/3 N^3 floating point operations so the runtime follows from the rate (GFLOPS) achieved.
+# The rate rises with N as the O(N^2) communication and panel work is amortised over more O(N^3) update work and
+# is modelled as gflops(N) = N / (a N + b), i.e. 1/gflops = a + b/N, which is fitted by least squares to the runs
+# measured so far. a is the reciprocal of the rate approached for large N.
+# The time each HPL invocation spends beyond the runs it reports (launching mpirun and HPL, setting up and tearing
+# down) is also measured so that configurations can be batched into invocations that amortise it.
+import math
+
+import numpy as np
+
+from hmxlabs.hplx.hpl_results import HplResult
+from hmxlabs.hplx.hpl_tuner import HplTuner
+
+
+class HplScheduler:
+
+    # A run is stopped once it has taken this many times its predicted runtime
+    DEFAULT_TIMEOUT_FACTOR = 3.0
+    # Nor is a run ever stopped before this many seconds, which covers launching HPL and small N noise
+    DEFAULT_MIN_TIMEOUT = 60.0
+
+    def __init__(self, timeout_factor: float = DEFAULT_TIMEOUT_FACTOR,
+                 min_timeout: float = DEFAULT_MIN_TIMEOUT) -> None:
+        if timeout_factor < 1:
+            raise ValueError("timeout_factor must be at least 1")
+
+        self._timeout_factor = timeout_factor
+        self._min_timeout = min_timeout
+        self._n: list[int] = []
+        self._gflops: list[float] = []
+        self._fitted: tuple[float, float] | None = None
+        self._launch_overheads: list[float] = []
+
+    def add(self, result: HplResult) -> None:
+        # Runs that failed the residual check or have no rate tell us nothing about the runtime
+        if result.failed or not result.gflops or math.isnan(result.gflops) or result.gflops <= 0 or result.n <= 0:
+            return
+
+        self._n.append(int(result.n))
+        self._gflops.append(float(result.gflops))
+        self._fitted = None
+
+    def add_all(self, results: list[HplResult]) -> None:
+        for result in results:
+            self.add(result)
+
+    def add_launch(self, wall_time: float, results: list[HplResult]) -> None:
+        """
+            Measures the launch overhead of an HPL invocation that took wall_time seconds and produced the results
+        """
+        if not results:
+            return
+
+        run_time = sum(result.time for result in results if not math.isnan(result.time))
+        self._launch_overheads.append(max(0.0, wall_time - run_time))
+
+    @property
+    def measurements(self) -> int:
+        return len(self._n)
+
+    @property
+    def launch_overhead(self) -> float | None:
+        # The median over the invocations measured so far, or None if there are none
+        if not self._launch_overheads:
+            return None
+
+        return float(np.median(self._launch_overheads))
+
+    def predict_gflops(self, n: int) -> float | None:
+        """
+            The rate expected at problem size n, or None if nothing has been measured yet
+        """
+        if not self._n:
+            return None
+
+        a, b = self._fit()
+        return n / (a * n + b)
+
+    def predict_runtime(self, n: int) -> float | None:
+        gflops = self.predict_gflops(n)
+        if gflops is None:
+            return None
+
+        return HplTuner.predict_runtime(n, gflops)
+
+    def timeout(self, n: int) -> float | None:
+        """
+            How long a run at problem size n is given before it is stopped. None, meaning no limit, until there is
+            a measurement to predict from
+        """
+        predicted = self.predict_runtime(n)
+        if predicted is None:
+            return None
+
+        return self.timeout_for(predicted)
+
+    def timeout_for(self, predicted: float) -> float:
+        # How long a run predicted to take that many seconds is given before it is stopped
+        return max(self._min_timeout, self._timeout_factor * predicted)
+
+    def order(self, configs: list[tuple[int, int, int, int]]) -> list[tuple[int, int, int, int]]:
+        """
+            Sorts (N, NB, P, Q) configurations shortest predicted runtime first. The predicted runtime always grows
+            with N, and before anything has been measured is taken to grow as N^3, so this is an ordering by N
+        """
+        return sorted(configs)
+
+    def _fit(self) -> tuple[float, float]:
+        if self._fitted is not None:
+            return self._fitted
+
+        n = np.array(self._n, dtype=np.float64)
+        inverse_gflops = 1.0 / np.array(self._gflops, dtype=np.float64)
+
+        # A constant rate (b = 0) unless there are at least two problem sizes to fit the curve to
+        a = float(np.mean(inverse_gflops))
+        b = 0.0
+        if len(np.unique(n)) >= 2:
+            slope, intercept = np.polyfit(1.0 / n, inverse_gflops, 1)
+            # Noise can give a curve where the rate falls with N or becomes unbounded, neither of which is HPL
+            if intercept > 0 and slope >= 0:
+                a, b = float(intercept), float(slope)
+
+        self._fitted = (a, b)
+        return self._fitted
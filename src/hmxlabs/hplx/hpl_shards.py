@@ -0,0 +1,222 @@
+# Splits a sweep of (N, NB, P, Q) configurations into shards that can be run independently, for example as the
+# tasks of a batch scheduler job array across many nodes, and merges the results of the shards back together.
+# HPL runs the cross product of the problem sizes, block sizes and process grids in its HPL.dat so every shard is
+# itself a cross product: the sweep is split repeatedly, taking the most expensive shard and dividing one of its
+# lists in two, until there are enough shards. This never adds a configuration that was not in the sweep.
+# Each shard is written to its own directory with its HPL.dat, and a manifest records what each shard contains and
+# the output file HPL is expected to write.
+import json
+from pathlib import Path
+
+from hmxlabs.hplx.hpl_input import HplInputFileGenerator
+from hmxlabs.hplx.hpl_results import HplResult, HplResultsFile
+
+
+class HplShard:
+
+    DEFAULT_OUTPUT_FILE = "HPL.out"
+
+    JSON_KEY_INDEX = "index"
+    JSON_KEY_DIRECTORY = "directory"
+    JSON_KEY_OUTPUT_FILE = "output_file"
+    JSON_KEY_N = "n"
+    JSON_KEY_NB = "nb"
+    JSON_KEY_P = "p"
+    JSON_KEY_Q = "q"
+
+    def __init__(self, n: [int], nb: [int], p: [int], q: [int], index: int = 0, directory: str = None,
+                 output_file: str = DEFAULT_OUTPUT_FILE) -> None:
+        if len(p) != len(q):
+            raise ValueError("The number of elements in p and q must be the same")
+
+        if not n or not nb or not p:
+            raise ValueError("A shard must have at least one problem size, block size and process grid")
+
+        self._n = list(n)
+        self._nb = list(nb)
+        self._p = list(p)
+        self._q = list(q)
+        self.index = index
+        self.directory = directory
+        self.output_file = output_file
+
+    @property
+    def n(self) -> [int]:
+        return self._n
+
+    @property
+    def nb(self) -> [int]:
+        return self._nb
+
+    @property
+    def p(self) -> [int]:
+        return self._p
+
+    @property
+    def q(self) -> [int]:
+        return self._q
+
+    @property
+    def configs(self) -> list[tuple[int, int, int, int]]:
+        return [(n, nb, self._p[idx], self._q[idx]) for n in self._n for nb in self._nb for idx in range(len(self._p))]
+
+    @property
+    def cost(self) -> float:
+        # HPL runtime goes as N^3 and every problem size is run for each block size and process grid
+        return sum(float(n) ** 3 for n in self._n) * len(self._nb) * len(self._p)
+
+    @property
+    def output_path(self) -> Path:
+        return Path(self.directory) / self.output_file
+
+    def split(self) -> tuple["HplShard", "HplShard"] | None:
+        """
+            Divides the shard in two along whichever of its lists gives the most even split, or None if it is a
+            single configuration
+        """
+        candidates = []
+        if len(self._n) > 1:
+            # Problem sizes are far from equal in cost so split where the two halves come closest
+            ordered = sorted(self._n)
+            costs = [float(n) ** 3 for n in ordered]
+            split_at = min(range(1, len(ordered)), key=lambda idx: abs(sum(costs[:idx]) - sum(costs[idx:])))
+            candidates.append((HplShard(ordered[:split_at], self._nb, self._p, self._q),
+                               HplShard(ordered[split_at:], self._nb, self._p, self._q)))
+        if len(self._nb) > 1:
+            half = len(self._nb) // 2
+            candidates.append((HplShard(self._n, self._nb[:half], self._p, self._q),
+                               HplShard(self._n, self._nb[half:], self._p, self._q)))
+        if len(self._p) > 1:
+            half = len(self._p) // 2
+            candidates.append((HplShard(self._n, self._nb, self._p[:half], self._q[:half]),
+                               HplShard(self._n, self._nb, self._p[half:], self._q[half:])))
+
+        if not candidates:
+            return None
+
+        return min(candidates, key=lambda halves: max(halves[0].cost, halves[1].cost))
+
+    def to_dict(self) -> dict:
+        return {
+            HplShard.JSON_KEY_INDEX: self.index,
+            HplShard.JSON_KEY_DIRECTORY: self.directory,
+            HplShard.JSON_KEY_OUTPUT_FILE: self.output_file,
+            HplShard.JSON_KEY_N: self._n,
+            HplShard.JSON_KEY_NB: self._nb,
+            HplShard.JSON_KEY_P: self._p,
+            HplShard.JSON_KEY_Q: self._q,
+        }
+
+    @staticmethod
+    def from_dict(shard: dict) -> "HplShard":
+        return HplShard(shard[HplShard.JSON_KEY_N], shard[HplShard.JSON_KEY_NB], shard[HplShard.JSON_KEY_P],
+                        shard[HplShard.JSON_KEY_Q], shard[HplShard.JSON_KEY_INDEX],
+                        shard[HplShard.JSON_KEY_DIRECTORY], shard[HplShard.JSON_KEY_OUTPUT_FILE])
+
+    def __str__(self) -> str:
+        return f"shard {self.index}: N={self._n}, NB={self._nb}, P={self._p}, Q={self._q}"
+
+
+class HplShardPlanner:
+
+    MANIFEST_FILE = "hplx-shards.json"
+    SHARD_DIR_PREFIX = "shard-"
+    JSON_KEY_CPU_COUNT = "cpu_count"
+    JSON_KEY_SHARDS = "shards"
+
+    @staticmethod
+    def plan(n: [int], nb: [int], p: [int], q: [int], num_shards: int) -> list[HplShard]:
+        """
+            Splits the cross product of n, nb and the process grids (p[idx], q[idx]) into at most num_shards shards
+            of roughly equal cost. There are fewer shards only if there are fewer configurations than num_shards
+        """
+        if num_shards < 1:
+            raise ValueError("num_shards must be at least 1")
+
+        shards = [HplShard(n, nb, p, q)]
+        while len(shards) < num_shards:
+            splittable = [shard for shard in shards if len(shard.configs) > 1]
+            if not splittable:
+                break
+            largest = max(splittable, key=lambda shard: shard.cost)
+            shards.remove(largest)
+            shards.extend(largest.split())
+
+        # Most expensive first so that a job array that cannot run every shard at once starts the longest ones first
+        shards.sort(key=lambda shard: shard.cost, reverse=True)
+        for index, shard in enumerate(shards):
+            shard.index = index
+        return shards
+
+    @staticmethod
+    def write_shards(shards: list[HplShard], output_dir: str, cpu_count: int) -> str:
+        """
+            Writes each shard's HPL.dat to its own directory under output_dir along with a manifest of the shards.
+            Returns the path of the manifest
+        """
+        output_path = Path(output_dir)
+        output_path.mkdir(parents=True, exist_ok=True)
+        manifest_shards = []
+        for shard in shards:
+            # Numbered from 0 without padding so a job array task can find its shard directly from its index
+            shard_dir = output_path / f"{HplShardPlanner.SHARD_DIR_PREFIX}{shard.index}"
+            shard_dir.mkdir(exist_ok=True)
+            shard.directory = str(shard_dir)
+            hpl_dat = HplInputFileGenerator.generate_input_file(shard.n, shard.nb, shard.p, shard.q, True,
+                                                                shard.output_file)
+            with open(shard_dir / "HPL.dat", "w") as file:
+                file.write(hpl_dat)
+
+            # Directories in the manifest are relative to it so the shards can be moved or copied elsewhere
+            manifest_shard = shard.to_dict()
+            manifest_shard[HplShard.JSON_KEY_DIRECTORY] = shard_dir.name
+            manifest_shards.append(manifest_shard)
+
+        manifest_path = output_path / HplShardPlanner.MANIFEST_FILE
+        with open(manifest_path, "w") as file:
+            json.dump({HplShardPlanner.JSON_KEY_CPU_COUNT: cpu_count,
+                       HplShardPlanner.JSON_KEY_SHARDS: manifest_shards}, file, indent=2)
+        return str(manifest_path)
+
+    @staticmethod
+    def read_shards(shards_dir: str) -> tuple[int, list[HplShard]]:
+        """
+            Reads the manifest written by write_shards. Returns the CPU count the shards were planned for and the shards
+        """
+        manifest_path = Path(shards_dir) / HplShardPlanner.MANIFEST_FILE
+        with open(manifest_path, "r") as file:
+            manifest = json.load(file)
+
+        shards = [HplShard.from_dict(shard) for shard in manifest[HplShardPlanner.JSON_KEY_SHARDS]]
+        for shard in shards:
+            shard.directory = str(Path(shards_dir) / shard.directory)
+        return manifest[HplShardPlanner.JSON_KEY_CPU_COUNT], shards
+
+    @staticmethod
+    def merge_shards(shards_dir: str, run_type: str = "shard",
+                     max_workers: int = None) -> tuple[list[HplResult], list[tuple[HplShard, int]]]:
+        """
+            Reads the output of every shard. Returns the results, each tagged with the output file it came from, and
+            each shard that has no output or is missing configurations along with the number missing
+        """
+        cpu_count, shards = HplShardPlanner.read_shards(shards_dir)
+        available = [shard for shard in shards if shard.output_path.is_file()]
+        # None of the shards may have been run yet
+        results = []
+        if available:
+            results = HplResultsFile.read_result_files([str(shard.output_path) for shard in available], max_workers)
+        for result in results:
+            result.cpu_count = cpu_count
+            result.type = run_type
+
+        found: dict[str, set[tuple[int, int, int, int]]] = {}
+        for result in results:
+            found.setdefault(result.source, set()).add((result.n, result.nb, result.p, result.q))
+
+        incomplete = []
+        for shard in shards:
+            missing = set(shard.configs) - found.get(str(shard.output_path), set())
+            if missing:
+                incomplete.append((shard, len(missing)))
+
+        return results, incomplete
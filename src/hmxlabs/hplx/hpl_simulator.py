@@ -0,0 +1,276 @@
+# A simulated HPL for developing and comparing sweeps and tuners without spending node hours. It reads HPL.dat as HPL
+# does, runs the same configurations in the same order (each process grid in turn, then each problem size, block
+# size and variant of the algorithmic parameters) and writes output in HPL's own format, to the output file or stdout
+# as HPL.dat says, so hplx cannot tell it from the real thing. The runtime of each configuration is predicted by an
+# HplPerformanceModel, slowed a little by the weaker algorithmic choices, and multiplied by log-normal noise. A
+# fraction of runs fail their residual check. By default the simulation completes instantly, with the start and end
+# times reported as if each run took its simulated runtime. Run it in place of HPL with, for example:
+#   export HPL_EXEC='python3 -m hmxlabs.hplx.hpl_simulator --ranks $RANKS$ --threads $THREADS$'
+# Every simulated result can also be recorded, with the runtime it was expected to take without noise, to measure
+# how much simulated time a sweep spends and how close it gets to the best configuration.
+import argparse
+import json
+import math
+import random
+import sys
+import time
+from typing import TextIO
+
+from hmxlabs.hplx.hpl_algorithm import HplAlgorithmParameters
+from hmxlabs.hplx.hpl_input import HplInputFileGenerator
+from hmxlabs.hplx.hpl_model import HplPerformanceModel
+
+
+class HplSimulator:
+
+    DEFAULT_INPUT_FILE = "HPL.dat"
+    # About the DGEMM rate of a modern core
+    DEFAULT_GFLOPS_PER_PROCESS = 40.0
+    # The standard deviation of the log of the runtime, about 2%
+    DEFAULT_NOISE = 0.02
+    DEFAULT_FAILURE_RATE = 0.0
+    EPSILON = 1.110223e-16
+
+    # The slowdown of each algorithmic choice relative to the best, roughly as seen on a single node. Lookahead hides
+    # the panel factorisation so a depth of 0 costs the most
+    FACT_SLOWDOWN = {HplAlgorithmParameters.FACT_LEFT: 1.02, HplAlgorithmParameters.FACT_CROUT: 1.0,
+                     HplAlgorithmParameters.FACT_RIGHT: 1.0}
+    BCAST_SLOWDOWN = {HplAlgorithmParameters.BCAST_1RING: 1.02, HplAlgorithmParameters.BCAST_1RING_MODIFIED: 1.0,
+                      HplAlgorithmParameters.BCAST_2RING: 1.015, HplAlgorithmParameters.BCAST_2RING_MODIFIED: 1.005,
+                      HplAlgorithmParameters.BCAST_LONG: 1.03, HplAlgorithmParameters.BCAST_LONG_MODIFIED: 1.01}
+    DEPTH_SLOWDOWN = {0: 1.06, 1: 1.0}
+    DEEP_LOOKAHEAD_SLOWDOWN = 1.01
+
+    FACT_NAMES = ("Left", "Crout", "Right")
+    BCAST_NAMES = ("1ring", "1ringM", "2ring", "2ringM", "Blong", "BlongM")
+    SEPARATOR = "=" * 80
+    RULE = "-" * 80
+    RESULT_HEADER = "T/V                N    NB     P     Q               Time                 Gflops"
+    RESIDUAL_LABEL = "||Ax-b||_oo/(eps*(||A||_oo*||x||_oo+||b||_oo)*N)="
+
+    def __init__(self, model: HplPerformanceModel, ranks: int, noise: float = DEFAULT_NOISE,
+                 failure_rate: float = DEFAULT_FAILURE_RATE, seed: int = None, time_scale: float = 0.0) -> None:
+        """
+            Simulates HPL on ranks MPI ranks, whose runtimes the model predicts. Each runtime is multiplied by
+            exp(noise x a standard normal) and failure_rate of the runs fail their residual check. Each simulated
+            second takes time_scale real seconds, none by default
+        """
+        if ranks < 1:
+            raise ValueError("ranks must be at least 1")
+
+        if noise < 0:
+            raise ValueError("noise cannot be negative")
+
+        if failure_rate < 0 or failure_rate > 1:
+            raise ValueError("failure_rate must be between 0 and 1")
+
+        if time_scale < 0:
+            raise ValueError("time_scale cannot be negative")
+
+        self._model = model
+        self._ranks = ranks
+        self._noise = noise
+        self._failure_rate = failure_rate
+        self._random = random.Random(seed)
+        self._time_scale = time_scale
+
+    def expected_time(self, n: int, nb: int, p: int, q: int, variant: str) -> float:
+        """
+            The runtime in seconds of a configuration without noise. variant is its T/V code
+        """
+        params = HplAlgorithmParameters.parse_variant_code(variant)
+        slowdown = HplSimulator.FACT_SLOWDOWN[params["pfact"]] * HplSimulator.FACT_SLOWDOWN[params["rfact"]] * \
+            HplSimulator.BCAST_SLOWDOWN[params["bcast"]] * \
+            HplSimulator.DEPTH_SLOWDOWN.get(params["depth"], HplSimulator.DEEP_LOOKAHEAD_SLOWDOWN)
+        return self._model.predict_time(n, nb, p, q) * slowdown
+
+    @staticmethod
+    def gflops(n: int, time_seconds: float) -> float:
+        # As HPL calculates it
+        return (n / 1.0e9) * (n / time_seconds) * (2.0 / 3.0 * n + 3.0 / 2.0)
+
+    def run(self, hpl_dat: str, stdout: TextIO = sys.stdout, record: TextIO = None) -> tuple[int, int, int]:
+        """
+            Runs the configurations in the HPL.dat text, writing the output where it says. If record is given each
+            result is also written to it as a JSON line along with its expected runtime. Returns the number of
+            configurations that passed, failed and were skipped, as HPL reports them
+        """
+        inputs = HplInputFileGenerator.parse_input_file(hpl_dat)
+        algorithm: HplAlgorithmParameters = inputs["algorithm"]
+        output = open(inputs["output_file"], "w") if inputs["write_file"] else stdout
+        passed = failed = skipped = 0
+        clock = time.time()
+        try:
+            output.write(HplSimulator._format_header(inputs))
+            output.flush()
+            for p, q in zip(inputs["p"], inputs["q"]):
+                for n in inputs["n"]:
+                    for nb in inputs["nb"]:
+                        for variant in algorithm.variant_codes(inputs["row_major"]):
+                            if p * q > self._ranks or n < 0 or nb < 1:
+                                # HPL skips what it cannot run, such as a grid larger than the ranks it has
+                                skipped += 1
+                                continue
+
+                            expected = self.expected_time(n, nb, p, q, variant) if n > 0 else 0.0
+                            elapsed = expected * math.exp(self._random.gauss(0.0, self._noise))
+                            if self._time_scale > 0:
+                                time.sleep(elapsed * self._time_scale)
+                            residual = self._residual(algorithm.threshold)
+                            check = "PASSED" if residual < algorithm.threshold else "FAILED"
+                            passed += "PASSED" == check
+                            failed += "FAILED" == check
+                            output.write(HplSimulator._format_result(variant, n, nb, p, q, elapsed, clock, residual,
+                                                                     check))
+                            output.flush()
+                            clock += elapsed
+                            if record is not None:
+                                record.write(json.dumps({"n": n, "nb": nb, "p": p, "q": q, "variant": variant,
+                                                         "time": elapsed, "expected_time": expected,
+                                                         "gflops": HplSimulator.gflops(n, elapsed) if n > 0 else 0.0,
+                                                         "passed": "PASSED" == check}) + "\n")
+            output.write(HplSimulator._format_footer(passed, failed, skipped))
+        finally:
+            if output is not stdout:
+                output.close()
+        return passed, failed, skipped
+
+    def _residual(self, threshold: float) -> float:
+        if self._random.random() < self._failure_rate:
+            return threshold * self._random.uniform(2.0, 1000.0)
+        return self._random.uniform(5e-4, 1e-2)
+
+    @staticmethod
+    def _format_values(label: str, values: list) -> str:
+        # HPL writes up to 8 values to a line, continuing on the lines after
+        lines = []
+        for start in range(0, len(values), 8):
+            prefix = f"{label:<7}:" if 0 == start else " " * 8
+            lines.append(prefix + "".join(f"{value:>8} " for value in values[start:start + 8]))
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _format_header(inputs: dict) -> str:
+        algorithm: HplAlgorithmParameters = inputs["algorithm"]
+        swaps = {HplAlgorithmParameters.SWAP_BINARY_EXCHANGE: "Binary-exchange",
+                 HplAlgorithmParameters.SWAP_LONG: "Spread-roll (long)",
+                 HplAlgorithmParameters.SWAP_MIX: f"Mix (threshold = {algorithm.swapping_threshold})"}
+        header = f"""{HplSimulator.SEPARATOR}
+HPLinpack 2.3  --  High-Performance Linpack benchmark  --   December 2, 2018
+Written by A. Petitet and R. Clint Whaley,  Innovative Computing Laboratory, UTK
+Modified by Piotr Luszczek, Innovative Computing Laboratory, UTK
+Modified by Julien Langou, University of Colorado Denver
+{HplSimulator.SEPARATOR}
+
+An explanation of the input/output parameters follows:
+T/V    : Wall time / encoded variant.
+N      : The order of the coefficient matrix A.
+NB     : The partitioning blocking factor.
+P      : The number of process rows.
+Q      : The number of process columns.
+Time   : Time in seconds to solve the linear system.
+Gflops : Rate of execution for solving the linear system.
+
+The following parameter values will be used:
+
+"""
+        header += HplSimulator._format_values("N", inputs["n"])
+        header += HplSimulator._format_values("NB", inputs["nb"])
+        header += f"PMAP   : {'Row' if inputs['row_major'] else 'Column'}-major process mapping\n"
+        header += HplSimulator._format_values("P", inputs["p"])
+        header += HplSimulator._format_values("Q", inputs["q"])
+        header += HplSimulator._format_values("PFACT", [HplSimulator.FACT_NAMES[pfact] for pfact in algorithm.pfacts])
+        header += HplSimulator._format_values("NBMIN", algorithm.nbmins)
+        header += HplSimulator._format_values("NDIV", algorithm.ndivs)
+        header += HplSimulator._format_values("RFACT", [HplSimulator.FACT_NAMES[rfact] for rfact in algorithm.rfacts])
+        header += HplSimulator._format_values("BCAST", [HplSimulator.BCAST_NAMES[bcast] for bcast in algorithm.bcasts])
+        header += HplSimulator._format_values("DEPTH", algorithm.depths)
+        header += f"SWAP   : {swaps[algorithm.swap]}\n"
+        header += f"L1     : {'transposed' if algorithm.l1_transposed else 'no-transposed'} form\n"
+        header += f"U      : {'transposed' if algorithm.u_transposed else 'no-transposed'} form\n"
+        header += f"EQUIL  : {'yes' if algorithm.equilibration else 'no'}\n"
+        header += f"ALIGN  : {algorithm.memory_alignment} double precision words\n"
+        header += f"""
+{HplSimulator.RULE}
+
+- The matrix A is randomly generated for each test.
+- The following scaled residual check will be computed:
+      ||Ax-b||_oo / ( eps * ( || x ||_oo * || A ||_oo + || b ||_oo ) * N )
+- The relative machine precision (eps) is taken to be{HplSimulator.EPSILON:>27.6e}
+- Computational tests pass if scaled residuals are less than{algorithm.threshold:>20.1f}
+
+"""
+        return header
+
+    @staticmethod
+    def _format_result(variant: str, n: int, nb: int, p: int, q: int, elapsed: float, start: float,
+                       residual: float, check: str) -> str:
+        gflops = HplSimulator.gflops(n, elapsed) if elapsed > 0 else 0.0
+        return f"""{HplSimulator.SEPARATOR}
+{HplSimulator.RESULT_HEADER}
+{HplSimulator.RULE}
+{variant}{n:>12}{nb:>6}{p:>6}{q:>6}{elapsed:>19.2f}{gflops:>23.4e}
+HPL_pdgesv() start time {time.ctime(start)}
+
+HPL_pdgesv() end time   {time.ctime(start + elapsed)}
+
+{HplSimulator.RULE}
+{HplSimulator.RESIDUAL_LABEL} {residual:>16.8e} ...... {check}
+"""
+
+    @staticmethod
+    def _format_footer(passed: int, failed: int, skipped: int) -> str:
+        return f"""{HplSimulator.SEPARATOR}
+
+Finished {passed + failed + skipped:>6} tests with the following results:
+         {passed:>6} tests completed and passed residual checks,
+         {failed:>6} tests completed and failed residual checks,
+         {skipped:>6} tests skipped because of illegal input values.
+{HplSimulator.RULE}
+
+End of Tests.
+{HplSimulator.SEPARATOR}
+"""
+
+
+def main() -> None:
+    argparser = argparse.ArgumentParser(prog="python -m hmxlabs.hplx.hpl_simulator",
+                                        description="Simulates HPL, reading HPL.dat and writing HPL's output")
+    argparser.add_argument("--input-file", dest="input_file", type=str, default=HplSimulator.DEFAULT_INPUT_FILE,
+                           help=f"The HPL input file to run. Default is {HplSimulator.DEFAULT_INPUT_FILE}, as HPL reads")
+    argparser.add_argument("--ranks", dest="ranks", type=int, required=True,
+                           help="The number of MPI ranks simulated. Grids larger than this are skipped, as HPL does")
+    argparser.add_argument("--threads", dest="threads", type=int, default=1,
+                           help="The threads each rank runs, each adding the rate of a process. Default is 1")
+    argparser.add_argument("--gflops-per-process", dest="gflops_per_process", type=float,
+                           default=HplSimulator.DEFAULT_GFLOPS_PER_PROCESS,
+                           help=f"The DGEMM rate of a single threaded rank in GFLOPS. Default is {HplSimulator.DEFAULT_GFLOPS_PER_PROCESS}")
+    argparser.add_argument("--noise", dest="noise", type=float, default=HplSimulator.DEFAULT_NOISE,
+                           help=f"The standard deviation of the log of each runtime. Default is {HplSimulator.DEFAULT_NOISE}")
+    argparser.add_argument("--failure-rate", dest="failure_rate", type=float, default=HplSimulator.DEFAULT_FAILURE_RATE,
+                           help=f"The fraction of runs that fail their residual check. Default is {HplSimulator.DEFAULT_FAILURE_RATE}")
+    argparser.add_argument("--seed", dest="seed", type=int, default=None,
+                           help="Seed the noise and failures, so that every invocation draws the same sequence. Default is random")
+    argparser.add_argument("--time-scale", dest="time_scale", type=float, default=0.0,
+                           help="The real seconds each simulated second takes. Default is 0, the simulation completes at once")
+    argparser.add_argument("--record-file", dest="record_file", type=str, default=None,
+                           help="Append every simulated result, with its runtime expected without noise, to this file as JSON lines")
+    args = argparser.parse_args()
+
+    try:
+        with open(args.input_file, "r") as file:
+            hpl_dat = file.read()
+        simulator = HplSimulator(HplPerformanceModel.from_peak(args.gflops_per_process * max(1, args.threads)),
+                                 args.ranks, args.noise, args.failure_rate, args.seed, args.time_scale)
+        if args.record_file:
+            with open(args.record_file, "a") as record:
+                simulator.run(hpl_dat, record=record)
+        else:
+            simulator.run(hpl_dat)
+    except (OSError, ValueError) as e:
+        print(f"HPL ERROR: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+# Samples the machine in the background while HPL runs so that a result that comes in low can be explained: the CPU
+# frequency and utilisation of the CPUs HPL uses (from sysfs cpufreq and psutil), the hottest thermal zone, swap
+# activity and, on Intel, the kernel's count of thermal throttling events. Each result is given aggregates of the
+# samples taken between the start and end times HPL reports for it, which are only to the second so the window
+# extends to the end of the last second. A run is flagged as throttled if the throttling count rose during it or
+# its CPUs ran well below their base frequency. Sampling is a few small sysfs reads once a second by default.
+import math
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import psutil
+
+from hmxlabs.hplx.hpl_results import HplResult
+
+
+class HplTelemetrySample:
+
+    def __init__(self, timestamp: float, frequencies: list[float], utilisation: float, temperature: float,
+                 swapped: int, throttle_count: int) -> None:
+        self._timestamp = timestamp
+        self._frequencies = frequencies
+        self._utilisation = utilisation
+        self._temperature = temperature
+        self._swapped = swapped
+        self._throttle_count = throttle_count
+
+    @property
+    def timestamp(self) -> float:
+        # Seconds since the epoch, as time.time()
+        return self._timestamp
+
+    @property
+    def frequencies(self) -> list[float]:
+        # The current frequency in MHz of each CPU sampled
+        return self._frequencies
+
+    @property
+    def utilisation(self) -> float:
+        # The mean utilisation in percent of the CPUs sampled since the previous sample
+        return self._utilisation
+
+    @property
+    def temperature(self) -> float:
+        # The hottest thermal zone in degrees Celsius, NaN if there are none
+        return self._temperature
+
+    @property
+    def swapped(self) -> int:
+        # The bytes swapped in and out since boot
+        return self._swapped
+
+    @property
+    def throttle_count(self) -> int:
+        # The thermal throttling events of the CPUs sampled since boot
+        return self._throttle_count
+
+
+class HplTelemetry:
+
+    def __init__(self, samples: list[HplTelemetrySample], baseline: HplTelemetrySample,
+                 base_frequency: float = None) -> None:
+        """
+            Aggregates the samples taken during a run. Swap activity and throttling events are counted from the
+            baseline, the last sample before the run. base_frequency is the CPUs' base frequency in MHz, if known
+        """
+        if not samples:
+            raise ValueError("At least one sample is required")
+
+        frequencies = [sample.frequencies for sample in samples if sample.frequencies]
+        self._mean_frequency = float(np.mean([np.mean(values) for values in frequencies])) if frequencies else math.nan
+        self._min_frequency = float(min(min(values) for values in frequencies)) if frequencies else math.nan
+        temperatures = [sample.temperature for sample in samples if not math.isnan(sample.temperature)]
+        self._max_temperature = float(max(temperatures)) if temperatures else math.nan
+        utilisations = [sample.utilisation for sample in samples if not math.isnan(sample.utilisation)]
+        self._utilisation = float(np.mean(utilisations)) if utilisations else math.nan
+        self._swapped = max(0, samples[-1].swapped - baseline.swapped)
+        self._throttle_events = max(0, samples[-1].throttle_count - baseline.throttle_count)
+        self._base_frequency = base_frequency
+        self._sample_count = len(samples)
+
+    @property
+    def mean_frequency(self) -> float:
+        return self._mean_frequency
+
+    @property
+    def min_frequency(self) -> float:
+        return self._min_frequency
+
+    @property
+    def max_temperature(self) -> float:
+        return self._max_temperature
+
+    @property
+    def utilisation(self) -> float:
+        return self._utilisation
+
+    @property
+    def swapped(self) -> int:
+        return self._swapped
+
+    @property
+    def throttle_events(self) -> int:
+        return self._throttle_events
+
+    @property
+    def sample_count(self) -> int:
+        return self._sample_count
+
+    @property
+    def throttled(self) -> bool:
+        # Brief dips are common as ranks start and synchronise so it is the mean frequency that counts
+        if self._throttle_events > 0:
+            return True
+
+        if self._base_frequency and not math.isnan(self._mean_frequency):
+            return self._mean_frequency < HplTelemetrySampler.THROTTLE_FREQUENCY_FRACTION * self._base_frequency
+
+        return False
+
+    def apply_to(self, result: HplResult) -> None:
+        result.mean_frequency = self._mean_frequency
+        result.min_frequency = self._min_frequency
+        result.max_temperature = self._max_temperature
+        result.swapped = self._swapped
+        result.throttled = self.throttled
+
+    def __str__(self) -> str:
+        return f"mean frequency {self._mean_frequency:.0f} MHz, min frequency {self._min_frequency:.0f} MHz, " \
+               f"max temperature {self._max_temperature:.1f} C, utilisation {self._utilisation:.1f}%, " \
+               f"swapped {self._swapped} bytes, {self._throttle_events} throttling events"
+
+
+class HplTelemetrySampler:
+
+    DEFAULT_INTERVAL = 1.0
+    DEFAULT_SYSFS_ROOT = "/sys"
+    # A CPU running below this fraction of its base frequency under HPL's load is taken to be throttled
+    THROTTLE_FREQUENCY_FRACTION = 0.9
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL, cpus: list[int] = None,
+                 sysfs_root: str = DEFAULT_SYSFS_ROOT, base_frequency: float = None) -> None:
+        """
+            Samples every interval seconds once started. Frequency, utilisation and throttling are of the CPUs given,
+            all of them by default. base_frequency (MHz) is read from sysfs where not given
+        """
+        if interval <= 0:
+            raise ValueError("interval must be positive")
+
+        self._interval = interval
+        self._cpus = sorted(cpus) if cpus is not None else list(range(psutil.cpu_count(logical=True) or 1))
+        cpu_dir = Path(sysfs_root) / "devices" / "system" / "cpu"
+        # The files are found once so that each sample is only a handful of reads
+        self._frequency_files = [path for path in (cpu_dir / f"cpu{cpu}" / "cpufreq" / "scaling_cur_freq"
+                                                   for cpu in self._cpus) if path.is_file()]
+        self._throttle_files = [path for cpu in self._cpus
+                                for path in (cpu_dir / f"cpu{cpu}" / "thermal_throttle").glob("*_throttle_count")]
+        self._temperature_files = sorted((Path(sysfs_root) / "class" / "thermal").glob("thermal_zone*/temp"))
+        self._base_frequency = base_frequency
+        if self._base_frequency is None:
+            base_khz = HplTelemetrySampler._read_number(cpu_dir / f"cpu{self._cpus[0]}" / "cpufreq" /
+                                                        "base_frequency")
+            self._base_frequency = None if math.isnan(base_khz) else base_khz / 1000
+
+        self._samples: list[HplTelemetrySample] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._last_result_time: float | None = None
+        # The busy and total CPU time of each CPU at the last sample. Utilisation is measured from these rather than
+        # with psutil.cpu_percent, which keeps a single starting point that every sampler in the process would reset
+        self._cpu_times: dict[int, tuple[float, float]] = {}
+
+    @property
+    def base_frequency(self) -> float | None:
+        return self._base_frequency
+
+    @property
+    def samples(self) -> list[HplTelemetrySample]:
+        with self._lock:
+            return list(self._samples)
+
+    def start(self) -> None:
+        # Utilisation is measured since the previous sample so this only sets the starting point
+        self._cpu_times = self._read_cpu_times()
+        self.record()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="hplx-telemetry", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def record(self) -> HplTelemetrySample:
+        # Takes a sample now, in addition to those taken in the background
+        sample = self.sample()
+        with self._lock:
+            self._samples.append(sample)
+        return sample
+
+    def sample(self) -> HplTelemetrySample:
+        frequencies = [value / 1000 for value in (HplTelemetrySampler._read_number(path)
+                                                  for path in self._frequency_files) if not math.isnan(value)]
+        if not frequencies and not self._frequency_files:
+            # Without cpufreq in sysfs psutil may still know the frequency, though not per CPU
+            frequency = psutil.cpu_freq()
+            frequencies = [frequency.current] if frequency is not None and frequency.current else []
+
+        cpu_times = self._read_cpu_times()
+        with self._lock:
+            previous, self._cpu_times = self._cpu_times, cpu_times
+        used = []
+        for cpu, (busy, total) in cpu_times.items():
+            if cpu in previous and total > previous[cpu][1]:
+                fraction = (busy - previous[cpu][0]) / (total - previous[cpu][1])
+                used.append(100.0 * min(1.0, max(0.0, fraction)))
+        temperatures = [value / 1000 for value in (HplTelemetrySampler._read_number(path)
+                                                   for path in self._temperature_files) if not math.isnan(value)]
+        swap = psutil.swap_memory()
+        throttle_count = sum(int(value) for value in (HplTelemetrySampler._read_number(path)
+                                                      for path in self._throttle_files) if not math.isnan(value))
+        return HplTelemetrySample(time.time(), frequencies, float(np.mean(used)) if used else math.nan,
+                                  max(temperatures) if temperatures else math.nan, swap.sin + swap.sout,
+                                  throttle_count)
+
+    def aggregate(self, start: float, end: float) -> HplTelemetry | None:
+        """
+            The telemetry of the samples taken from start to end (as time.time()). A run shorter than the interval
+            may have no samples of its own, in which case the first sample after it starts is used. None if there
+            is no such sample
+        """
+        samples = self.samples
+        window = [sample for sample in samples if start <= sample.timestamp <= end]
+        if not window:
+            window = [sample for sample in samples if sample.timestamp >= start][:1]
+        if not window:
+            return None
+
+        before = [sample for sample in samples if sample.timestamp < start]
+        return HplTelemetry(window, before[-1] if before else window[0], self._base_frequency)
+
+    def aggregate_result(self, result: HplResult) -> HplTelemetry | None:
+        """
+            The telemetry of the run that produced the result, from the start and end times HPL reported for it.
+            Where HPL did not report them the run is taken to be everything since the previous result
+        """
+        now = self.record().timestamp
+        if result.start_time is not None and result.end_time is not None:
+            start = HplTelemetrySampler._to_timestamp(result.start_time)
+            # HPL reports the times to the second
+            end = HplTelemetrySampler._to_timestamp(result.end_time) + 1
+        else:
+            start = self._last_result_time if self._last_result_time is not None else self.samples[0].timestamp
+            end = now
+        self._last_result_time = now
+        return self.aggregate(start, end)
+
+    def __enter__(self) -> "HplTelemetrySampler":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.stop()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._interval):
+            self.record()
+
+    def _read_cpu_times(self) -> dict[int, tuple[float, float]]:
+        cpu_times = psutil.cpu_times(percpu=True)
+        busy_times = {}
+        for cpu in self._cpus:
+            if cpu < len(cpu_times):
+                times = cpu_times[cpu]
+                # As psutil counts them: guest time is already included in user time and waiting on I/O is idle
+                total = sum(times) - getattr(times, "guest", 0) - getattr(times, "guest_nice", 0)
+                busy_times[cpu] = (total - times.idle - getattr(times, "iowait", 0), total)
+        return busy_times
+
+    @staticmethod
+    def _to_timestamp(value: datetime) -> float:
+        # HPL reports local times without a time zone, which timestamp() takes to be local
+        return value.timestamp()
+
+    @staticmethod
+    def _read_number(path: Path) -> float:
+        try:
+            return float(path.read_text().strip())
+        except (OSError, ValueError):
+            return math.nan
@@ -0,0 +1,57 @@
+# Describes how HPL's CPUs are split between MPI ranks and the threads each rank runs. With a multithreaded BLAS
+# fewer ranks with several threads each can be faster than a rank per core, and each rank needs less memory for MPI
+# buffers and so on. The process grid is then over the ranks rather than the CPUs. The threads per rank are passed
+# to HPL through the $THREADS$ placeholder in HPL_EXEC and the usual OpenMP and BLAS environment variables.
+
+
+class HplThreadLayout:
+
+    # OpenMP and the common BLAS libraries each read their own variable
+    THREAD_ENV_VARS = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS", "BLIS_NUM_THREADS")
+
+    def __init__(self, ranks: int, threads: int = 1) -> None:
+        if ranks < 1:
+            raise ValueError("ranks must be at least 1")
+
+        if threads < 1:
+            raise ValueError("threads must be at least 1")
+
+        self._ranks = ranks
+        self._threads = threads
+
+    @property
+    def ranks(self) -> int:
+        return self._ranks
+
+    @property
+    def threads(self) -> int:
+        return self._threads
+
+    @property
+    def cpu_count(self) -> int:
+        return self._ranks * self._threads
+
+    @staticmethod
+    def layouts(cpu_count: int, threads_per_rank: list[int]) -> list["HplThreadLayout"]:
+        """
+            A layout of cpu_count CPUs for each of the threads per rank given, in the order given. Raises ValueError
+            if any number of threads does not divide the CPUs evenly
+        """
+        if not threads_per_rank:
+            raise ValueError("At least one number of threads per rank is required")
+
+        layouts = []
+        for threads in threads_per_rank:
+            if threads < 1 or 0 != cpu_count % threads:
+                raise ValueError(f"{threads} threads per rank does not divide {cpu_count} CPUs evenly")
+            layouts.append(HplThreadLayout(cpu_count // threads, threads))
+        return layouts
+
+    def environment(self) -> dict[str, str]:
+        """
+            The environment variables that set the threads each rank runs
+        """
+        return {name: str(self._threads) for name in HplThreadLayout.THREAD_ENV_VARS}
+
+    def __str__(self) -> str:
+        return f"{self._ranks} ranks x {self._threads} threads"
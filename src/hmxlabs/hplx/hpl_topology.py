@@ -0,0 +1,184 @@
+# Reads the machine's topology (sockets, NUMA nodes and L3 cache domains) from sysfs so that process grids can be
+# chosen to suit it. HPL's panel factorisation exchanges many small messages down each process column, so those
+# are best kept within a single domain where latency is lowest, while the panel broadcasts along each process row
+# are fewer and larger. Ranks are placed on the CPUs in topology order (socket, then NUMA node, then L3 domain) and
+# each candidate grid is scored by how many domains its columns and rows span under row- and column-major PMAP.
+# Only the few best scoring grids need then be run to find the best. The sysfs root is configurable for testing.
+from pathlib import Path
+
+
+class HplTopology:
+
+    DEFAULT_SYSFS_ROOT = "/sys"
+    DEFAULT_MAX_GRIDS = 4
+    # The cost of a process column or row spanning one more domain at each level. Crossing sockets is the most
+    # expensive, sharing an L3 cache the least
+    SOCKET_WEIGHT = 4.0
+    NUMA_WEIGHT = 2.0
+    L3_WEIGHT = 1.0
+    # Columns carry the latency bound pivot search so matter more than rows
+    COLUMN_WEIGHT = 2.0
+    ROW_WEIGHT = 1.0
+
+    def __init__(self, domains: dict[int, tuple[int, int, int, int]]) -> None:
+        """
+            domains maps each CPU to its (socket, NUMA node, L3 domain, core). Only the CPUs HPL may use are included
+        """
+        if not domains:
+            raise ValueError("The topology must have at least one CPU")
+
+        self._domains = domains
+        self._cpus = sorted(domains, key=lambda cpu: (domains[cpu], cpu))
+
+    @property
+    def cpus(self) -> list[int]:
+        # In topology order
+        return self._cpus
+
+    @property
+    def cpu_count(self) -> int:
+        return len(self._cpus)
+
+    @property
+    def num_sockets(self) -> int:
+        return len({domain[0] for domain in self._domains.values()})
+
+    @property
+    def num_numa_nodes(self) -> int:
+        return len({domain[1] for domain in self._domains.values()})
+
+    @property
+    def num_l3_domains(self) -> int:
+        return len({domain[2] for domain in self._domains.values()})
+
+    @staticmethod
+    def probe(sysfs_root: str = DEFAULT_SYSFS_ROOT, use_smt: bool = False) -> "HplTopology | None":
+        """
+            Reads the topology of the online CPUs from sysfs. Unless use_smt is set only the first hardware thread of
+            each core is included. Returns None if sysfs does not describe the CPUs, e.g. on macOS
+        """
+        cpu_dir = Path(sysfs_root) / "devices" / "system" / "cpu"
+        node_dir = Path(sysfs_root) / "devices" / "system" / "node"
+        if not cpu_dir.is_dir():
+            return None
+
+        cpus = HplTopology._read_cpu_list(cpu_dir / "online")
+        if not cpus:
+            cpus = sorted(int(path.name[3:]) for path in cpu_dir.glob("cpu[0-9]*"))
+
+        numa_nodes = {}
+        for path in node_dir.glob("node[0-9]*"):
+            for cpu in HplTopology._read_cpu_list(path / "cpulist"):
+                numa_nodes[cpu] = int(path.name[4:])
+
+        domains = {}
+        for cpu in cpus:
+            path = cpu_dir / f"cpu{cpu}"
+            if not path.is_dir():
+                continue
+
+            core = min(HplTopology._read_cpu_list(path / "topology" / "thread_siblings_list") or [cpu])
+            if not use_smt and core != cpu:
+                continue
+
+            socket = HplTopology._read_int(path / "topology" / "physical_package_id", 0)
+            numa_node = numa_nodes.get(cpu, socket)
+            # An L3 domain is identified by the lowest CPU sharing it. Without L3 details it is the NUMA node
+            l3_domain = -1 - numa_node
+            for cache in path.glob("cache/index[0-9]*"):
+                if 3 == HplTopology._read_int(cache / "level", 0):
+                    l3_domain = min(HplTopology._read_cpu_list(cache / "shared_cpu_list") or [cpu])
+            domains[cpu] = (socket, numa_node, l3_domain, core)
+
+        return HplTopology(domains) if domains else None
+
+    @staticmethod
+    def parse_cpu_list(cpu_list: str) -> list[int]:
+        """
+            The CPUs in a sysfs CPU list, e.g. 0-3,8-11
+        """
+        cpus = []
+        for part in cpu_list.strip().split(","):
+            if not part:
+                continue
+            start, _, end = part.partition("-")
+            cpus.extend(range(int(start), int(end if end else start) + 1))
+        return cpus
+
+    def placement(self, rank_count: int, cpus: list[int] = None, threads_per_rank: int = 1) -> list[int]:
+        """
+            The first CPU of each of rank_count ranks, filling each L3 domain, NUMA node and socket in turn. Each rank
+            takes threads_per_rank consecutive CPUs. If cpus is given only those CPUs are used, e.g. those of a
+            partition. CPUs missing from the topology come last
+        """
+        allowed = self._cpus
+        if cpus is not None:
+            allowed = [cpu for cpu in self._cpus if cpu in set(cpus)] + sorted(set(cpus) - set(self._domains))
+        if rank_count * threads_per_rank > len(allowed):
+            raise ValueError(f"Unable to place {rank_count} ranks of {threads_per_rank} threads on {len(allowed)} CPUs")
+        return allowed[:rank_count * threads_per_rank:threads_per_rank]
+
+    def grid_cost(self, p: int, q: int, row_major: bool = True, cpus: list[int] = None,
+                  threads_per_rank: int = 1) -> float:
+        """
+            How poorly a P x Q grid maps onto the topology: the average number of extra domains each process column
+            and row spans, weighted by level. 0 is a perfect fit
+        """
+        placement = self.placement(p * q, cpus, threads_per_rank)
+        columns = [[] for _ in range(q)]
+        rows = [[] for _ in range(p)]
+        for rank, cpu in enumerate(placement):
+            row, column = (rank // q, rank % q) if row_major else (rank % p, rank // p)
+            domain = self._domains.get(cpu, (0, 0, 0, cpu))
+            columns[column].append(domain)
+            rows[row].append(domain)
+
+        cost = 0.0
+        for level, weight in enumerate([HplTopology.SOCKET_WEIGHT, HplTopology.NUMA_WEIGHT, HplTopology.L3_WEIGHT]):
+            column_span = sum(len({domain[level] for domain in column}) - 1 for column in columns) / q
+            row_span = sum(len({domain[level] for domain in row}) - 1 for row in rows) / p
+            cost += weight * (HplTopology.COLUMN_WEIGHT * column_span + HplTopology.ROW_WEIGHT * row_span)
+        return cost
+
+    def rank_grids(self, grid_p: [int], grid_q: [int], max_grids: int = DEFAULT_MAX_GRIDS,
+                   cpus: list[int] = None, threads_per_rank: int = 1) -> (([int], [int]), bool):
+        """
+            The max_grids grids that best fit the topology, best first, and whether they suit row-major PMAP. The
+            PMAP is the one under which the best grid fits best. Grids that fit equally well are ordered as close to
+            square as possible with P no greater than Q
+        """
+        if len(grid_p) != len(grid_q):
+            raise ValueError("The number of elements in p and q must be the same")
+
+        if max_grids < 1:
+            raise ValueError("max_grids must be at least 1")
+
+        ranked = {}
+        for row_major in [True, False]:
+            costs = [round(self.grid_cost(p, q, row_major, cpus, threads_per_rank), 6)
+                     for p, q in zip(grid_p, grid_q)]
+            ranked[row_major] = sorted(zip(costs, [p + q for p, q in zip(grid_p, grid_q)], grid_p, grid_q))
+
+        # Row-major is HPL's default so it wins ties
+        row_major = ranked[True][0][0] <= ranked[False][0][0]
+        best = ranked[row_major][:max_grids]
+        return ([grid[2] for grid in best], [grid[3] for grid in best]), row_major
+
+    @staticmethod
+    def _read_cpu_list(path: Path) -> list[int]:
+        if not path.is_file():
+            return []
+        return HplTopology.parse_cpu_list(path.read_text())
+
+    @staticmethod
+    def _read_int(path: Path, default: int) -> int:
+        if not path.is_file():
+            return default
+        try:
+            return int(path.read_text().strip())
+        except ValueError:
+            return default
+
+    def __str__(self) -> str:
+        return f"{self.num_sockets} sockets, {self.num_numa_nodes} NUMA nodes, {self.num_l3_domains} L3 domains, " \
+               f"{self.cpu_count} CPUs"
@@ -0,0 +1,225 @@
+# An adaptive search for the best HPL configuration within a wall-clock budget.
+# Rather than running every combination of N, NB and process grid at full size this uses successive halving:
+# every (NB, P, Q) candidate is first run with a small problem size, only the best 1/eta of them go through to the
+# next round and each round uses a larger N. N grows so that every round costs roughly the same (HPL runtime goes
+# as N^3) and the few candidates left in the final round are run at the largest N the budget allows.
+# Each round is fitted to its share of what is left of the budget, predicted from the rates measured so far or, before
+# there are any, from a performance estimate. Without either the first round is run at the smallest N. A round is run
+# one process grid at a time and no more are started once the budget has been spent.
+import math
+import re
+import time
+from typing import Callable
+
+from hmxlabs.hplx.hpl_results import HplResult
+
+
+class HplTuner:
+
+    DEFAULT_ETA = 3
+    # Problem sizes are rounded down to a multiple of this
+    N_GRANULARITY = 100
+
+    def __init__(self, run_configs: Callable[[list[tuple[int, int, int, int]], str], list[HplResult]],
+                 block_sizes: [int], p: [int], q: [int], min_n: int, max_n: int, budget: float,
+                 eta: int = DEFAULT_ETA,
+                 predict_gflops: Callable[[int, int, int, int], float] | None = None) -> None:
+        """
+            run_configs is called with a list of (N, NB, P, Q) configurations and a run type and must run HPL for
+            them, returning the results. Candidates are every block size on every process grid (p[idx], q[idx]).
+            The budget is in seconds. predict_gflops, if given, estimates the GFLOPS of an (N, NB, P, Q)
+            configuration, e.g. from the theoretical peak, for candidates that have not been measured yet
+        """
+        if len(p) != len(q):
+            raise ValueError("The number of elements in p and q must be the same")
+
+        if not block_sizes or not p:
+            raise ValueError("There must be at least one block size and one process grid to tune")
+
+        if eta < 2:
+            raise ValueError("eta must be at least 2")
+
+        if min_n > max_n:
+            raise ValueError("min_n cannot be greater than max_n")
+
+        self._run_configs = run_configs
+        self._candidates = [(nb, p[idx], q[idx]) for idx in range(len(p)) for nb in block_sizes]
+        self._min_n = min_n
+        self._max_n = max_n
+        self._budget = budget
+        self._eta = eta
+        self._predict_gflops = predict_gflops
+        self._results: list[HplResult] = []
+        self._stop_when: Callable[[HplResult], bool] | None = None
+
+    @staticmethod
+    def parse_duration(duration: str) -> float:
+        """
+            Parses a duration such as 90, 90s, 30m, 2h or 1h30m into seconds. A bare number is taken as seconds
+        """
+        if not duration or not duration.strip():
+            raise ValueError("duration cannot be None or empty")
+
+        duration = duration.strip().lower()
+        if re.fullmatch(r"\d+(\.\d+)?", duration):
+            return float(duration)
+
+        units = {"d": 86400, "h": 3600, "m": 60, "s": 1}
+        parts = re.findall(r"(\d+(?:\.\d+)?)([dhms])", duration)
+        if not parts or "".join(value + unit for value, unit in parts) != duration:
+            raise ValueError(f"Unable to parse the duration {duration}. Use for example 90s, 30m, 2h or 1h30m")
+
+        return sum(float(value) * units[unit] for value, unit in parts)
+
+    @staticmethod
+    def predict_runtime(n: int, gflops: float) -> float:
+        # HPL performs roughly 2/3 N^3 + 2 N^2 floating point operations
+        if not gflops or math.isnan(gflops) or gflops <= 0:
+            return math.inf
+        return ((2.0 / 3.0) * n ** 3 + 2.0 * n ** 2) / (gflops * 1e9)
+
+    @property
+    def results(self) -> list[HplResult]:
+        return self._results
+
+    def stop_when(self, condition: Callable[[HplResult], bool]) -> None:
+        # Tuning stops after the current round if any result satisfies the condition
+        self._stop_when = condition
+
+    def round_sizes(self) -> list[int]:
+        """
+            The number of candidates run in each round. Each round keeps the best 1/eta of the previous one until
+            no more than eta are left, which are then all run in the final round
+        """
+        sizes = [len(self._candidates)]
+        while sizes[-1] > self._eta:
+            sizes.append(math.ceil(sizes[-1] / self._eta))
+        return sizes
+
+    def round_problem_sizes(self) -> list[int]:
+        """
+            The problem size of each round. The final round uses max_n and earlier rounds are scaled down so that each
+            round, with its larger number of candidates, costs about the same
+        """
+        sizes = self.round_sizes()
+        problem_sizes = []
+        for size in sizes:
+            n = self._max_n * (sizes[-1] / size) ** (1.0 / 3.0)
+            problem_sizes.append(max(self._min_n, self._round_n(n)))
+        return problem_sizes
+
+    def tune(self) -> HplResult | None:
+        """
+            Runs the rounds of successive halving until the final round is complete, the budget runs out or the stop
+            condition is met. Returns the best result from the largest problem size that was run
+        """
+        start = time.monotonic()
+        survivors = list(self._candidates)
+        sizes = self.round_sizes()
+        problem_sizes = self.round_problem_sizes()
+        # The best rate seen for each candidate is used to predict how long its next run will take
+        best_rates: dict[tuple[int, int, int], float] = {}
+        last_round_results: list[HplResult] = []
+        last_n = 0
+
+        for round_idx, n in enumerate(problem_sizes):
+            survivors = survivors[:sizes[round_idx]]
+            # The rounds are planned to cost about the same so each round left gets an equal share of the budget
+            remaining = self._budget - (time.monotonic() - start)
+            n, survivors = self._fit_to_budget(n, survivors, best_rates, remaining / (len(problem_sizes) - round_idx))
+            # Stop if the budget left cannot even match the size of the previous round as nothing would be learnt
+            if 0 == n or n < last_n:
+                break
+
+            # One process grid at a time so that the round stops once the budget is spent
+            round_results = []
+            for grid in dict.fromkeys((p, q) for _, p, q in survivors):
+                if time.monotonic() - start >= self._budget:
+                    break
+                configs = [(n, nb, p, q) for nb, p, q in survivors if (p, q) == grid]
+                round_results += self._run_configs(configs, f"tune_round_{round_idx}")
+            self._results.extend(round_results)
+            if not round_results:
+                break
+
+            last_round_results = round_results
+            last_n = n
+            for result in round_results:
+                if not result.failed:
+                    key = (result.nb, result.p, result.q)
+                    best_rates[key] = max(best_rates.get(key, 0), result.gflops)
+
+            # Rank this round's candidates by what they achieved in it. A failed run, or one that was not run, ranks
+            # last
+            achieved = {}
+            for result in round_results:
+                achieved[(result.nb, result.p, result.q)] = -math.inf if result.failed else result.gflops
+            survivors = sorted(survivors, key=lambda candidate: achieved.get(candidate, -math.inf), reverse=True)
+
+            if self._stop_when is not None and any(self._stop_when(result) for result in round_results):
+                break
+            if time.monotonic() - start >= self._budget:
+                break
+
+        return HplResult.highest_gflops(last_round_results)
+
+    def _fit_to_budget(self, n: int, survivors: list[tuple[int, int, int]],
+                       best_rates: dict[tuple[int, int, int], float],
+                       budget: float) -> tuple[int, list[tuple[int, int, int]]]:
+        """
+            Reduces n until the predicted time of running every survivor fits in the budget and, if it does not fit
+            even at min_n, runs only as many of the survivors as do, the fastest first. Returns 0 if none fit. With
+            nothing to predict from the round is run at min_n
+        """
+        if budget <= 0:
+            return 0, []
+
+        if self._rates(n, survivors, best_rates) is None:
+            return self._min_n, survivors
+
+        while n >= self._min_n:
+            rates = self._rates(n, survivors, best_rates)
+            predicted = sum(HplTuner.predict_runtime(n, rate) for rate in rates)
+            if predicted <= budget:
+                return n, survivors
+
+            # budget = 2/3 N^3 * sum(1 / rate) so solve for N. The rates predicted fall with N so this is repeated
+            seconds_per_flop = sum(1.0 / (rate * 1e9) for rate in rates)
+            n = min(n - HplTuner.N_GRANULARITY, self._round_n((1.5 * budget / seconds_per_flop) ** (1.0 / 3.0)))
+
+        n = self._min_n
+        rates = self._rates(n, survivors, best_rates)
+        ranked = sorted(zip(survivors, rates), key=lambda candidate: candidate[1], reverse=True)
+        fitted = []
+        predicted = 0.0
+        for candidate, rate in ranked:
+            predicted += HplTuner.predict_runtime(n, rate)
+            if predicted > budget:
+                break
+            fitted.append(candidate)
+        # In the order they were ranked in
+        fitted = [candidate for candidate in survivors if candidate in fitted]
+        return (n, fitted) if fitted else (0, [])
+
+    def _rates(self, n: int, survivors: list[tuple[int, int, int]],
+               best_rates: dict[tuple[int, int, int], float]) -> list[float] | None:
+        """
+            The GFLOPS each survivor is expected to run at: the best it has been measured at, else the estimate, else
+            that of the slowest survivor that has one. None if there is nothing to predict from
+        """
+        rates = []
+        for nb, p, q in survivors:
+            rate = best_rates.get((nb, p, q))
+            if rate is None and self._predict_gflops is not None:
+                rate = self._predict_gflops(n, nb, p, q)
+            rates.append(rate if rate is not None and not math.isnan(rate) and rate > 0 else None)
+
+        known = [rate for rate in rates if rate is not None]
+        if not known:
+            return None
+
+        slowest = min(known)
+        return [rate if rate is not None else slowest for rate in rates]
+
+    def _round_n(self, n: float) -> int:
+        return int(n / HplTuner.N_GRANULARITY) * HplTuner.N_GRANULARITY
@@ -1,16 +1,45 @@
 import argparse
+import contextlib
+import functools
 import logging
+import math
 import os
 import sys
+import time
 import psutil
-import subprocess
 from pathlib import Path
+from typing import Callable
+from hmxlabs.hplx.hpl_algorithm import HplAlgorithmParameters
+from hmxlabs.hplx.hpl_batch import HplBatch, HplBatchPlanner
+from hmxlabs.hplx.hpl_cache import HplResultsCache
+from hmxlabs.hplx.hpl_compare import HplComparer
+from hmxlabs.hplx.hpl_journal import HplJournal
 from hmxlabs.hplx.hpl_input import HplInputFileGenerator
+from hmxlabs.hplx.hpl_memory import HplMemoryModel
+from hmxlabs.hplx.hpl_model import HplPerformanceModel
+from hmxlabs.hplx.hpl_parallel import HplParallelRunner, HplPartition
+from hmxlabs.hplx.hpl_peak import HplPeakPerformance
+from hmxlabs.hplx.hpl_repetition import HplRepetition
 from hmxlabs.hplx.hpl_results import HplResult, HplResultsFile
+from hmxlabs.hplx.hpl_result_set import HplResultSet
+from hmxlabs.hplx.hpl_results_writer import HplResultsWriter
+from hmxlabs.hplx.hpl_runner import HplRunner, HplRunError, HplTimeoutError, HplExitError
+from hmxlabs.hplx.hpl_scheduler import HplScheduler
+from hmxlabs.hplx.hpl_shards import HplShardPlanner
+from hmxlabs.hplx.hpl_telemetry import HplTelemetrySampler
+from hmxlabs.hplx.hpl_threads import HplThreadLayout
+from hmxlabs.hplx.hpl_topology import HplTopology
+from hmxlabs.hplx.hpl_tuner import HplTuner
 
 LOG_FILE = "hplx.log"
 MAX_RESULTS_FILE = "hplx-highest-gflops"
 ALL_RESULTS_FILE = "hplx-all"
+HPL_INPUT_FILE = "./HPL.dat"
+SHARDS_DIR = "hplx-shards"
+# Results parsed from existing files are written out in batches of this size
+WRITE_BATCH_SIZE = 10000
+# The journal's record of the process grid the problem sizes are run with
+BEST_GRID_CHOICE = "best_grid"
 
 def main():
     curdir = os.getcwd()
@@ -18,6 +47,8 @@ def main():
     logging.basicConfig(filename=logfile, filemode='a', level=logging.DEBUG,
                         format="%(asctime)s-%(levelname)-s-%(name)s::%(message)s")
     logging.getLogger().addHandler(logging.StreamHandler(sys.stdout))
+    # HPL is run with asyncio, whose debug logging is of no interest
+    logging.getLogger("asyncio").setLevel(logging.WARNING)
     logging.info("STARTING HPLx")
     logging.info(f"Output directory: {curdir}")
 
@@ -25,6 +56,11 @@ def main():
 
     try:
         args.func(args)
+    except HplRunError as e:
+        logging.error(f"Running HPL failed: {e}. Command: {e.command}")
+        if e.output:
+            logging.error("Last output from HPL:\n" + "\n".join(e.output))
+        sys.exit(1)
     except Exception as e:
         logging.error("An unknown and unhandled error occurred. Exiting", exc_info=e)
         sys.exit(1)
@@ -37,6 +73,9 @@ def setup_argparse() -> argparse.Namespace:
     argparser.add_argument("--output-jsonlines", dest="output_jsonlines", required=False,
                                             action=argparse.BooleanOptionalAction, default=False,
                                             help="Output results in JSON lines format")
+    argparser.add_argument("--output-binary", dest="output_binary", required=False,
+                                            action=argparse.BooleanOptionalAction, default=False,
+                                            help="Output results in the compact HPLx binary format for fast reloading of large result sets")
     argparser.add_argument("--cpu-count", dest="cpu_count", required=False, type=int,
                               default=0,
                               help="The number of physical cores to use in the test. Default is the number of physical cores on the machine")
@@ -48,15 +87,108 @@ def setup_argparse() -> argparse.Namespace:
 
     argparser.add_argument("--max-prob-size", dest="max_prob_size", required=False, type=int,
                               default=0, help="A cap on the problem size to impose on any type of run")
+    argparser.add_argument("--exclude-failed", dest="exclude_failed", required=False,
+                           action=argparse.BooleanOptionalAction, default=True,
+                           help="Exclude runs that failed the HPL residual check when selecting and writing results. Default is True")
+
+    argparser.add_argument("--use-cache", dest="use_cache", required=False, action=argparse.BooleanOptionalAction,
+                           default=False,
+                           help="Reuse results already measured on identical hardware rather than running those configurations again. Default is False")
+    argparser.add_argument("--cache-file", dest="cache_file", required=False, type=str,
+                           default=HplResultsCache.DEFAULT_CACHE_FILE,
+                           help=f"The results cache database. Default is {HplResultsCache.DEFAULT_CACHE_FILE}")
+    argparser.add_argument("--cache-max-age", dest="cache_max_age", required=False, type=float,
+                           default=HplResultsCache.DEFAULT_MAX_AGE / 3600,
+                           help="The age in hours beyond which cached results are ignored and evicted. Default is 168")
+    argparser.add_argument("--cache-max-entries", dest="cache_max_entries", required=False, type=int,
+                           default=HplResultsCache.DEFAULT_MAX_ENTRIES,
+                           help=f"The number of results kept in the cache, oldest evicted first. Default is {HplResultsCache.DEFAULT_MAX_ENTRIES}")
+
+    argparser.add_argument("--schedule", dest="schedule", required=False, action=argparse.BooleanOptionalAction,
+                           default=False,
+                           help="Run each configuration separately, cheapest first, stopping any that run far beyond their predicted runtime. Default is False")
+    argparser.add_argument("--timeout-factor", dest="timeout_factor", required=False, type=float,
+                           default=HplScheduler.DEFAULT_TIMEOUT_FACTOR,
+                           help=f"When scheduling, stop a run after this many times its predicted runtime. Default is {HplScheduler.DEFAULT_TIMEOUT_FACTOR}")
+    argparser.add_argument("--min-timeout", dest="min_timeout", required=False, type=float,
+                           default=HplScheduler.DEFAULT_MIN_TIMEOUT,
+                           help=f"When scheduling, never stop a run before this many seconds. Default is {HplScheduler.DEFAULT_MIN_TIMEOUT}")
+    argparser.add_argument("--batch-time", dest="batch_time", required=False, type=float, default=0,
+                           help="When scheduling, run configurations together in HPL invocations predicted to take up to this many seconds, launch included, rather than one at a time. Default is 0, one configuration per invocation")
+    argparser.add_argument("--launch-overhead", dest="launch_overhead", required=False, type=float, default=-1,
+                           help="The seconds each HPL invocation takes beyond its runs, e.g. for mpirun to start every rank, used to plan batches. Default is to measure it")
+
+    argparser.add_argument("--max-repeats", dest="max_repeats", required=False, type=int,
+                           default=HplRepetition.DEFAULT_MAX_REPEATS,
+                           help=f"Run configurations still in contention for the best up to this many times, until their confidence interval is tight enough or another configuration is clearly better. Default is {HplRepetition.DEFAULT_MAX_REPEATS}, no repetition")
+    argparser.add_argument("--confidence", dest="confidence", required=False, type=float,
+                           default=HplRepetition.DEFAULT_CONFIDENCE,
+                           help=f"The confidence level of the intervals on each configuration's mean GFLOPS. The best configuration is the one with the highest lower bound. Default is {HplRepetition.DEFAULT_CONFIDENCE}")
+    argparser.add_argument("--ci-width", dest="ci_width", required=False, type=float,
+                           default=HplRepetition.DEFAULT_RELATIVE_WIDTH,
+                           help=f"Stop repeating a configuration once the half width of its confidence interval is within this fraction of its mean. Default is {HplRepetition.DEFAULT_RELATIVE_WIDTH}")
+
+    argparser.add_argument("--hpl-stdout", dest="hpl_stdout", required=False, action=argparse.BooleanOptionalAction,
+                           default=False,
+                           help="Have HPL write its results to stdout, which is captured to the output file, rather than to the file itself. Default is False")
+    argparser.add_argument("--inactivity-timeout", dest="inactivity_timeout", required=False, type=float, default=0,
+                           help="Stop HPL, assuming it has hung, if it produces no output for this many seconds. Default is 0, never")
+    argparser.add_argument("--partitions", dest="partitions", required=False, type=int, default=1,
+                           help="Split the CPUs into this many partitions and run the small process grid probes concurrently, one on each. Default is 1")
+    argparser.add_argument("--memory-fraction", dest="memory_fraction", required=False, type=float,
+                           default=HplMemoryModel.DEFAULT_MEMORY_FRACTION,
+                           help=f"The fraction of the available memory HPL may use. Default is {HplMemoryModel.DEFAULT_MEMORY_FRACTION}")
+    argparser.add_argument("--os-reserve", dest="os_reserve", required=False, type=int,
+                           default=HplMemoryModel.DEFAULT_OS_RESERVE,
+                           help=f"The memory in bytes always left for the OS. Default is {HplMemoryModel.DEFAULT_OS_RESERVE} (1 GiB)")
+    argparser.add_argument("--rank-overhead", dest="rank_overhead", required=False, type=int,
+                           default=HplMemoryModel.DEFAULT_RANK_OVERHEAD,
+                           help=f"The memory in bytes each MPI rank needs besides its part of the matrix, e.g. for MPI buffers and libraries. Default is {HplMemoryModel.DEFAULT_RANK_OVERHEAD} (128 MiB)")
+    argparser.add_argument("--huge-pages", dest="huge_pages", required=False, action=argparse.BooleanOptionalAction,
+                           default=False,
+                           help="HPL allocates its matrix in huge pages, so it must fit in the free huge pages. Default is False")
+    argparser.add_argument("--topology", dest="topology", required=False, action=argparse.BooleanOptionalAction,
+                           default=True,
+                           help="Read the CPU topology (sockets, NUMA nodes and L3 caches) from sysfs to choose the process grids to probe, their PMAP and the placement of ranks. Default is True")
+    argparser.add_argument("--sysfs-root", dest="sysfs_root", required=False, type=str,
+                           default=HplTopology.DEFAULT_SYSFS_ROOT,
+                           help=f"The root of the sysfs file system to read the CPU topology and base frequency from. Default is {HplTopology.DEFAULT_SYSFS_ROOT}")
+    argparser.add_argument("--telemetry", dest="telemetry", required=False, action=argparse.BooleanOptionalAction,
+                           default=True,
+                           help="Sample the CPU frequency, utilisation and temperature, swapping and thermal throttling while HPL runs and record them with each result, flagging throttled runs. Default is True")
+    argparser.add_argument("--telemetry-interval", dest="telemetry_interval", required=False, type=float,
+                           default=HplTelemetrySampler.DEFAULT_INTERVAL,
+                           help=f"The seconds between telemetry samples. Default is {HplTelemetrySampler.DEFAULT_INTERVAL}")
+    argparser.add_argument("--max-grids", dest="max_grids", required=False, type=int,
+                           default=HplTopology.DEFAULT_MAX_GRIDS,
+                           help=f"The number of process grids that best fit the CPU topology to probe. Default is {HplTopology.DEFAULT_MAX_GRIDS}")
+    argparser.add_argument("--rpeak", dest="rpeak", required=False, type=float, default=None,
+                           help="The theoretical peak performance, in GFLOPS, of the CPUs used. Results are reported as a percentage of it. Default is to estimate it from the CPU")
+    argparser.add_argument("--cpu-frequency", dest="cpu_frequency", required=False, type=float, default=None,
+                           help="The CPU frequency, in GHz, to estimate the theoretical peak performance with. Default is the CPU's base frequency")
+    argparser.add_argument("--flops-per-cycle", dest="flops_per_cycle", required=False, type=float, default=None,
+                           help="The double precision FLOPs per cycle per core to estimate the theoretical peak performance with. Default is determined from the CPU's vector instructions")
+    argparser.add_argument("--fma-units", dest="fma_units", required=False, type=int, default=None,
+                           help=f"The number of FMA units per core to estimate the theoretical peak performance with. Default is {HplPeakPerformance.DEFAULT_FMA_UNITS}")
 
     # Parse HPL output file
     subparsers = argparser.add_subparsers()
     parser_output = subparsers.add_parser("parse-results", help="Parse HPLinpack output files")
     parser_output.set_defaults(func=parse_output)
-    parser_output.add_argument("--input-file", dest="input_file", required=True, type=str,
+    parser_output_inputs = parser_output.add_mutually_exclusive_group(required=True)
+    parser_output_inputs.add_argument("--input-file", dest="input_file", type=str,
                                   help="The HPL results file to process")
+    parser_output_inputs.add_argument("--input-dir", dest="input_dir", type=str,
+                                  help="A directory of HPL results files to process. Results from every file are merged into a single output")
+    parser_output.add_argument("--glob", dest="glob", required=False, type=str, default="*.out",
+                                  help="The pattern used to select files in the input directory. Use **/ to recurse. Default is *.out")
+    parser_output.add_argument("--workers", dest="workers", required=False, type=int, default=0,
+                                  help="The number of processes used to parse files in the input directory. Default is the number of CPUs")
     parser_output.add_argument("--output-file", dest="output_file", required=False, type=str, default=None,
                                   help="The output file to write the processed results to. If not specified no output file is written")
+    parser_output.add_argument("--follow", dest="follow", required=False, action=argparse.BooleanOptionalAction,
+                               default=False,
+                               help="Follow the input file as HPL writes to it, reporting each result as it arrives. Default is False")
 
     # Generate input file (theoretical best)
     parser_gen_input_tbest = subparsers.add_parser("gen-input-theoretical-best", help="Generate theoretical best HPLinpack input files")
@@ -71,8 +203,10 @@ def setup_argparse() -> argparse.Namespace:
                                             default=0,
                                             help="The maximum problem size (N) to evaluate for use. Default determined N based on available memory")
     parser_gen_input_tbest.add_argument("--prob-sizes-step", dest="prob_sizes_step", type=int, required=False,
-                                            default=5000,
-                                            help="The maximum problem size (N) step size for theoretical evaluation. Default is 5000")
+                                            default=None,
+                                            help="Deprecated and ignored. N is the largest the memory model allows, a multiple of NB x lcm(P, Q)")
+    add_calibration_arguments(parser_gen_input_tbest)
+    add_thread_arguments(parser_gen_input_tbest)
     parser_gen_input_tbest.set_defaults(func=generate_input_tbest)
 
     # Generate input file (calc optimal)
@@ -85,6 +219,7 @@ def setup_argparse() -> argparse.Namespace:
                                      help="The number of problem sizes (N) to use in the test. Default is 10")
     parser_gen_input_calc_optimal.add_argument("--num-block-sizes", dest="n_block_sizes", type=int, required=False, default=10,
                                      help="The number of block sizes (NB) to use in the test. Default is 10")
+    add_thread_arguments(parser_gen_input_calc_optimal)
     parser_gen_input_calc_optimal.set_defaults(func=generate_input_calc_optimal)
 
     # Calculate optimal
@@ -93,6 +228,9 @@ def setup_argparse() -> argparse.Namespace:
                                     help="The number of problem sizes (N) to use in the test. Default is 10")
     parser_find_optimal.add_argument("--num-block-sizes", dest="n_block_sizes", type=int, required=False, default=10,
                                      help="The number of block sizes (NB) to use in the test. Default is 10")
+    add_algorithm_sweep_arguments(parser_find_optimal)
+    add_thread_arguments(parser_find_optimal)
+    add_journal_arguments(parser_find_optimal)
     parser_find_optimal.set_defaults(func=calc_optimal)
 
     # Theoretical optimal
@@ -102,10 +240,61 @@ def setup_argparse() -> argparse.Namespace:
                                      help="The minimum problem size (N) to evaluate for use. Default is 1000")
     parser_theoretical_optimal.add_argument("--max-prob-sizes", dest="max_prob_sizes", type=int, required=False, default=0,
                                      help="The maximum problem size (N) to evaluate for use. Default determined N based on available memory")
-    parser_theoretical_optimal.add_argument("--prob-sizes-step", dest="prob_sizes_step", type=int, required=False, default=1000,
-                                     help="The problem size (N) step size for theoretical evaluation. Default is 1000")
+    parser_theoretical_optimal.add_argument("--prob-sizes-step", dest="prob_sizes_step", type=int, required=False, default=None,
+                                     help="Deprecated and ignored. N is the largest the memory model allows, a multiple of NB x lcm(P, Q)")
+    add_calibration_arguments(parser_theoretical_optimal)
+    add_thread_arguments(parser_theoretical_optimal)
     parser_theoretical_optimal.set_defaults(func=run_theoretical_optimal)
 
+    # Tune within a time budget
+    parser_tune = subparsers.add_parser("tune", help="Search for the optimal HPLinpack parameters within a time budget")
+    parser_tune.add_argument("--budget", dest="budget", type=str, required=True,
+                             help="The wall-clock time to tune for, e.g. 90m, 2h or 1h30m. A bare number is seconds")
+    parser_tune.add_argument("--num-block-sizes", dest="n_block_sizes", type=int, required=False, default=10,
+                             help="The number of block sizes (NB) to consider. Default is 10")
+    parser_tune.add_argument("--min-prob-size", dest="min_prob_size", type=int, required=False,
+                             default=HplInputFileGenerator.PROC_GRID_N,
+                             help=f"The smallest problem size (N) any round will use. Default is {HplInputFileGenerator.PROC_GRID_N}")
+    parser_tune.add_argument("--eta", dest="eta", type=int, required=False, default=HplTuner.DEFAULT_ETA,
+                             help=f"Only the best 1/eta of the candidates go through to each next round. Default is {HplTuner.DEFAULT_ETA}")
+    parser_tune.add_argument("--target-efficiency", dest="target_efficiency", type=float, required=False, default=0,
+                             help="Stop tuning after the round in which a result reaches this percentage of the theoretical peak performance. Default is 0, never")
+    add_thread_arguments(parser_tune)
+    parser_tune.set_defaults(func=tune)
+
+    # Shard a sweep across nodes
+    parser_plan_shards = subparsers.add_parser("plan-shards", help="Split an experimental sweep into HPLinpack input files to run independently, e.g. as a job array")
+    parser_plan_shards.add_argument("--num-shards", dest="num_shards", type=int, required=True,
+                                    help="The number of shards to split the sweep into")
+    parser_plan_shards.add_argument("--output-dir", dest="output_dir", type=str, required=False, default=SHARDS_DIR,
+                                    help=f"The directory to write the shards to. Default is {SHARDS_DIR}")
+    parser_plan_shards.add_argument("--num-prob-sizes", dest="n_prob_sizes", type=int, required=False, default=10,
+                                    help="The number of problem sizes (N) to use in the sweep. Default is 10")
+    parser_plan_shards.add_argument("--num-block-sizes", dest="n_block_sizes", type=int, required=False, default=10,
+                                    help="The number of block sizes (NB) to use in the sweep. Default is 10")
+    add_thread_arguments(parser_plan_shards)
+    parser_plan_shards.set_defaults(func=plan_shards)
+
+    parser_merge_shards = subparsers.add_parser("merge-shards", help="Merge the results of the shards written by plan-shards")
+    parser_merge_shards.add_argument("--input-dir", dest="input_dir", type=str, required=False, default=SHARDS_DIR,
+                                     help=f"The directory the shards were written to. Default is {SHARDS_DIR}")
+    parser_merge_shards.add_argument("--workers", dest="workers", required=False, type=int, default=0,
+                                     help="The number of processes used to parse the shard output files. Default is the number of CPUs")
+    parser_merge_shards.set_defaults(func=merge_shards)
+
+    parser_compare = subparsers.add_parser("compare", help="Compare results against a baseline, exiting with 1 if performance regressed")
+    parser_compare.add_argument("--baseline", dest="baseline", type=str, nargs="+", required=True,
+                                help="The baseline results: HPL output, or results written by HPLx as CSV, JSON lines or binary")
+    parser_compare.add_argument("--candidate", dest="candidate", type=str, nargs="+", required=True,
+                                help="The results to compare against the baseline, in any of the same formats")
+    parser_compare.add_argument("--threshold", dest="threshold", type=float, required=False,
+                                default=HplComparer.DEFAULT_THRESHOLD,
+                                help=f"A significant drop in GFLOPS of more than this fraction of the baseline is a regression. Default is {HplComparer.DEFAULT_THRESHOLD}")
+    parser_compare.add_argument("--prior-noise", dest="prior_noise", type=float, required=False,
+                                default=HplRepetition.DEFAULT_PRIOR_NOISE,
+                                help=f"The relative standard deviation of a single run's GFLOPS assumed before any repeated runs are seen. Default is {HplRepetition.DEFAULT_PRIOR_NOISE}")
+    parser_compare.set_defaults(func=compare_results)
+
     # Run ALL.
 
     parser_run_all = subparsers.add_parser("run-all", help="Run all theoretical best and experimental optimal tests")
@@ -120,8 +309,12 @@ def setup_argparse() -> argparse.Namespace:
                                             default=0,
                                             help="The maximum problem size (N) to determine the theoretical max. Default determined N based on available memory")
     parser_run_all.add_argument("--prob-sizes-step", dest="prob_sizes_step", type=int, required=False,
-                                            default=1000,
-                                            help="The problem size (N) step size for to determine the theoretical max. Default is 1000")
+                                            default=None,
+                                            help="Deprecated and ignored. N is the largest the memory model allows, a multiple of NB x lcm(P, Q)")
+    add_algorithm_sweep_arguments(parser_run_all)
+    add_calibration_arguments(parser_run_all)
+    add_thread_arguments(parser_run_all)
+    add_journal_arguments(parser_run_all)
     parser_run_all.set_defaults(func=run_all_calcs)
 
     try:
@@ -134,9 +327,131 @@ def setup_argparse() -> argparse.Namespace:
         argparser.print_help()
         sys.exit(1)
 
+    HplInputFileGenerator.memory_model = create_memory_model(args)
     return args
 
 
+def create_memory_model(args) -> HplMemoryModel:
+    huge_page_memory, huge_page_size = 0, 0
+    if args.huge_pages:
+        huge_page_memory, huge_page_size = HplMemoryModel.huge_pages()
+        logging.info(f"Free huge page memory: {huge_page_memory} bytes in pages of {huge_page_size} bytes")
+        if 0 == huge_page_memory:
+            logging.warning("No free huge pages were found. Problem sizes are chosen for ordinary memory")
+
+    # The algorithm sweep can run deeper lookahead, which needs more panel workspace
+    depth = HplMemoryModel.DEFAULT_DEPTH
+    if getattr(args, "sweep_algorithm", False):
+        depth = max(depth, max(args.depths))
+
+    return HplMemoryModel(args.memory_fraction, args.os_reserve, args.rank_overhead, huge_page_memory,
+                          huge_page_size, depth)
+
+
+def add_calibration_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--calibration-files", dest="calibration_files", type=str, nargs="+", required=False,
+                        default=[],
+                        help="Results from earlier runs on this machine (HPL output, or results written by HPLx as "
+                             "CSV, JSON lines or binary) to calibrate the performance model that chooses the "
+                             "theoretical best parameters with. Default is to estimate the model from the theoretical "
+                             "peak performance")
+
+
+def create_performance_model(args, threads: int = 1) -> HplPerformanceModel | None:
+    # Without the peak performance or results to calibrate with there is no model and the rules of thumb are used.
+    # Each process is a rank of threads CPUs
+    model = None
+    peak = get_peak_performance(args)
+    if peak is not None:
+        model = HplPerformanceModel.from_peak(peak.rpeak / peak.cpu_count * threads)
+
+    if args.calibration_files:
+        results = []
+        for calibration_file in args.calibration_files:
+            results.extend(_read_stored_results(Path(calibration_file)))
+        try:
+            model = HplPerformanceModel.calibrate(results, model)
+            logging.info(f"Calibrated the performance model from {len(results)} results: {model}")
+        except ValueError as e:
+            logging.warning(f"Unable to calibrate the performance model: {e}")
+
+    if model is None:
+        logging.warning("No performance model is available. Choosing the theoretical best parameters by rules of thumb")
+    return model
+
+
+def warn_prob_sizes_step(args) -> None:
+    if args.prob_sizes_step is not None:
+        logging.warning("--prob-sizes-step is deprecated and ignored. N is the largest the memory model allows")
+
+
+def _read_stored_results(input_file_path: Path) -> list[HplResult]:
+    # Results written by HPLx as CSV, JSON lines or binary, or else HPL output
+    if not input_file_path.is_file():
+        logging.error(f"Results file {input_file_path} does not exist")
+        sys.exit(1)
+
+    input_file = str(input_file_path)
+    suffix = input_file_path.suffix.lower()
+    if ".csv" == suffix:
+        return HplResultsFile.read_results_csv(input_file)
+    if suffix in [".json", ".jsonl"]:
+        return HplResultsFile.read_results_json(input_file)
+    if ".bin" == suffix:
+        return HplResultSet.read_binary_file(input_file).to_results()
+    return _read_results_from_file(input_file_path)
+
+
+def add_thread_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--threads-per-rank", dest="threads_per_rank", required=False, type=int, nargs="+",
+                        default=None,
+                        help="The threads each MPI rank runs, so that there are CPUs / threads ranks. Give several to find the best when running calc-optimal or run-all, other commands use the first. Sets $RANKS$ and $THREADS$ in HPL_EXEC and the OpenMP and BLAS thread environment variables. Default is a single threaded rank per CPU")
+
+
+def add_journal_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--journal-file", dest="journal_file", required=False, type=str,
+                        default=HplJournal.DEFAULT_JOURNAL_FILE,
+                        help=f"The journal of the configurations planned and completed, the results and the best process grid chosen, written as the sweep progresses. Default is {HplJournal.DEFAULT_JOURNAL_FILE}")
+    parser.add_argument("--resume", dest="resume", required=False, action=argparse.BooleanOptionalAction,
+                        default=False,
+                        help="Resume an interrupted sweep from its journal, recovering any results in the partial HPL output, rather than starting again (default: False)")
+
+
+def add_algorithm_sweep_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--sweep-algorithm", dest="sweep_algorithm", required=False,
+                        action=argparse.BooleanOptionalAction, default=False,
+                        help="Once the best problem size, block size and process grid are found, run them with every "
+                             "combination of the algorithmic parameters below. Default is false")
+    parser.add_argument("--pfacts", dest="pfacts", type=int, nargs="+", required=False,
+                        default=list(HplAlgorithmParameters.SWEEP_PFACTS),
+                        help="The panel factorisations (PFACT) to sweep. 0=left, 1=Crout, 2=right. Default is 1 2")
+    parser.add_argument("--nbmins", dest="nbmins", type=int, nargs="+", required=False,
+                        default=list(HplAlgorithmParameters.SWEEP_NBMINS),
+                        help="The recursive stopping criteria (NBMIN) to sweep. Default is 4")
+    parser.add_argument("--ndivs", dest="ndivs", type=int, nargs="+", required=False,
+                        default=list(HplAlgorithmParameters.SWEEP_NDIVS),
+                        help="The numbers of panels in recursion (NDIV) to sweep. Default is 2")
+    parser.add_argument("--rfacts", dest="rfacts", type=int, nargs="+", required=False,
+                        default=list(HplAlgorithmParameters.SWEEP_RFACTS),
+                        help="The recursive panel factorisations (RFACT) to sweep. 0=left, 1=Crout, 2=right. "
+                             "Default is 1 2")
+    parser.add_argument("--bcasts", dest="bcasts", type=int, nargs="+", required=False,
+                        default=list(HplAlgorithmParameters.SWEEP_BCASTS),
+                        help="The broadcasts (BCAST) to sweep. 0=1rg, 1=1rM, 2=2rg, 3=2rM, 4=Lng, 5=LnM. "
+                             "Default is all of them")
+    parser.add_argument("--depths", dest="depths", type=int, nargs="+", required=False,
+                        default=list(HplAlgorithmParameters.SWEEP_DEPTHS),
+                        help="The lookahead depths (DEPTH) to sweep. Default is 0 1 2")
+    parser.add_argument("--pmaps", dest="pmaps", type=str, nargs="+", required=False, choices=["row", "column"],
+                        default=["row", "column"],
+                        help="The process mappings (PMAP) to sweep, each run separately. Default is row column")
+    parser.add_argument("--swap", dest="swap", type=int, required=False, default=HplAlgorithmParameters.SWAP_MIX,
+                        help="The swapping algorithm (SWAP) for the sweep. HPL takes a single value. "
+                             "0=binary exchange, 1=long, 2=mix. Default is 2")
+    parser.add_argument("--swapping-threshold", dest="swapping_threshold", type=int, required=False, default=64,
+                        help="The swapping threshold for the sweep. HPL takes a single value. Default is 64")
+
+
 def parse_output(args) -> None:
 
     input_file = args.input_file
@@ -146,8 +461,57 @@ def parse_output(args) -> None:
         write_output = True
         output_file = args.output_file
 
-    logging.info(f"Parsing HPL results. Input file: {input_file}")
-    input_file_path = Path(input_file)
+    if args.input_dir is not None:
+        input_file = args.input_dir
+        logging.info(f"Parsing HPL results. Input directory: {input_file}. Pattern: {args.glob}")
+        results = _read_results_from_dir(Path(input_file), args.glob, args.workers)
+    elif args.follow:
+        logging.info(f"Following HPL results. Input file: {input_file}")
+        results = []
+        results_writer = open_results_writer(output_file, args) if write_output else None
+        for result in HplResultsFile.iter_results(input_file, follow=True):
+            logging.info(f"HPL result: {result}")
+            results.append(result)
+            if results_writer is not None:
+                results_writer.write(result)
+        if results_writer is not None:
+            results_writer.close()
+            # Everything has already been written as it arrived
+            write_output = False
+    else:
+        logging.info(f"Parsing HPL results. Input file: {input_file}")
+        results = _read_results_from_file(Path(input_file))
+
+    if len(results) == 0:
+        logging.error(f"No results found in the input file {input_file}")
+        sys.exit(1)
+
+    results = HplResultSet.from_results(results)
+    best_result = select_best(args, results)
+    logging.info(f"Parsed {len(results)} results. Highest GFLOPS: {best_result.gflops}")
+
+    if write_output:
+        logging.info(f"Writing output to file: {output_file}")
+        write_results(output_file, results, args.output_jsonlines, args.exclude_failed, args.output_binary)
+
+
+def _read_results_from_dir(input_dir_path: Path, pattern: str, workers: int) -> list[HplResult]:
+    if not input_dir_path.is_dir():
+        logging.error(f"Input directory {input_dir_path} is not a directory")
+        sys.exit(1)
+
+    input_files = sorted(str(path) for path in input_dir_path.glob(pattern) if path.is_file())
+    if len(input_files) == 0:
+        logging.error(f"No files matching {pattern} found in the input directory {input_dir_path}")
+        sys.exit(1)
+
+    max_workers = workers if workers > 0 else None
+    logging.info(f"Parsing {len(input_files)} HPL results files")
+    return HplResultsFile.read_result_files(input_files, max_workers)
+
+
+def _read_results_from_file(input_file_path: Path) -> list[HplResult]:
+    input_file = str(input_file_path)
     if not input_file_path.exists():
         logging.error(f"Input file {input_file} does not exist")
         sys.exit(1)
@@ -160,17 +524,7 @@ def parse_output(args) -> None:
         logging.error(f"Input file {input_file} is empty")
         sys.exit(1)
 
-    results = HplResultsFile.read_result_file(input_file)
-    if len(results) == 0:
-        logging.error(f"No results found in the input file {input_file}")
-        sys.exit(1)
-
-    best_result = HplResult.highest_gflops(results)
-    logging.info(f"Parsed {len(results)} results. Highest GFLOPS: {best_result.gflops}")
-
-    if write_output:
-        logging.info(f"Writing output to file: {output_file}")
-        write_results(output_file, results, args.output_jsonlines)
+    return HplResultsFile.read_result_file(input_file)
 
 
 def generate_input_tbest(args):
@@ -190,11 +544,15 @@ def generate_input_tbest(args):
         results_file = args.results_file
 
     logging.info("Generating input for theoretical best parameters")
-    hpl_dat_inputs = HplInputFileGenerator.generate_theoretical_best_inputs(cpu_count, available_memory,
+    warn_prob_sizes_step(args)
+    layout = get_thread_layouts(args, cpu_count)[0]
+    performance_model = create_performance_model(args, layout.threads)
+    hpl_dat_inputs = HplInputFileGenerator.generate_theoretical_best_inputs(layout.ranks, available_memory,
                                                                             args.min_prob_sizes,
                                                                             args.max_prob_sizes,
-                                                                            args.prob_sizes_step,
-                                                                            args.max_prob_size)
+                                                                            prob_size_cap=args.max_prob_size,
+                                                                            performance_model=performance_model)
+    log_predicted_gflops(performance_model, hpl_dat_inputs)
 
     hpl_dat = HplInputFileGenerator.generate_input_file([hpl_dat_inputs[0]], [hpl_dat_inputs[1]],
                                                         [hpl_dat_inputs[2]],
@@ -221,7 +579,7 @@ def generate_input_calc_optimal(args) -> None:
         results_file = args.results_file
 
     logging.info("Generating input for calculation of optimal parameters")
-    proc_grid = HplInputFileGenerator.generate_possible_process_grids(cpu_count)
+    proc_grid = HplInputFileGenerator.generate_possible_process_grids(get_thread_layouts(args, cpu_count)[0].ranks)
     hpl_dat = HplInputFileGenerator.generate_input_file_calc_best_problem_size(available_memory, proc_grid[0],
                                                                                proc_grid[1], write_results_file,
                                                                                results_file, args.n_prob_sizes,
@@ -229,38 +587,178 @@ def generate_input_calc_optimal(args) -> None:
     write_hpl_input_file(hpl_dat, output_file)
 
 
-def get_hpl_exec_command(cpu_count: int) -> str:
+def get_hpl_exec_command(cpu_count: int, partition: HplPartition = None, topology: HplTopology = None,
+                         threads: int = 1) -> str:
     hpl_cmd = os.environ.get("HPL_EXEC", None)
     if not hpl_cmd:
         print("HPL_EXEC environment variable not set", file=sys.stderr)
         sys.exit(1)
 
-    return hpl_cmd.replace("$CPUS$", str(cpu_count))
+    # $CPUS$ is the number of CPUs, $RANKS$ the number of MPI ranks and $THREADS$ the threads each rank runs
+    ranks = cpu_count // threads
+    hpl_cmd = hpl_cmd.replace("$RANKS$", str(ranks)).replace("$THREADS$", str(threads))
+
+    # $CPU_LIST$ is the CPUs to pin HPL to, e.g. with taskset -c or numactl --physcpubind
+    if partition is None:
+        cpus = HplParallelRunner.available_cpus()
+        if topology is not None:
+            cpus = topology.placement(min(cpu_count, len(cpus)), cpus)
+        partition = HplPartition(0, cpus[:cpu_count], ".")
+
+    # $RANK_CPUS$ is the (first) CPU for each rank in turn, e.g. for mpirun --cpu-list with --bind-to cpu-list:ordered
+    rank_cpus = partition.cpus[::threads][:ranks]
+    if topology is not None:
+        rank_cpus = topology.placement(min(ranks, partition.cpu_count // threads), partition.cpus, threads)
+    return hpl_cmd.replace("$CPUS$", str(cpu_count)).replace("$CPU_LIST$", partition.cpu_list) \
+        .replace("$RANK_CPUS$", ",".join(str(cpu) for cpu in rank_cpus))
 
 
 def run_theoretical_optimal(args):
-    results = _run_theoretical_optimal(args)
-    write_results(MAX_RESULTS_FILE, results, args.output_jsonlines)
+    with open_results_writer(MAX_RESULTS_FILE, args) as results_writer, open_results_cache(args) as cache:
+        _run_theoretical_optimal(args, results_writer.write, cache)
 
 def calc_optimal(args):
-    results = _run_calc_optimal(args)
-    highest_gflop_result = HplResult.highest_gflops(results)
+    # Every result is written as soon as HPL produces it so that nothing is lost if the run is interrupted
+    with open_results_writer(ALL_RESULTS_FILE, args) as all_results_writer, open_results_cache(args) as cache, \
+            open_journal(args) as journal:
+        results = HplResultSet.from_results(_run_calc_optimal(args, all_results_writer.write, cache, journal))
+    highest_gflop_result = select_best(args, results)
     logging.info(f"Best input config size: {highest_gflop_result}")
     logging.info(f"Highest GFLOPS: {highest_gflop_result.gflops}")
     logging.info("Writing highest GFLOPS to file")
-    write_results(MAX_RESULTS_FILE, [highest_gflop_result], args.output_jsonlines)
-    write_results(ALL_RESULTS_FILE, results, args.output_jsonlines)
+    write_results(MAX_RESULTS_FILE, [highest_gflop_result], args.output_jsonlines, binary=args.output_binary)
 
 def run_all_calcs(args) -> None:
-    theoretical_results = _run_theoretical_optimal(args)
-    calc_results = _run_calc_optimal(args)
-    all_results = theoretical_results + calc_results
-    highest_gflop_result = HplResult.highest_gflops(all_results)
+    with open_results_writer(ALL_RESULTS_FILE, args) as all_results_writer, open_results_cache(args) as cache, \
+            open_journal(args) as journal:
+        theoretical_results = _run_theoretical_optimal(args, all_results_writer.write, cache, journal)
+        calc_results = _run_calc_optimal(args, all_results_writer.write, cache, journal)
+    all_results = HplResultSet.from_results(theoretical_results + calc_results)
+    highest_gflop_result = select_best(args, all_results)
     logging.info(f"Best input config size: {highest_gflop_result}")
     logging.info(f"Highest GFLOPS: {highest_gflop_result.gflops}")
     logging.info("Writing highest GFLOPS to file")
-    write_results(MAX_RESULTS_FILE, [highest_gflop_result], args.output_jsonlines)
-    write_results(ALL_RESULTS_FILE, all_results, args.output_jsonlines)
+    write_results(MAX_RESULTS_FILE, [highest_gflop_result], args.output_jsonlines, binary=args.output_binary)
+
+def tune(args) -> None:
+    budget = HplTuner.parse_duration(args.budget)
+    with open_results_writer(ALL_RESULTS_FILE, args) as all_results_writer, open_results_cache(args) as cache:
+        best_result = _tune(args, budget, all_results_writer.write, cache)
+
+    if best_result is None:
+        logging.error("No results were produced within the tuning budget")
+        sys.exit(1)
+
+    logging.info(f"Best input config size: {best_result}")
+    logging.info(f"Highest GFLOPS: {best_result.gflops}")
+    logging.info("Writing highest GFLOPS to file")
+    write_results(MAX_RESULTS_FILE, [best_result], args.output_jsonlines, binary=args.output_binary)
+
+def plan_shards(args) -> None:
+    cpu_count = get_cpu_count(args)
+    ranks = get_thread_layouts(args, cpu_count)[0].ranks
+    proc_grid = HplInputFileGenerator.generate_possible_process_grids(ranks)
+    problem_sizes = HplInputFileGenerator.generate_possible_problem_sizes(args.available_memory, args.n_prob_sizes,
+                                                                          args.max_prob_size, ranks)
+    block_sizes = HplInputFileGenerator.generate_possible_block_sizes(problem_sizes[-1], args.n_block_sizes)
+
+    shards = HplShardPlanner.plan(problem_sizes, block_sizes, proc_grid[0], proc_grid[1], args.num_shards)
+    if len(shards) < args.num_shards:
+        logging.warning(f"The sweep has only enough configurations for {len(shards)} shards")
+
+    manifest = HplShardPlanner.write_shards(shards, args.output_dir, cpu_count)
+    for shard in shards:
+        logging.info(f"Created {shard} in {shard.directory}. {len(shard.configs)} configurations")
+    logging.info(f"Wrote {len(shards)} shards for {cpu_count} CPUs. Manifest: {manifest}")
+
+def merge_shards(args) -> None:
+    logging.info(f"Merging the results of the shards in {args.input_dir}")
+    results, incomplete = HplShardPlanner.merge_shards(args.input_dir,
+                                                            max_workers=args.workers if args.workers > 0 else None)
+    for shard, missing in incomplete:
+        logging.warning(f"{missing} of the {len(shard.configs)} configurations in {shard} have no result. "
+                        f"Expected output: {shard.output_path}")
+
+    if len(results) == 0:
+        logging.error(f"No results found in the shards in {args.input_dir}")
+        sys.exit(1)
+
+    # The shards may have run on different hardware to this so the peak is only known if it is given
+    if args.rpeak is not None or (args.cpu_frequency is not None and args.flops_per_cycle is not None):
+        peak = HplPeakPerformance.detect(results[0].cpu_count, args.cpu_frequency, args.flops_per_cycle,
+                                         rpeak=args.rpeak)
+        logging.info(f"Theoretical peak performance of the shards: {peak}")
+        for result in results:
+            result.efficiency = peak.efficiency(result.gflops)
+
+    # Ranked from highest to lowest gflops
+    results = HplResultSet.from_results(results).sort("gflops", descending=True)
+    highest_gflop_result = select_best(args, results)
+    logging.info(f"Merged {len(results)} results. Best input config size: {highest_gflop_result}")
+    logging.info(f"Highest GFLOPS: {highest_gflop_result.gflops}")
+    write_results(ALL_RESULTS_FILE, results, args.output_jsonlines, args.exclude_failed, args.output_binary)
+    write_results(MAX_RESULTS_FILE, [highest_gflop_result], args.output_jsonlines, binary=args.output_binary)
+
+def compare_results(args) -> None:
+    baseline = [result for baseline_file in args.baseline for result in _read_stored_results(Path(baseline_file))]
+    candidate = [result for candidate_file in args.candidate for result in _read_stored_results(Path(candidate_file))]
+    if len(baseline) == 0 or len(candidate) == 0:
+        logging.error(f"No results found in the {'baseline' if len(baseline) == 0 else 'candidate'} files")
+        sys.exit(1)
+
+    logging.info(f"Comparing {len(candidate)} candidate results against {len(baseline)} baseline results")
+    comparer = HplComparer(args.threshold, args.confidence, args.prior_noise, args.exclude_failed)
+    report = comparer.compare(baseline, candidate)
+    if not report.assessed:
+        logging.warning("No configuration was run more than once so the significance of changes cannot be assessed. "
+                        "Any drop of more than the threshold is taken to be a regression. Use --max-repeats for a "
+                        "tighter gate")
+    for comparison in report.comparisons:
+        if comparison.regressed:
+            logging.warning(comparison)
+        else:
+            logging.info(comparison)
+    if report.baseline_only:
+        logging.warning(f"{len(report.baseline_only)} baseline configurations have no candidate results")
+    if report.candidate_only:
+        logging.info(f"{len(report.candidate_only)} candidate configurations have no baseline results")
+    if report.best is None:
+        logging.error("All results failed the HPL residual check. Use --no-exclude-failed to ignore this")
+        sys.exit(1)
+
+    logging.info(f"Best configuration: {report.best}")
+    if report.regressed:
+        logging.error(f"Performance regressed by more than {args.threshold * 100:.1f}% in "
+                      f"{len(report.regressions)} comparisons")
+        sys.exit(1)
+
+    logging.info(f"No regressions of more than {args.threshold * 100:.1f}% in {len(report.comparisons)} "
+                 f"configurations or the best")
+
+
+def log_predicted_gflops(performance_model: HplPerformanceModel, inputs: tuple[int, int, int, int]) -> None:
+    if performance_model is not None and inputs is not None:
+        logging.info(f"Predicted GFLOPS for N={inputs[0]}, NB={inputs[1]}, P={inputs[2]}, Q={inputs[3]}: "
+                     f"{performance_model.predict_gflops(*inputs):.2f}")
+
+
+def select_best(args, results: list[HplResult] | HplResultSet) -> HplResult:
+    """
+        The run of the configuration with the highest lower confidence bound on its GFLOPS, the one closest to the
+        mean of its runs. Without repetition this is the configuration with the highest GFLOPS
+    """
+    best = create_repetition(args).best(results)
+    if best is None:
+        logging.error(f"All {len(results)} results failed the HPL residual check. Use --no-exclude-failed to ignore this")
+        sys.exit(1)
+
+    if best.count > 1:
+        logging.info(f"Best configuration: {best}")
+    return best.representative
+
+
+def create_repetition(args) -> HplRepetition:
+    return HplRepetition(args.confidence, args.max_repeats, args.ci_width, exclude_failed=args.exclude_failed)
 
 def write_hpl_input_file(contents: str, filename: str) -> None:
     if Path(filename).exists():
@@ -277,76 +775,600 @@ def write_hpl_input_file(contents: str, filename: str) -> None:
         sys.exit(1)
 
 
-def run_hpl(cpu_count: int, expected_output_file:str, run_type: str = None) -> list[HplResult]:
-    logging.info(f"Will run HPL with {cpu_count} CPUs")
-    hpl_cmd = get_hpl_exec_command(cpu_count)
+def run_hpl(cpu_count: int, expected_output_file:str, run_type: str = None,
+            on_result: Callable[[HplResult], None] = None, timeout: float = None,
+            partition: HplPartition = None, stdout: bool = False, inactivity_timeout: float = None,
+            peak: HplPeakPerformance = None, topology: HplTopology = None,
+            threads: int = None, telemetry: HplTelemetrySampler = None) -> list[HplResult]:
+    """
+        Runs HPL and returns its results. If a timeout (in seconds) is given and HPL has not finished by then it is
+        stopped and whatever results it had produced are returned. If a partition is given HPL is run in the
+        partition's working directory and pinned to its CPUs. If stdout is set HPL is expected to write its results
+        to stdout, which is saved to the expected output file, rather than to the file itself. If the theoretical
+        peak performance is given each result's efficiency is calculated from it. If the CPU topology is given
+        ranks are placed on the CPUs in topology order. If threads (per rank) is given the OpenMP and BLAS thread
+        environment variables are set to it, otherwise HPL is run with a single threaded rank per CPU. If a
+        telemetry sampler is given it samples the machine while HPL runs and each result is given its aggregates
+    """
+    layout = HplThreadLayout(cpu_count // (threads or 1), threads or 1)
+    logging.info(f"Will run HPL with {cpu_count} CPUs as {layout}")
+    hpl_cmd = get_hpl_exec_command(cpu_count, partition, topology, layout.threads)
+    work_dir = None if partition is None else partition.work_dir
+
+    def record_result(result: HplResult) -> None:
+        # Report each result as HPL writes it rather than waiting for the whole run to complete
+        result.type = run_type
+        result.cpu_count = cpu_count
+        result.threads = layout.threads
+        if peak is not None:
+            result.efficiency = peak.efficiency(result.gflops, cpu_count)
+        run_telemetry = None if telemetry is None else telemetry.aggregate_result(result)
+        if run_telemetry is not None:
+            run_telemetry.apply_to(result)
+        logging.info(f"HPL result: {result}")
+        if result.failed:
+            logging.warning(f"HPL result failed the residual check. Residual: {result.residual}")
+        if result.throttled:
+            logging.warning(f"HPL run was throttled, so its result understates the machine: {run_telemetry}")
+        if run_telemetry is not None and run_telemetry.swapped > 0:
+            logging.warning(f"The machine swapped while HPL ran, so its result understates the machine: "
+                            f"{run_telemetry}")
+        if on_result is not None:
+            on_result(result)
 
     logging.info(f"Running HPL with command: {hpl_cmd}")
-    subprocess.Popen(hpl_cmd, shell=True).wait()
+    runner = HplRunner(hpl_cmd, output_file=None if stdout else expected_output_file,
+                       capture_file=expected_output_file if stdout else None, cwd=work_dir, timeout=timeout,
+                       inactivity_timeout=inactivity_timeout, on_result=record_result,
+                       env=None if threads is None else layout.environment())
+    if telemetry is not None:
+        telemetry.start()
+    try:
+        results = runner.run_sync()
+    except HplTimeoutError as e:
+        logging.warning(f"HPL has run for more than its timeout of {timeout:.0f} seconds and was stopped")
+        return e.results
+    except HplExitError as e:
+        # mpirun can report a failure as it tears down after HPL completed, so any results are still kept
+        if not e.results:
+            raise
+        logging.warning(f"{e}. Keeping the {len(e.results)} results it produced")
+        results = e.results
+    finally:
+        if telemetry is not None:
+            telemetry.stop()
+
+    if runner.summary is not None:
+        logging.info(f"HPL run summary: {runner.summary}")
 
-    expected_output_path = Path(expected_output_file)
-    if not expected_output_path.exists():
-        logging.error(f"The expected output file running HPL: {expected_output_file} was not found. Did the command run?")
-        sys.exit(1)
+    return results
 
-    if not expected_output_path.is_file():
-        logging.error(f"The expected output file running HPL: {expected_output_file} is not a file")
-        sys.exit(1)
 
-    if expected_output_path.stat().st_size == 0:
-        logging.error(f"The expected output file running HPL: {expected_output_file} is empty")
-        sys.exit(1)
+def results_format(jsonlines: bool, binary: bool = False) -> str:
+    if binary:
+        return HplResultsWriter.FORMAT_BINARY
 
-    results = HplResultsFile.read_result_file(expected_output_file)
-    if len(results) == 0:
-        logging.error(f"No results found in the expected output file running HPL: {expected_output_file}")
+    if jsonlines:
+        return HplResultsWriter.FORMAT_JSON
+
+    return HplResultsWriter.FORMAT_CSV
+
+
+def open_results_writer(file_path: str, args, append: bool = False) -> HplResultsWriter:
+    output_format = results_format(args.output_jsonlines, args.output_binary)
+    file_path = file_path + HplResultsWriter.FILE_EXTENSIONS[output_format]
+    logging.info(f"Writing results to file as they are produced: {file_path}")
+    return HplResultsWriter.open(file_path, output_format, append=append, exclude_failed=args.exclude_failed)
+
+
+def write_results(file_path: str, results: list[HplResult] | HplResultSet, jsonlines: bool,
+                  exclude_failed: bool = False, binary: bool = False) -> None:
+    output_format = results_format(jsonlines, binary)
+    file_path = file_path + HplResultsWriter.FILE_EXTENSIONS[output_format]
+    with HplResultsWriter.open(file_path, output_format, append=False, batch_size=WRITE_BATCH_SIZE,
+                               exclude_failed=exclude_failed) as results_writer:
+        results_writer.write_all(results)
+
+    if 0 == results_writer.count:
+        logging.warning(f"No results were written to {file_path}. All results failed the HPL residual check")
+
+
+def open_results_cache(args) -> HplResultsCache | contextlib.nullcontext:
+    if not args.use_cache:
+        return contextlib.nullcontext()
+
+    logging.info(f"Using results cache: {args.cache_file}")
+    cache = HplResultsCache(args.cache_file)
+    evicted = cache.evict(args.cache_max_age * 3600, args.cache_max_entries)
+    logging.debug(f"Evicted {evicted} results from the cache. {len(cache)} results remain")
+    return cache
+
+
+def open_journal(args) -> HplJournal:
+    journal = HplJournal(args.journal_file, args.resume)
+    if journal.resumed:
+        logging.info(f"Resuming from the journal: {args.journal_file}")
+    else:
+        if args.resume:
+            logging.warning(f"There is no journal to resume from at {args.journal_file}. Starting afresh")
+        logging.info(f"Journalling progress to: {args.journal_file}")
+    return journal
+
+
+@functools.cache
+def hardware_fingerprint(available_memory: int, cpu_count: int, threads: int = None) -> str:
+    return HplResultsCache.hardware_fingerprint(available_memory, HplInputFileGenerator.output_lines_13_36,
+                                                cpu_count=cpu_count, threads=threads or 1)
+
+
+def get_peak_performance(args) -> HplPeakPerformance | None:
+    return peak_performance(args.cpu_count, args.use_smt, args.rpeak, args.cpu_frequency, args.flops_per_cycle,
+                            args.fma_units, args.sysfs_root)
+
+
+@functools.cache
+def peak_performance(cpu_count: int, use_smt: bool, rpeak: float, cpu_frequency: float, flops_per_cycle: float,
+                     fma_units: int,
+                     sysfs_root: str = HplPeakPerformance.DEFAULT_SYSFS_ROOT) -> HplPeakPerformance | None:
+    # The peak of all the CPUs HPL is run with, as get_cpu_count determines them. With SMT those CPUs are hardware
+    # threads, which share their core's FMA units, so the peak is that of the physical cores they are on
+    if cpu_count <= 0:
+        cpu_count = psutil.cpu_count(logical=use_smt)
+
+    threads_per_core = 1
+    physical = psutil.cpu_count(logical=False)
+    if use_smt and physical:
+        threads_per_core = max(1, psutil.cpu_count(logical=True) // physical)
+
+    try:
+        peak = HplPeakPerformance.detect(cpu_count, cpu_frequency, flops_per_cycle, fma_units, rpeak,
+                                         threads_per_core=threads_per_core, sysfs_root=sysfs_root)
+    except ValueError as e:
+        logging.warning(f"Unable to determine the theoretical peak performance, efficiency will not be reported: {e}")
+        return None
+
+    logging.info(f"Theoretical peak performance: {peak}")
+    return peak
+
+
+def get_topology(args) -> HplTopology | None:
+    if not args.topology:
+        return None
+    return probe_topology(args.sysfs_root, args.use_smt)
+
+
+@functools.cache
+def probe_topology(sysfs_root: str, use_smt: bool) -> HplTopology | None:
+    topology = HplTopology.probe(sysfs_root, use_smt)
+    if topology is None:
+        logging.warning(f"Unable to read the CPU topology from {sysfs_root}. Every process grid will be probed")
+    else:
+        logging.info(f"CPU topology: {topology}")
+    return topology
+
+
+def get_thread_layouts(args, cpu_count: int) -> list[HplThreadLayout]:
+    """
+        The layouts of ranks and threads per rank to run over the CPUs, a single threaded rank per CPU by default
+    """
+    if args.threads_per_rank is None:
+        return [HplThreadLayout(cpu_count)]
+
+    try:
+        layouts = HplThreadLayout.layouts(cpu_count, args.threads_per_rank)
+    except ValueError as e:
+        logging.error(f"Invalid threads per rank: {e}")
         sys.exit(1)
 
-    for result in results:
-        result.type = run_type
-        result.cpu_count = cpu_count
+    if any(layout.threads > 1 for layout in layouts) and "$RANKS$" not in os.environ.get("HPL_EXEC", ""):
+        logging.warning("HPL_EXEC does not use $RANKS$ so HPL may not be started with the expected number of ranks")
+    return layouts
 
-    return results
 
+def run_threads(args, threads: int) -> int | None:
+    # The threads per rank to run HPL with. Unless they were asked for the thread environment is left alone
+    if args.threads_per_rank is None or math.isnan(threads):
+        return None
+    return int(threads)
 
-def write_results(file_path: str, results: list[HplResult], jsonlines: bool) -> None:
 
-    if jsonlines:
-        file_path = file_path + ".json"
-        HplResultsFile.write_results_to_json(file_path, results)
+def select_process_grids(args, cpu_count: int, threads: int = 1) -> (([int], [int]), bool):
+    """
+        The process grids of the cpu_count / threads ranks to probe and whether to map them row-major. With the CPU
+        topology only the grids that best fit it are probed, otherwise every grid is, row-major
+    """
+    proc_grid = HplInputFileGenerator.generate_possible_process_grids(cpu_count // threads)
+    topology = get_topology(args)
+    if topology is None:
+        return proc_grid, True
+
+    try:
+        proc_grid, row_major = topology.rank_grids(proc_grid[0], proc_grid[1], args.max_grids,
+                                                   HplParallelRunner.available_cpus(), threads)
+    except ValueError as e:
+        logging.warning(f"Unable to fit the process grids to the CPU topology, every grid will be probed: {e}")
+        return proc_grid, True
+
+    logging.info(f"Process grids that best fit the CPU topology: {list(zip(proc_grid[0], proc_grid[1]))}, "
+                 f"{'row' if row_major else 'column'}-major")
+    return proc_grid, row_major
+
+
+@functools.cache
+def hpl_scheduler(timeout_factor: float, min_timeout: float) -> HplScheduler:
+    # A single scheduler for the whole invocation so that every run measured so far informs the predictions
+    return HplScheduler(timeout_factor, min_timeout)
+
+
+def run_hpl_configs(args, cpu_count: int, n: [int], nb: [int], p: [int], q: [int], output_file: str, run_type: str,
+                    on_result: Callable[[HplResult], None] = None, cache: HplResultsCache = None,
+                    algorithm: HplAlgorithmParameters = None, row_major: bool = True,
+                    threads: int = None, journal: HplJournal = None) -> list[HplResult]:
+    """
+        Runs HPL over the cross product of the problem sizes, block sizes and process grids given, each over
+        cpu_count / threads ranks of threads threads (see run_hpl). Where a journal is given the configurations and
+        their results are recorded in it under the output file, and those it already holds are not run again. Where
+        a cache is given, configurations it already holds are not run again and their cached results are returned
+        instead.
+        With --schedule each configuration is run separately, shortest first, and stopped if it overruns, or with
+        --batch-time in batches of configurations that amortise the cost of launching HPL.
+        The cache holds one result per configuration so must not be given along with algorithmic parameters that
+        have more than one variant
+    """
+    configs = [(n_val, nb_val, p[idx], q[idx]) for n_val in n for nb_val in nb for idx in range(len(p))]
+    journaled, cached, fingerprint = _reuse_results(args, configs, cpu_count, output_file, run_type, cache, journal,
+                                                    on_result, threads,
+                                                    algorithm.num_variants if algorithm is not None else 1)
+    done = [result for results in journaled.values() for result in results]
+    uncached = [config for config in configs if config not in cached and config not in journaled]
+
+    scheduler = hpl_scheduler(args.timeout_factor, args.min_timeout)
+    scheduler.add_all(done + list(cached.values()))
+
+    def recorder(phase: str) -> Callable[[HplResult], None]:
+        # Each round of repeats is journaled as a phase of its own so that its results do not replace the first's
+        def record_result(result: HplResult) -> None:
+            scheduler.add(result)
+            if cache is not None:
+                cache.put(fingerprint, result)
+            if journal is not None:
+                journal.record(phase, result)
+            if on_result is not None:
+                on_result(result)
+        return record_result
+
+    if not uncached:
+        logging.info(f"All {len(configs)} configurations were found in the journal or cache. Not running HPL")
+        results = done + list(cached.values())
     else:
-        file_path = file_path + ".csv"
-        HplResultsFile.write_results_to_csv(file_path, results)
+        # HPL runs the full cross product of its inputs so only sizes and grids that are entirely cached can be
+        # dropped. Any cached configuration that still gets run is simply measured again
+        run_n = [n_val for n_val in n if any(n_val == config[0] for config in uncached)]
+        run_nb = [nb_val for nb_val in nb if any(nb_val == config[1] for config in uncached)]
+        run_grids = [(p[idx], q[idx]) for idx in range(len(p))
+                     if any((p[idx], q[idx]) == (config[2], config[3]) for config in uncached)]
+        if cached:
+            logging.info(f"{len(cached)} of {len(configs)} configurations were found in the cache")
+
+        if args.schedule:
+            results = _run_scheduled(args, cpu_count, scheduler, uncached, output_file, run_type,
+                                     recorder(output_file), algorithm, row_major, threads)
+        else:
+            results = _run_hpl_dat(args, cpu_count, run_n, run_nb, run_grids, output_file, run_type,
+                                   recorder(output_file), algorithm=algorithm, row_major=row_major, threads=threads)
+
+        # Journaled and cached configurations that HPL ran again as part of its cross product are reported as
+        # measured
+        measured = {(result.n, result.nb, result.p, result.q) for result in results}
+        results = ([result for result in done if (result.n, result.nb, result.p, result.q) not in measured] +
+                   results + [result for config, result in cached.items() if config not in measured])
+
+    if args.max_repeats > 1:
+        results += _run_repetitions(args, cpu_count, scheduler, results, output_file, run_type, on_result, recorder,
+                                    algorithm, row_major, threads, journal)
+    return results
+
+
+def _run_repetitions(args, cpu_count: int, scheduler: HplScheduler, results: list[HplResult], output_file: str,
+                     run_type: str, on_result: Callable[[HplResult], None],
+                     recorder: Callable[[str], Callable[[HplResult], None]], algorithm: HplAlgorithmParameters = None,
+                     row_major: bool = True, threads: int = None, journal: HplJournal = None) -> list[HplResult]:
+    """
+        Each round runs every configuration still in contention once more, each round to its own output file.
+        recorder gives the callback for the results of a round, by its output file. Where a journal is given the
+        configurations of a round it has already completed are not run again
+    """
+    repetition = create_repetition(args)
+    variants = algorithm.num_variants if algorithm is not None else 1
+    repeats = []
+    for round_number in range(2, args.max_repeats + 1):
+        contenders = repetition.contenders(results + repeats)
+        # Every variant of the algorithmic parameters is run again along with the configuration
+        configs = list(dict.fromkeys(stat.key[:4] for stat in contenders))
+        if not configs:
+            break
+
+        logging.info(f"Repeating {len(configs)} configurations still in contention, run {round_number} of at most "
+                     f"{args.max_repeats}. Leading: {contenders[0]}")
+        round_file = str(Path(output_file).with_stem(f"{Path(output_file).stem}_R{round_number}"))
+        journaled = _journaled_results(args, journal, configs, cpu_count, round_file, run_type, on_result, threads,
+                                       variants)
+        repeats += [result for results in journaled.values() for result in results]
+        configs = [config for config in configs if config not in journaled]
+        if not configs:
+            continue
+
+        if args.schedule:
+            repeats += _run_scheduled(args, cpu_count, scheduler, configs, round_file, run_type,
+                                      recorder(round_file), algorithm, row_major, threads)
+            continue
+
+        # Only the configurations in contention are run, in as few HPL invocations as cover them exactly
+        for batch in HplBatchPlanner.products(configs):
+            repeats += _run_hpl_dat(args, cpu_count, batch.n, batch.nb, batch.grids, round_file, run_type,
+                                    recorder(round_file), algorithm=algorithm, row_major=row_major, threads=threads)
+
+    return repeats
+
+
+def _reuse_results(args, configs: list[tuple[int, int, int, int]], cpu_count: int, output_file: str, run_type: str,
+                   cache: HplResultsCache, journal: HplJournal, on_result: Callable[[HplResult], None],
+                   threads: int = None, variants: int = 1,
+                   recover: bool = True) -> tuple[dict[tuple[int, int, int, int], list[HplResult]],
+                                                  dict[tuple[int, int, int, int], HplResult], str | None]:
+    """
+        The results of the configurations that need not be run again: those the journal has completed and then
+        those in the cache, each passed to on_result and the cached ones recorded in the journal. Also returns the
+        hardware fingerprint results are cached under, None without a cache
+    """
+    journaled = _journaled_results(args, journal, configs, cpu_count, output_file, run_type, on_result, threads,
+                                   variants, recover)
+    cached: dict[tuple[int, int, int, int], HplResult] = {}
+    fingerprint = None
+    if cache is not None:
+        fingerprint = hardware_fingerprint(args.available_memory, cpu_count, threads)
+        cached = cache.get_many(fingerprint, [config for config in configs if config not in journaled],
+                                args.cache_max_age * 3600)
+        peak = get_peak_performance(args)
+        for config in configs:
+            if config in cached:
+                cached[config].type = run_type
+                if peak is not None:
+                    cached[config].efficiency = peak.efficiency(cached[config].gflops, cached[config].cpu_count)
+                logging.info(f"Using cached HPL result: {cached[config]}")
+                if journal is not None:
+                    journal.record(output_file, cached[config])
+                if on_result is not None:
+                    on_result(cached[config])
+
+    return journaled, cached, fingerprint
+
+
+def _journaled_results(args, journal: HplJournal, configs: list[tuple[int, int, int, int]], cpu_count: int,
+                       output_file: str, run_type: str, on_result: Callable[[HplResult], None], threads: int,
+                       variants: int, recover: bool = True) -> dict[tuple[int, int, int, int], list[HplResult]]:
+    """
+        Plans the configurations in the journal and returns the results of those it has already completed. When
+        resuming, results in the partial HPL output of the interrupted run are first recovered into the journal
+        unless recover is False
+    """
+    if journal is None:
+        return {}
+
+    journal.plan(output_file, configs)
+    if recover and journal.resumed and Path(output_file).is_file():
+        pending = set(configs) - set(journal.completed(output_file, configs, variants))
+        peak = get_peak_performance(args)
+        recovered = 0
+        for result in HplResultsFile.read_result_file(output_file):
+            # A result cut off before its residual check is run again
+            if (result.n, result.nb, result.p, result.q) not in pending or result.passed is None:
+                continue
+            result.type = run_type
+            result.cpu_count = cpu_count
+            result.threads = threads or 1
+            if peak is not None:
+                result.efficiency = peak.efficiency(result.gflops, cpu_count)
+            journal.record(output_file, result)
+            recovered += 1
+        if recovered:
+            logging.info(f"Recovered {recovered} results from the partial HPL output {output_file}")
+
+    journaled = journal.completed(output_file, configs, variants)
+    for results in journaled.values():
+        for result in results:
+            result.type = run_type
+            logging.info(f"Using journaled HPL result: {result}")
+            if on_result is not None:
+                on_result(result)
+    if journaled:
+        logging.info(f"{len(journaled)} of {len(configs)} configurations were completed before resuming")
+    return journaled
+
+
+def _run_hpl_dat(args, cpu_count: int, n: [int], nb: [int], grids: list[tuple[int, int]], output_file: str,
+                 run_type: str, on_result: Callable[[HplResult], None], timeout: float = None,
+                 partition: HplPartition = None, algorithm: HplAlgorithmParameters = None,
+                 row_major: bool = True, threads: int = None) -> list[HplResult]:
+    # Everything in a single HPL.dat, which HPL runs as the cross product of its inputs
+    hpl_input_file = HPL_INPUT_FILE
+    if partition is not None:
+        # Both files go in the partition's working directory, where HPL is run
+        output_file = Path(output_file).name
+        hpl_input_file = str(Path(partition.work_dir) / Path(HPL_INPUT_FILE).name)
+
+    expected_output_file = output_file if partition is None else str(Path(partition.work_dir) / output_file)
+    if Path(expected_output_file).exists():
+        Path(expected_output_file).unlink()
+
+    hpl_dat = HplInputFileGenerator.generate_input_file(n, nb, [grid[0] for grid in grids],
+                                                        [grid[1] for grid in grids], not args.hpl_stdout, output_file,
+                                                        row_major, algorithm)
+    write_hpl_input_file(hpl_dat, hpl_input_file)
+    inactivity_timeout = args.inactivity_timeout if args.inactivity_timeout > 0 else None
+    return run_hpl(cpu_count, expected_output_file, run_type, on_result, timeout, partition, args.hpl_stdout,
+                   inactivity_timeout, get_peak_performance(args), get_topology(args), threads,
+                   create_telemetry_sampler(args, partition))
+
+
+def create_telemetry_sampler(args, partition: HplPartition = None) -> HplTelemetrySampler | None:
+    if not args.telemetry:
+        return None
+
+    # The base frequency to judge throttling by is the one the peak is estimated with if given, else sysfs's
+    base_frequency = args.cpu_frequency * 1000 if args.cpu_frequency is not None else None
+    return HplTelemetrySampler(args.telemetry_interval, None if partition is None else partition.cpus,
+                               args.sysfs_root, base_frequency)
+
+
+def run_hpl_partitioned(args, partitions: list[HplPartition], configs: list[tuple[int, int, int, int]],
+                        output_file: str, run_type: str, on_result: Callable[[HplResult], None] = None,
+                        cache: HplResultsCache = None, threads: int = None,
+                        journal: HplJournal = None) -> list[HplResult]:
+    """
+        Runs the (N, NB, P, Q) configurations concurrently, one at a time on each partition. P x Q must match the
+        number of ranks in the partitions. Configurations already in the journal or cache are not run again
+    """
+    # Each partition writes its own HPL output so there is no single partial output to recover
+    journaled, cached, fingerprint = _reuse_results(args, configs, partitions[0].cpu_count, output_file, run_type,
+                                                    cache, journal, on_result, threads, recover=False)
+
+    def record_result(result: HplResult) -> None:
+        if cache is not None:
+            cache.put(fingerprint, result)
+        if journal is not None:
+            journal.record(output_file, result)
+        if on_result is not None:
+            on_result(result)
+
+    def run_config(partition: HplPartition, config: tuple[int, int, int, int],
+                   on_partition_result: Callable[[HplResult], None]) -> list[HplResult]:
+        n, nb, p, q = config
+        logging.info(f"Running N={n}, NB={nb}, P={p}, Q={q} on {partition}")
+        return _run_hpl_dat(args, partition.cpu_count, [n], [nb], [(p, q)], output_file, run_type,
+                            on_partition_result, partition=partition, threads=threads)
+
+    uncached = [config for config in configs if config not in cached and config not in journaled]
+    runner = HplParallelRunner(partitions, run_config)
+    return (runner.run(uncached, record_result) + list(cached.values()) +
+            [result for results in journaled.values() for result in results])
+
+
+def _run_scheduled(args, cpu_count: int, scheduler: HplScheduler, configs: list[tuple[int, int, int, int]],
+                   output_file: str, run_type: str, on_result: Callable[[HplResult], None],
+                   algorithm: HplAlgorithmParameters = None, row_major: bool = True,
+                   threads: int = None) -> list[HplResult]:
+    """
+        Runs each configuration as its own HPL invocation, shortest predicted runtime first. Each is given a timeout
+        derived from its predicted runtime, which is refined as results come in, and is stopped if it overruns
+    """
+    if args.batch_time > 0:
+        return _run_batched(args, cpu_count, scheduler, configs, output_file, run_type, on_result, algorithm,
+                            row_major, threads)
+
+    # HPL runs each configuration once for every variant of the algorithmic parameters
+    variants = algorithm.num_variants if algorithm is not None else 1
+    results = []
+    for n, nb, p, q in scheduler.order(configs):
+        predicted = scheduler.predict_runtime(n)
+        timeout = scheduler.timeout(n)
+        if predicted is not None:
+            predicted *= variants
+            timeout *= variants
+            logging.info(f"Running N={n}, NB={nb}, P={p}, Q={q}. Predicted runtime {predicted:.1f} seconds. "
+                         f"Timeout {timeout:.0f} seconds")
+
+        start = time.monotonic()
+        config_results = _run_hpl_dat(args, cpu_count, [n], [nb], [(p, q)], output_file, run_type, on_result,
+                                      timeout, algorithm=algorithm, row_major=row_major, threads=threads)
+        scheduler.add_launch(time.monotonic() - start, config_results)
+        if not config_results:
+            logging.warning(f"N={n}, NB={nb}, P={p}, Q={q} was stopped without producing a result")
+        results += config_results
+
+    if scheduler.launch_overhead is not None:
+        logging.info(f"Measured HPL launch overhead: {scheduler.launch_overhead:.1f} seconds per invocation")
+    return results
 
 
-def _run_theoretical_optimal(args) -> list[HplResult]:
+def _run_batched(args, cpu_count: int, scheduler: HplScheduler, configs: list[tuple[int, int, int, int]],
+                 output_file: str, run_type: str, on_result: Callable[[HplResult], None],
+                 algorithm: HplAlgorithmParameters = None, row_major: bool = True,
+                 threads: int = None) -> list[HplResult]:
+    """
+        Runs the configurations in batches, each a single HPL invocation predicted to take no more than the batch
+        time, launch included, and stopped if it overruns. The remaining batches are planned again after each one
+        so that they follow the predictions and launch overhead as they are refined
+    """
+    variants = algorithm.num_variants if algorithm is not None else 1
+    remaining = list(configs)
+    results = []
+    while remaining:
+        timeout = None
+        if 0 == scheduler.measurements:
+            # Nothing can be predicted until something has run, so the smallest configuration goes first on its own
+            n, nb, p, q = scheduler.order(remaining)[0]
+            batch = HplBatch([n], [nb], [(p, q)])
+            logging.info(f"Running N={n}, NB={nb}, P={p}, Q={q} on its own to predict the runtime of the rest")
+        else:
+            launch_overhead = args.launch_overhead if args.launch_overhead >= 0 else scheduler.launch_overhead or 0.0
+            planner = HplBatchPlanner(lambda config: scheduler.predict_runtime(config[0]) * variants, launch_overhead,
+                                      args.batch_time)
+            batches = planner.plan(remaining)
+            batch = batches[0]
+            predicted = planner.predict(batch)
+            timeout = scheduler.timeout_for(predicted)
+            logging.info(f"Running {len(batch)} configurations in one HPL invocation, the first of {len(batches)} "
+                         f"batches: {batch}. Predicted runtime {predicted:.1f} seconds including "
+                         f"{launch_overhead:.1f} seconds to launch. Timeout {timeout:.0f} seconds")
+
+        start = time.monotonic()
+        batch_results = _run_hpl_dat(args, cpu_count, batch.n, batch.nb, batch.grids, output_file, run_type,
+                                     on_result, timeout, algorithm=algorithm, row_major=row_major, threads=threads)
+        scheduler.add_launch(time.monotonic() - start, batch_results)
+        measured = {(result.n, result.nb, result.p, result.q) for result in batch_results}
+        stopped = [config for config in batch.configs if config not in measured]
+        if stopped:
+            logging.warning(f"{len(stopped)} of the {len(batch)} configurations in the batch were stopped without "
+                            f"producing a result")
+        results += batch_results
+        batched = set(batch.configs)
+        remaining = [config for config in remaining if config not in batched]
+
+    return results
+
+
+def _run_theoretical_optimal(args, on_result: Callable[[HplResult], None] = None,
+                             cache: HplResultsCache = None, journal: HplJournal = None) -> list[HplResult]:
     logging.info("Running HPL with theoretical best parameters")
 
     cpu_count = get_cpu_count(args)
     available_memory = args.available_memory
 
-    input_file = "./HPL.dat"
     theoretical_max_file = "./HPL_THEORETICAL_MAX.out"
-    if Path(theoretical_max_file).exists():
-        Path(theoretical_max_file).unlink()
 
     logging.info(f"Creating HPL input file to determine theoretical best parameters...")
-    hpl_dat_inputs = HplInputFileGenerator.generate_theoretical_best_inputs(cpu_count, available_memory,
+    warn_prob_sizes_step(args)
+    layout = get_thread_layouts(args, cpu_count)[0]
+    performance_model = create_performance_model(args, layout.threads)
+    hpl_dat_inputs = HplInputFileGenerator.generate_theoretical_best_inputs(layout.ranks, available_memory,
                                                                             args.min_prob_sizes,
-                                                                            args.max_prob_sizes, args.prob_sizes_step,
-                                                                            args.max_prob_size)
+                                                                            args.max_prob_sizes,
+                                                                            prob_size_cap=args.max_prob_size,
+                                                                            performance_model=performance_model)
+    log_predicted_gflops(performance_model, hpl_dat_inputs)
 
-    hpl_dat = HplInputFileGenerator.generate_input_file([hpl_dat_inputs[0]], [hpl_dat_inputs[1]], [hpl_dat_inputs[2]],
-                                                        [hpl_dat_inputs[3]], True, theoretical_max_file)
-    write_hpl_input_file(hpl_dat, input_file)
     logging.info(
         f"Running HPL with theoretical best parameters. N={hpl_dat_inputs[0]}, NB={hpl_dat_inputs[1]}, P={hpl_dat_inputs[2]}, Q={hpl_dat_inputs[3]}")
-    results = run_hpl(cpu_count, theoretical_max_file, "theoretical_max")
-    best_gflops = HplResult.highest_gflops(results)
+    results = run_hpl_configs(args, cpu_count, [hpl_dat_inputs[0]], [hpl_dat_inputs[1]], [hpl_dat_inputs[2]],
+                              [hpl_dat_inputs[3]], theoretical_max_file, "theoretical_max", on_result, cache,
+                              threads=run_threads(args, layout.threads), journal=journal)
+    best_gflops = select_best(args, results)
     logging.info(f"Theoretical best GFLOPS: {best_gflops.gflops}")
     return results
 
-def _run_calc_optimal(args) -> list[HplResult]:
+def _run_calc_optimal(args, on_result: Callable[[HplResult], None] = None,
+                      cache: HplResultsCache = None, journal: HplJournal = None) -> list[HplResult]:
     logging.info(
         f"Calculating maximal gflops experimentally with {args.n_prob_sizes} problem sizes and {args.n_block_sizes} block sizes")
     # Approach here is to
@@ -357,33 +1379,150 @@ def _run_calc_optimal(args) -> list[HplResult]:
     cpu_count = get_cpu_count(args)
     available_memory = args.available_memory
 
-    proc_grid_file = "./HPL_PROC_GRID.out"
-    if Path(proc_grid_file).exists():
-        Path(proc_grid_file).unlink()
-
-    input_file = "./HPL.dat"
     logging.info(f"Creating HPL input file to determine best process grid...")
-    hpl_dat = HplInputFileGenerator.generate_input_file_calc_best_process_grid(cpu_count, True, proc_grid_file)
-    write_hpl_input_file(hpl_dat, input_file)
-
-    proc_grid_results = run_hpl(cpu_count, proc_grid_file, "proc_grid")
-    best_grid = HplResult.highest_gflops(proc_grid_results)
-    logging.info(f"Best process grid: {best_grid}")
+    # Each layout of ranks and threads has its own process grids so the probe covers them all
+    proc_grid_results = []
+    best = None
+    for layout in get_thread_layouts(args, cpu_count):
+        proc_grid_file = "./HPL_PROC_GRID.out" if 1 == layout.threads else f"./HPL_PROC_GRID_T{layout.threads}.out"
+        proc_grid, row_major = select_process_grids(args, cpu_count, layout.threads)
+        if args.partitions > 1:
+            layout_results, best_grid = _run_partitioned_proc_grid(args, cpu_count, proc_grid, proc_grid_file,
+                                                                   on_result, cache, run_threads(args, layout.threads),
+                                                                   journal)
+        else:
+            layout_results = run_hpl_configs(args, cpu_count, [HplInputFileGenerator.PROC_GRID_N],
+                                             [HplInputFileGenerator.PROC_GRID_NB], proc_grid[0], proc_grid[1],
+                                             proc_grid_file, "proc_grid", on_result, cache, row_major=row_major,
+                                             threads=run_threads(args, layout.threads), journal=journal)
+            best_grid_result = select_best(args, layout_results)
+            logging.info(f"Best process grid result with {layout}: {best_grid_result}")
+            best_grid = (best_grid_result.p, best_grid_result.q)
+        proc_grid_results += layout_results
+        layout_best = select_best(args, layout_results)
+        if best is None or layout_best.gflops > best[0].gflops:
+            best = (layout_best, layout, best_grid, row_major)
+    _, layout, best_grid, row_major = best
+    chosen = journal.choice(BEST_GRID_CHOICE) if journal is not None else None
+    if chosen is not None:
+        # Carry on with the grid the interrupted sweep chose
+        layout = HplThreadLayout(cpu_count // chosen["threads"], chosen["threads"])
+        best_grid, row_major = (chosen["p"], chosen["q"]), chosen["row_major"]
+    elif journal is not None:
+        journal.choose(BEST_GRID_CHOICE, {"p": int(best_grid[0]), "q": int(best_grid[1]), "threads": layout.threads,
+                                          "row_major": row_major})
+    logging.info(f"Best process grid: P={best_grid[0]}, Q={best_grid[1]} with {layout}")
 
     prob_sizes_file = "./HPL_PROB_SIZES.out"
-    if Path(prob_sizes_file).exists():
-        Path(prob_sizes_file).unlink()
-
-    hpl_dat = HplInputFileGenerator.generate_input_file_calc_best_problem_size(available_memory, [best_grid.p],
-                                                                               [best_grid.q], True,
-                                                                               prob_sizes_file, args.n_prob_sizes,
-                                                                               args.n_block_sizes, args.max_prob_size)
-    write_hpl_input_file(hpl_dat, input_file)
-    prob_size_results = run_hpl(cpu_count, prob_sizes_file, "prob_size")
+    problem_sizes = HplInputFileGenerator.generate_possible_problem_sizes(available_memory, args.n_prob_sizes,
+                                                                          args.max_prob_size, layout.ranks)
+    block_sizes = HplInputFileGenerator.generate_possible_block_sizes(problem_sizes[-1], args.n_block_sizes)
+    prob_size_results = run_hpl_configs(args, cpu_count, problem_sizes, block_sizes, [best_grid[0]], [best_grid[1]],
+                                        prob_sizes_file, "prob_size", on_result, cache, row_major=row_major,
+                                        threads=run_threads(args, layout.threads), journal=journal)
     all_results = proc_grid_results + prob_size_results
+    if args.sweep_algorithm:
+        all_results += _run_algorithm_sweep(args, cpu_count, select_best(args, prob_size_results),
+                                            on_result, journal)
     return all_results
 
 
+def _run_algorithm_sweep(args, cpu_count: int, best_result: HplResult,
+                         on_result: Callable[[HplResult], None] = None,
+                         journal: HplJournal = None) -> list[HplResult]:
+    # 4. Run the best problem size, block size and process grid with every combination of the algorithmic parameters
+    algorithm = HplAlgorithmParameters.sweep(args.pfacts, args.nbmins, args.ndivs, args.rfacts, args.bcasts,
+                                             args.depths, args.swap, args.swapping_threshold)
+    logging.info(f"Sweeping {algorithm.num_variants} variants of the algorithmic parameters for each of "
+                 f"{len(args.pmaps)} process mappings with N={best_result.n}, NB={best_result.nb}, P={best_result.p}, "
+                 f"Q={best_result.q}")
+    results = []
+    for pmap in args.pmaps:
+        # PMAP takes a single value in HPL.dat so each mapping is a separate run. The results cache holds a single
+        # result per configuration rather than one per variant so is not used
+        results += run_hpl_configs(args, cpu_count, [best_result.n], [best_result.nb], [best_result.p],
+                                   [best_result.q], f"./HPL_ALGORITHM_{pmap.upper()}.out", "algorithm", on_result,
+                                   None, algorithm, "row" == pmap, run_threads(args, best_result.threads), journal)
+
+    best_variant = select_best(args, results)
+    logging.info(f"Best algorithmic parameters: {best_variant.variant} at {best_variant.gflops} GFLOPS")
+    return results
+
+
+def _tune(args, budget: float, on_result: Callable[[HplResult], None] = None,
+          cache: HplResultsCache = None) -> HplResult | None:
+    cpu_count = get_cpu_count(args)
+    layout = get_thread_layouts(args, cpu_count)[0]
+    max_n = HplInputFileGenerator.calculate_max_problem_size(args.available_memory, args.max_prob_size, layout.ranks)
+    proc_grid = HplInputFileGenerator.generate_possible_process_grids(layout.ranks)
+    block_sizes = HplInputFileGenerator.generate_possible_block_sizes(max_n, args.n_block_sizes)
+    logging.info(f"Tuning HPL within {budget} seconds. Block sizes: {block_sizes}. "
+                 f"Process grids: {list(zip(proc_grid[0], proc_grid[1]))}. Max problem size: {max_n}")
+
+    tune_file = "./HPL_TUNE.out"
+
+    def run_configs(configs: list[tuple[int, int, int, int]], run_type: str) -> list[HplResult]:
+        # HPL runs the cross product of its inputs so each problem size and grid is run separately with just the
+        # block sizes still in contention for it
+        grouped: dict[tuple[int, int, int], list[int]] = {}
+        for n, nb, p, q in configs:
+            grouped.setdefault((n, p, q), []).append(nb)
+
+        results = []
+        for (n, p, q), nbs in grouped.items():
+            logging.info(f"Tuning round {run_type}. N={n}, NB={nbs}, P={p}, Q={q}")
+            results += run_hpl_configs(args, cpu_count, [n], nbs, [p], [q], tune_file, run_type, on_result, cache,
+                                       threads=run_threads(args, layout.threads))
+        return results
+
+    # The theoretical peak, if known, predicts what the first round will cost before anything has been run
+    predict_gflops = None
+    peak = get_peak_performance(args)
+    if peak is not None:
+        predict_gflops = HplPerformanceModel.from_peak(peak.rpeak / peak.cpu_count * layout.threads).predict_gflops
+
+    tuner = HplTuner(run_configs, block_sizes, proc_grid[0], proc_grid[1], min(args.min_prob_size, max_n), max_n,
+                     budget, args.eta, predict_gflops)
+    if args.target_efficiency > 0:
+        if peak is None:
+            logging.warning("The theoretical peak performance is unknown so tuning cannot stop at a target efficiency")
+        tuner.stop_when(lambda result: not result.failed and result.efficiency >= args.target_efficiency)
+    logging.info(f"Tuning rounds: {tuner.round_sizes()} candidates at problem sizes {tuner.round_problem_sizes()}")
+    best_result = tuner.tune()
+    logging.info(f"Tuning complete after {len(tuner.results)} HPL runs")
+    return best_result
+
+
+def _run_partitioned_proc_grid(args, cpu_count: int, proc_grid: ([int], [int]), proc_grid_file: str,
+                               on_result: Callable[[HplResult], None] = None, cache: HplResultsCache = None,
+                               threads: int = None,
+                               journal: HplJournal = None) -> (list[HplResult], tuple[int, int]):
+    """
+        Probes the process grids of one partition's worth of CPUs, all partitions at once, then maps the best of
+        them to the grid of the same shape across all the CPUs
+    """
+    # Unpinned the concurrent probes would contend for every core and comparing their grids would be meaningless
+    hpl_exec = os.environ.get("HPL_EXEC", "")
+    if "$CPU_LIST$" not in hpl_exec and "$RANK_CPUS$" not in hpl_exec:
+        logging.error("HPL_EXEC must pin HPL to the partition's CPUs with $CPU_LIST$ or $RANK_CPUS$ to run the "
+                      "process grid probes concurrently on --partitions")
+        sys.exit(1)
+
+    partitions = HplParallelRunner.create_partitions(cpu_count, args.partitions)
+    partition_grid = HplInputFileGenerator.generate_possible_process_grids(partitions[0].cpu_count // (threads or 1))
+    logging.info(f"Running the process grid probe concurrently on {len(partitions)} partitions of "
+                 f"{partitions[0].cpu_count} CPUs: {', '.join(str(partition) for partition in partitions)}")
+
+    configs = [(HplInputFileGenerator.PROC_GRID_N, HplInputFileGenerator.PROC_GRID_NB, partition_grid[0][idx],
+                partition_grid[1][idx]) for idx in range(len(partition_grid[0]))]
+    results = run_hpl_partitioned(args, partitions, configs, proc_grid_file, "proc_grid", on_result, cache, threads,
+                                  journal)
+    best_partition_grid = select_best(args, results)
+    logging.info(f"Best partition process grid result: {best_partition_grid}")
+    return results, HplParallelRunner.closest_grid(best_partition_grid.p, best_partition_grid.q, proc_grid[0],
+                                                   proc_grid[1])
+
+
 def get_cpu_count(args) -> int:
     if args.cpu_count > 0:
         logging.info(f"Using user specified CPU count: {args.cpu_count}")
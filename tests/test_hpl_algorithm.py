@@ -0,0 +1,100 @@
+import unittest
+
+from hmxlabs.hplx.hpl_algorithm import HplAlgorithmParameters
+from hmxlabs.hplx.hpl_input import HplInputFileGenerator
+
+
+class TestHplAlgorithmParameters(unittest.TestCase):
+
+    def test_defaults(self) -> None:
+        # The defaults are exactly what HPLx has always written
+        algorithm = HplAlgorithmParameters()
+        self.assertEqual(HplInputFileGenerator.LINES_13_36, algorithm.lines_13_36())
+        self.assertEqual(1, algorithm.num_variants)
+        self.assertEqual(["WR11C2R4"], algorithm.variant_codes())
+        self.assertEqual(["WC11C2R4"], algorithm.variant_codes(row_major=False))
+
+    def test_multi_valued(self) -> None:
+        algorithm = HplAlgorithmParameters(pfacts=[0, 1, 2], bcasts=[0, 1, 2, 3, 4, 5], depths=[0, 1], swap=1,
+                                           swapping_threshold=128)
+        lines = algorithm.lines_13_36().splitlines()
+        self.assertEqual(24, len(lines))
+        self.assertEqual("3            # of panel fact", lines[1])
+        self.assertEqual("0 1 2        PFACTs (0=left, 1=Crout, 2=Right)", lines[2])
+        self.assertEqual("6            # of broadcast", lines[9])
+        self.assertEqual("0 1 2 3 4 5  BCASTs (0=1rg,1=1rM,2=2rg,3=2rM,4=Lng,5=LnM)", lines[10])
+        self.assertEqual("0 1          DEPTHs (>=0)", lines[12])
+        self.assertEqual("1            SWAP (0=bin-exch,1=long,2=mix)", lines[13])
+        self.assertEqual("128          swapping threshold", lines[14])
+
+        # Long lists push the comment along
+        long_list = HplAlgorithmParameters(nbmins=[1, 2, 4, 8, 16, 32]).lines_13_36().splitlines()
+        self.assertEqual("1 2 4 8 16 32 NBMINs (>= 1)", long_list[4])
+
+        codes = algorithm.variant_codes()
+        self.assertEqual(36, algorithm.num_variants)
+        self.assertEqual(36, len(set(codes)))
+        self.assertIn("WR05C2L4", codes)
+
+    def test_parse_variant_code(self) -> None:
+        parameters = HplAlgorithmParameters.parse_variant_code("WC12R3L16")
+        self.assertEqual({"row_major": False, "depth": 1, "bcast": 2, "rfact": 2, "ndiv": 3, "pfact": 0, "nbmin": 16},
+                         parameters)
+
+        for code in HplAlgorithmParameters.sweep().variant_codes():
+            parameters = HplAlgorithmParameters.parse_variant_code(code)
+            self.assertEqual(code, HplAlgorithmParameters.variant_code(**parameters))
+
+        for code in [None, "", "WR11C2R", "XR11C2R4", "WX11C2R4", "WR11X2R4", "WR1AC2R4"]:
+            with self.assertRaises(ValueError):
+                HplAlgorithmParameters.parse_variant_code(code)
+
+    def test_invalid(self) -> None:
+        with self.assertRaises(ValueError):
+            HplAlgorithmParameters(pfacts=[])
+        with self.assertRaises(ValueError):
+            HplAlgorithmParameters(pfacts=[3])
+        with self.assertRaises(ValueError):
+            HplAlgorithmParameters(bcasts=[6])
+        with self.assertRaises(ValueError):
+            HplAlgorithmParameters(ndivs=[1])
+        with self.assertRaises(ValueError):
+            HplAlgorithmParameters(swap=3)
+
+    def test_input_file(self) -> None:
+        algorithm = HplAlgorithmParameters.sweep()
+        hpl_dat = HplInputFileGenerator.generate_input_file([1000], [64], [2], [2], True, "HPL.out", False, algorithm)
+        lines = hpl_dat.splitlines()
+        self.assertTrue(lines[8].startswith("1 "))
+        self.assertEqual(algorithm.lines_13_36().splitlines(), lines[12:])
+
+        # Without algorithmic parameters the default lines are used
+        hpl_dat = HplInputFileGenerator.generate_input_file([1000], [64], [2], [2], True, "HPL.out")
+        self.assertTrue(hpl_dat.endswith(HplInputFileGenerator.LINES_13_36))
+
+    def test_parse_input_file(self) -> None:
+        algorithm = HplAlgorithmParameters.sweep(bcasts=[1, 3], depths=[0, 2], swap=HplAlgorithmParameters.SWAP_LONG)
+        hpl_dat = HplInputFileGenerator.generate_input_file([1000, 2000], [64, 128], [1, 2], [4, 2], True, "HPL.out",
+                                                            False, algorithm)
+        inputs = HplInputFileGenerator.parse_input_file(hpl_dat)
+        self.assertEqual("HPL.out", inputs["output_file"])
+        self.assertTrue(inputs["write_file"])
+        self.assertEqual([1000, 2000], inputs["n"])
+        self.assertEqual([64, 128], inputs["nb"])
+        self.assertFalse(inputs["row_major"])
+        self.assertEqual([1, 2], inputs["p"])
+        self.assertEqual([4, 2], inputs["q"])
+        self.assertEqual(algorithm.lines_13_36(), inputs["algorithm"].lines_13_36())
+
+        # The default lines read back as the default parameters
+        hpl_dat = HplInputFileGenerator.generate_input_file([1000], [64], [2], [2], False, "HPL.out")
+        inputs = HplInputFileGenerator.parse_input_file(hpl_dat)
+        self.assertFalse(inputs["write_file"])
+        self.assertEqual(["WR11C2R4"], inputs["algorithm"].variant_codes())
+
+        with self.assertRaises(ValueError):
+            HplInputFileGenerator.parse_input_file("\n".join(hpl_dat.splitlines()[:20]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+
+from hmxlabs.hplx.hpl_batch import HplBatch, HplBatchPlanner
+
+
+class TestHplBatchPlanner(unittest.TestCase):
+
+    N = [1000, 2000, 4000]
+    NB = [64, 128]
+    GRIDS = [(1, 4), (2, 2)]
+
+    @staticmethod
+    def cross_product(n: list[int], nb: list[int], grids: list[tuple[int, int]]) -> list[tuple[int, int, int, int]]:
+        return [(n_val, nb_val, p, q) for n_val in n for nb_val in nb for p, q in grids]
+
+    @staticmethod
+    def runtime(config: tuple[int, int, int, int]) -> float:
+        # A second per thousand N
+        return config[0] / 1000
+
+    def assert_covers(self, configs: list[tuple[int, int, int, int]], batches: list[HplBatch]) -> None:
+        # Every configuration is run exactly once and nothing else is
+        batched = [config for batch in batches for config in batch.configs]
+        self.assertEqual(sorted(configs), sorted(batched))
+
+    def test_cross_product(self) -> None:
+        configs = self.cross_product(self.N, self.NB, self.GRIDS)
+        batches = HplBatchPlanner(self.runtime).plan(configs)
+        self.assertEqual(1, len(batches))
+        self.assertEqual(self.N, batches[0].n)
+        self.assertEqual(12, len(batches[0]))
+
+    def test_products(self) -> None:
+        # The largest problem size is only run with one grid, so cannot share a batch with the others
+        configs = self.cross_product(self.N[:2], self.NB, self.GRIDS) + self.cross_product([8000], self.NB, [(2, 2)])
+        batches = HplBatchPlanner.products(configs)
+        self.assert_covers(configs, batches)
+        self.assertEqual(2, len(batches))
+
+        # A sparse set of configurations is never padded out to a cross product
+        configs = [(1000, 64, 1, 4), (2000, 128, 2, 2), (2000, 64, 1, 4)]
+        batches = HplBatchPlanner.products(configs)
+        self.assert_covers(configs, batches)
+
+    def test_max_batch_time(self) -> None:
+        configs = self.cross_product(self.N, self.NB, self.GRIDS)
+        planner = HplBatchPlanner(self.runtime, launch_overhead=2, max_batch_time=14)
+        batches = planner.plan(configs)
+        self.assert_covers(configs, batches)
+        self.assertTrue(all(planner.predict(batch) <= 14 for batch in batches))
+        # N=1000 and 2000 together take 12 seconds and the launch 2, N=4000 alone takes 16 so is split by grid
+        self.assertEqual([[1000, 2000], [4000], [4000]], [batch.n for batch in batches])
+        self.assertEqual([[(1, 4)], [(2, 2)]], [batch.grids for batch in batches[1:]])
+
+        # A configuration too long to fit is still run, on its own
+        planner = HplBatchPlanner(self.runtime, launch_overhead=2, max_batch_time=3)
+        batches = planner.plan(configs)
+        self.assert_covers(configs, batches)
+        self.assertEqual(12, len(batches))
+
+    def test_invalid(self) -> None:
+        with self.assertRaises(ValueError):
+            HplBatchPlanner(self.runtime, launch_overhead=-1)
+        with self.assertRaises(ValueError):
+            HplBatchPlanner(self.runtime, max_batch_time=0)
+        with self.assertRaises(ValueError):
+            HplBatch([], [64], [(1, 1)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import os
+import tempfile
+import time
+import unittest
+
+from hmxlabs.hplx.hpl_cache import HplResultsCache
+from hmxlabs.hplx.hpl_input import HplInputFileGenerator
+from hmxlabs.hplx.hpl_results import HplResultsFile
+
+
+class TestHplResultsCache(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.results = HplResultsFile.read_result_file("./data/HPL.out")
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache = HplResultsCache(os.path.join(self.temp_dir.name, "cache", "results.sqlite"))
+        self.fingerprint = HplResultsCache.hardware_fingerprint(16 * (1024 ** 3),
+                                                                HplInputFileGenerator.LINES_13_36, "Test CPU")
+
+    def tearDown(self) -> None:
+        self.cache.close()
+        self.temp_dir.cleanup()
+
+    def test_fingerprint(self) -> None:
+        same = HplResultsCache.hardware_fingerprint(16 * (1024 ** 3), HplInputFileGenerator.LINES_13_36, "Test CPU")
+        other_memory = HplResultsCache.hardware_fingerprint(32 * (1024 ** 3), HplInputFileGenerator.LINES_13_36,
+                                                            "Test CPU")
+        other_cpu = HplResultsCache.hardware_fingerprint(16 * (1024 ** 3), HplInputFileGenerator.LINES_13_36,
+                                                         "Other CPU")
+        other_dat = HplResultsCache.hardware_fingerprint(16 * (1024 ** 3), "", "Test CPU")
+        self.assertEqual(self.fingerprint, same)
+        self.assertEqual(4, len({self.fingerprint, other_memory, other_cpu, other_dat}))
+
+    def test_fingerprint_cpu_count(self) -> None:
+        # The same process grid measured on a 4 CPU partition is not reused for a run on 8 CPUs
+        fingerprint_4 = HplResultsCache.hardware_fingerprint(16 * (1024 ** 3), HplInputFileGenerator.LINES_13_36,
+                                                             "Test CPU", cpu_count=4)
+        fingerprint_8 = HplResultsCache.hardware_fingerprint(16 * (1024 ** 3), HplInputFileGenerator.LINES_13_36,
+                                                             "Test CPU", cpu_count=8)
+        result = self.results[0]
+        result.cpu_count = 4
+        self.cache.put(fingerprint_4, result)
+        config = (result.n, result.nb, result.p, result.q)
+        self.assertEqual([config], list(self.cache.get_many(fingerprint_4, [config])))
+        self.assertEqual({}, self.cache.get_many(fingerprint_8, [config]))
+
+    def test_fingerprint_threads(self) -> None:
+        # 2x2 ranks on 4 CPUs and 2x2 ranks of 2 threads on 8 CPUs share a process grid but not a measurement
+        single = HplResultsCache.hardware_fingerprint(16 * (1024 ** 3), HplInputFileGenerator.LINES_13_36,
+                                                      "Test CPU", cpu_count=8)
+        threaded = HplResultsCache.hardware_fingerprint(16 * (1024 ** 3), HplInputFileGenerator.LINES_13_36,
+                                                        "Test CPU", cpu_count=8, threads=2)
+        self.assertEqual(single, HplResultsCache.hardware_fingerprint(16 * (1024 ** 3),
+                                                                      HplInputFileGenerator.LINES_13_36, "Test CPU",
+                                                                      cpu_count=8, threads=1))
+        result = self.results[0]
+        result.threads = 2
+        self.cache.put(threaded, result)
+        config = (result.n, result.nb, result.p, result.q)
+        self.assertEqual([config], list(self.cache.get_many(threaded, [config])))
+        self.assertEqual({}, self.cache.get_many(single, [config]))
+
+    def test_put_get(self) -> None:
+        result = self.results[0]
+        self.cache.put(self.fingerprint, result)
+        cached = self.cache.get(self.fingerprint, result.n, result.nb, result.p, result.q)
+        self.assertEqual(result.to_json(), cached.to_json())
+        self.assertIsNone(self.cache.get("other", result.n, result.nb, result.p, result.q))
+
+    def test_max_age(self) -> None:
+        result = self.results[0]
+        self.cache.put(self.fingerprint, result, time.time() - 7200)
+        self.assertIsNone(self.cache.get(self.fingerprint, result.n, result.nb, result.p, result.q, max_age=3600))
+        self.assertIsNotNone(self.cache.get(self.fingerprint, result.n, result.nb, result.p, result.q,
+                                            max_age=10800))
+
+    def test_failed_not_cached(self) -> None:
+        self.results[0].passed = False
+        self.cache.put(self.fingerprint, self.results[0])
+        self.assertEqual(0, len(self.cache))
+
+    def test_get_many(self) -> None:
+        for result in self.results:
+            self.cache.put(self.fingerprint, result)
+        configs = [(1000, 32, 1, 4), (1000, 64, 1, 4), (1234, 64, 1, 4)]
+        cached = self.cache.get_many(self.fingerprint, configs)
+        self.assertEqual({(1000, 32, 1, 4), (1000, 64, 1, 4)}, set(cached.keys()))
+
+    def test_evict(self) -> None:
+        now = time.time()
+        for idx, result in enumerate(self.results):
+            self.cache.put(self.fingerprint, result, now - idx * 60)
+        self.assertEqual(40, len(self.cache))
+
+        # Anything older than 30 minutes goes, then only the newest 10 of those left are kept
+        self.assertEqual(30, self.cache.evict(max_age=1770, max_entries=10))
+        self.assertEqual(10, len(self.cache))
+        self.assertIsNotNone(self.cache.get(self.fingerprint, self.results[0].n, self.results[0].nb,
+                                            self.results[0].p, self.results[0].q))
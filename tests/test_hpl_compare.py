@@ -0,0 +1,121 @@
+import unittest
+
+from hmxlabs.hplx.hpl_compare import HplComparer
+from hmxlabs.hplx.hpl_results import HplResult, HplResultsFile
+
+
+class TestHplCompare(unittest.TestCase):
+
+    @staticmethod
+    def _result(n: int, nb: int, gflops: float, passed: bool = True, cpu_count: int = 4) -> HplResult:
+        result = HplResult()
+        result.n = n
+        result.nb = nb
+        result.p = 2
+        result.q = 2
+        result.cpu_count = cpu_count
+        result.variant = "WR11C2R4"
+        result.gflops = gflops
+        result.time = 10.0
+        result.passed = passed
+        return result
+
+    @staticmethod
+    def _runs(n: int, nb: int, gflops: list[float]) -> list[HplResult]:
+        return [TestHplCompare._result(n, nb, value) for value in gflops]
+
+    def test_unchanged(self):
+        results = HplResultsFile.read_result_file("./data/HPL.out")
+        report = HplComparer().compare(results, results)
+        self.assertEqual(40, len(report.comparisons))
+        self.assertFalse(report.regressed)
+        for comparison in report.comparisons:
+            self.assertEqual(0.0, comparison.change)
+            self.assertFalse(comparison.significant)
+        self.assertEqual([], report.baseline_only)
+        self.assertEqual([], report.candidate_only)
+
+    def test_regression(self):
+        baseline = TestHplCompare._runs(1000, 64, [100.0, 100.5, 99.5]) + TestHplCompare._runs(2000, 64, [200.0])
+        candidate = TestHplCompare._runs(1000, 64, [90.0, 90.5, 89.5]) + TestHplCompare._runs(2000, 64, [199.0])
+        report = HplComparer().compare(baseline, candidate)
+        self.assertEqual(2, len(report.comparisons))
+        # The largest drop first
+        dropped = report.comparisons[0]
+        self.assertEqual(1000, dropped.baseline.representative.n)
+        self.assertAlmostEqual(-0.1, dropped.change)
+        self.assertTrue(dropped.significant)
+        self.assertTrue(dropped.regressed)
+        self.assertFalse(report.comparisons[1].significant)
+        self.assertEqual([dropped], report.regressions)
+
+        # A drop within the threshold is not a regression even if it is significant
+        self.assertFalse(HplComparer(threshold=0.2).compare(baseline, candidate).regressed)
+
+    def test_noise(self):
+        # The same drop is within the noise of inconsistent repeats but not of consistent ones
+        baseline = TestHplCompare._runs(1000, 64, [100.0, 108.0, 92.0])
+        candidate = TestHplCompare._runs(1000, 64, [93.0, 101.0, 85.0])
+        report = HplComparer().compare(baseline, candidate)
+        self.assertTrue(report.assessed)
+        self.assertFalse(report.regressed)
+
+        baseline = TestHplCompare._runs(1000, 64, [100.0, 100.1, 99.9, 100.0, 100.1])
+        candidate = TestHplCompare._runs(1000, 64, [93.0, 93.1, 92.9, 93.0, 92.9])
+        self.assertTrue(HplComparer().compare(baseline, candidate).regressed)
+
+    def test_single_runs(self):
+        # Without repeats the noise is only the prior so a drop of more than the threshold is a regression
+        baseline = TestHplCompare._runs(1000, 64, [100.0])
+        report = HplComparer().compare(baseline, TestHplCompare._runs(1000, 64, [93.0]))
+        self.assertFalse(report.assessed)
+        self.assertFalse(report.comparisons[0].significant)
+        self.assertTrue(report.comparisons[0].regressed)
+        self.assertIn("significance not assessed", str(report.comparisons[0]))
+        self.assertFalse(HplComparer().compare(baseline, TestHplCompare._runs(1000, 64, [97.0])).regressed)
+
+    def test_best(self):
+        # The best configurations differ so only the best can show the regression
+        baseline = TestHplCompare._runs(1000, 64, [100.0, 100.0]) + TestHplCompare._runs(2000, 64, [150.0, 150.0])
+        candidate = TestHplCompare._runs(3000, 64, [120.0, 120.0])
+        report = HplComparer().compare(baseline, candidate)
+        self.assertEqual([], report.comparisons)
+        self.assertEqual(2, len(report.baseline_only))
+        self.assertEqual(1, len(report.candidate_only))
+        self.assertEqual(2000, report.best.baseline.representative.n)
+        self.assertEqual(3000, report.best.candidate.representative.n)
+        self.assertAlmostEqual(-0.2, report.best.change)
+        self.assertTrue(report.regressed)
+
+    def test_matching(self):
+        baseline = [TestHplCompare._result(1000, 64, 100.0, cpu_count=4),
+                    TestHplCompare._result(1000, 64, 50.0, passed=False, cpu_count=8)]
+        candidate = [TestHplCompare._result(1000, 64, 100.0, cpu_count=8)]
+        report = HplComparer().compare(baseline, candidate)
+        # Configurations only match on the same CPU count and failed runs are left out
+        self.assertEqual([], report.comparisons)
+        self.assertEqual([(1000, 64, 2, 2, 4, "WR11C2R4")], report.baseline_only)
+
+        report = HplComparer(exclude_failed=False).compare(baseline, candidate)
+        self.assertEqual(1, len(report.comparisons))
+        self.assertAlmostEqual(1.0, report.comparisons[0].change)
+
+    def test_missing_variant(self):
+        # Results written before the variant was recorded were run with the default variant
+        baseline = TestHplCompare._runs(1000, 64, [100.0])
+        baseline[0].variant = None
+        candidate = TestHplCompare._runs(1000, 64, [99.0]) + TestHplCompare._runs(1000, 64, [80.0])
+        candidate[1].variant = "WR00L2L2"
+        report = HplComparer().compare(baseline, candidate)
+        self.assertEqual(1, len(report.comparisons))
+        self.assertEqual("WR11C2R4", report.comparisons[0].candidate.representative.variant)
+        self.assertEqual([(1000, 64, 2, 2, 4, "WR00L2L2")], report.candidate_only)
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, HplComparer, threshold=-0.1)
+        self.assertRaises(ValueError, HplComparer, confidence=0)
+        self.assertRaises(ValueError, HplComparer, prior_noise=-0.1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,3 +1,4 @@
+import math
 import unittest
 from parameterized import parameterized
 
@@ -7,11 +8,16 @@ class TestHplInputFileGenerator(unittest.TestCase):
 
     def test_generate_process_grid(self) -> None:
         grid = HplInputFileGenerator.generate_possible_process_grids(4)
-        self.assertEqual(2, len(grid), "The number of possible grids was not as expected")
-        self.assertEqual(1, grid[0][0], "The value of P was not as expected")
-        self.assertEqual(2, grid[0][1], "The value of P was not as expected")
-        self.assertEqual(4, grid[1][0], "The value of Q was not as expected")
-        self.assertEqual(2, grid[1][1], "The value of Q was not as expected")
+        self.assertEqual(3, len(grid[0]), "The number of possible grids was not as expected")
+        self.assertEqual([1, 2, 4], grid[0], "The values of P were not as expected")
+        self.assertEqual([4, 2, 1], grid[1], "The values of Q were not as expected")
+
+        self.assertEqual(([1], [1]), HplInputFileGenerator.generate_possible_process_grids(1))
+        self.assertEqual(([1, 7], [7, 1]), HplInputFileGenerator.generate_possible_process_grids(7))
+        grid = HplInputFileGenerator.generate_possible_process_grids(10080)
+        self.assertEqual(72, len(grid[0]))
+        self.assertTrue(all(10080 == P * Q for P, Q in zip(*grid)))
+        self.assertEqual(sorted(grid[0]), grid[0])
 
     def test_generate_input_file(self) -> None:
         output = HplInputFileGenerator.generate_input_file([1000], [32], [2],[2], False,
@@ -26,12 +32,25 @@ class TestHplInputFileGenerator(unittest.TestCase):
         cpu_count: int = 4
         params = HplInputFileGenerator.generate_theoretical_best_inputs(4, 16*(1024**3))
 
-        self.assertEqual(41000, params[0], "The value of N was not as expected")
-        self.assertEqual(202, params[1], "The value of NB was not as expected")
+        self.assertEqual(39600, params[0], "The value of N was not as expected")
+        self.assertEqual(198, params[1], "The value of NB was not as expected")
         self.assertEqual(2, params[2], "The value of P was not as expected")
         self.assertEqual(2, params[3], "The value of Q was not as expected")
 
         self.assertEqual(cpu_count, params[2]*params[3], "The value of P*Q was not as the cpu count")
+        self.assertEqual(0, params[0] % (params[1] * 2), "N was not a multiple of NB x lcm(P, Q)")
+
+    def test_generate_theoretical_best_params_capped(self) -> None:
+        params = HplInputFileGenerator.generate_theoretical_best_inputs(4, 16*(1024**3), max_n=20000)
+        self.assertEqual(19740, params[0], "N was not rounded down to whole blocks below the cap")
+        self.assertEqual(141, params[1], "NB was not chosen for the capped N")
+        self.assertIsNone(HplInputFileGenerator.generate_theoretical_best_inputs(4, 16*(1024**3), min_n=50000))
+
+    def test_generate_theoretical_best_params_step_n(self) -> None:
+        # step_n is ignored but still taken positionally, ahead of the cap
+        with self.assertWarns(DeprecationWarning):
+            params = HplInputFileGenerator.generate_theoretical_best_inputs(4, 16*(1024**3), 1000, 0, 5000, 20000)
+        self.assertEqual(HplInputFileGenerator.generate_theoretical_best_inputs(4, 16*(1024**3), max_n=20000), params)
 
     @parameterized.expand([
                             ["case1", 4, 16*(1024**3)],
@@ -47,6 +66,11 @@ class TestHplInputFileGenerator(unittest.TestCase):
         params = HplInputFileGenerator.generate_theoretical_best_inputs(cpu_count, available_memory_gb)
 
         self.assertEqual(cpu_count, params[2]*params[3], "The value of P*Q was not as the cpu count")
+        self.assertLessEqual(params[2], params[3], "P was greater than Q")
+        self.assertEqual(0, params[0] % (params[1] * math.lcm(params[2], params[3])),
+                         "N was not a multiple of NB x lcm(P, Q)")
+        self.assertTrue(HplInputFileGenerator.memory_model.fits(available_memory_gb, *params),
+                        "N did not fit in memory")
 
     def test_generate_possible_problem_sizes(self) -> None:
         available_mem = 16 * (1024**3)
@@ -60,7 +84,7 @@ class TestHplInputFileGenerator(unittest.TestCase):
     def test_calculate_prob_size(self) -> None:
         available_mem = 16 * (1024 ** 3)
         prob_size = HplInputFileGenerator.calculate_max_problem_size(available_mem)
-        self.assertEqual(41448, prob_size, "The value of N was not as expected")
+        self.assertEqual(40733, prob_size, "The value of N was not as expected")
 
     def test_calculate_prob_size_with_cap(self) -> None:
         available_mem = 256 * (1024 ** 3)
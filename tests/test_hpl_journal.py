@@ -0,0 +1,91 @@
+import os
+import tempfile
+import unittest
+
+from hmxlabs.hplx.hpl_journal import HplJournal
+from hmxlabs.hplx.hpl_results import HplResultsFile
+
+
+class TestHplJournal(unittest.TestCase):
+
+    PHASE = "./HPL_PROB_SIZES.out"
+
+    def setUp(self) -> None:
+        self.results = HplResultsFile.read_result_file("./data/HPL.out")
+        self.configs = [(result.n, result.nb, result.p, result.q) for result in self.results]
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.journal_file = os.path.join(self.temp_dir.name, "journal", "hplx-journal.jsonl")
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def test_resume(self) -> None:
+        with HplJournal(self.journal_file) as journal:
+            self.assertFalse(journal.resumed)
+            journal.plan(self.PHASE, self.configs)
+            for result in self.results[:5]:
+                journal.record(self.PHASE, result)
+            journal.choose("best_grid", {"p": 1, "q": 4})
+
+        with HplJournal(self.journal_file, resume=True) as journal:
+            self.assertTrue(journal.resumed)
+            self.assertEqual(self.configs, journal.planned(self.PHASE))
+            completed = journal.completed(self.PHASE, self.configs)
+            self.assertEqual(self.configs[:5], list(completed))
+            self.assertEqual(self.results[0].to_json(), completed[self.configs[0]][0].to_json())
+            self.assertEqual({"p": 1, "q": 4}, journal.choice("best_grid"))
+            self.assertEqual({}, journal.completed("./HPL_PROC_GRID.out", self.configs))
+
+        # Without resuming the journal starts afresh
+        with HplJournal(self.journal_file) as journal:
+            self.assertEqual([], journal.results(self.PHASE))
+            self.assertIsNone(journal.choice("best_grid"))
+
+    def test_torn_record(self) -> None:
+        with HplJournal(self.journal_file) as journal:
+            journal.record(self.PHASE, self.results[0])
+        with open(self.journal_file, "a") as file:
+            file.write('{"event": "result", "pha')
+
+        with HplJournal(self.journal_file, resume=True) as journal:
+            self.assertEqual(1, len(journal.results(self.PHASE)))
+            journal.record(self.PHASE, self.results[1])
+
+        with HplJournal(self.journal_file, resume=True) as journal:
+            self.assertEqual(2, len(journal.results(self.PHASE)))
+
+    def test_variants(self) -> None:
+        with HplJournal(self.journal_file) as journal:
+            config = self.configs[0]
+            journal.record(self.PHASE, self.results[0])
+            self.assertEqual({}, journal.completed(self.PHASE, [config], variants=2))
+
+            other = HplResultsFile.read_result_file("./data/HPL.out")[0]
+            other.variant = "WC11C2R4"
+            journal.record(self.PHASE, other)
+            self.assertEqual(2, len(journal.completed(self.PHASE, [config], variants=2)[config]))
+
+            # Running a variant again replaces its result
+            journal.record(self.PHASE, self.results[0])
+            self.assertEqual(2, len(journal.results(self.PHASE)))
+
+    def test_repeats(self) -> None:
+        # Each round of repeats is its own phase so every run of a configuration is kept
+        rounds = [self.PHASE, "./HPL_PROB_SIZES_R2.out", "./HPL_PROB_SIZES_R3.out"]
+        with HplJournal(self.journal_file) as journal:
+            for phase in rounds:
+                journal.plan(phase, self.configs[:1])
+                journal.record(phase, self.results[0])
+
+        with HplJournal(self.journal_file, resume=True) as journal:
+            for phase in rounds:
+                self.assertEqual(self.configs[:1], list(journal.completed(phase, self.configs[:1])))
+            self.assertEqual(3, sum(len(journal.results(phase)) for phase in rounds))
+
+    def test_invalid(self) -> None:
+        with self.assertRaises(ValueError):
+            HplJournal("")
+
+
+if __name__ == '__main__':
+    unittest.main()
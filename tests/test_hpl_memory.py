@@ -0,0 +1,80 @@
+import math
+import tempfile
+import unittest
+from pathlib import Path
+
+from hmxlabs.hplx.hpl_memory import HplMemoryModel
+
+
+class TestHplMemoryModel(unittest.TestCase):
+
+    GIB = 1024 ** 3
+
+    def test_local_size(self) -> None:
+        self.assertEqual(500, HplMemoryModel.local_size(1000, 100, 2))
+        # 11 blocks over 2 processes leaves one with 6 of them
+        self.assertEqual(600, HplMemoryModel.local_size(1050, 100, 2))
+        self.assertEqual(50, HplMemoryModel.local_size(50, 100, 4))
+
+    def test_max_problem_size(self) -> None:
+        model = HplMemoryModel()
+        for nb, p, q in [(256, 2, 2), (192, 2, 4), (128, 3, 4), (64, 1, 1)]:
+            n = model.max_problem_size(16 * self.GIB, nb, p, q)
+            step = nb * math.lcm(p, q)
+            self.assertEqual(0, n % step)
+            self.assertTrue(model.fits(16 * self.GIB, n, nb, p, q))
+            self.assertFalse(model.fits(16 * self.GIB, n + step, nb, p, q))
+            # The matrix alone is bounded by the target fraction of memory
+            self.assertLess(8 * n ** 2, 0.8 * 16 * self.GIB)
+
+    def test_max_problem_sizes(self) -> None:
+        # Every configuration is searched at once
+        nb, p, q = [256, 192, 128, 64, 32], [2, 2, 3, 1, 4], [2, 4, 4, 1, 8]
+        for model in [HplMemoryModel(), HplMemoryModel(huge_page_memory=4 * self.GIB, huge_page_size=2 * 1024 ** 2)]:
+            sizes = model.max_problem_sizes(16 * self.GIB, nb, p, q)
+            self.assertEqual(len(nb), len(sizes))
+            for n, config in zip(sizes.tolist(), zip(nb, p, q)):
+                step = config[0] * math.lcm(config[1], config[2])
+                self.assertTrue(model.fits(16 * self.GIB, n, *config))
+                self.assertFalse(model.fits(16 * self.GIB, n + step, *config))
+
+    def test_reserve_and_overhead(self) -> None:
+        # On a small node the OS reserve rather than the fraction is the limit
+        model = HplMemoryModel(memory_fraction=0.95)
+        self.assertEqual(3 * self.GIB, model.usable_memory(4 * self.GIB))
+        self.assertEqual(int(0.95 * 64 * self.GIB), model.usable_memory(64 * self.GIB))
+
+        small_overhead = HplMemoryModel(rank_overhead=0).max_problem_size(16 * self.GIB, 64, 4, 8)
+        large_overhead = HplMemoryModel(rank_overhead=256 * 1024 ** 2).max_problem_size(16 * self.GIB, 64, 4, 8)
+        self.assertGreater(small_overhead, large_overhead)
+
+        # Nothing fits if the overhead alone exceeds the memory
+        self.assertEqual(0, HplMemoryModel(rank_overhead=self.GIB).max_problem_size(8 * self.GIB, 64, 4, 4))
+
+    def test_huge_pages(self) -> None:
+        page_size = 2 * 1024 ** 2
+        model = HplMemoryModel(huge_page_memory=4 * self.GIB, huge_page_size=page_size)
+        n = model.max_problem_size(64 * self.GIB, 128, 2, 2)
+        self.assertGreater(n, 0)
+        self.assertLessEqual(4 * model.rank_memory(n, 128, 2, 2), 4 * self.GIB)
+        self.assertEqual(0, model.rank_memory(n, 128, 2, 2) % page_size)
+        self.assertLess(n, HplMemoryModel().max_problem_size(64 * self.GIB, 128, 2, 2))
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            meminfo = Path(temp_dir) / "meminfo"
+            meminfo.write_text("MemTotal:       65536000 kB\nHugePages_Total:    2048\nHugePages_Free:     1024\n"
+                               "Hugepagesize:       2048 kB\n")
+            self.assertEqual((2 * self.GIB, page_size), HplMemoryModel.huge_pages(str(meminfo)))
+            self.assertEqual((0, 0), HplMemoryModel.huge_pages(str(Path(temp_dir) / "missing")))
+
+    def test_invalid(self) -> None:
+        with self.assertRaises(ValueError):
+            HplMemoryModel(memory_fraction=0)
+        with self.assertRaises(ValueError):
+            HplMemoryModel(memory_fraction=1.5)
+        with self.assertRaises(ValueError):
+            HplMemoryModel(os_reserve=-1)
+
+
+if __name__ == '__main__':
+    unittest.main()
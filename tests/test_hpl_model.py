@@ -0,0 +1,99 @@
+import math
+import unittest
+
+from hmxlabs.hplx.hpl_input import HplInputFileGenerator
+from hmxlabs.hplx.hpl_model import HplPerformanceModel
+from hmxlabs.hplx.hpl_results import HplResult, HplResultsFile
+
+
+class TestHplPerformanceModel(unittest.TestCase):
+
+    @staticmethod
+    def _result(n: int, nb: int, p: int, q: int, time: float) -> HplResult:
+        result = HplResult()
+        result.update({"n": n, "nb": nb, "p": p, "q": q, "time": time, "gflops": 0.0, "passed": True})
+        return result
+
+    def test_predict(self) -> None:
+        model = HplPerformanceModel(1e-10, 0, 0, 0, 0)
+        # Only the updates cost anything so the model runs at the DGEMM rate of each of the 4 processes
+        self.assertAlmostEqual(2.0 / 3.0 * 1000 ** 3 / 4 * 1e-10, model.predict_time(1000, 64, 2, 2))
+        self.assertAlmostEqual(40.0, model.predict_gflops(100000, 64, 2, 2), places=2)
+
+        gflops = HplPerformanceModel.from_peak(50).predict_gflops([10000, 20000], [64, 64], [2, 2], [2, 2])
+        self.assertEqual(2, len(gflops))
+        # Larger problems spend relatively less time communicating
+        self.assertLess(gflops[0], gflops[1])
+        self.assertLess(gflops[1], 200)
+
+    def test_calibrate_recovers_coefficients(self) -> None:
+        expected = HplPerformanceModel(2e-11, 4e-10, 6e-11, 2e-9, 5e-6)
+        results = [self._result(n, nb, p, q, expected.predict_time(n, nb, p, q))
+                   for n in [2000, 5000, 10000, 20000] for nb in [32, 64, 128, 256] for p, q in [(1, 4), (2, 2), (4, 1)]]
+        calibrated = HplPerformanceModel.calibrate(results)
+        for name, value in expected.coefficients.items():
+            self.assertAlmostEqual(1.0, calibrated.coefficients[name] / value, places=6, msg=name)
+
+    def test_calibrate_sample_file(self) -> None:
+        results = HplResultsFile.read_result_file("./data/HPL.out")
+        model = HplPerformanceModel.calibrate(results)
+        self.assertTrue(all(value >= 0 for value in model.coefficients.values()))
+
+        # The model prefers the grid and large problem sizes that did best
+        best = max(results, key=lambda result: result.gflops)
+        best_inputs = HplInputFileGenerator.generate_theoretical_best_inputs(4, 16 * 1024 ** 3, max_n=best.n,
+                                                                             performance_model=model)
+        self.assertEqual((best.p, best.q), best_inputs[2:])
+        self.assertGreater(best_inputs[0], 0.9 * best.n)
+
+    def test_calibrate_too_few_results(self) -> None:
+        results = [self._result(1000, 64, 2, 2, 1.0), self._result(2000, 64, 2, 2, 8.0)]
+        with self.assertRaises(ValueError):
+            HplPerformanceModel.calibrate(results)
+
+        # Failed runs are not used
+        failed = self._result(4000, 64, 2, 2, 60.0)
+        failed.passed = False
+        with self.assertRaises(ValueError):
+            HplPerformanceModel.calibrate(results + [failed])
+
+    def test_calibrate_with_prior(self) -> None:
+        # A single grid and block size cannot separate the communication terms so they come from the prior
+        prior = HplPerformanceModel.from_peak(50)
+        results = [self._result(n, 64, 2, 2, prior.predict_time(n, 64, 2, 2)) for n in [2000, 5000, 10000, 20000]]
+        calibrated = HplPerformanceModel.calibrate(results, prior)
+        for n in [4000, 30000]:
+            self.assertAlmostEqual(1.0, calibrated.predict_time(n, 64, 2, 2) / prior.predict_time(n, 64, 2, 2),
+                                   places=2)
+
+    def test_theoretical_best_inputs(self) -> None:
+        model = HplPerformanceModel.from_peak(50)
+        n, nb, p, q = HplInputFileGenerator.generate_theoretical_best_inputs(16, 16 * 1024 ** 3,
+                                                                             performance_model=model)
+        self.assertEqual((4, 4), (p, q))
+        self.assertEqual(0, nb % HplInputFileGenerator.NB_STEP)
+        self.assertEqual(0, n % (nb * 4))
+        self.assertTrue(HplInputFileGenerator.memory_model.fits(16 * 1024 ** 3, n, nb, p, q))
+
+        capped = HplInputFileGenerator.generate_theoretical_best_inputs(16, 16 * 1024 ** 3, max_n=20000,
+                                                                        performance_model=model)
+        self.assertLessEqual(capped[0], 20000)
+        self.assertIsNone(HplInputFileGenerator.generate_theoretical_best_inputs(16, 16 * 1024 ** 3, min_n=100000,
+                                                                                 performance_model=model))
+
+        # Thousands of ranks have many grids to consider
+        n, nb, p, q = HplInputFileGenerator.generate_theoretical_best_inputs(10080, 1024 ** 5, performance_model=model)
+        self.assertEqual(10080, p * q)
+        self.assertEqual(0, n % (nb * math.lcm(p, q)))
+
+    def test_invalid(self) -> None:
+        with self.assertRaises(ValueError):
+            HplPerformanceModel(0, 0, 0, 0, 0)
+        with self.assertRaises(ValueError):
+            HplPerformanceModel(1e-10, -1, 0, 0, 0)
+        with self.assertRaises(ValueError):
+            HplPerformanceModel.from_peak(0)
+
+
+if __name__ == '__main__':
+    unittest.main()
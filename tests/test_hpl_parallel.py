@@ -0,0 +1,92 @@
+import os
+import tempfile
+import threading
+import unittest
+
+from hmxlabs.hplx.hpl_parallel import HplParallelRunner, HplPartition
+from hmxlabs.hplx.hpl_results import HplResult
+
+
+class TestHplParallelRunner(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def test_cpu_list(self) -> None:
+        self.assertEqual("0-3", HplPartition(0, [3, 1, 2, 0], ".").cpu_list)
+        self.assertEqual("0-3,8-11", HplPartition(0, [0, 1, 2, 3, 8, 9, 10, 11], ".").cpu_list)
+        self.assertEqual("1,3,5-6", HplPartition(0, [1, 3, 5, 6], ".").cpu_list)
+        self.assertEqual("7", HplPartition(0, [7], ".").cpu_list)
+
+        with self.assertRaises(ValueError):
+            HplPartition(0, [], ".")
+
+    def test_create_partitions(self) -> None:
+        partitions = HplParallelRunner.create_partitions(8, 2, self.temp_dir.name, list(range(16)))
+        self.assertEqual(2, len(partitions))
+        self.assertEqual([0, 1, 2, 3], partitions[0].cpus)
+        self.assertEqual([4, 5, 6, 7], partitions[1].cpus)
+        self.assertNotEqual(partitions[0].work_dir, partitions[1].work_dir)
+        for partition in partitions:
+            self.assertTrue(os.path.isdir(partition.work_dir))
+
+        # CPUs that do not divide evenly are left unused
+        partitions = HplParallelRunner.create_partitions(7, 3, self.temp_dir.name, list(range(8)))
+        self.assertEqual([[0, 1], [2, 3], [4, 5]], [partition.cpus for partition in partitions])
+
+        with self.assertRaises(ValueError):
+            HplParallelRunner.create_partitions(2, 4, self.temp_dir.name, list(range(8)))
+        with self.assertRaises(ValueError):
+            HplParallelRunner.create_partitions(8, 0, self.temp_dir.name, list(range(8)))
+
+    def test_closest_grid(self) -> None:
+        p = [1, 2, 4, 8]
+        q = [16, 8, 4, 2]
+        self.assertEqual((4, 4), HplParallelRunner.closest_grid(2, 2, p, q))
+        self.assertEqual((2, 8), HplParallelRunner.closest_grid(1, 4, p, q))
+        self.assertEqual((1, 16), HplParallelRunner.closest_grid(1, 32, p, q))
+        self.assertEqual((8, 2), HplParallelRunner.closest_grid(3, 1, p, q))
+
+        with self.assertRaises(ValueError):
+            HplParallelRunner.closest_grid(2, 2, [], [])
+
+    def test_run(self) -> None:
+        partitions = HplParallelRunner.create_partitions(4, 2, self.temp_dir.name, list(range(4)))
+        configs = [(1000, 64, p, q) for p, q in [(1, 2), (2, 1), (1, 2), (2, 1), (1, 2)]]
+        runs: list[tuple[int, tuple[int, int, int, int]]] = []
+        callback_threads = set()
+        lock = threading.Lock()
+
+        def run_config(partition: HplPartition, config: tuple[int, int, int, int], on_result) -> list[HplResult]:
+            with lock:
+                runs.append((partition.index, config))
+            result = HplResult()
+            result.n, result.nb, result.p, result.q = config
+            result.gflops = 1.0
+            on_result(result)
+            return [result]
+
+        def on_result(_: HplResult) -> None:
+            callback_threads.add(threading.get_ident())
+
+        results = HplParallelRunner(partitions, run_config).run(configs, on_result)
+        self.assertEqual(5, len(results))
+        self.assertEqual(sorted(configs), sorted(config for _, config in runs))
+        # Results are only ever reported on the calling thread
+        self.assertEqual({threading.get_ident()}, callback_threads)
+
+    def test_run_error(self) -> None:
+        partitions = HplParallelRunner.create_partitions(2, 2, self.temp_dir.name, list(range(2)))
+
+        def run_config(partition: HplPartition, config: tuple[int, int, int, int], on_result) -> list[HplResult]:
+            raise RuntimeError("HPL failed")
+
+        with self.assertRaises(RuntimeError):
+            HplParallelRunner(partitions, run_config).run([(1000, 64, 1, 1)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import math
+import tempfile
+import unittest
+from pathlib import Path
+
+from hmxlabs.hplx.hpl_peak import HplPeakPerformance
+
+
+class TestHplPeakPerformance(unittest.TestCase):
+
+    INTEL_AVX512 = {"vendor_id_raw": "GenuineIntel", "family": 6, "hz_advertised": [2100000000, 0],
+                    "flags": ["sse2", "avx", "avx2", "fma", "avx512f"]}
+    AMD_ZEN4 = {"vendor_id_raw": "AuthenticAMD", "family": 25, "hz_advertised": [2400000000, 0],
+                "flags": ["sse2", "avx", "avx2", "fma", "avx512f"]}
+    AMD_ZEN5 = {"vendor_id_raw": "AuthenticAMD", "family": 26, "hz_advertised": [2500000000, 0],
+                "flags": ["sse2", "avx", "avx2", "fma", "avx512f"]}
+
+    def test_flops_per_cycle(self) -> None:
+        self.assertEqual(32, HplPeakPerformance.flops_per_cycle_from_cpu_info(self.INTEL_AVX512))
+        self.assertEqual(16, HplPeakPerformance.flops_per_cycle_from_cpu_info(self.INTEL_AVX512, fma_units=1))
+        # Zen 4 runs AVX-512 on 256 bit units, Zen 5 does not
+        self.assertEqual(16, HplPeakPerformance.flops_per_cycle_from_cpu_info(self.AMD_ZEN4))
+        self.assertEqual(32, HplPeakPerformance.flops_per_cycle_from_cpu_info(self.AMD_ZEN5))
+        self.assertEqual(16, HplPeakPerformance.flops_per_cycle_from_cpu_info({"flags": ["avx", "avx2", "fma"]}))
+        self.assertEqual(8, HplPeakPerformance.flops_per_cycle_from_cpu_info({"flags": ["sse2", "avx"]}))
+        self.assertEqual(8, HplPeakPerformance.flops_per_cycle_from_cpu_info({"flags": ["fp", "asimd"]}))
+        self.assertEqual(4, HplPeakPerformance.flops_per_cycle_from_cpu_info({"flags": ["sse2"]}))
+        self.assertEqual(2, HplPeakPerformance.flops_per_cycle_from_cpu_info({}))
+
+    def test_detect(self) -> None:
+        peak = HplPeakPerformance.detect(48, cpu_info=self.INTEL_AVX512)
+        self.assertAlmostEqual(48 * 2.1 * 32, peak.rpeak)
+        self.assertAlmostEqual(2.1, peak.frequency_ghz)
+        self.assertEqual(32, peak.flops_per_cycle)
+
+        # Overrides take the place of what is detected
+        peak = HplPeakPerformance.detect(48, frequency_ghz=1.8, flops_per_cycle=16, cpu_info=self.INTEL_AVX512)
+        self.assertAlmostEqual(48 * 1.8 * 16, peak.rpeak)
+        peak = HplPeakPerformance.detect(48, rpeak=3000.0, cpu_info=self.INTEL_AVX512)
+        self.assertEqual(3000.0, peak.rpeak)
+
+    def test_detect_smt(self) -> None:
+        # 96 hardware threads on 48 cores share the cores' FMA units, detected or given
+        peak = HplPeakPerformance.detect(96, cpu_info=self.INTEL_AVX512, threads_per_core=2)
+        self.assertAlmostEqual(48 * 2.1 * 32, peak.rpeak)
+        self.assertEqual(48, peak.cores)
+        self.assertEqual(96, peak.cpu_count)
+        peak = HplPeakPerformance.detect(96, flops_per_cycle=32, cpu_info=self.INTEL_AVX512, threads_per_core=2)
+        self.assertAlmostEqual(48 * 2.1 * 32, peak.rpeak)
+        # A run on all of the hardware threads is against the whole peak
+        self.assertAlmostEqual(50.0, peak.efficiency(peak.rpeak / 2, 96))
+
+    def test_base_frequency(self) -> None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cpufreq_dir = Path(temp_dir) / "devices" / "system" / "cpu" / "cpu0" / "cpufreq"
+            cpufreq_dir.mkdir(parents=True)
+            (cpufreq_dir / "base_frequency").write_text("2300000\n")
+            # The brand string is preferred, then sysfs
+            self.assertAlmostEqual(2.1, HplPeakPerformance.frequency_from_cpu_info(self.INTEL_AVX512, temp_dir))
+            self.assertAlmostEqual(2.3, HplPeakPerformance.frequency_from_cpu_info({}, temp_dir))
+
+    def test_efficiency(self) -> None:
+        peak = HplPeakPerformance(4, 2.0, 16)
+        self.assertAlmostEqual(128.0, peak.rpeak)
+        self.assertAlmostEqual(50.0, peak.efficiency(64.0))
+        # A run on half of the CPUs has half the peak
+        self.assertAlmostEqual(100.0, peak.efficiency(64.0, 2))
+        self.assertTrue(math.isnan(peak.efficiency(math.nan)))
+
+    def test_invalid(self) -> None:
+        with self.assertRaises(ValueError):
+            HplPeakPerformance(0, 2.0, 16)
+        with self.assertRaises(ValueError):
+            HplPeakPerformance(4, 0, 16)
+        with self.assertRaises(ValueError):
+            HplPeakPerformance(4, None, None, rpeak=-1)
+        with self.assertRaises(ValueError):
+            HplPeakPerformance(4, 2.0, 16, threads_per_core=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
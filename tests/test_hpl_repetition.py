@@ -0,0 +1,109 @@
+import math
+import unittest
+
+from hmxlabs.hplx.hpl_repetition import HplConfigStats, HplRepetition
+from hmxlabs.hplx.hpl_results import HplResult
+
+
+class TestHplRepetition(unittest.TestCase):
+
+    @staticmethod
+    def _result(n: int, nb: int, gflops: float, passed: bool = True, variant: str = "WR11C2R4") -> HplResult:
+        result = HplResult()
+        result.n = n
+        result.nb = nb
+        result.p = 2
+        result.q = 2
+        result.variant = variant
+        result.gflops = gflops
+        result.time = 10.0
+        result.passed = passed
+        return result
+
+    def test_t_quantile(self):
+        # From the tables of Student's t distribution
+        expected = {1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 10: 2.228, 30: 2.042, math.inf: 1.960}
+        for df, value in expected.items():
+            self.assertAlmostEqual(value, HplRepetition.t_quantile(0.975, df), delta=value * 0.01)
+        self.assertAlmostEqual(-2.228, HplRepetition.t_quantile(0.025, 10), delta=0.02)
+        self.assertAlmostEqual(0.0, HplRepetition.t_quantile(0.5, 7))
+        self.assertRaises(ValueError, HplRepetition.t_quantile, 0.975, 0)
+
+    def test_stats(self):
+        results = [TestHplRepetition._result(1000, 64, gflops) for gflops in [98.0, 100.0, 102.0]]
+        results.append(TestHplRepetition._result(1000, 128, 90.0))
+        stats = HplRepetition().stats(results)
+        self.assertEqual(2, len(stats))
+        repeated = stats[0]
+        self.assertEqual((1000, 64, 2, 2, "WR11C2R4"), repeated.key)
+        self.assertEqual(3, repeated.count)
+        self.assertAlmostEqual(100.0, repeated.mean)
+        self.assertAlmostEqual(2.0, repeated.stddev)
+        self.assertEqual(100.0, repeated.representative.gflops)
+        self.assertLess(repeated.lower, repeated.mean)
+        self.assertAlmostEqual(repeated.mean, (repeated.lower + repeated.upper) / 2)
+
+        single = stats[1]
+        self.assertEqual(1, single.count)
+        self.assertTrue(math.isnan(single.stddev))
+        # The spread is pooled, so the single run's interval is as wide relative to its mean, only by sqrt(3) more
+        self.assertAlmostEqual(single.relative_half_width, repeated.relative_half_width * math.sqrt(3))
+
+    def test_stats_pools_noise(self):
+        # A quiet machine narrows every interval below what the prior alone gives
+        quiet = [TestHplRepetition._result(1000, 64, gflops) for gflops in [100.0, 100.1, 99.9, 100.0, 100.1]]
+        prior_only = HplRepetition().stats(quiet[:1])[0]
+        pooled = HplRepetition().stats(quiet)[0]
+        self.assertLess(pooled.relative_half_width, prior_only.relative_half_width / math.sqrt(5))
+
+    def test_best_prefers_lower_bound(self):
+        # A single lucky run does not beat a configuration that is consistently almost as fast
+        results = [TestHplRepetition._result(1000, 64, gflops) for gflops in [100.0, 100.2, 99.8, 100.1, 99.9]]
+        results.append(TestHplRepetition._result(1000, 128, 101.0))
+        best = HplRepetition().best(results)
+        self.assertEqual(64, best.key[1])
+        self.assertEqual(101.0, HplResult.highest_gflops(results).gflops)
+
+    def test_best_excludes_failed(self):
+        results = [TestHplRepetition._result(1000, 64, 100.0), TestHplRepetition._result(1000, 128, 200.0, False)]
+        self.assertEqual(64, HplRepetition().best(results).key[1])
+        self.assertEqual(128, HplRepetition(exclude_failed=False).best(results).key[1])
+        self.assertIsNone(HplRepetition().best(results[1:]))
+
+    def test_variants_are_separate(self):
+        results = [TestHplRepetition._result(1000, 64, 100.0, variant="WR11C2R4"),
+                   TestHplRepetition._result(1000, 64, 80.0, variant="WR00L2L2")]
+        stats = HplRepetition().stats(results)
+        self.assertEqual(["WR11C2R4", "WR00L2L2"], [stat.key[4] for stat in stats])
+
+    def test_contenders(self):
+        results = [TestHplRepetition._result(1000, 64, 100.0), TestHplRepetition._result(1000, 128, 99.0),
+                   TestHplRepetition._result(1000, 192, 50.0)]
+        repetition = HplRepetition(max_repeats=3)
+        contenders = repetition.contenders(results)
+        # The slow configuration is clearly beaten
+        self.assertEqual([64, 128], [stat.key[1] for stat in contenders])
+
+        # Nothing is repeated beyond the maximum number of runs
+        self.assertEqual([], HplRepetition().contenders(results))
+        results += [TestHplRepetition._result(1000, 64, 100.0), TestHplRepetition._result(1000, 64, 100.0)]
+        self.assertEqual([128], [stat.key[1] for stat in repetition.contenders(results)])
+
+        # Nor a leader with nothing close to it
+        self.assertEqual([], repetition.contenders(results[2:3]))
+        self.assertEqual([], repetition.contenders([TestHplRepetition._result(1000, 64, 100.0),
+                                                    TestHplRepetition._result(1000, 128, 50.0)]))
+
+        # Nor once the interval is tight enough
+        self.assertEqual([], HplRepetition(max_repeats=3, relative_width=0.5).contenders(results))
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, HplRepetition, confidence=1.0)
+        self.assertRaises(ValueError, HplRepetition, max_repeats=0)
+        self.assertRaises(ValueError, HplRepetition, relative_width=0)
+        self.assertRaises(ValueError, HplRepetition, prior_noise=-0.1)
+        self.assertRaises(ValueError, HplConfigStats, [], 0.02, 4, 0.95)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+
+from hmxlabs.hplx.hpl_results import HplResult, HplResultsFile
+from hmxlabs.hplx.hpl_result_set import HplResultSet
+
+
+class TestHplResultSet(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.results = HplResultsFile.read_result_file("./data/HPL.out")
+        self.result_set = HplResultSet.from_results(self.results)
+
+    def test_round_trip(self) -> None:
+        self.assertEqual(40, len(self.result_set))
+        for expected, result in zip(self.results, self.result_set.to_results()):
+            self.assertEqual(expected.to_csv(), result.to_csv())
+
+    def test_highest_gflops(self) -> None:
+        expected = HplResult.highest_gflops(self.results)
+        highest = self.result_set.highest_gflops()
+        self.assertEqual(expected.to_csv(), highest.to_csv())
+
+    def test_top_k(self) -> None:
+        top = self.result_set.top_k(5)
+        expected = sorted((result.gflops for result in self.results), reverse=True)[:5]
+        self.assertEqual(expected, list(top.column("gflops")))
+
+    def test_sort(self) -> None:
+        ascending = self.result_set.sort("time", descending=False)
+        times = list(ascending.column("time"))
+        self.assertEqual(sorted(times), times)
+
+    def test_filter(self) -> None:
+        filtered = self.result_set.filter(p=2, q=2)
+        self.assertEqual(20, len(filtered))
+        for result in filtered:
+            self.assertEqual(2, result.p)
+            self.assertEqual(2, result.q)
+
+        filtered = self.result_set.filter(self.result_set.column("n") == 1000, nb=32)
+        self.assertEqual(2, len(filtered))
+
+    def test_group_by(self) -> None:
+        duplicated = HplResultSet.concat([self.result_set, self.result_set])
+        groups = duplicated.group_by()
+        self.assertEqual(40, len(groups))
+        self.assertEqual(2, len(groups[(1000, 32, 1, 4)]))
+
+    def test_group_max(self) -> None:
+        best_per_grid = self.result_set.group_max("gflops", ("p", "q"))
+        self.assertEqual(2, len(best_per_grid))
+        for result in best_per_grid:
+            grid = self.result_set.filter(p=result.p, q=result.q)
+            self.assertEqual(max(grid.column("gflops")), result.gflops)
+
+    def test_exclude_failed(self) -> None:
+        self.results[0].passed = False
+        result_set = HplResultSet.from_results(self.results)
+        self.assertEqual(39, len(result_set.exclude_failed()))
+
+    def test_concat_categories(self) -> None:
+        for result in self.results:
+            result.type = "proc_grid"
+        first = HplResultSet.from_results(self.results)
+        for result in self.results:
+            result.type = "prob_size"
+        second = HplResultSet.from_results(self.results)
+
+        combined = HplResultSet.concat([first, second])
+        self.assertEqual(80, len(combined))
+        self.assertEqual(40, len(combined.filter(type="proc_grid")))
+        self.assertEqual("prob_size", combined[-1].type)
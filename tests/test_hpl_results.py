@@ -1,6 +1,11 @@
 import unittest
 import json
-from hmxlabs.hplx.hpl_results import HplResult, HplResultsFile
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+from hmxlabs.hplx.hpl_results import HplResult, HplResultsFile, HplOutputParser
 
 
 class TestHplResults(unittest.TestCase):
@@ -45,7 +50,7 @@ class TestHplResults(unittest.TestCase):
         hpl_results.type = "test"
 
         hpl_csv = hpl_results.to_csv()
-        expected = "1000,100,2,4,111,1123,4,test"
+        expected = "1000,100,2,4,111,1123,4,test,None,nan,None,None,None,None,nan,nan,nan,nan,nan,nan,None"
 
         self.assertEqual(expected, hpl_csv, "The HplResults CSV output did not match the expected value")
 
@@ -60,6 +65,7 @@ class TestHplResults(unittest.TestCase):
         self.assertEqual(4, hpl_results.q)
         self.assertEqual(179.72, hpl_results.time)
         self.assertEqual(29.679, hpl_results.gflops)
+        self.assertEqual("WR11C2R4", hpl_results.variant)
 
 
     def test_read_sample_file(self) -> None:
@@ -69,14 +75,111 @@ class TestHplResults(unittest.TestCase):
 
     def test_write_results_to_csv(self) -> None:
         hpL_results = HplResultsFile.read_result_file("./data/HPL.out")
-        test_file = "./data/output/hplx.out.csv"
-        HplResultsFile.write_results_to_csv(test_file, hpL_results)
         with open("./data/HPL.csv","r") as file:
             expected_csv = file.read()
 
-        with open(test_file,"r") as file:
-            generated_csv = file.read()
+        with tempfile.TemporaryDirectory() as temp_dir:
+            test_file = os.path.join(temp_dir, "hplx.out.csv")
+            HplResultsFile.write_results_to_csv(test_file, hpL_results)
+            with open(test_file,"r") as file:
+                generated_csv = file.read()
 
         self.assertEqual(expected_csv, generated_csv, "The generated CSV file did not match the expected CSV file")
 
-
+    def test_read_results_csv_and_json(self) -> None:
+        expected = HplResultsFile.read_result_file("./data/HPL.out")
+        from_csv = HplResultsFile.read_results_csv("./data/HPL.csv")
+        self.assertEqual([result.to_csv() for result in expected], [result.to_csv() for result in from_csv])
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            test_file = os.path.join(temp_dir, "hplx.out.jsonl")
+            HplResultsFile.write_results_to_json(test_file, expected)
+            from_json = HplResultsFile.read_results_json(test_file)
+        self.assertEqual([result.to_json() for result in expected], [result.to_json() for result in from_json])
+
+    def test_iter_results(self) -> None:
+        results = list(HplResultsFile.iter_results("./data/HPL.out"))
+        self.assertEqual(40, len(results))
+        self.assertEqual(1000, results[0].n)
+        self.assertEqual(32, results[0].nb)
+
+    def test_iter_results_follow(self) -> None:
+        with open("./data/HPL.out", "r") as file:
+            lines = file.readlines()
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            growing_file = os.path.join(temp_dir, "HPL.out")
+
+            def write_slowly():
+                with open(growing_file, "w") as out:
+                    for line in lines:
+                        # Split the lines to check partially written lines are not parsed early
+                        out.write(line[:10])
+                        out.flush()
+                        out.write(line[10:])
+                        out.flush()
+
+            writer = threading.Thread(target=write_slowly)
+            writer.start()
+            results = list(HplResultsFile.iter_results(growing_file, follow=True, poll_interval=0.01))
+            writer.join()
+
+        self.assertEqual(40, len(results))
+        self.assertEqual(1000, results[0].n)
+        self.assertEqual(34.745, results[-1].gflops)
+
+    def test_iter_results_follow_stop(self) -> None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            missing_file = os.path.join(temp_dir, "HPL.out")
+            start = time.time()
+            results = list(HplResultsFile.iter_results(missing_file, follow=True, poll_interval=0.01,
+                                                       stop=lambda: time.time() - start > 0.1))
+        self.assertEqual(0, len(results))
+
+    def test_iter_results_mmap(self) -> None:
+        expected = HplResultsFile.read_result_file("./data/HPL.out")
+        results = list(HplResultsFile.iter_results_mmap("./data/HPL.out"))
+        self.assertEqual(len(expected), len(results))
+        for expected_result, result in zip(expected, results):
+            self.assertEqual(expected_result.to_csv(), result.to_csv())
+
+    def test_read_result_files(self) -> None:
+        file_paths = ["./data/HPL.out", "./data/HPL.out", "./data/HPL.out"]
+        results = HplResultsFile.read_result_files(file_paths, max_workers=2)
+        self.assertEqual(120, len(results))
+        self.assertEqual("./data/HPL.out", results[0].source)
+        self.assertEqual("./data/HPL.out", results[-1].source)
+
+    def test_read_residual_and_times(self) -> None:
+        results = HplResultsFile.read_result_file("./data/HPL.out")
+        self.assertEqual(3.71130207e-03, results[0].residual)
+        self.assertTrue(results[0].passed)
+        self.assertEqual(datetime(2024, 12, 9, 11, 54, 52), results[0].start_time)
+        self.assertEqual(datetime(2024, 12, 9, 11, 54, 54), results[0].end_time)
+
+    def test_read_result_summary(self) -> None:
+        summary = HplResultsFile.read_result_summary("./data/HPL.out")
+        self.assertEqual(40, summary.tests)
+        self.assertEqual(40, summary.passed)
+        self.assertEqual(0, summary.failed)
+        self.assertEqual(0, summary.skipped)
+
+    def test_highest_gflops_excludes_failed(self) -> None:
+        lines = [
+            HplOutputParser.RESULT_HEADER,
+            "--------------------------------------------------------------------------------",
+            "WR11C2R4       20000    64     2     4             179.72             2.9679e+01",
+            "||Ax-b||_oo/(eps*(||A||_oo*||x||_oo+||b||_oo)*N)=   3.71130207e-03 ...... PASSED",
+            HplOutputParser.RESULT_HEADER,
+            "--------------------------------------------------------------------------------",
+            "WR11C2R4       20000   128     2     4             100.72             5.2958e+01",
+            "||Ax-b||_oo/(eps*(||A||_oo*||x||_oo+||b||_oo)*N)=   2.59e+03 ...... FAILED",
+        ]
+        parser = HplOutputParser()
+        results = [result for result in map(parser.parse_line, lines) if result is not None]
+        self.assertEqual(2, len(results))
+        self.assertTrue(results[1].failed)
+
+        self.assertEqual(64, HplResult.highest_gflops(results).nb)
+        self.assertEqual(128, HplResult.highest_gflops(results, exclude_failed=False).nb)
+        self.assertEqual(1, len(HplResult.exclude_failed(results)))
@@ -0,0 +1,108 @@
+import os
+import tempfile
+import unittest
+
+from hmxlabs.hplx.hpl_results import HplResult, HplResultsFile
+from hmxlabs.hplx.hpl_result_set import HplResultSet
+from hmxlabs.hplx.hpl_results_writer import HplResultsWriter
+
+
+class TestHplResultsWriter(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.results = HplResultsFile.read_result_file("./data/HPL.out")
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def test_csv_matches_bulk_writer(self) -> None:
+        test_file = os.path.join(self.temp_dir.name, "hplx.csv")
+        with HplResultsWriter.open(test_file, HplResultsWriter.FORMAT_CSV, append=False, batch_size=7) as writer:
+            writer.write_all(self.results)
+
+        with open("./data/HPL.csv", "r") as file:
+            expected_csv = file.read()
+        with open(test_file, "r") as file:
+            generated_csv = file.read()
+
+        self.assertEqual(expected_csv, generated_csv)
+
+    def test_append_writes_header_once(self) -> None:
+        test_file = os.path.join(self.temp_dir.name, "hplx.csv")
+        for result in self.results[:3]:
+            with HplResultsWriter.open(test_file, HplResultsWriter.FORMAT_CSV) as writer:
+                writer.write(result)
+
+        with open(test_file, "r") as file:
+            lines = file.read().splitlines()
+
+        self.assertEqual(4, len(lines))
+        self.assertEqual(HplResult.csv_header(), lines[0])
+        self.assertEqual(self.results[2].to_csv(), lines[3])
+
+    def test_each_result_flushed(self) -> None:
+        test_file = os.path.join(self.temp_dir.name, "hplx.json")
+        with HplResultsWriter.open(test_file, HplResultsWriter.FORMAT_JSON) as writer:
+            writer.write(self.results[0])
+            # Without closing the writer the result must already be in the file
+            with open(test_file, "r") as file:
+                self.assertEqual(self.results[0].to_json() + "\n", file.read())
+
+    def test_batched_results_pending_until_flush(self) -> None:
+        test_file = os.path.join(self.temp_dir.name, "hplx.json")
+        with HplResultsWriter.open(test_file, HplResultsWriter.FORMAT_JSON, batch_size=10) as writer:
+            writer.write(self.results[0])
+            self.assertEqual(0, os.path.getsize(test_file))
+            writer.flush()
+            self.assertLess(0, os.path.getsize(test_file))
+
+    def test_exclude_failed(self) -> None:
+        self.results[0].passed = False
+        test_file = os.path.join(self.temp_dir.name, "hplx.json")
+        with HplResultsWriter.open(test_file, HplResultsWriter.FORMAT_JSON, exclude_failed=True) as writer:
+            writer.write_all(self.results)
+        self.assertEqual(39, writer.count)
+
+    def test_binary_round_trip(self) -> None:
+        for result in self.results:
+            result.type = "prob_size"
+        test_file = os.path.join(self.temp_dir.name, "hplx.bin")
+        with HplResultsWriter.open(test_file, HplResultsWriter.FORMAT_BINARY) as writer:
+            writer.write_all(self.results[:20])
+        with HplResultsWriter.open(test_file, HplResultsWriter.FORMAT_BINARY, batch_size=100) as writer:
+            writer.write_all(self.results[20:])
+
+        loaded = HplResultSet.read_binary_file(test_file)
+        self.assertEqual(40, len(loaded))
+        for expected, result in zip(self.results, loaded):
+            self.assertEqual(expected.to_csv(), result.to_csv())
+
+    def test_binary_truncates_long_categories(self) -> None:
+        self.results[0].source = "/dat/" + "\u00e9" * 70
+        self.results[1].source = "/" + "a" * 200 + "/HPL.out"
+        test_file = os.path.join(self.temp_dir.name, "hplx.bin")
+        with self.assertWarns(UserWarning):
+            with HplResultsWriter.open(test_file, HplResultsWriter.FORMAT_BINARY) as writer:
+                writer.write_all(self.results[:3])
+
+        loaded = HplResultSet.read_binary_file(test_file)
+        length = HplResultSet.BINARY_CATEGORY_LENGTHS["source"]
+        # Multi-byte characters are never split
+        self.assertEqual("/dat/" + "\u00e9" * 61, loaded[0].source)
+        self.assertEqual(self.results[1].source[:length], loaded[1].source)
+        self.assertEqual(self.results[2].source, loaded[2].source)
+
+    def test_binary_ignores_partial_record(self) -> None:
+        test_file = os.path.join(self.temp_dir.name, "hplx.bin")
+        with HplResultsWriter.open(test_file, HplResultsWriter.FORMAT_BINARY) as writer:
+            writer.write_all(self.results[:2])
+        with open(test_file, "ab") as file:
+            file.write(b"partial")
+
+        self.assertEqual(2, len(HplResultSet.read_binary_file(test_file)))
+        with HplResultsWriter.open(test_file, HplResultsWriter.FORMAT_BINARY) as writer:
+            writer.write(self.results[2])
+        loaded = HplResultSet.read_binary_file(test_file)
+        self.assertEqual(3, len(loaded))
+        self.assertEqual(self.results[2].to_csv(), loaded[2].to_csv())
@@ -0,0 +1,97 @@
+import os
+import tempfile
+import time
+import unittest
+
+from hmxlabs.hplx.hpl_runner import HplRunner, HplTimeoutError, HplHangError, HplExitError, HplNoResultsError
+
+
+class TestHplRunner(unittest.TestCase):
+
+    HPL_OUT = os.path.abspath("./data/HPL.out")
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.output_file = os.path.join(self.temp_dir.name, "HPL.out")
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def test_stdout(self) -> None:
+        streamed = []
+        runner = HplRunner(f"cat {self.HPL_OUT}", capture_file=self.output_file, on_result=streamed.append,
+                           poll_interval=0.05)
+        results = runner.run_sync()
+        self.assertEqual(40, len(results))
+        self.assertEqual(results, streamed)
+        self.assertEqual(40, runner.summary.passed)
+
+        # stdout is saved as it is read
+        with open(self.HPL_OUT) as expected, open(self.output_file) as captured:
+            self.assertEqual(expected.read(), captured.read())
+
+    def test_output_file(self) -> None:
+        runner = HplRunner(f"cat {self.HPL_OUT} > HPL.out", output_file=self.output_file, cwd=self.temp_dir.name,
+                           poll_interval=0.05)
+        results = runner.run_sync()
+        self.assertEqual(40, len(results))
+        self.assertEqual(1000, results[0].n)
+        self.assertEqual(32, results[0].nb)
+
+    def test_environment(self) -> None:
+        # The variables given are added to the environment HPL runs in
+        runner = HplRunner(f"test \"$OMP_NUM_THREADS\" = 4 && test -n \"$PATH\" && cat {self.HPL_OUT}",
+                           env={"OMP_NUM_THREADS": "4"}, poll_interval=0.05)
+        self.assertEqual(40, len(runner.run_sync()))
+
+    def test_output_file_not_written(self) -> None:
+        runner = HplRunner("echo no output file", output_file=self.output_file, poll_interval=0.05)
+        with self.assertRaises(HplNoResultsError) as context:
+            runner.run_sync()
+        self.assertEqual(["no output file"], context.exception.output)
+
+    def test_no_results(self) -> None:
+        with self.assertRaises(HplNoResultsError):
+            HplRunner("echo nothing to see", poll_interval=0.05).run_sync()
+
+    def test_exit_code(self) -> None:
+        with self.assertRaises(HplExitError) as context:
+            HplRunner(f"cat {self.HPL_OUT}; exit 3", poll_interval=0.05).run_sync()
+        self.assertEqual(3, context.exception.returncode)
+        # The results produced are still available
+        self.assertEqual(40, len(context.exception.results))
+
+    def test_timeout(self) -> None:
+        start = time.monotonic()
+        with self.assertRaises(HplTimeoutError) as context:
+            HplRunner(f"cat {self.HPL_OUT}; sleep 30", timeout=0.5, poll_interval=0.05).run_sync()
+        self.assertLess(time.monotonic() - start, 10)
+        self.assertEqual(40, len(context.exception.results))
+        self.assertIn("sleep 30", context.exception.command)
+
+    def test_hang(self) -> None:
+        # Output keeps the run alive until it stops coming
+        start = time.monotonic()
+        with self.assertRaises(HplHangError):
+            HplRunner("for i in 1 2 3 4 5; do echo $i; sleep 0.2; done; sleep 30", inactivity_timeout=0.6,
+                      poll_interval=0.05).run_sync()
+        elapsed = time.monotonic() - start
+        self.assertGreater(elapsed, 1.0)
+        self.assertLess(elapsed, 10)
+
+    def test_run_many(self) -> None:
+        runners = [HplRunner(f"cat {self.HPL_OUT}", poll_interval=0.05),
+                   HplRunner("exit 1", poll_interval=0.05),
+                   HplRunner(f"sleep 0.5; cat {self.HPL_OUT}", poll_interval=0.05)]
+        outcomes = HplRunner.run_many(runners)
+        self.assertEqual(40, len(outcomes[0]))
+        self.assertIsInstance(outcomes[1], HplExitError)
+        self.assertEqual(40, len(outcomes[2]))
+
+    def test_invalid(self) -> None:
+        with self.assertRaises(ValueError):
+            HplRunner("")
+
+
+if __name__ == '__main__':
+    unittest.main()
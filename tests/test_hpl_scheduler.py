@@ -0,0 +1,87 @@
+import unittest
+
+from hmxlabs.hplx.hpl_results import HplResult
+from hmxlabs.hplx.hpl_scheduler import HplScheduler
+from hmxlabs.hplx.hpl_tuner import HplTuner
+
+
+class TestHplScheduler(unittest.TestCase):
+
+    @staticmethod
+    def result(n: int, gflops: float, passed: bool = True) -> HplResult:
+        result = HplResult()
+        result.n = n
+        result.nb = 192
+        result.p = 2
+        result.q = 2
+        result.gflops = gflops
+        result.passed = passed
+        return result
+
+    def test_no_measurements(self) -> None:
+        scheduler = HplScheduler()
+        self.assertEqual(0, scheduler.measurements)
+        self.assertIsNone(scheduler.predict_gflops(10000))
+        self.assertIsNone(scheduler.predict_runtime(10000))
+        self.assertIsNone(scheduler.timeout(10000))
+
+    def test_single_measurement(self) -> None:
+        scheduler = HplScheduler()
+        scheduler.add(self.result(10000, 50))
+        self.assertAlmostEqual(50, scheduler.predict_gflops(20000))
+        self.assertAlmostEqual(HplTuner.predict_runtime(20000, 50), scheduler.predict_runtime(20000))
+
+    def test_fit(self) -> None:
+        # Rates that follow 1/gflops = 1/100 + 5000/(100 N) exactly
+        scheduler = HplScheduler()
+        for n in [1000, 5000, 10000, 20000]:
+            scheduler.add(self.result(n, 100 * n / (n + 5000)))
+
+        self.assertAlmostEqual(100 * 40000 / 45000, scheduler.predict_gflops(40000), places=6)
+        self.assertLess(scheduler.predict_gflops(40000), 100)
+        self.assertLess(scheduler.predict_runtime(20000), scheduler.predict_runtime(40000))
+
+    def test_ignores_failed(self) -> None:
+        scheduler = HplScheduler()
+        scheduler.add(self.result(10000, 50))
+        scheduler.add(self.result(10000, 5000, passed=False))
+        scheduler.add(self.result(10000, float("nan")))
+        self.assertEqual(1, scheduler.measurements)
+        self.assertAlmostEqual(50, scheduler.predict_gflops(10000))
+
+    def test_falling_rate_not_extrapolated(self) -> None:
+        # A rate that falls with N is noise and is averaged rather than extrapolated to zero
+        scheduler = HplScheduler()
+        scheduler.add(self.result(1000, 100))
+        scheduler.add(self.result(2000, 50))
+        self.assertGreater(scheduler.predict_gflops(1000000), 50)
+
+    def test_timeout(self) -> None:
+        scheduler = HplScheduler(timeout_factor=2, min_timeout=10)
+        scheduler.add(self.result(10000, 1))
+        self.assertAlmostEqual(2 * HplTuner.predict_runtime(10000, 1), scheduler.timeout(10000))
+        self.assertEqual(10, scheduler.timeout(100))
+
+        with self.assertRaises(ValueError):
+            HplScheduler(timeout_factor=0.5)
+
+    def test_launch_overhead(self) -> None:
+        scheduler = HplScheduler()
+        self.assertIsNone(scheduler.launch_overhead)
+        result = self.result(10000, 50)
+        result.time = 20
+        scheduler.add_launch(35, [result])
+        scheduler.add_launch(31, [result])
+        scheduler.add_launch(90, [result])
+        # Invocations that produced nothing cannot be measured
+        scheduler.add_launch(120, [])
+        self.assertAlmostEqual(15, scheduler.launch_overhead)
+
+    def test_order(self) -> None:
+        configs = [(20000, 64, 2, 2), (1000, 192, 1, 4), (10000, 128, 2, 2), (1000, 64, 2, 2)]
+        self.assertEqual([(1000, 64, 2, 2), (1000, 192, 1, 4), (10000, 128, 2, 2), (20000, 64, 2, 2)],
+                         HplScheduler().order(configs))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from hmxlabs.hplx.hpl_shards import HplShard, HplShardPlanner
+
+
+class TestHplShardPlanner(unittest.TestCase):
+
+    # The sweep in ./data/HPL.out
+    N = [1000, 5000, 10000, 20000]
+    NB = [32, 64, 128, 196, 256]
+    P = [1, 2]
+    Q = [4, 2]
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.sweep = HplShard(self.N, self.NB, self.P, self.Q).configs
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def test_plan(self) -> None:
+        for num_shards in [1, 2, 3, 7, 16]:
+            shards = HplShardPlanner.plan(self.N, self.NB, self.P, self.Q, num_shards)
+            self.assertEqual(num_shards, len(shards))
+            self.assertEqual(list(range(num_shards)), [shard.index for shard in shards])
+
+            # Every configuration in exactly one shard and nothing added
+            configs = [config for shard in shards for config in shard.configs]
+            self.assertEqual(len(self.sweep), len(configs))
+            self.assertEqual(set(self.sweep), set(configs))
+
+            costs = [shard.cost for shard in shards]
+            self.assertEqual(sorted(costs, reverse=True), costs)
+
+    def test_plan_balanced(self) -> None:
+        shards = HplShardPlanner.plan(self.N, self.NB, self.P, self.Q, 4)
+        total = sum(shard.cost for shard in shards)
+        self.assertLessEqual(shards[0].cost, 1.25 * total / 4)
+
+    def test_plan_too_many_shards(self) -> None:
+        shards = HplShardPlanner.plan([1000], [32, 64], [1], [4], 5)
+        self.assertEqual(2, len(shards))
+        self.assertIsNone(HplShard([1000], [32], [1], [4]).split())
+
+        with self.assertRaises(ValueError):
+            HplShardPlanner.plan([1000], [32], [1], [4], 0)
+
+    def test_write_read(self) -> None:
+        shards = HplShardPlanner.plan(self.N, self.NB, self.P, self.Q, 3)
+        manifest = HplShardPlanner.write_shards(shards, self.temp_dir.name, 4)
+        self.assertTrue(Path(manifest).is_file())
+
+        for shard in shards:
+            hpl_dat = (Path(self.temp_dir.name) / f"shard-{shard.index}" / "HPL.dat").read_text().splitlines()
+            self.assertTrue(hpl_dat[2].startswith(HplShard.DEFAULT_OUTPUT_FILE))
+            self.assertEqual(" ".join(str(n) for n in shard.n), hpl_dat[5].split("  ")[0].strip())
+
+        cpu_count, read_shards = HplShardPlanner.read_shards(self.temp_dir.name)
+        self.assertEqual(4, cpu_count)
+        self.assertEqual([shard.to_dict() for shard in shards], [shard.to_dict() for shard in read_shards])
+
+    def test_merge(self) -> None:
+        shards = HplShardPlanner.plan(self.N, self.NB, self.P, self.Q, 3)
+        HplShardPlanner.write_shards(shards, self.temp_dir.name, 4)
+        # Only the first two shards have been run
+        for shard in shards[:2]:
+            shutil.copy("./data/HPL.out", shard.output_path)
+
+        results, incomplete = HplShardPlanner.merge_shards(self.temp_dir.name, max_workers=1)
+        self.assertEqual(80, len(results))
+        self.assertEqual({str(shard.output_path) for shard in shards[:2]}, {result.source for result in results})
+        for result in results:
+            self.assertEqual(4, result.cpu_count)
+            self.assertEqual("shard", result.type)
+
+        self.assertEqual(1, len(incomplete))
+        self.assertEqual(2, incomplete[0][0].index)
+        self.assertEqual(len(shards[2].configs), incomplete[0][1])
+
+    def test_merge_none_run(self) -> None:
+        shards = HplShardPlanner.plan(self.N, self.NB, self.P, self.Q, 3)
+        HplShardPlanner.write_shards(shards, self.temp_dir.name, 4)
+
+        results, incomplete = HplShardPlanner.merge_shards(self.temp_dir.name, max_workers=1)
+        self.assertEqual([], results)
+        self.assertEqual([0, 1, 2], [shard.index for shard, _ in incomplete])
+        self.assertEqual([len(shard.configs) for shard in shards], [missing for _, missing in incomplete])
+
+
+if __name__ == '__main__':
+    unittest.main()
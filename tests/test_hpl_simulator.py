@@ -0,0 +1,100 @@
+import json
+import os
+import tempfile
+import unittest
+from io import StringIO
+from pathlib import Path
+
+from hmxlabs.hplx.hpl_algorithm import HplAlgorithmParameters
+from hmxlabs.hplx.hpl_input import HplInputFileGenerator
+from hmxlabs.hplx.hpl_model import HplPerformanceModel
+from hmxlabs.hplx.hpl_results import HplResultsFile
+from hmxlabs.hplx.hpl_simulator import HplSimulator
+
+
+class TestHplSimulator(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self._model = HplPerformanceModel.from_peak(40.0)
+
+    def test_output(self) -> None:
+        hpl_dat = HplInputFileGenerator.generate_input_file([1000, 5000, 10000, 20000], [32, 64, 128, 196, 256],
+                                                            [1, 2], [4, 2], True, "HPL.out")
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cwd = os.getcwd()
+            os.chdir(temp_dir)
+            try:
+                passed, failed, skipped = HplSimulator(self._model, 4, seed=1).run(hpl_dat)
+            finally:
+                os.chdir(cwd)
+            output_file = str(Path(temp_dir) / "HPL.out")
+
+            # Byte for byte the same header as HPL writes
+            with open(output_file, "r") as file:
+                header = "".join(file.readlines()[:43])
+            with open("./data/HPL.out", "r") as file:
+                self.assertEqual("".join(file.readlines()[:43]), header)
+
+            results = HplResultsFile.read_result_file(output_file)
+            summary = HplResultsFile.read_result_summary(output_file)
+
+        self.assertEqual((40, 0, 0), (passed, failed, skipped))
+        self.assertEqual(40, len(results))
+        self.assertEqual(40, summary.passed)
+        # Each grid in turn, as HPL runs them
+        self.assertEqual((1000, 32, 1, 4), (results[0].n, results[0].nb, results[0].p, results[0].q))
+        self.assertEqual((20000, 256, 2, 2), (results[-1].n, results[-1].nb, results[-1].p, results[-1].q))
+        self.assertTrue(all(result.passed for result in results))
+        # The times are rounded to hundredths of a second, too coarse to check the smallest runs against
+        for result in [result for result in results if result.time >= 1]:
+            self.assertAlmostEqual(HplSimulator.gflops(result.n, result.time), result.gflops,
+                                   delta=0.01 * result.gflops + 0.01)
+        self.assertLessEqual(results[0].start_time, results[-1].start_time)
+
+    def test_stdout_and_record(self) -> None:
+        algorithm = HplAlgorithmParameters.sweep(bcasts=[0, 1], depths=[0, 1])
+        hpl_dat = HplInputFileGenerator.generate_input_file([2000], [64], [2, 4], [2, 2], False, "HPL.out", True,
+                                                            algorithm)
+        stdout = StringIO()
+        record = StringIO()
+        passed, failed, skipped = HplSimulator(self._model, 4, noise=0, failure_rate=1.0).run(hpl_dat, stdout, record)
+        self.assertEqual(0, passed)
+        self.assertEqual(algorithm.num_variants, failed)
+        # The 4 x 2 grid needs more ranks than there are
+        self.assertEqual(algorithm.num_variants, skipped)
+
+        records = [json.loads(line) for line in record.getvalue().splitlines()]
+        self.assertEqual(algorithm.num_variants, len(records))
+        self.assertFalse(any(entry["passed"] for entry in records))
+        # Without noise each run takes exactly its expected time, the best choices the least
+        self.assertEqual([entry["expected_time"] for entry in records], [entry["time"] for entry in records])
+        fastest = min(records, key=lambda entry: entry["time"])
+        self.assertEqual("WR11", fastest["variant"][:4])
+
+        output_file = StringIO(stdout.getvalue())
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir) / "HPL.out"
+            path.write_text(output_file.getvalue())
+            results = HplResultsFile.read_result_file(str(path))
+        self.assertEqual(algorithm.num_variants, len(results))
+        self.assertTrue(all(result.failed for result in results))
+
+    def test_noise(self) -> None:
+        hpl_dat = HplInputFileGenerator.generate_input_file([10000], [128], [2], [2], False, "HPL.out")
+        times = []
+        for seed in [1, 1, 2]:
+            record = StringIO()
+            HplSimulator(self._model, 4, noise=0.05, seed=seed).run(hpl_dat, StringIO(), record)
+            times.append(json.loads(record.getvalue())["time"])
+        self.assertEqual(times[0], times[1])
+        self.assertNotEqual(times[0], times[2])
+
+    def test_invalid(self) -> None:
+        self.assertRaises(ValueError, HplSimulator, self._model, 0)
+        self.assertRaises(ValueError, HplSimulator, self._model, 4, noise=-1)
+        self.assertRaises(ValueError, HplSimulator, self._model, 4, failure_rate=1.5)
+        self.assertRaises(ValueError, HplSimulator, self._model, 4, time_scale=-1)
+
+
+if __name__ == "__main__":
+    unittest.main()
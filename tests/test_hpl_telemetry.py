@@ -0,0 +1,158 @@
+import math
+import tempfile
+import time
+import unittest
+from datetime import datetime
+from pathlib import Path
+
+from hmxlabs.hplx.hpl_results import HplResult
+from hmxlabs.hplx.hpl_telemetry import HplTelemetry, HplTelemetrySample, HplTelemetrySampler
+
+
+class TestHplTelemetry(unittest.TestCase):
+
+    @staticmethod
+    def _write_sysfs(root: Path, frequencies_khz: list[int], temperatures: list[int], throttle_count: int = 0,
+                     base_khz: int = None) -> None:
+        cpu_dir = root / "devices" / "system" / "cpu"
+        for cpu, frequency in enumerate(frequencies_khz):
+            cpufreq_dir = cpu_dir / f"cpu{cpu}" / "cpufreq"
+            cpufreq_dir.mkdir(parents=True, exist_ok=True)
+            (cpufreq_dir / "scaling_cur_freq").write_text(f"{frequency}\n")
+            if base_khz is not None:
+                (cpufreq_dir / "base_frequency").write_text(f"{base_khz}\n")
+            throttle_dir = cpu_dir / f"cpu{cpu}" / "thermal_throttle"
+            throttle_dir.mkdir(parents=True, exist_ok=True)
+            (throttle_dir / "core_throttle_count").write_text(f"{throttle_count}\n")
+        for zone, temperature in enumerate(temperatures):
+            zone_dir = root / "class" / "thermal" / f"thermal_zone{zone}"
+            zone_dir.mkdir(parents=True, exist_ok=True)
+            (zone_dir / "temp").write_text(f"{temperature}\n")
+
+    @staticmethod
+    def _sample(timestamp: float, frequencies: list[float], temperature: float = 50.0, swapped: int = 0,
+                throttle_count: int = 0) -> HplTelemetrySample:
+        return HplTelemetrySample(timestamp, frequencies, 100.0, temperature, swapped, throttle_count)
+
+    def test_sample(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            root = Path(temp_dir)
+            TestHplTelemetry._write_sysfs(root, [3000000, 2800000, 2600000, 2400000], [45000, 61500], 3, 2500000)
+            sampler = HplTelemetrySampler(cpus=[1, 2], sysfs_root=temp_dir)
+            self.assertEqual(2500, sampler.base_frequency)
+
+            sample = sampler.sample()
+            self.assertEqual([2800, 2600], sample.frequencies)
+            self.assertEqual(61.5, sample.temperature)
+            # Only the throttling of the CPUs sampled counts
+            self.assertEqual(6, sample.throttle_count)
+
+    def test_sample_without_sysfs(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            sampler = HplTelemetrySampler(cpus=[0], sysfs_root=temp_dir)
+            self.assertIsNone(sampler.base_frequency)
+            sample = sampler.sample()
+            self.assertTrue(math.isnan(sample.temperature))
+            self.assertEqual(0, sample.throttle_count)
+
+    def test_utilisation_per_sampler(self):
+        # Samplers of concurrent partitions each measure utilisation since their own last sample
+        with tempfile.TemporaryDirectory() as temp_dir:
+            first = HplTelemetrySampler(cpus=[0, 1], sysfs_root=temp_dir)
+            second = HplTelemetrySampler(cpus=[0, 1], sysfs_root=temp_dir)
+            # The busy and total CPU time of each CPU at each sample
+            readings = iter([{0: (10.0, 100.0), 1: (20.0, 100.0)},
+                             {0: (10.0, 100.0), 1: (20.0, 100.0)},
+                             {0: (19.0, 110.0), 1: (25.0, 110.0)},
+                             {0: (29.0, 120.0), 1: (30.0, 120.0)}])
+            first._read_cpu_times = lambda: next(readings)
+            second._read_cpu_times = lambda: next(readings)
+
+            # Nothing to measure from yet
+            self.assertTrue(math.isnan(first.sample().utilisation))
+            self.assertTrue(math.isnan(second.sample().utilisation))
+            # 9 and 5 of 10 seconds busy since the first's last sample
+            self.assertAlmostEqual(70.0, first.sample().utilisation)
+            # The first sampling in between does not reset the second's starting point
+            self.assertAlmostEqual(72.5, second.sample().utilisation)
+
+    def test_aggregate(self):
+        samples = [TestHplTelemetry._sample(1, [3000, 3000], 50, 100, 2),
+                   TestHplTelemetry._sample(2, [2800, 2400], 70, 100, 2),
+                   TestHplTelemetry._sample(3, [2600, 3000], 60, 4196, 2)]
+        telemetry = HplTelemetry(samples[1:], samples[0], base_frequency=2500)
+        self.assertEqual(2700, telemetry.mean_frequency)
+        self.assertEqual(2400, telemetry.min_frequency)
+        self.assertEqual(70, telemetry.max_temperature)
+        self.assertEqual(4096, telemetry.swapped)
+        self.assertEqual(0, telemetry.throttle_events)
+        self.assertEqual(2, telemetry.sample_count)
+        # A single CPU dipping below the base frequency is not throttling
+        self.assertFalse(telemetry.throttled)
+
+    def test_throttled(self):
+        baseline = TestHplTelemetry._sample(1, [3000], throttle_count=5)
+        self.assertTrue(HplTelemetry([TestHplTelemetry._sample(2, [3000], throttle_count=6)], baseline).throttled)
+        self.assertFalse(HplTelemetry([TestHplTelemetry._sample(2, [3000], throttle_count=5)], baseline).throttled)
+
+        slow = [TestHplTelemetry._sample(2, [2000, 2200])]
+        self.assertTrue(HplTelemetry(slow, baseline, base_frequency=2500).throttled)
+        # Without a base frequency only the throttling count can tell
+        self.assertFalse(HplTelemetry(slow, baseline).throttled)
+
+    def test_aggregate_window(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            root = Path(temp_dir)
+            TestHplTelemetry._write_sysfs(root, [3000000], [40000])
+            sampler = HplTelemetrySampler(cpus=[0], sysfs_root=temp_dir)
+            before = sampler.record()
+            time.sleep(0.01)
+            start = time.time()
+            TestHplTelemetry._write_sysfs(root, [2000000], [80000], 1)
+            sampler.record()
+            end = time.time()
+            time.sleep(0.01)
+            TestHplTelemetry._write_sysfs(root, [1000000], [90000], 1)
+            sampler.record()
+
+            telemetry = sampler.aggregate(start, end)
+            self.assertEqual(2000, telemetry.mean_frequency)
+            self.assertEqual(80, telemetry.max_temperature)
+            self.assertEqual(1, telemetry.throttle_events)
+
+            # A run between samples takes the first sample after it starts
+            telemetry = sampler.aggregate(before.timestamp + 0.001, before.timestamp + 0.002)
+            self.assertEqual(2000, telemetry.mean_frequency)
+            self.assertIsNone(sampler.aggregate(end + 60, end + 120))
+
+    def test_aggregate_result(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            root = Path(temp_dir)
+            TestHplTelemetry._write_sysfs(root, [3000000, 3000000], [50000], 0, 3000000)
+            with HplTelemetrySampler(interval=0.01, sysfs_root=temp_dir, cpus=[0, 1]) as sampler:
+                start_time = datetime.now().replace(microsecond=0)
+                time.sleep(0.05)
+                TestHplTelemetry._write_sysfs(root, [2000000, 2000000], [95000], 2)
+                time.sleep(0.05)
+
+            self.assertGreater(len(sampler.samples), 2)
+            result = HplResult()
+            result.start_time = start_time
+            result.end_time = datetime.now().replace(microsecond=0)
+            telemetry = sampler.aggregate_result(result)
+            telemetry.apply_to(result)
+            self.assertEqual(2000, result.min_frequency)
+            self.assertEqual(95, result.max_temperature)
+            self.assertTrue(result.throttled)
+
+            data = result.to_dict()
+            self.assertTrue(data[HplResult.JSON_KEY_THROTTLED])
+            self.assertEqual(95, data[HplResult.JSON_KEY_MAX_TEMPERATURE])
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, HplTelemetrySampler, interval=0)
+        self.assertRaises(ValueError, HplTelemetry, [], TestHplTelemetry._sample(1, [3000]))
+
+
+if __name__ == "__main__":
+    unittest.main()
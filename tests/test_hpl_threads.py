@@ -0,0 +1,32 @@
+import unittest
+
+from hmxlabs.hplx.hpl_threads import HplThreadLayout
+
+
+class TestHplThreadLayout(unittest.TestCase):
+
+    def test_layouts(self) -> None:
+        layouts = HplThreadLayout.layouts(16, [1, 2, 4])
+        self.assertEqual([16, 8, 4], [layout.ranks for layout in layouts])
+        self.assertEqual([1, 2, 4], [layout.threads for layout in layouts])
+        self.assertTrue(all(16 == layout.cpu_count for layout in layouts))
+        self.assertEqual("4 ranks x 4 threads", str(layouts[2]))
+
+    def test_environment(self) -> None:
+        environment = HplThreadLayout(8, 2).environment()
+        self.assertEqual(set(HplThreadLayout.THREAD_ENV_VARS), set(environment))
+        self.assertTrue(all("2" == value for value in environment.values()))
+
+    def test_invalid(self) -> None:
+        with self.assertRaises(ValueError):
+            HplThreadLayout.layouts(16, [3])
+        with self.assertRaises(ValueError):
+            HplThreadLayout.layouts(16, [])
+        with self.assertRaises(ValueError):
+            HplThreadLayout(0, 1)
+        with self.assertRaises(ValueError):
+            HplThreadLayout(4, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
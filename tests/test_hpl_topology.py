@@ -0,0 +1,110 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from hmxlabs.hplx.hpl_input import HplInputFileGenerator
+from hmxlabs.hplx.hpl_topology import HplTopology
+
+
+class TestHplTopology(unittest.TestCase):
+
+    @staticmethod
+    def _write_sysfs(root: Path, sockets: int, nodes_per_socket: int, l3_per_node: int, cores_per_l3: int,
+                     threads_per_core: int = 1) -> None:
+        # CPUs are numbered as Linux does: every core's first thread, then every core's second thread and so on
+        cores = sockets * nodes_per_socket * l3_per_node * cores_per_l3
+        cpu_dir = root / "devices" / "system" / "cpu"
+        cpu_dir.mkdir(parents=True)
+        (cpu_dir / "online").write_text(f"0-{cores * threads_per_core - 1}\n")
+        cores_per_node = l3_per_node * cores_per_l3
+        for node in range(sockets * nodes_per_socket):
+            node_dir = root / "devices" / "system" / "node" / f"node{node}"
+            node_dir.mkdir(parents=True)
+            cpus = [thread * cores + core for thread in range(threads_per_core)
+                    for core in range(node * cores_per_node, (node + 1) * cores_per_node)]
+            (node_dir / "cpulist").write_text(",".join(str(cpu) for cpu in cpus) + "\n")
+
+        for cpu in range(cores * threads_per_core):
+            core = cpu % cores
+            siblings = [thread * cores + core for thread in range(threads_per_core)]
+            l3_first = core // cores_per_l3 * cores_per_l3
+            l3_cpus = [thread * cores + l3_core for thread in range(threads_per_core)
+                       for l3_core in range(l3_first, l3_first + cores_per_l3)]
+            topology_dir = cpu_dir / f"cpu{cpu}" / "topology"
+            topology_dir.mkdir(parents=True)
+            (topology_dir / "physical_package_id").write_text(f"{core // (nodes_per_socket * cores_per_node)}\n")
+            (topology_dir / "thread_siblings_list").write_text(",".join(str(sibling) for sibling in siblings) + "\n")
+            for index, level in enumerate([1, 2, 3]):
+                cache_dir = cpu_dir / f"cpu{cpu}" / "cache" / f"index{index}"
+                cache_dir.mkdir(parents=True)
+                (cache_dir / "level").write_text(f"{level}\n")
+                shared = l3_cpus if 3 == level else siblings
+                (cache_dir / "shared_cpu_list").write_text(",".join(str(cpu) for cpu in sorted(shared)) + "\n")
+
+    def test_probe(self) -> None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            self._write_sysfs(Path(temp_dir), 2, 2, 2, 4, threads_per_core=2)
+            topology = HplTopology.probe(temp_dir)
+            self.assertEqual(2, topology.num_sockets)
+            self.assertEqual(4, topology.num_numa_nodes)
+            self.assertEqual(8, topology.num_l3_domains)
+            self.assertEqual(list(range(32)), topology.cpus)
+
+            # With SMT every hardware thread is a CPU, placed alongside the other threads of its core
+            topology = HplTopology.probe(temp_dir, use_smt=True)
+            self.assertEqual(64, topology.cpu_count)
+            self.assertEqual([0, 32, 1, 33, 2, 34, 3, 35, 4], topology.placement(9))
+
+            self.assertIsNone(HplTopology.probe(str(Path(temp_dir) / "missing")))
+
+    def test_parse_cpu_list(self) -> None:
+        self.assertEqual([0, 1, 2, 3, 8, 10, 11], HplTopology.parse_cpu_list("0-3,8,10-11\n"))
+        self.assertEqual([], HplTopology.parse_cpu_list(""))
+
+    def test_placement(self) -> None:
+        # CPUs numbered alternately across two sockets are placed a socket at a time
+        topology = HplTopology({cpu: (cpu % 2, cpu % 2, cpu % 2, cpu) for cpu in range(8)})
+        self.assertEqual([0, 2, 4, 6, 1, 3, 5, 7], topology.placement(8))
+        self.assertEqual([4, 6, 5], topology.placement(3, [4, 5, 6]))
+        with self.assertRaises(ValueError):
+            topology.placement(9)
+
+    def test_grid_cost(self) -> None:
+        # 2 sockets of 8 cores, each socket a NUMA node and L3 domain
+        topology = HplTopology({cpu: (cpu // 8, cpu // 8, cpu // 8, cpu) for cpu in range(16)})
+        # Column-major keeps each column of an 8 x 2 grid within a socket, leaving only the rows to cross sockets
+        # as the single row of a 1 x 16 grid does. Row-major splits every column across the sockets
+        self.assertEqual(topology.grid_cost(1, 16), topology.grid_cost(8, 2, row_major=False))
+        self.assertLess(topology.grid_cost(8, 2, row_major=False), topology.grid_cost(8, 2, row_major=True))
+        self.assertLess(topology.grid_cost(8, 2, row_major=False), topology.grid_cost(2, 8, row_major=True))
+
+        # One domain fits every grid perfectly
+        flat = HplTopology({cpu: (0, 0, 0, cpu) for cpu in range(16)})
+        self.assertEqual(0.0, flat.grid_cost(4, 4))
+
+    def test_rank_grids(self) -> None:
+        grids = HplInputFileGenerator.generate_possible_process_grids(32)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            self._write_sysfs(Path(temp_dir), 2, 2, 2, 4)
+            topology = HplTopology.probe(temp_dir)
+
+        ranked, row_major = topology.rank_grids(grids[0], grids[1])
+        self.assertEqual(HplTopology.DEFAULT_MAX_GRIDS, len(ranked[0]))
+        # Each column of 8 ranks is a NUMA node
+        self.assertEqual((8, 4), (ranked[0][0], ranked[1][0]))
+        self.assertFalse(row_major)
+        self.assertNotIn(32, ranked[0])
+        self.assertNotIn(32, ranked[1])
+
+        # Without any structure to fit the grids are as square as possible with P no greater than Q
+        flat = HplTopology({cpu: (0, 0, 0, cpu) for cpu in range(32)})
+        ranked, row_major = flat.rank_grids(grids[0], grids[1], 3)
+        self.assertEqual(([4, 8, 2], [8, 4, 16]), ranked)
+        self.assertTrue(row_major)
+
+        with self.assertRaises(ValueError):
+            flat.rank_grids(grids[0], grids[1], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
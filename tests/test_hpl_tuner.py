@@ -0,0 +1,166 @@
+import time
+import unittest
+
+from hmxlabs.hplx.hpl_results import HplResult
+from hmxlabs.hplx.hpl_tuner import HplTuner
+
+
+class TestHplTuner(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.runs: list[tuple[str, list[tuple[int, int, int, int]]]] = []
+
+    def fake_run_configs(self, configs: list[tuple[int, int, int, int]], run_type: str) -> list[HplResult]:
+        # A made up machine where larger block sizes and squarer grids are faster
+        self.runs.append((run_type, configs))
+        results = []
+        for n, nb, p, q in configs:
+            result = HplResult()
+            result.n = n
+            result.nb = nb
+            result.p = p
+            result.q = q
+            result.gflops = nb / max(p, q)
+            result.time = HplTuner.predict_runtime(n, result.gflops)
+            result.passed = True
+            results.append(result)
+        return results
+
+    @staticmethod
+    def fake_gflops(n: int, nb: int, p: int, q: int) -> float:
+        return nb / max(p, q)
+
+    def rounds(self) -> list[list[tuple[int, int, int, int]]]:
+        # Each round is run a process grid at a time so gather the configurations run in each
+        rounds: dict[str, list[tuple[int, int, int, int]]] = {}
+        for run_type, configs in self.runs:
+            rounds.setdefault(run_type, []).extend(configs)
+        return list(rounds.values())
+
+    def assert_rounds_fit(self, tuner: HplTuner, budget: float) -> None:
+        # The fake runs take no time so each round has an equal share of the whole budget
+        num_rounds = len(tuner.round_problem_sizes())
+        for round_idx, configs in enumerate(self.rounds()):
+            predicted = sum(HplTuner.predict_runtime(n, TestHplTuner.fake_gflops(n, nb, p, q))
+                            for n, nb, p, q in configs)
+            self.assertLessEqual(predicted, budget / (num_rounds - round_idx))
+
+    def test_parse_duration(self) -> None:
+        self.assertEqual(90, HplTuner.parse_duration("90"))
+        self.assertEqual(90, HplTuner.parse_duration("90s"))
+        self.assertEqual(1800, HplTuner.parse_duration("30m"))
+        self.assertEqual(7200, HplTuner.parse_duration("2h"))
+        self.assertEqual(5400, HplTuner.parse_duration("1h30m"))
+        self.assertEqual(86400, HplTuner.parse_duration("1d"))
+
+        for invalid in ["", "2x", "h", "1h 30m", "abc"]:
+            with self.assertRaises(ValueError):
+                HplTuner.parse_duration(invalid)
+
+    def test_predict_runtime(self) -> None:
+        self.assertAlmostEqual(((2.0 / 3.0) * 1000 ** 3 + 2.0 * 1000 ** 2) / 1e9, HplTuner.predict_runtime(1000, 1))
+        self.assertEqual(float("inf"), HplTuner.predict_runtime(1000, 0))
+
+    def test_round_sizes(self) -> None:
+        tuner = HplTuner(self.fake_run_configs, [32, 64, 96, 128, 160, 192, 224, 256, 288], [1, 2, 3], [6, 3, 2],
+                         1000, 40000, 3600)
+        self.assertEqual([27, 9, 3], tuner.round_sizes())
+
+        problem_sizes = tuner.round_problem_sizes()
+        self.assertEqual(3, len(problem_sizes))
+        self.assertEqual(40000, problem_sizes[-1])
+        self.assertEqual(sorted(problem_sizes), problem_sizes)
+        for problem_size in problem_sizes:
+            self.assertEqual(0, problem_size % HplTuner.N_GRANULARITY)
+            self.assertGreaterEqual(problem_size, 1000)
+
+    def test_tune(self) -> None:
+        tuner = HplTuner(self.fake_run_configs, [32, 64, 128, 256], [1, 2], [4, 2], 1000, 20000, 1e9)
+        best = tuner.tune()
+
+        self.assertEqual(256, best.nb)
+        self.assertEqual(2, best.p)
+        self.assertEqual(2, best.q)
+        self.assertEqual(20000, best.n)
+
+        # Every candidate is run in the first round and only the best go through to later, larger, rounds
+        rounds = self.rounds()
+        self.assertEqual([8, 3], [len(configs) for configs in rounds])
+        self.assertEqual({(128, 2, 2), (256, 2, 2), (256, 1, 4)}, {(nb, p, q) for _, nb, p, q in rounds[-1]})
+        # With nothing to predict the cost of the first round from it is run at the smallest N
+        self.assertEqual({1000}, {n for n, _, _, _ in rounds[0]})
+        self.assertEqual(11, len(tuner.results))
+
+    def test_tune_failed_ranked_last(self) -> None:
+        def run_configs(configs: list[tuple[int, int, int, int]], run_type: str) -> list[HplResult]:
+            results = self.fake_run_configs(configs, run_type)
+            for result in results:
+                if 256 == result.nb:
+                    result.passed = False
+            return results
+
+        tuner = HplTuner(run_configs, [32, 64, 128, 256], [2], [2], 1000, 20000, 1e9, eta=2)
+        best = tuner.tune()
+        self.assertEqual(128, best.nb)
+        self.assertNotIn(256, [nb for _, nb, _, _ in self.runs[-1][1]])
+
+    def test_tune_budget(self) -> None:
+        # With almost no budget the later rounds are shrunk, or skipped, so they fit
+        tuner = HplTuner(self.fake_run_configs, [32, 64, 128, 256], [1, 2], [4, 2], 1000, 1000000, 1)
+        tuner.tune()
+        self.assertEqual({1000}, {n for n, _, _, _ in self.rounds()[0]})
+        self.assert_rounds_fit(tuner, 1)
+
+    def test_tune_budget_first_round(self) -> None:
+        # The first round alone would take far longer than the budget at the N planned for it
+        tuner = HplTuner(self.fake_run_configs, [32, 64, 128, 256], [1, 2], [4, 2], 1000, 1000000, 60,
+                         predict_gflops=TestHplTuner.fake_gflops)
+        planned = tuner.round_problem_sizes()[0]
+        self.assertGreater(sum(HplTuner.predict_runtime(planned, TestHplTuner.fake_gflops(planned, nb, p, q))
+                               for nb, p, q in [(32, 1, 4), (64, 1, 4), (128, 1, 4), (256, 1, 4),
+                                                (32, 2, 2), (64, 2, 2), (128, 2, 2), (256, 2, 2)]), 60)
+
+        tuner.tune()
+        rounds = self.rounds()
+        self.assertEqual(8, len(rounds[0]))
+        self.assertLess(rounds[0][0][0], planned)
+        self.assert_rounds_fit(tuner, 60)
+
+        # If not every candidate fits even at the smallest N only the fastest are run
+        self.runs = []
+        tuner = HplTuner(self.fake_run_configs, [32, 64, 128, 256], [1, 2], [4, 2], 15000, 1000000, 60,
+                         predict_gflops=TestHplTuner.fake_gflops)
+        tuner.tune()
+        self.assertEqual([(15000, 256, 2, 2)], self.rounds()[0])
+
+    def test_tune_budget_within_round(self) -> None:
+        # No more process grids are run once the budget is spent
+        def run_configs(configs: list[tuple[int, int, int, int]], run_type: str) -> list[HplResult]:
+            time.sleep(0.2)
+            return self.fake_run_configs(configs, run_type)
+
+        tuner = HplTuner(run_configs, [32, 64, 128, 256], [1, 2], [4, 2], 1000, 20000, 0.1)
+        best = tuner.tune()
+        self.assertEqual(1, len(self.runs))
+        self.assertEqual((1, 4), (best.p, best.q))
+
+    def test_stop_when(self) -> None:
+        tuner = HplTuner(self.fake_run_configs, [32, 64, 128, 256], [1, 2], [4, 2], 1000, 20000, 1e9)
+        tuner.stop_when(lambda result: result.gflops >= 100)
+        best = tuner.tune()
+        self.assertEqual(1, len(self.rounds()))
+        self.assertEqual(128, best.gflops)
+
+    def test_invalid(self) -> None:
+        with self.assertRaises(ValueError):
+            HplTuner(self.fake_run_configs, [32], [1, 2], [4], 1000, 20000, 60)
+        with self.assertRaises(ValueError):
+            HplTuner(self.fake_run_configs, [], [1], [4], 1000, 20000, 60)
+        with self.assertRaises(ValueError):
+            HplTuner(self.fake_run_configs, [32], [1], [4], 1000, 20000, 60, eta=1)
+        with self.assertRaises(ValueError):
+            HplTuner(self.fake_run_configs, [32], [1], [4], 30000, 20000, 60)
+
+
+if __name__ == '__main__':
+    unittest.main()